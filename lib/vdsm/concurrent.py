@@ -19,11 +19,16 @@
 #
 
 import threading
+from collections import deque
 from collections import namedtuple
 
+from . import utils
+
 
 Result = namedtuple("Result", ["succeeded", "value"])
 
+Status = namedtuple("Status", ["succeeded", "value", "elapsed"])
+
 
 def tmap(func, iterable):
     args = list(iterable)
@@ -46,3 +51,90 @@ def tmap(func, iterable):
         t.join()
 
     return results
+
+
+class BoundedPool(object):
+    """
+    Run calls in threads, at most size threads at the same time.
+
+    A call that did not return in time is abandoned, but its thread keeps
+    counting against size until the call returns. Calls stuck on a dead
+    resource cannot pile up threads; while all threads are busy, new calls
+    wait for a free thread until their timeout expires.
+
+    A pool is meant to be shared by all the users of the same resource.
+    """
+
+    def __init__(self, name, size):
+        self._name = name
+        self._size = size
+        self._cond = threading.Condition(threading.Lock())
+        self._busy = 0
+
+    @property
+    def busy(self):
+        """
+        The number of threads running calls, including abandoned calls.
+        """
+        with self._cond:
+            return self._busy
+
+    def map(self, func, iterable, timeout, item_timeout=None):
+        """
+        Call func(item) for every item, waiting up to timeout seconds for
+        all calls. A call is abandoned if it did not return item_timeout
+        seconds after it was started.
+
+        Returns a list of Status in the order of the items. value is the
+        result of func on success, or the exception raised otherwise. The
+        status of an item not started or abandoned is None.
+        """
+        items = list(iterable)
+        results = [None] * len(items)
+        queue = deque(xrange(len(items)))
+        running = {}
+        deadline = utils.monotonic_time() + timeout
+        if item_timeout is None:
+            item_timeout = timeout
+
+        def run(i, started):
+            try:
+                status = Status(True, func(items[i]),
+                                utils.monotonic_time() - started)
+            except Exception as e:
+                status = Status(False, e, utils.monotonic_time() - started)
+            with self._cond:
+                self._busy -= 1
+                # Ignore late results of abandoned calls
+                if running.pop(i, None) is not None:
+                    results[i] = status
+                self._cond.notify_all()
+
+        with self._cond:
+            while True:
+                now = utils.monotonic_time()
+                for i, started in running.items():
+                    if now >= started + item_timeout:
+                        del running[i]
+
+                if now >= deadline or not (queue or running):
+                    break
+
+                while queue and self._busy < self._size:
+                    i = queue.popleft()
+                    running[i] = now
+                    self._busy += 1
+                    t = threading.Thread(target=run, args=(i, now),
+                                         name="%s-%d" % (self._name, i))
+                    t.daemon = True
+                    t.start()
+
+                wakeup = deadline
+                if running:
+                    wakeup = min(wakeup,
+                                 min(running.itervalues()) + item_timeout)
+                self._cond.wait(max(0, wakeup - now))
+            # Calls still running are abandoned
+            running.clear()
+
+        return results
@@ -18,6 +18,7 @@
 #
 
 from contextlib import closing
+from contextlib import contextmanager
 from glob import iglob
 import array
 import ctypes
@@ -36,9 +37,14 @@ from .utils import anyFnmatch
 from .utils import CommandPath
 from .utils import execCmd
 from .utils import grouper
+from . import netlink
+from .netlink import addr as netlink_addr
 from .netlink import link
+from .netlink import route as netlink_route
+from .netlink import rule as netlink_rule
 
 _IP_BINARY = CommandPath('ip', '/sbin/ip')
+_TABLES = {'main': 254, 'default': 253, 'local': 255}
 
 NET_SYSFS = '/sys/class/net'
 DUMMY_BRIDGE = ';vdsmdummy;'
@@ -527,6 +533,98 @@ def _execCmd(command):
     return output
 
 
+@contextmanager
+def batch():
+    """
+    Run the address, route, rule and link changes issued by the current thread
+    in the block over a single netlink socket.
+    """
+    with netlink.session():
+        yield
+
+
+@contextmanager
+def _netlinkErrors():
+    try:
+        yield
+    except IOError as e:
+        raise IPRoute2Error(e.strerror or str(e))
+
+
+def _keywordArgs(tokens, keywords):
+    """
+    Returns a dictionary of the 'keyword value' pairs in tokens, or None if
+    tokens contain anything but the specified keywords, in which case the
+    request is left to the ip binary.
+    """
+    if len(tokens) % 2:
+        return None
+    args = dict(zip(tokens[::2], tokens[1::2]))
+    if not set(args).issubset(keywords):
+        return None
+    return args
+
+
+def _table(value):
+    if value is None:
+        return _TABLES['main']
+    value = _TABLES.get(value, value)
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _linkIndex(dev):
+    return link.get_link(dev)['index']
+
+
+def _netlinkRoute(route, family=4, dev=None):
+    """
+    Returns the keyword arguments of the netlink route for an ip route
+    specification, or None if it can only be handled by the ip binary.
+    """
+    tokens = list(route)
+    if not tokens:
+        return None
+    network = tokens[0]
+    args = _keywordArgs(tokens[1:], ('via', 'src', 'dev', 'table'))
+    if args is None:
+        return None
+    if network == 'default':
+        via = args.get('via', '')
+        network = '::/0' if family == 6 or ':' in via else '0.0.0.0/0'
+    elif not _isValid(network, IPNetwork):
+        return None
+    table = _table(args.get('table'))
+    if table is None:
+        return None
+    dev = args.get('dev', dev)
+    return {'destination': network, 'gateway': args.get('via'),
+            'source': args.get('src'), 'table': table,
+            'index': _linkIndex(dev) if dev else 0}
+
+
+def _netlinkRule(rule):
+    """
+    Returns the keyword arguments of the netlink rule for an ip rule
+    specification, or None if it can only be handled by the ip binary.
+    """
+    args = _keywordArgs(list(rule), ('from', 'to', 'dev', 'iif', 'table',
+                                     'lookup'))
+    if args is None:
+        return None
+    table = _table(args.get('table', args.get('lookup')))
+    if table is None:
+        return None
+    source = args.get('from')
+    destination = args.get('to')
+    return {'table': table,
+            'source': None if source == 'all' else source,
+            'destination': None if destination == 'all' else destination,
+            'iif': args.get('dev', args.get('iif'))}
+
+
 def routeShowGateways(table):
     command = [_IP_BINARY.cmd, 'route', 'show', 'to', '0.0.0.0/0', 'table',
                table]
@@ -539,6 +637,11 @@ def routeShowTable(table):
 
 
 def routeAdd(route, family=4, dev=None):
+    with _netlinkErrors():
+        args = _netlinkRoute(route, family, dev)
+        if args is not None:
+            netlink_route.add_route(**args)
+            return
     command = [_IP_BINARY.cmd, '-%s' % family, 'route', 'add']
     command += route
     if dev is not None:
@@ -547,6 +650,11 @@ def routeAdd(route, family=4, dev=None):
 
 
 def routeDel(route):
+    with _netlinkErrors():
+        args = _netlinkRoute(route)
+        if args is not None:
+            netlink_route.del_route(**args)
+            return
     command = [_IP_BINARY.cmd, 'route', 'del']
     command += route
     _execCmd(command)
@@ -577,12 +685,22 @@ def ruleList():
 
 
 def ruleAdd(rule):
+    args = _netlinkRule(rule)
+    if args is not None:
+        with _netlinkErrors():
+            netlink_rule.add_rule(**args)
+        return
     command = [_IP_BINARY.cmd, 'rule', 'add']
     command += rule
     _execCmd(command)
 
 
 def ruleDel(rule):
+    args = _netlinkRule(rule)
+    if args is not None:
+        with _netlinkErrors():
+            netlink_rule.del_rule(**args)
+        return
     command = [_IP_BINARY.cmd, 'rule', 'del']
     command += rule
     _execCmd(command)
@@ -594,9 +712,14 @@ def ruleExists(rule):
 
 
 def addrAdd(dev, ipaddr, netmask, family=4):
-    command = [_IP_BINARY.cmd, '-%s' % family, 'addr', 'add', 'dev', dev,
-               '%s/%s' % (ipaddr, netmask)]
-    _execCmd(command)
+    try:
+        prefixlen = IPNetwork('%s/%s' % (ipaddr, netmask)).prefixlen
+    except (AddrFormatError, ValueError):
+        raise IPRoute2Error('Invalid address %s/%s' % (ipaddr, netmask))
+    with _netlinkErrors():
+        netlink_addr.add_address(
+            _linkIndex(dev), '%s/%s' % (ipaddr, prefixlen),
+            socket.AF_INET6 if family == 6 else socket.AF_INET)
 
 
 def addrFlush(dev, family='both'):
@@ -606,10 +729,10 @@ def addrFlush(dev, family='both'):
 
     Link-local address must be kept not to harm DHCPv6 functionality.
     """
-    family_param = ['-%s' % family] if family in (4, 6) else []
-    command = [_IP_BINARY.cmd] + family_param + ['addr', 'flush', 'dev', dev,
-                                                 'scope', 'global']
-    _execCmd(command)
+    families = {4: socket.AF_INET, 6: socket.AF_INET6}
+    with _netlinkErrors():
+        netlink_addr.flush_addresses(
+            _linkIndex(dev), families.get(family, socket.AF_UNSPEC))
 
 
 def linkAdd(name, linkType, link=None, args=()):
@@ -624,7 +747,37 @@ def linkAdd(name, linkType, link=None, args=()):
     _execCmd(command)
 
 
+def _netlinkLinkArgs(linkArgs):
+    """
+    Returns the keyword arguments of netlink set_link for ip link set
+    arguments, or None if they can only be handled by the ip binary.
+    """
+    args = {}
+    tokens = list(linkArgs)
+    while tokens:
+        token = tokens.pop(0)
+        if token in ('up', 'down'):
+            args['up'] = token == 'up'
+        elif token == 'nomaster':
+            args['master'] = ''
+        elif token in ('mtu', 'master') and tokens:
+            args[token] = tokens.pop(0)
+        else:
+            return None
+    if 'mtu' in args:
+        try:
+            args['mtu'] = int(args['mtu'])
+        except ValueError:
+            return None
+    return args
+
+
 def linkSet(dev, linkArgs):
+    args = _netlinkLinkArgs(linkArgs)
+    if args is not None:
+        with _netlinkErrors():
+            link.set_link(dev, **args)
+        return
     command = [_IP_BINARY.cmd, 'link', 'set', 'dev', dev]
     command += linkArgs
     _execCmd(command)
@@ -75,6 +75,23 @@ def stop_event_loop():
 
 __connections = {}
 __connectionLock = threading.Lock()
+__registeredEvents = set()
+
+# Domain events dispatched to the target of the connection. Events which
+# the libvirt bindings do not define are not registered. BLOCK_JOB_2,
+# reporting the drive name instead of its path, replaces BLOCK_JOB.
+_DOMAIN_EVENTS = (
+    'VIR_DOMAIN_EVENT_ID_LIFECYCLE',
+    'VIR_DOMAIN_EVENT_ID_REBOOT',
+    'VIR_DOMAIN_EVENT_ID_RTC_CHANGE',
+    'VIR_DOMAIN_EVENT_ID_IO_ERROR_REASON',
+    'VIR_DOMAIN_EVENT_ID_GRAPHICS',
+    'VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2',
+    'VIR_DOMAIN_EVENT_ID_WATCHDOG',
+    'VIR_DOMAIN_EVENT_ID_BALLOON_CHANGE',
+    'VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED',
+    'VIR_DOMAIN_EVENT_ID_TUNABLE',
+)
 
 
 def _read_password():
@@ -108,6 +125,29 @@ def _clear():
     """
     with __connectionLock:
         __connections.clear()
+        __registeredEvents.clear()
+
+
+def _domain_events():
+    events = []
+    for name in _DOMAIN_EVENTS:
+        if (name == 'VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2' and
+                not hasattr(libvirt, name)):
+            name = 'VIR_DOMAIN_EVENT_ID_BLOCK_JOB'
+        if hasattr(libvirt, name):
+            events.append(getattr(libvirt, name))
+        else:
+            log.debug('libvirt does not support %s', name)
+    return events
+
+
+def registered_events():
+    """
+    Return the ids of the domain events dispatched to the target of the
+    connection.
+    """
+    with __connectionLock:
+        return frozenset(__registeredEvents)
 
 
 def get(target=None, killOnFailure=True):
@@ -171,17 +211,16 @@ def get(target=None, killOnFailure=True):
                 if callable(method) and name[0] != '_':
                     setattr(conn, name, wrapMethod(method))
             if target is not None:
-                for ev in (libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
-                           libvirt.VIR_DOMAIN_EVENT_ID_REBOOT,
-                           libvirt.VIR_DOMAIN_EVENT_ID_RTC_CHANGE,
-                           libvirt.VIR_DOMAIN_EVENT_ID_IO_ERROR_REASON,
-                           libvirt.VIR_DOMAIN_EVENT_ID_GRAPHICS,
-                           libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB,
-                           libvirt.VIR_DOMAIN_EVENT_ID_WATCHDOG):
-                    conn.domainEventRegisterAny(None,
-                                                ev,
-                                                target.dispatchLibvirtEvents,
-                                                ev)
+                for ev in _domain_events():
+                    try:
+                        conn.domainEventRegisterAny(
+                            None, ev, target.dispatchLibvirtEvents, ev)
+                    except libvirt.libvirtError:
+                        # libvirtd may be older than the bindings
+                        log.warning('cannot register domain event %s', ev,
+                                    exc_info=True)
+                    else:
+                        __registeredEvents.add(ev)
             # In case we're running into troubles with keeping the connections
             # alive we should place here:
             # conn.setKeepAlive(interval=5, count=3)
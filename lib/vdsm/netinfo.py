@@ -19,6 +19,7 @@
 #
 
 from collections import defaultdict
+from copy import deepcopy
 import errno
 from glob import iglob
 from datetime import datetime, timedelta
@@ -30,6 +31,7 @@ import os
 import shlex
 import socket
 import struct
+import threading
 import xml.etree.cElementTree as etree
 
 from . import constants
@@ -45,6 +47,7 @@ from .netconfpersistence import RunningConfig
 from .netlink import link as nl_link
 from .netlink import addr as nl_addr
 from .netlink import route as nl_route
+from .netlink import monitor as nl_monitor
 from .utils import memoized
 
 
@@ -693,7 +696,37 @@ def _cfgBootprotoCompat(networks):
             attrs['cfg']['BOOTPROTO'] = 'dhcp' if attrs['dhcpv4'] else 'none'
 
 
+def _linkinfo(dev, paddr, routes, ipaddrs, dhcpv4_ifaces, dhcpv6_ifaces):
+    """Returns the section name and the information dictionary of a link, or
+    None if the link is not reported."""
+    if dev.isHidden():
+        return None
+    if dev.isBRIDGE():
+        section, devinfo = 'bridges', _bridgeinfo(dev)
+    elif dev.isNICLike():
+        section, devinfo = 'nics', _nicinfo(dev, paddr)
+    elif dev.isBOND():
+        section, devinfo = 'bondings', _bondinfo(dev)
+    elif dev.isVLAN():
+        section, devinfo = 'vlans', _vlaninfo(dev)
+    else:
+        return None
+    devinfo.update(_devinfo(dev, routes, ipaddrs, dhcpv4_ifaces,
+                            dhcpv6_ifaces))
+    if dev.isBOND():
+        _bondOptsCompat(devinfo)
+    return section, devinfo
+
+
 def get(vdsmnets=None):
+    """Returns the host network information. While the network model is
+    monitoring netlink events, the information is served from it."""
+    if vdsmnets is None and _model.monitoring:
+        return _model.get()
+    return _get(vdsmnets)
+
+
+def _get(vdsmnets=None):
     d = {'bondings': {}, 'bridges': {}, 'networks': {}, 'nics': {},
          'vlans': {}}
     paddr = permAddr()
@@ -708,27 +741,187 @@ def get(vdsmnets=None):
     else:
         d['networks'] = vdsmnets
 
-    for dev in (link for link in getLinks() if not link.isHidden()):
-        if dev.isBRIDGE():
-            devinfo = d['bridges'][dev.name] = _bridgeinfo(dev)
-        elif dev.isNICLike():
-            devinfo = d['nics'][dev.name] = _nicinfo(dev, paddr)
-        elif dev.isBOND():
-            devinfo = d['bondings'][dev.name] = _bondinfo(dev)
-        elif dev.isVLAN():
-            devinfo = d['vlans'][dev.name] = _vlaninfo(dev)
-        else:
-            continue
-        devinfo.update(_devinfo(dev, routes, ipaddrs, dhcpv4_ifaces,
-                                dhcpv6_ifaces))
-        if dev.isBOND():
-            _bondOptsCompat(devinfo)
+    for dev in getLinks():
+        info = _linkinfo(dev, paddr, routes, ipaddrs, dhcpv4_ifaces,
+                         dhcpv6_ifaces)
+        if info is not None:
+            section, devinfo = info
+            d[section][dev.name] = devinfo
 
     _cfgBootprotoCompat(d['networks'])
 
     return d
 
 
+class NetInfoModel(object):
+    """
+    An in-memory model of the host network information, kept current by
+    netlink link, address and route events.
+
+    The model is built once, and later only the devices named in events
+    (and the bridges or bonds they were or are enslaved to) are queried
+    again. Networks are recomputed on any change, since they depend on the
+    addresses and routes of their devices.
+
+    Changes that netlink does not report, such as libvirt networks and
+    ifcfg files written by vdsm, must be followed by invalidate(). It is
+    the consistency fence: the next query rebuilds the whole model.
+    """
+    _log = logging.getLogger('NetInfoModel')
+
+    _GROUPS = ('link', 'ipv4-ifaddr', 'ipv6-ifaddr', 'ipv4-route',
+               'ipv6-route')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._monitor = None
+        self._devices = {}  # name -> (section, devinfo)
+        self._masters = {}  # name -> master name or None
+        self._networks = {}
+        self._dirty = set()
+        self._full = True
+        self._generation = 0
+
+    @property
+    def monitoring(self):
+        return self._monitor is not None
+
+    @property
+    def generation(self):
+        """A counter incremented whenever the model may have changed."""
+        return self._generation
+
+    def start(self):
+        monitor = nl_monitor.Monitor(groups=self._GROUPS)
+        monitor.start()
+        with self._lock:
+            self._monitor = monitor
+            self._full = True
+            self._generation += 1
+        t = threading.Thread(target=self._run, args=(monitor,),
+                             name='netinfo-model')
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        with self._lock:
+            monitor = self._monitor
+            self._monitor = None
+        if monitor is not None:
+            monitor.stop()
+
+    def _run(self, monitor):
+        try:
+            for event in monitor:
+                self.handleEvent(event)
+        except Exception:
+            self._log.exception('Error monitoring network events, network '
+                                'information will not be cached')
+        finally:
+            with self._lock:
+                if self._monitor is monitor:
+                    self._monitor = None
+
+    def invalidate(self):
+        """Rebuild the whole model on the next query."""
+        with self._lock:
+            self._full = True
+            self._generation += 1
+
+    def handleEvent(self, event):
+        """Mark the devices affected by a netlink event for update."""
+        # link events name the device, address events label it and route
+        # events report their output interface.
+        name = event.get('name') or event.get('label') or event.get('oif')
+        with self._lock:
+            self._generation += 1
+            if name is None:
+                self._full = True
+                return
+            self._dirty.add(name)
+            for master in (event.get('master'), self._masters.get(name)):
+                if master:
+                    self._dirty.add(master)
+
+    def get(self):
+        with self._lock:
+            if self._full or self._dirty:
+                try:
+                    self._update()
+                except:
+                    self._full = True
+                    raise
+            d = {'bondings': {}, 'bridges': {}, 'networks': self._networks,
+                 'nics': {}, 'vlans': {}}
+            for name, (section, devinfo) in self._devices.iteritems():
+                d[section][name] = devinfo
+            # Callers may modify the returned information
+            return deepcopy(d)
+
+    def _update(self):
+        full, dirty = self._full, self._dirty
+        self._full, self._dirty = False, set()
+
+        paddr = permAddr()
+        ipaddrs = _getIpAddrs()
+        dhcpv4_ifaces, dhcpv6_ifaces = _get_dhclient_ifaces()
+        routes = _get_routes()
+
+        if full:
+            self._devices.clear()
+            self._masters.clear()
+            links = getLinks()
+        else:
+            self._log.debug('Updating network information of %s',
+                            ', '.join(sorted(dirty)))
+            links = []
+            for name in dirty:
+                self._devices.pop(name, None)
+                self._masters.pop(name, None)
+                try:
+                    links.append(getLink(name))
+                except IOError as e:
+                    if e.errno != errno.ENODEV:
+                        raise
+
+        for dev in links:
+            self._masters[dev.name] = dev.master
+            info = _linkinfo(dev, paddr, routes, ipaddrs, dhcpv4_ifaces,
+                             dhcpv6_ifaces)
+            if info is not None:
+                self._devices[dev.name] = info
+
+        self._networks = libvirtNets2vdsm(networks(), routes, ipaddrs,
+                                          dhcpv4_ifaces, dhcpv6_ifaces)
+        _cfgBootprotoCompat(self._networks)
+
+
+_model = NetInfoModel()
+
+
+def startMonitoring():
+    """Serve get() from a network model kept current by netlink events."""
+    _model.start()
+
+
+def stopMonitoring():
+    _model.stop()
+
+
+def invalidate():
+    """Must be called after changing the host network configuration while
+    the model is monitoring."""
+    _model.invalidate()
+
+
+def generation():
+    """Returns a number that changes whenever the host network information
+    may have changed, or None when the network is not monitored."""
+    if _model.monitoring:
+        return _model.generation
+    return None
+
+
 def isVlanned(dev):
     return any(vlan.startswith(dev + '.') for vlan in vlans())
 
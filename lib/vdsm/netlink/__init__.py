@@ -18,11 +18,11 @@
 # Refer to the README and COPYING files for full details of the license
 #
 from contextlib import contextmanager
-from ctypes import (CDLL, CFUNCTYPE, c_char, c_char_p, c_int, c_void_p,
-                    c_size_t, get_errno, py_object, sizeof)
+from ctypes import (CDLL, CFUNCTYPE, byref, c_char, c_char_p, c_int,
+                    c_void_p, c_size_t, get_errno, py_object, sizeof)
 from functools import partial
 from Queue import Empty, Queue
-from threading import BoundedSemaphore
+from threading import BoundedSemaphore, local
 
 _POOL_SIZE = 5
 _NETLINK_ROUTE = 0
@@ -51,7 +51,12 @@ class NLSocketPool(object):
 
     @contextmanager
     def socket(self):
-        """Returns a socket from the pool (creating it when needed)."""
+        """Returns a socket from the pool (creating it when needed). Inside a
+        session(), the socket of the session is returned."""
+        sock = getattr(_session, 'sock', None)
+        if sock is not None:
+            yield sock
+            return
         with self._semaphore:
             try:
                 sock = self._sockets.get_nowait()
@@ -64,6 +69,22 @@ class NLSocketPool(object):
 
 
 _pool = NLSocketPool(_POOL_SIZE)
+_session = local()
+
+
+@contextmanager
+def session():
+    """Runs all the netlink requests of the current thread in the block over
+    the same socket. Nested sessions join the outer session."""
+    if getattr(_session, 'sock', None) is not None:
+        yield
+        return
+    with _pool.socket() as sock:
+        _session.sock = sock
+        try:
+            yield
+        finally:
+            _session.sock = None
 
 
 def _open_socket(callback_function=None, callback_arg=None):
@@ -115,6 +136,24 @@ def _cache_manager(cache_allocator, sock):
         _nl_cache_free(cache)
 
 
+def _check(err):
+    """Raises IOError for a negative libnl error code."""
+    if err < 0:
+        raise IOError(-err, _nl_strerror(err))
+
+
+@contextmanager
+def _parsed_addr(text, family):
+    """Provides the netlink address parsed from text (e.g. '10.0.0.1/24' or
+    'default') and frees it upon exit."""
+    addr = c_void_p()
+    _check(_nl_addr_parse(text, family, byref(addr)))
+    try:
+        yield addr
+    finally:
+        _nl_addr_put(addr)
+
+
 def _addr_to_str(addr):
     """Returns the textual representation of a netlink address (be it hardware
     or IP) or None if the address is None"""
@@ -197,6 +236,10 @@ _nl_recvmsgs_default = _int_proto(('nl_recvmsgs_default', LIBNL))
 
 _nl_connect = CFUNCTYPE(c_int, c_void_p, c_int)(('nl_connect', LIBNL))
 _nl_geterror = CFUNCTYPE(c_char_p)(('nl_geterror', LIBNL))
+_nl_strerror = CFUNCTYPE(c_char_p, c_int)(('nl_geterror', LIBNL))
+_nl_addr_parse = CFUNCTYPE(c_int, c_char_p, c_int, c_void_p)((
+    'nl_addr_parse', LIBNL))
+_nl_addr_put = _none_proto(('nl_addr_put', LIBNL))
 
 _nl_cache_free = _none_proto(('nl_cache_free', LIBNL))
 _nl_cache_get_first = _void_proto(('nl_cache_get_first', LIBNL))
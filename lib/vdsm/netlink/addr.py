@@ -18,11 +18,12 @@
 #
 from ctypes import (CFUNCTYPE, byref, c_char, c_int, c_void_p, sizeof)
 from functools import partial
+from socket import AF_UNSPEC
 import errno
 
 from . import _cache_manager, _nl_cache_get_first, _nl_cache_get_next
-from . import _int_char_proto, _int_proto, _void_proto
-from . import LIBNL_ROUTE, _nl_geterror, _pool
+from . import _int_char_proto, _int_proto, _none_proto, _void_proto
+from . import LIBNL_ROUTE, _nl_geterror, _pool, _check, _parsed_addr
 from . import _addr_to_str, _af_to_str, _scope_to_str, CHARBUFFSIZE
 from .link import _nl_link_cache, _link_index_to_name
 
@@ -39,6 +40,47 @@ def iter_addrs():
                     addr = _nl_cache_get_next(addr)
 
 
+def add_address(index, address, family=AF_UNSPEC):
+    """Adds the address (in prefix notation, e.g. '10.0.0.1/24') to the link
+    with the specified index."""
+    _change_address(_rtnl_addr_add, index, address, family)
+
+
+def del_address(index, address, family=AF_UNSPEC):
+    """Removes the address (in prefix notation) from the link with the
+    specified index."""
+    _change_address(_rtnl_addr_delete, index, address, family)
+
+
+def flush_addresses(index, family=AF_UNSPEC):
+    """Removes all the global scope addresses of the link with the specified
+    index, optionally only those of the specified family."""
+    RT_SCOPE_UNIVERSE = 0
+    with _pool.socket() as sock:
+        with _nl_addr_cache(sock) as addr_cache:
+            addr = _nl_cache_get_first(addr_cache)
+            while addr:
+                if (_rtnl_addr_get_ifindex(addr) == index and
+                        _rtnl_addr_get_scope(addr) == RT_SCOPE_UNIVERSE and
+                        family in (AF_UNSPEC, _rtnl_addr_get_family(addr))):
+                    _check(_rtnl_addr_delete(sock, addr, 0))
+                addr = _nl_cache_get_next(addr)
+
+
+def _change_address(operation, index, address, family):
+    addr = _rtnl_addr_alloc()
+    if not addr:
+        raise IOError(errno.ENOMEM, 'Failed to allocate an address')
+    try:
+        _rtnl_addr_set_ifindex(addr, index)
+        with _parsed_addr(address, family) as local:
+            _check(_rtnl_addr_set_local(addr, local))
+        with _pool.socket() as sock:
+            _check(operation(sock, addr, 0))
+    finally:
+        _rtnl_addr_put(addr)
+
+
 def _addr_info(addr, link_cache=None):
     """Returns a dictionary with the address information."""
     index = _rtnl_addr_get_ifindex(addr)
@@ -90,3 +132,14 @@ _rtnl_addr_get_scope = _int_proto(('rtnl_addr_get_scope', LIBNL_ROUTE))
 _rtnl_addr_get_flags = _int_proto(('rtnl_addr_get_flags', LIBNL_ROUTE))
 _rtnl_addr_get_local = _void_proto(('rtnl_addr_get_local', LIBNL_ROUTE))
 _rtnl_addr_flags2str = _int_char_proto(('rtnl_addr_flags2str', LIBNL_ROUTE))
+
+_rtnl_addr_alloc = CFUNCTYPE(c_void_p)(('rtnl_addr_alloc', LIBNL_ROUTE))
+_rtnl_addr_put = _none_proto(('rtnl_addr_put', LIBNL_ROUTE))
+_rtnl_addr_set_ifindex = CFUNCTYPE(None, c_void_p, c_int)((
+    'rtnl_addr_set_ifindex', LIBNL_ROUTE))
+_rtnl_addr_set_local = CFUNCTYPE(c_int, c_void_p, c_void_p)((
+    'rtnl_addr_set_local', LIBNL_ROUTE))
+_rtnl_addr_add = CFUNCTYPE(c_int, c_void_p, c_void_p, c_int)((
+    'rtnl_addr_add', LIBNL_ROUTE))
+_rtnl_addr_delete = CFUNCTYPE(c_int, c_void_p, c_void_p, c_int)((
+    'rtnl_addr_delete', LIBNL_ROUTE))
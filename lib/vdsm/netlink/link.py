@@ -16,15 +16,16 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
-from ctypes import (CFUNCTYPE, byref, c_char, c_char_p, c_int, c_void_p,
-                    c_size_t, sizeof)
+from ctypes import (CFUNCTYPE, byref, c_char, c_char_p, c_int, c_uint,
+                    c_uint64, c_void_p, c_size_t, sizeof)
 from functools import partial
 from socket import AF_UNSPEC
 import errno
 
 from . import _cache_manager, _nl_cache_get_first, _nl_cache_get_next
-from . import _char_proto, _int_char_proto, _int_proto, _void_proto
-from . import LIBNL_ROUTE, _nl_geterror, _pool
+from . import _char_proto, _int_char_proto, _int_proto, _none_proto
+from . import _void_proto
+from . import LIBNL_ROUTE, _nl_geterror, _nl_strerror, _pool, _check
 from . import _addr_to_str, CHARBUFFSIZE
 
 
@@ -38,6 +39,46 @@ def get_link(name):
         return _link_info(link)
 
 
+def set_link(name, up=None, mtu=None, master=None):
+    """Changes the link attributes: up (True for up, False for down), mtu and
+    master (the name of the master device, '' to release the link from its
+    master). Attributes left as None are kept."""
+    IFF_UP = 1
+    with _pool.socket() as sock:
+        orig = c_void_p()
+        err = _rtnl_link_get_kernel(sock, 0, name, byref(orig))
+        if err:
+            raise IOError(-err, _nl_strerror(err))
+        changes = _rtnl_link_alloc()
+        try:
+            if up is True:
+                _rtnl_link_set_flags(changes, IFF_UP)
+            elif up is False:
+                _rtnl_link_unset_flags(changes, IFF_UP)
+            if mtu is not None:
+                _rtnl_link_set_mtu(changes, mtu)
+            if master is not None:
+                master_index = 0
+                if master:
+                    master_index = _link_name_to_index(sock, master)
+                _rtnl_link_set_master(changes, master_index)
+            _check(_rtnl_link_change(sock, orig, changes, 0))
+        finally:
+            _rtnl_link_put(changes)
+            _rtnl_link_put(orig)
+
+
+def _link_name_to_index(sock, name):
+    link = c_void_p()
+    err = _rtnl_link_get_kernel(sock, 0, name, byref(link))
+    if err:
+        raise IOError(-err, _nl_strerror(err))
+    try:
+        return _rtnl_link_get_ifindex(link)
+    finally:
+        _rtnl_link_put(link)
+
+
 def iter_links():
     """Generator that yields an information dictionary for each link of the
     system."""
@@ -49,6 +90,41 @@ def iter_links():
                 link = _nl_cache_get_next(link)
 
 
+# libnl/include/netlink/route/link.h rtnl_link_stat_id_t
+_STATS = {
+    'rx_packets': 0,  # RTNL_LINK_RX_PACKETS
+    'tx_packets': 1,  # RTNL_LINK_TX_PACKETS
+    'rx_bytes': 2,    # RTNL_LINK_RX_BYTES
+    'tx_bytes': 3,    # RTNL_LINK_TX_BYTES
+    'rx_errors': 4,   # RTNL_LINK_RX_ERRORS
+    'tx_errors': 5,   # RTNL_LINK_TX_ERRORS
+    'rx_dropped': 6,  # RTNL_LINK_RX_DROPPED
+    'tx_dropped': 7,  # RTNL_LINK_TX_DROPPED
+}
+
+
+def iter_links_stats():
+    """Generator that yields an information dictionary, as iter_links does,
+    with the statistics counters of the link under 'stats', for each link of
+    the system. All the links are fetched with a single netlink dump."""
+    with _pool.socket() as sock:
+        with _nl_link_cache(sock) as cache:
+            link = _nl_cache_get_first(cache)
+            while link:
+                yield _link_stats(link, cache=cache)
+                link = _nl_cache_get_next(link)
+
+
+def _link_stats(link, cache=None):
+    """Returns the information dictionary of the link object, with its
+    statistics counters under 'stats'. Counters are named as in
+    /sys/class/net/<link>/statistics/."""
+    info = _link_info(link, cache=cache)
+    info['stats'] = dict((name, _rtnl_link_get_stat(link, stat_id))
+                         for name, stat_id in _STATS.iteritems())
+    return info
+
+
 def _link_info(link, cache=None):
     """Returns a dictionary with the information of the link object."""
     info = {}
@@ -189,9 +265,24 @@ _rtnl_link_get_mtu = _int_proto(('rtnl_link_get_mtu', LIBNL_ROUTE))
 _rtnl_link_get_name = _char_proto(('rtnl_link_get_name', LIBNL_ROUTE))
 _rtnl_link_get_operstate = _int_proto(('rtnl_link_get_operstate', LIBNL_ROUTE))
 _rtnl_link_get_qdisc = _char_proto(('rtnl_link_get_qdisc', LIBNL_ROUTE))
+_rtnl_link_get_stat = CFUNCTYPE(c_uint64, c_void_p, c_int)((
+    'rtnl_link_get_stat', LIBNL_ROUTE))
 _rtnl_link_get_by_name = CFUNCTYPE(c_void_p, c_void_p, c_char_p)((
     'rtnl_link_get_by_name', LIBNL_ROUTE))
 _rtnl_link_i2name = CFUNCTYPE(c_char_p, c_void_p, c_int, c_char_p, c_size_t)((
     'rtnl_link_i2name', LIBNL_ROUTE))
 _rtnl_link_operstate2str = _int_char_proto(('rtnl_link_operstate2str',
                                             LIBNL_ROUTE))
+
+_rtnl_link_alloc = CFUNCTYPE(c_void_p)(('rtnl_link_alloc', LIBNL_ROUTE))
+_rtnl_link_put = _none_proto(('rtnl_link_put', LIBNL_ROUTE))
+_rtnl_link_set_flags = CFUNCTYPE(None, c_void_p, c_uint)((
+    'rtnl_link_set_flags', LIBNL_ROUTE))
+_rtnl_link_unset_flags = CFUNCTYPE(None, c_void_p, c_uint)((
+    'rtnl_link_unset_flags', LIBNL_ROUTE))
+_rtnl_link_set_mtu = CFUNCTYPE(None, c_void_p, c_uint)((
+    'rtnl_link_set_mtu', LIBNL_ROUTE))
+_rtnl_link_set_master = CFUNCTYPE(None, c_void_p, c_int)((
+    'rtnl_link_set_master', LIBNL_ROUTE))
+_rtnl_link_change = CFUNCTYPE(c_int, c_void_p, c_void_p, c_void_p, c_int)((
+    'rtnl_link_change', LIBNL_ROUTE))
@@ -16,14 +16,14 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
-from ctypes import CFUNCTYPE, c_int, c_void_p, byref
+from ctypes import CFUNCTYPE, c_int, c_uint32, c_void_p, byref
 from functools import partial
-from socket import AF_UNSPEC
+from socket import AF_INET, AF_INET6, AF_UNSPEC
 import errno
 
 from . import _cache_manager, _nl_cache_get_first, _nl_cache_get_next
-from . import _char_proto, _int_proto, _void_proto
-from . import LIBNL_ROUTE, _nl_geterror, _pool
+from . import _char_proto, _int_proto, _none_proto, _void_proto
+from . import LIBNL_ROUTE, _nl_geterror, _pool, _check, _parsed_addr
 from . import _addr_to_str, _af_to_str, _scope_to_str
 from .link import _nl_link_cache, _link_index_to_name
 
@@ -31,6 +31,8 @@ _RT_TABLE_UNSPEC = 0
 _RT_TABLE_COMPAT = 252
 _RT_TABLE_MAIN = 254
 
+_NLM_F_EXCL = 0x200
+
 
 def iter_routes():
     """Generator that yields an information dictionary for each route in the
@@ -44,6 +46,60 @@ def iter_routes():
                     route = _nl_cache_get_next(route)
 
 
+def add_route(destination, gateway=None, source=None, index=0,
+              table=_RT_TABLE_MAIN):
+    """Adds a route to destination (a network in prefix notation or
+    'default') via the optional gateway and/or the link with the specified
+    index. Fails with EEXIST-like errors if the route already exists."""
+    _change_route(_rtnl_route_add, _NLM_F_EXCL, destination, gateway, source,
+                  index, table)
+
+
+def del_route(destination, gateway=None, source=None, index=0,
+              table=_RT_TABLE_MAIN):
+    """Removes the route matching the specified attributes."""
+    _change_route(_rtnl_route_delete, 0, destination, gateway, source, index,
+                  table)
+
+
+def _route_family(*addresses):
+    for address in addresses:
+        if address is not None and address != 'default':
+            return AF_INET6 if ':' in address else AF_INET
+    return AF_INET
+
+
+def _change_route(operation, flags, destination, gateway, source, index,
+                  table):
+    family = _route_family(destination, gateway, source)
+    route = _rtnl_route_alloc()
+    if not route:
+        raise IOError(errno.ENOMEM, 'Failed to allocate a route')
+    try:
+        _check(_rtnl_route_set_family(route, family))
+        _rtnl_route_set_table(route, table)
+        with _parsed_addr(destination, family) as dst:
+            _check(_rtnl_route_set_dst(route, dst))
+        if source is not None:
+            with _parsed_addr(source, family) as src:
+                _check(_rtnl_route_set_pref_src(route, src))
+        if gateway is not None or index:
+            hop = _rtnl_route_nh_alloc()
+            if not hop:
+                raise IOError(errno.ENOMEM, 'Failed to allocate a next hop')
+            if index:
+                _rtnl_route_nh_set_ifindex(hop, index)
+            if gateway is not None:
+                with _parsed_addr(gateway, family) as via:
+                    _rtnl_route_nh_set_gateway(hop, via)
+            # The route takes ownership of the next hop
+            _rtnl_route_add_nexthop(route, hop)
+        with _pool.socket() as sock:
+            _check(operation(sock, route, flags))
+    finally:
+        _rtnl_route_put(route)
+
+
 def _route_info(route, link_cache=None):
     data = {
         'destination': _addr_to_str(_rtnl_route_get_dst(route)),  # network
@@ -72,6 +128,29 @@ _route_get_nexthop_n = CFUNCTYPE(c_void_p, c_void_p, c_int)(
 _hop_get_ifindex = _int_proto(('rtnl_route_nh_get_ifindex', LIBNL_ROUTE))
 _hop_get_gateway = _void_proto(('rtnl_route_nh_get_gateway', LIBNL_ROUTE))
 
+_rtnl_route_alloc = CFUNCTYPE(c_void_p)(('rtnl_route_alloc', LIBNL_ROUTE))
+_rtnl_route_put = _none_proto(('rtnl_route_put', LIBNL_ROUTE))
+_rtnl_route_set_family = CFUNCTYPE(c_int, c_void_p, c_int)((
+    'rtnl_route_set_family', LIBNL_ROUTE))
+_rtnl_route_set_table = CFUNCTYPE(None, c_void_p, c_uint32)((
+    'rtnl_route_set_table', LIBNL_ROUTE))
+_rtnl_route_set_dst = CFUNCTYPE(c_int, c_void_p, c_void_p)((
+    'rtnl_route_set_dst', LIBNL_ROUTE))
+_rtnl_route_set_pref_src = CFUNCTYPE(c_int, c_void_p, c_void_p)((
+    'rtnl_route_set_pref_src', LIBNL_ROUTE))
+_rtnl_route_add_nexthop = CFUNCTYPE(None, c_void_p, c_void_p)((
+    'rtnl_route_add_nexthop', LIBNL_ROUTE))
+_rtnl_route_nh_alloc = CFUNCTYPE(c_void_p)(('rtnl_route_nh_alloc',
+                                            LIBNL_ROUTE))
+_rtnl_route_nh_set_ifindex = CFUNCTYPE(None, c_void_p, c_int)((
+    'rtnl_route_nh_set_ifindex', LIBNL_ROUTE))
+_rtnl_route_nh_set_gateway = CFUNCTYPE(None, c_void_p, c_void_p)((
+    'rtnl_route_nh_set_gateway', LIBNL_ROUTE))
+_rtnl_route_add = CFUNCTYPE(c_int, c_void_p, c_void_p, c_int)((
+    'rtnl_route_add', LIBNL_ROUTE))
+_rtnl_route_delete = CFUNCTYPE(c_int, c_void_p, c_void_p, c_int)((
+    'rtnl_route_delete', LIBNL_ROUTE))
+
 
 def _rtnl_route_alloc_cache(sock):
     """Wraps the new addr alloc cache to expose the libnl1 signature"""
@@ -0,0 +1,89 @@
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from ctypes import CFUNCTYPE, c_char_p, c_int, c_uint8, c_uint32, c_void_p
+from socket import AF_INET, AF_INET6
+import errno
+
+from . import _none_proto
+from . import LIBNL_ROUTE, _pool, _check, _parsed_addr
+
+_FR_ACT_TO_TBL = 1
+
+
+def add_rule(table, source=None, destination=None, iif=None):
+    """Adds a policy routing rule looking up table for the packets matching
+    the optional source and destination networks (in prefix notation) and
+    incoming interface name."""
+    _change_rule(_rtnl_rule_add, table, source, destination, iif)
+
+
+def del_rule(table, source=None, destination=None, iif=None):
+    """Removes the policy routing rule matching the specified attributes."""
+    _change_rule(_rtnl_rule_delete, table, source, destination, iif)
+
+
+def _change_rule(operation, table, source, destination, iif):
+    family = AF_INET
+    for address in (source, destination):
+        if address is not None and ':' in address:
+            family = AF_INET6
+    rule = _rtnl_rule_alloc()
+    if not rule:
+        raise IOError(errno.ENOMEM, 'Failed to allocate a rule')
+    try:
+        _rtnl_rule_set_family(rule, family)
+        _rtnl_rule_set_table(rule, table)
+        _rtnl_rule_set_action(rule, _FR_ACT_TO_TBL)
+        if source is not None:
+            with _parsed_addr(source, family) as src:
+                _check(_rtnl_rule_set_src(rule, src))
+        if destination is not None:
+            with _parsed_addr(destination, family) as dst:
+                _check(_rtnl_rule_set_dst(rule, dst))
+        if iif is not None:
+            _check(_rtnl_rule_set_iif(rule, iif))
+        with _pool.socket() as sock:
+            _check(operation(sock, rule, 0))
+    finally:
+        _rtnl_rule_put(rule)
+
+
+# C function prototypes
+# http://docs.python.org/2/library/ctypes.html#function-prototypes
+# This helps ctypes know the calling conventions it should use to communicate
+# with the binary interface of libnl and which types it should allocate and
+# cast. Without it ctypes fails when not running on the main thread.
+_rtnl_rule_alloc = CFUNCTYPE(c_void_p)(('rtnl_rule_alloc', LIBNL_ROUTE))
+_rtnl_rule_put = _none_proto(('rtnl_rule_put', LIBNL_ROUTE))
+_rtnl_rule_set_family = CFUNCTYPE(None, c_void_p, c_int)((
+    'rtnl_rule_set_family', LIBNL_ROUTE))
+_rtnl_rule_set_table = CFUNCTYPE(None, c_void_p, c_uint32)((
+    'rtnl_rule_set_table', LIBNL_ROUTE))
+_rtnl_rule_set_action = CFUNCTYPE(None, c_void_p, c_uint8)((
+    'rtnl_rule_set_action', LIBNL_ROUTE))
+_rtnl_rule_set_src = CFUNCTYPE(c_int, c_void_p, c_void_p)((
+    'rtnl_rule_set_src', LIBNL_ROUTE))
+_rtnl_rule_set_dst = CFUNCTYPE(c_int, c_void_p, c_void_p)((
+    'rtnl_rule_set_dst', LIBNL_ROUTE))
+_rtnl_rule_set_iif = CFUNCTYPE(c_int, c_void_p, c_char_p)((
+    'rtnl_rule_set_iif', LIBNL_ROUTE))
+_rtnl_rule_add = CFUNCTYPE(c_int, c_void_p, c_void_p, c_int)((
+    'rtnl_rule_add', LIBNL_ROUTE))
+_rtnl_rule_delete = CFUNCTYPE(c_int, c_void_p, c_void_p, c_int)((
+    'rtnl_rule_delete', LIBNL_ROUTE))
@@ -21,6 +21,7 @@
 import os
 import re
 import signal
+import time
 
 from . import utils
 
@@ -167,9 +168,51 @@ def check(image, format=None):
     raise QImgError(rc, out, err, "unable to parse qemu-img check output")
 
 
+class ProgressParser(object):
+    """
+    Parse qemu-img progress output ("    (12.34/100%)\\r") incrementally,
+    as it is read from the process.
+    """
+
+    _PROGRESS = re.compile(r"\((\d+\.\d+)/100%\)")
+
+    def __init__(self):
+        self._buf = ""
+        self.value = 0.0
+
+    def feed(self, data):
+        """
+        Consume data, returning True if the progress value changed.
+        """
+        lines = (self._buf + data).split("\r")
+        # The last item is an incomplete update, or empty.
+        self._buf = lines.pop()
+        changed = False
+        for line in lines:
+            m = self._PROGRESS.search(line)
+            if m:
+                value = float(m.group(1))
+                if value != self.value:
+                    self.value = value
+                    changed = True
+        return changed
+
+
 def convert(srcImage, dstImage, stop, srcFormat=None, dstFormat=None,
-            backing=None, backingFormat=None):
+            backing=None, backingFormat=None, progress=None):
+    """
+    Convert srcImage to dstImage.
+
+    If progress is specified, it is called as progress(percent, written)
+    when qemu-img reports progress, written being the number of bytes
+    qemu-img wrote so far, or None if unknown. qemu-img percent also moves
+    over unallocated areas of the source, which are not written. progress
+    may return a number of seconds the conversion should be paused, used to
+    limit the bandwidth of the copy.
+    """
     cmd = [_qemuimg.cmd, "convert", "-t", "none"]
+    if progress is not None:
+        cmd.append("-p")
     options = []
     cwdPath = None
 
@@ -200,9 +243,12 @@ def convert(srcImage, dstImage, stop, srcFormat=None, dstFormat=None,
 
     cmd.append(dstImage)
 
-    (rc, out, err) = utils.watchCmd(
-        cmd, cwd=cwdPath, stop=stop, nice=utils.NICENESS.HIGH,
-        ioclass=utils.IOCLASS.IDLE)
+    if progress is None:
+        (rc, out, err) = utils.watchCmd(
+            cmd, cwd=cwdPath, stop=stop, nice=utils.NICENESS.HIGH,
+            ioclass=utils.IOCLASS.IDLE)
+    else:
+        (rc, out, err) = _watchProgress(cmd, cwdPath, stop, progress)
 
     if rc != 0:
         raise QImgError(rc, out, err)
@@ -210,6 +256,76 @@ def convert(srcImage, dstImage, stop, srcFormat=None, dstFormat=None,
     return (rc, out, err)
 
 
+# Interval in seconds for checking stop while a conversion is paused
+_PAUSE_INTERVAL = 0.5
+
+
+def _watchProgress(cmd, cwd, stop, progress):
+    """
+    Like utils.watchCmd, but report the progress parsed from the command
+    output while it runs, and pause the command when progress asks for it.
+    """
+    proc = utils.execCmd(cmd, cwd=cwd, sync=False, nice=utils.NICENESS.HIGH,
+                         ioclass=utils.IOCLASS.IDLE,
+                         deathSignal=signal.SIGKILL)
+    parser = ProgressParser()
+
+    def check():
+        if stop():
+            return True
+        data = proc.stdout.read1(4096)
+        if data and parser.feed(data):
+            delay = progress(parser.value, _bytesWritten(proc.pid))
+            if delay:
+                _pause(proc, delay, stop)
+        return stop()
+
+    if not proc.wait(cond=check):
+        proc.kill()
+        raise utils.ActionStopped()
+
+    # Report progress written just before the command exited
+    data = "".join(proc.stdout)
+    if parser.feed(data):
+        progress(parser.value, None)
+
+    out = data.splitlines()
+    err = utils.stripNewLines(proc.stderr)
+    return proc.returncode, out, err
+
+
+def _bytesWritten(pid):
+    """
+    Return the number of bytes process pid passed to write calls, or None if
+    it is not available.
+    """
+    try:
+        with open("/proc/%d/io" % pid) as f:
+            for line in f:
+                name, value = line.split(":", 1)
+                if name == "wchar":
+                    return int(value)
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def _pause(proc, delay, stop):
+    """
+    Stop proc for delay seconds, or until stop returns True.
+    """
+    os.kill(proc.pid, signal.SIGSTOP)
+    try:
+        deadline = utils.monotonic_time() + delay
+        while not stop():
+            remaining = deadline - utils.monotonic_time()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, _PAUSE_INTERVAL))
+    finally:
+        os.kill(proc.pid, signal.SIGCONT)
+
+
 def resize(image, newSize, format=None):
     cmd = [_qemuimg.cmd, "resize"]
 
@@ -49,10 +49,6 @@ class ConnectionRefusedError(Exception):
     pass
 
 
-class NoConnectedStoragePoolError(DumpChainsError):
-    pass
-
-
 class ChainError(DumpChainsError):
     def __init__(self, volumes_children):
         self.volumes_children = volumes_children
@@ -119,31 +115,18 @@ def _parse_args(args):
     return parser.parse_args(args=args[1:])
 
 
-def _get_volume_info(server, vol_uuid, img_uuid, sd_uuid, sp_uuid):
-    res = _call_server(server.getVolumeInfo, sd_uuid, sp_uuid, img_uuid,
-                       vol_uuid)
-    return res['info']
-
-
 def _get_volumes_chains(server, sd_uuid):
-    sp_uuid = _get_sp_uuid(server)
-    images_uuids = _get_all_images(server, sd_uuid)
+    volumes_info = _get_volumes_info(server, sd_uuid)
+    images_volumes = _get_images_volumes(volumes_info)
 
     image_chains = {}  # {image_uuid -> vol_chain}
-    volumes_info = {}  # {vol_uuid-> vol_info}
-
-    for img_uuid in images_uuids:
-        volumes = _get_volumes_for_image(server, img_uuid, sd_uuid, sp_uuid)
 
+    for img_uuid, volumes in images_volumes.iteritems():
         # to avoid 'double parent' bug here we don't use a dictionary
         volumes_children = []  # [(parent_vol_uuid, child_vol_uuid),]
 
         for vol_uuid in volumes:
-            vol_info = _get_volume_info(server, vol_uuid, img_uuid, sd_uuid,
-                                        sp_uuid)
-            volumes_info[vol_uuid] = vol_info
-
-            parent_uuid = vol_info['parent']
+            parent_uuid = volumes_info[vol_uuid]['parent']
             volumes_children.append((parent_uuid, vol_uuid))
 
         try:
@@ -154,14 +137,28 @@ def _get_volumes_chains(server, sd_uuid):
     return image_chains, volumes_info
 
 
-def _get_all_images(server, sd_uuid):
-    res = _call_server(server.getImagesList, sd_uuid)
-    return res['imageslist']
+def _get_volumes_info(server, sd_uuid):
+    res = _call_server(server.getVolumesInfo, sd_uuid)
+    return res['volumes']  # {vol_uuid-> vol_info}
 
 
-def _get_volumes_for_image(server, img_uuid, sd_uuid, sp_uuid):
-    res = _call_server(server.getVolumesList, sd_uuid, sp_uuid, img_uuid)
-    return res['uuidlist']
+def _get_images_volumes(volumes_info):
+    """
+    Return {image_uuid: [vol_uuid, ...]} from the volumes info. A template
+    volume belongs to its own image, and to every image based on it.
+    """
+    images_volumes = defaultdict(list)
+    for vol_uuid, vol_info in volumes_info.iteritems():
+        img_uuid = vol_info['image']
+        images_volumes[img_uuid].append(vol_uuid)
+    for vol_uuid, vol_info in volumes_info.iteritems():
+        img_uuid = vol_info['image']
+        parent_uuid = vol_info['parent']
+        parent_info = volumes_info.get(parent_uuid)
+        if (parent_info is not None and parent_info['image'] != img_uuid and
+                parent_uuid not in images_volumes[img_uuid]):
+            images_volumes[img_uuid].append(parent_uuid)
+    return images_volumes
 
 
 def _build_volume_chain(volumes_children):
@@ -188,19 +185,6 @@ def _build_volume_chain(volumes_children):
     return chain
 
 
-def _get_sp_uuid(server):
-    """there can be only one storage pool in a single VDSM context"""
-    pools = _call_server(server.getConnectedStoragePoolsList)
-    try:
-        sp_uuid, = pools['poollist']
-    except ValueError:
-        if not pools['poollist']:
-            raise NoConnectedStoragePoolError('There is no connected storage '
-                                              'pool to this server')
-    else:
-        return sp_uuid
-
-
 def _print_volume_chains(image_chains, volumes_info):
     if not image_chains:
         print()
@@ -23,10 +23,13 @@ import collections
 import os
 
 from monkeypatch import MonkeyPatch
+from monkeypatch import MonkeyPatchScope
 from testlib import VdsmTestCase as TestCaseBase
 
 from storage import blockSD
 from storage import lvm
+from storage import misc
+from storage import sd
 from vdsm import constants
 
 # Make it easy to test the values we care about
@@ -84,3 +87,84 @@ class GetAllVolumesTests(TestCaseBase):
         sdName = "3386c6f2-926f-42c4-839c-38287fac8998"
         allVols = blockSD.getAllVolumes(sdName)
         self.assertEqual(len(allVols), 23)
+
+
+class TestingBlockStorageDomain(blockSD.BlockStorageDomain):
+
+    stat = None  # Accessed in __del__
+
+    def __init__(self, sdUUID):
+        self.sdUUID = sdUUID
+
+
+def fakeMetadata(slots):
+    """
+    Return the content of a metadata volume with the given {slot: lines}.
+    """
+    size = (max(slots) + 1) * 512
+    data = bytearray(size)
+    for slot, lines in slots.iteritems():
+        block = "".join(line + "\n" for line in lines) + "EOF\n"
+        data[slot * 512:slot * 512 + len(block)] = block
+    return str(data)
+
+
+class DumpVolumesTests(TestCaseBase):
+
+    SD_UUID = "3386c6f2-926f-42c4-839c-38287fac8998"
+
+    def setUp(self):
+        self.reads = []
+        meta = ["FORMAT=COW", "VOLTYPE=LEAF", "SIZE=2048", "LEGALITY=LEGAL",
+                "CTIME=1420000000", "DESCRIPTION="]
+        slots = dict((slot, meta) for slot in range(40))
+        slots[17] = ["FORMAT=RAW", "VOLTYPE=SHARED", "SIZE=4096",
+                     "LEGALITY=ILLEGAL"]
+        slots[21] = ["SIZE=a=b"]
+        self.metadata = fakeMetadata(slots)
+
+    def readblockRaw(self, name, offset, size):
+        self.reads.append((name, offset, size))
+        return self.metadata[offset:offset + size]
+
+    def test_dump(self):
+        with MonkeyPatchScope([(lvm, 'getLV', fakeGetLV),
+                               (misc, 'readblockRaw', self.readblockRaw)]):
+            dom = TestingBlockStorageDomain(self.SD_UUID)
+            res = dom.dumpVolumes()
+
+        self.assertEqual(len(res), 23)
+        # All the metadata is read at once
+        self.assertEqual(len(self.reads), 1)
+        self.assertEqual(self.reads[0][1:], (0, 33 * 512))
+
+        # MD_24
+        info = res["128f0b4a-2ed0-4ea1-84a5-105c6721f4b7"]
+        self.assertEqual(info["image"], "8e6eef9f-457b-4145-ace7-19d35938a80b")
+        self.assertEqual(info["parent"], sd.BLANK_UUID)
+        self.assertEqual(info["format"], "COW")
+        self.assertEqual(info["capacity"], str(2048 * 512))
+        self.assertEqual(info["apparentsize"], "2147483648")
+        self.assertEqual(info["truesize"], "2147483648")
+        self.assertEqual(info["status"], "OK")
+
+    def test_illegal(self):
+        with MonkeyPatchScope([(lvm, 'getLV', fakeGetLV),
+                               (misc, 'readblockRaw', self.readblockRaw)]):
+            dom = TestingBlockStorageDomain(self.SD_UUID)
+            res = dom.dumpVolumes()
+        # MD_17
+        info = res["0574c3f6-3d44-4cc7-98e3-6d90626dd95f"]
+        self.assertEqual(info["format"], "RAW")
+        self.assertEqual(info["legality"], "ILLEGAL")
+        self.assertEqual(info["status"], "ILLEGAL")
+
+    def test_invalid_metadata(self):
+        with MonkeyPatchScope([(lvm, 'getLV', fakeGetLV),
+                               (misc, 'readblockRaw', self.readblockRaw)]):
+            dom = TestingBlockStorageDomain(self.SD_UUID)
+            res = dom.dumpVolumes()
+        # MD_21
+        info = res["0641b528-c72c-45ed-94bc-7090085a0d4b"]
+        self.assertEqual(info["image"], "d6d785cd-e244-4949-a849-3f98138dc758")
+        self.assertEqual(info["status"], "INVALID")
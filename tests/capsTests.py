@@ -21,8 +21,11 @@
 
 import os
 import platform
+import time
 from testlib import VdsmTestCase as TestCaseBase
+from testlib import namedTemporaryDir
 from monkeypatch import MonkeyPatch
+from monkeypatch import MonkeyPatchScope
 
 import caps
 from vdsm import utils
@@ -194,3 +197,81 @@ class TestCaps(TestCaseBase):
         support = caps._getLiveSnapshotSupport(caps.Architecture.X86_64,
                                                capsData)
         self.assertEqual(support, False)
+
+
+class TestCapsSection(TestCaseBase):
+
+    def setUp(self):
+        self.computed = 0
+        self.stamp = 0
+
+    def compute(self):
+        self.computed += 1
+        return {'key': {'computed': self.computed}}
+
+    def testOnce(self):
+        section = caps._CapsSection('test', self.compute)
+        section.get()
+        self.assertEqual(section.get(), {'key': {'computed': 1}})
+
+    def testStampChanged(self):
+        section = caps._CapsSection('test', self.compute, lambda: self.stamp)
+        section.get()
+        section.get()
+        self.stamp = 1
+        self.assertEqual(section.get(), {'key': {'computed': 2}})
+        self.assertEqual(self.computed, 2)
+
+    def testNoStamp(self):
+        section = caps._CapsSection('test', self.compute, lambda: None)
+        section.get()
+        section.get()
+        self.assertEqual(self.computed, 2)
+
+    def testInvalidate(self):
+        section = caps._CapsSection('test', self.compute)
+        section.get()
+        section.invalidate()
+        section.get()
+        self.assertEqual(self.computed, 2)
+
+    def testReturnsCopy(self):
+        section = caps._CapsSection('test', self.compute)
+        section.get()['key']['computed'] = 'modified'
+        self.assertEqual(section.get(), {'key': {'computed': 1}})
+
+    def testErrorNotCached(self):
+        def fail():
+            raise RuntimeError('compute failed')
+
+        section = caps._CapsSection('test', fail)
+        self.assertRaises(RuntimeError, section.get)
+        section._compute = self.compute
+        self.assertEqual(section.get(), {'key': {'computed': 1}})
+
+    def testCpuTopologyStamp(self):
+        with namedTemporaryDir() as top:
+            online = os.path.join(top, 'online')
+            with MonkeyPatchScope([(caps, 'CPU_ONLINE', online)]):
+                self.assertEqual(caps._cpuTopologyStamp(), None)
+                with open(online, 'w') as f:
+                    f.write('0-3\n')
+                stamp = caps._cpuTopologyStamp()
+                self.assertEqual(caps._cpuTopologyStamp(), stamp)
+                with open(online, 'w') as f:
+                    f.write('0-7\n')
+                self.assertNotEqual(caps._cpuTopologyStamp(), stamp)
+
+    def testTreeMtimes(self):
+        with namedTemporaryDir() as top:
+            os.mkdir(os.path.join(top, 'before_vm_start'))
+            stamp = caps._treeMtimes(top)
+            self.assertEqual(caps._treeMtimes(top), stamp)
+            hook = os.path.join(top, 'before_vm_start', '50_hook')
+            with open(hook, 'w'):
+                pass
+            self.assertNotEqual(caps._treeMtimes(top), stamp)
+            stamp = caps._treeMtimes(top)
+            past = time.time() - 60
+            os.utime(hook, (past, past))
+            self.assertNotEqual(caps._treeMtimes(top), stamp)
@@ -0,0 +1,247 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import errno
+
+from monkeypatch import MonkeyPatchScope
+from testlib import VdsmTestCase
+
+from storage import clusterlock
+
+LSFLAG_ADD = 1
+LSFLAG_REM = 2
+
+
+class SanlockException(Exception):
+
+    @property
+    def errno(self):
+        return self.args[0]
+
+
+class FakeSanlock(object):
+    """
+    Sanlock daemon keeping lockspaces in memory and counting calls.
+    """
+    SanlockException = SanlockException
+
+    HOST_UNKNOWN = 1
+    HOST_FREE = 2
+    HOST_LIVE = 3
+    HOST_FAIL = 4
+    HOST_DEAD = 5
+
+    LSFLAG_ADD = LSFLAG_ADD
+    LSFLAG_REM = LSFLAG_REM
+
+    def __init__(self):
+        self.lockspaces = {}
+        self.hosts = {}
+        self.calls = []
+        self.error = None
+
+    def join(self, sdUUID, hostId, path, flags=0):
+        self.lockspaces[sdUUID] = {'lockspace': sdUUID, 'host_id': hostId,
+                                   'path': path, 'offset': 0,
+                                   'flags': flags}
+        self.hosts[sdUUID] = [{'host_id': hostId, 'generation': 1,
+                               'timestamp': 1, 'io_timeout': 10,
+                               'flags': self.HOST_LIVE}]
+
+    def add_lockspace(self, sdUUID, hostId, path, async=False):
+        self.calls.append('add_lockspace')
+        self.join(sdUUID, hostId, path)
+
+    def rem_lockspace(self, sdUUID, hostId, path, async=False, unused=False):
+        self.calls.append('rem_lockspace')
+        del self.lockspaces[sdUUID]
+        del self.hosts[sdUUID]
+
+    def inq_lockspace(self, sdUUID, hostId, path, wait=False):
+        self.calls.append('inq_lockspace')
+        ls = self.lockspaces.get(sdUUID)
+        if ls is None:
+            return False
+        if ls['flags']:
+            return None
+        return ls['host_id'] == hostId and ls['path'] == path
+
+    def get_lockspaces(self):
+        self.calls.append('get_lockspaces')
+        if self.error:
+            raise SanlockException(self.error, "Sanlock error")
+        return [dict(ls) for ls in self.lockspaces.itervalues()]
+
+    def get_hosts(self, sdUUID):
+        self.calls.append('get_hosts')
+        if sdUUID not in self.hosts:
+            raise SanlockException(errno.ENOENT, "No such lockspace")
+        return [dict(host) for host in self.hosts[sdUUID]]
+
+
+class LegacySanlock(FakeSanlock):
+    """
+    Sanlock without get_lockspaces.
+    """
+    get_lockspaces = property()
+
+
+class NoFlagsSanlock(FakeSanlock):
+    """
+    Sanlock not reporting the lockspace flags.
+    """
+    LSFLAG_ADD = property()
+    LSFLAG_REM = property()
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class SANLockStatusTests(VdsmTestCase):
+
+    def setUp(self):
+        self.sanlock = FakeSanlock()
+        self.clock = FakeClock()
+        self.status = clusterlock.SANLockStatus(5, clock=self.clock)
+        self.patch = MonkeyPatchScope([
+            (clusterlock, 'sanlock', self.sanlock),
+            (clusterlock.SANLock, '_status', self.status),
+        ])
+        self.patch.__enter__()
+
+    def tearDown(self):
+        self.patch.__exit__(None, None, None)
+
+    def lock(self, sdUUID):
+        return clusterlock.SANLock(sdUUID, "/%s/ids" % sdUUID,
+                                   "/%s/leases" % sdUUID)
+
+    def test_shared_refresh(self):
+        for i in range(10):
+            self.sanlock.join("sd%d" % i, 1, "/sd%d/ids" % i)
+        for i in range(10):
+            lock = self.lock("sd%d" % i)
+            self.assertTrue(lock.hasHostId(1))
+            self.assertEqual(lock.getHostStatus(1),
+                             clusterlock.HOST_STATUS_LIVE)
+        # One get_lockspaces and one get_hosts per lockspace
+        self.assertEqual(self.sanlock.calls.count('get_lockspaces'), 1)
+        self.assertEqual(self.sanlock.calls.count('get_hosts'), 10)
+        self.assertNotIn('inq_lockspace', self.sanlock.calls)
+
+    def test_hosts_read_lazily(self):
+        for i in range(10):
+            self.sanlock.join("sd%d" % i, 1, "/sd%d/ids" % i)
+        for i in range(10):
+            self.assertTrue(self.lock("sd%d" % i).hasHostId(1))
+        self.assertEqual(self.sanlock.calls, ['get_lockspaces'])
+        lock = self.lock("sd0")
+        lock.getHostStatus(1)
+        lock.getHostStatus(2)
+        self.assertEqual(self.sanlock.calls, ['get_lockspaces', 'get_hosts'])
+
+    def test_interval(self):
+        self.sanlock.join("sd0", 1, "/sd0/ids")
+        lock = self.lock("sd0")
+        lock.hasHostId(1)
+        self.clock.now = 4.9
+        lock.hasHostId(1)
+        self.assertEqual(self.sanlock.calls.count('get_lockspaces'), 1)
+        self.clock.now = 5
+        lock.hasHostId(1)
+        self.assertEqual(self.sanlock.calls.count('get_lockspaces'), 2)
+
+    def test_not_joined(self):
+        lock = self.lock("sd0")
+        self.assertFalse(lock.hasHostId(1))
+        self.assertEqual(lock.getHostStatus(1),
+                         clusterlock.HOST_STATUS_UNAVAILABLE)
+
+    def test_other_host_id(self):
+        self.sanlock.join("sd0", 2, "/sd0/ids")
+        lock = self.lock("sd0")
+        self.assertFalse(lock.hasHostId(1))
+        self.assertEqual(lock.getHostStatus(1), clusterlock.HOST_STATUS_FREE)
+
+    def test_in_progress(self):
+        self.sanlock.join("sd0", 1, "/sd0/ids", flags=LSFLAG_ADD)
+        self.assertIsNone(self.lock("sd0").hasHostId(1))
+
+    def test_same_as_inq_lockspace(self):
+        self.sanlock.join("sd0", 1, "/sd0/ids")
+        self.sanlock.join("sd1", 1, "/sd1/ids", flags=LSFLAG_REM)
+        self.sanlock.join("sd2", 2, "/sd2/ids")
+        for sdUUID in ("sd0", "sd1", "sd2", "sd3"):
+            lock = self.lock(sdUUID)
+            self.assertEqual(
+                lock.hasHostId(1),
+                self.sanlock.inq_lockspace(sdUUID, 1, "/%s/ids" % sdUUID))
+
+    def test_acquire_invalidates(self):
+        lock = self.lock("sd0")
+        self.assertFalse(lock.hasHostId(1))
+        lock.acquireHostId(1, async=True)
+        self.assertTrue(lock.hasHostId(1))
+        lock.releaseHostId(1, async=True, unused=False)
+        self.assertFalse(lock.hasHostId(1))
+        self.assertEqual(self.sanlock.calls.count('get_lockspaces'), 3)
+
+    def test_error(self):
+        self.sanlock.join("sd0", 1, "/sd0/ids")
+        self.sanlock.error = errno.ECONNREFUSED
+        lock = self.lock("sd0")
+        self.assertFalse(lock.hasHostId(1))
+        self.assertEqual(lock.getHostStatus(1),
+                         clusterlock.HOST_STATUS_UNAVAILABLE)
+        # The error is cached as well
+        self.assertEqual(self.sanlock.calls.count('get_lockspaces'), 1)
+        self.sanlock.error = None
+        self.clock.now = 5
+        self.assertTrue(lock.hasHostId(1))
+
+    def test_disabled(self):
+        status = clusterlock.SANLockStatus(0, clock=self.clock)
+        with MonkeyPatchScope([(clusterlock.SANLock, '_status', status)]):
+            self.sanlock.join("sd0", 1, "/sd0/ids")
+            lock = self.lock("sd0")
+            self.assertTrue(lock.hasHostId(1))
+            self.assertEqual(lock.getHostStatus(1),
+                             clusterlock.HOST_STATUS_LIVE)
+        self.assertEqual(self.sanlock.calls, ['inq_lockspace', 'get_hosts'])
+
+    def test_no_lockspace_flags(self):
+        noflags = NoFlagsSanlock()
+        noflags.join("sd0", 1, "/sd0/ids", flags=LSFLAG_ADD)
+        with MonkeyPatchScope([(clusterlock, 'sanlock', noflags)]):
+            self.assertIsNone(self.lock("sd0").hasHostId(1))
+        self.assertEqual(noflags.calls, ['inq_lockspace'])
+
+    def test_legacy_sanlock(self):
+        legacy = LegacySanlock()
+        legacy.join("sd0", 1, "/sd0/ids")
+        with MonkeyPatchScope([(clusterlock, 'sanlock', legacy)]):
+            self.assertTrue(self.lock("sd0").hasHostId(1))
+        self.assertEqual(legacy.calls, ['inq_lockspace'])
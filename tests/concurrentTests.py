@@ -18,6 +18,7 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import threading
 import time
 import random
 
@@ -58,3 +59,97 @@ class TMapTests(VdsmTestCase):
         results = concurrent.tmap(func, range(10))
         expected = [concurrent.Result(False, error)] * 10
         self.assertEqual(results, expected)
+
+
+class BoundedPoolTests(VdsmTestCase):
+
+    def test_results(self):
+        pool = concurrent.BoundedPool("test", 2)
+        results = pool.map(lambda x: x * 2, [3, 1, 2], timeout=10)
+        self.assertEqual([r.value for r in results], [6, 2, 4])
+        self.assertTrue(all(r.succeeded for r in results))
+        self.assertTrue(all(r.elapsed >= 0 for r in results))
+
+    def test_error(self):
+        error = RuntimeError("No result for you!")
+
+        def func(x):
+            if x == 1:
+                raise error
+            return x
+
+        pool = concurrent.BoundedPool("test", 2)
+        results = pool.map(func, range(3), timeout=10)
+        self.assertEqual([(r.succeeded, r.value) for r in results],
+                         [(True, 0), (False, error), (True, 2)])
+
+    def test_bounded(self):
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def func(x):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return x
+
+        pool = concurrent.BoundedPool("test", 3)
+        results = pool.map(func, range(10), timeout=10)
+        self.assertTrue(all(r.succeeded for r in results))
+        self.assertTrue(peak[0] <= 3)
+        self.assertEqual(pool.busy, 0)
+
+    def test_item_timeout(self):
+        blocked = threading.Event()
+
+        def func(x):
+            if x == "stuck":
+                blocked.wait(5)
+            return x
+
+        pool = concurrent.BoundedPool("test", 2)
+        try:
+            results = pool.map(func, ["stuck", "a", "b"], timeout=5,
+                               item_timeout=0.1)
+            self.assertEqual(pool.busy, 1)
+        finally:
+            blocked.set()
+        self.assertEqual(results[0], None)
+        self.assertEqual([r.value for r in results[1:]], ["a", "b"])
+
+    def test_timeout(self):
+        blocked = threading.Event()
+
+        def func(x):
+            blocked.wait(5)
+            return x
+
+        pool = concurrent.BoundedPool("test", 1)
+        try:
+            start = time.time()
+            results = pool.map(func, range(3), timeout=0.2)
+            self.assertTrue(time.time() - start < 1)
+        finally:
+            blocked.set()
+        self.assertEqual(results, [None] * 3)
+
+    def test_abandoned_calls_hold_threads(self):
+        blocked = threading.Event()
+        called = []
+
+        def func(x):
+            called.append(x)
+            blocked.wait(5)
+            return x
+
+        pool = concurrent.BoundedPool("test", 1)
+        try:
+            pool.map(func, ["stuck"], timeout=0.1)
+            self.assertEqual(pool.map(func, ["new"], timeout=0.1), [None])
+            self.assertEqual(called, ["stuck"])
+        finally:
+            blocked.set()
@@ -0,0 +1,129 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import xmlrpclib
+
+from testlib import VdsmTestCase
+from storage.copyJobs import BandwidthScheduler, CopyJob
+from storage.task import Task
+
+MB = 1024 * 1024
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTask(object):
+
+    def __init__(self):
+        self.progress = None
+
+    def setProgress(self, done, total, rate):
+        self.progress = (done, total, rate)
+
+
+class BandwidthSchedulerTests(VdsmTestCase):
+
+    def test_unlimited(self):
+        scheduler = BandwidthScheduler(0)
+        with CopyJob(scheduler, 100 * MB):
+            self.assertEqual(scheduler.share(), 0)
+
+    def test_fair_share(self):
+        scheduler = BandwidthScheduler(90 * MB)
+        with CopyJob(scheduler, MB):
+            self.assertEqual(scheduler.share(), 90 * MB)
+            with CopyJob(scheduler, MB), CopyJob(scheduler, MB):
+                self.assertEqual(scheduler.share(), 30 * MB)
+            self.assertEqual(scheduler.share(), 90 * MB)
+
+
+class CopyJobTests(VdsmTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_report_progress(self):
+        scheduler = BandwidthScheduler(0, clock=self.clock)
+        task = FakeTask()
+        with CopyJob(scheduler, 100 * MB, task=task) as job:
+            self.clock.now = 2
+            self.assertEqual(job.progress(50.0), 0)
+        self.assertEqual(task.progress, (50 * MB, 100 * MB, 25 * MB))
+
+    def test_within_share(self):
+        scheduler = BandwidthScheduler(10 * MB, clock=self.clock)
+        with CopyJob(scheduler, 100 * MB) as job:
+            self.clock.now = 1
+            self.assertEqual(job.progress(10.0), 0)
+
+    def test_throttle(self):
+        scheduler = BandwidthScheduler(10 * MB, clock=self.clock)
+        with CopyJob(scheduler, 100 * MB) as job:
+            self.clock.now = 1
+            # Copied 30 MiB in 1 second, 20 MiB over the share
+            self.assertEqual(job.progress(30.0), 2.0)
+            # The pause paid for the extra data
+            self.clock.now = 4
+            self.assertEqual(job.progress(40.0), 0)
+
+    def test_throttle_shared(self):
+        scheduler = BandwidthScheduler(10 * MB, clock=self.clock)
+        with CopyJob(scheduler, 100 * MB) as job1:
+            with CopyJob(scheduler, 100 * MB):
+                self.clock.now = 1
+                # Share is 5 MiB/s, copied 10 MiB
+                self.assertEqual(job1.progress(10.0), 1.0)
+
+
+    def test_throttle_written(self):
+        scheduler = BandwidthScheduler(10 * MB, clock=self.clock)
+        with CopyJob(scheduler, 100 * MB) as job:
+            self.clock.now = 1
+            # Passed 30% of a sparse image, writing only 5 MiB
+            self.assertEqual(job.progress(30.0, 5 * MB), 0)
+            self.clock.now = 2
+            # Wrote 25 MiB in 1 second, 15 MiB over the share
+            self.assertEqual(job.progress(40.0, 30 * MB), 1.5)
+
+
+class TaskProgressTests(VdsmTestCase):
+
+    def test_marshal_large_progress(self):
+        task = Task(None)
+        try:
+            task.setProgress(3 * 1024 * MB, 5 * 1024 * MB, 100 * MB)
+            info = task.getInfo()
+        finally:
+            # Skip the autoclean of unfinished tasks in Task.__del__
+            task.state.state = "finished"
+        self.assertEqual(info["progress"]["percent"], 60)
+        data = xmlrpclib.dumps(({task.id: info},), methodresponse=True)
+        (result,), _ = xmlrpclib.loads(data)
+        progress = result[task.id]["progress"]
+        self.assertEqual(int(progress["done"]), 3 * 1024 * MB)
+        self.assertEqual(int(progress["total"]), 5 * 1024 * MB)
+        self.assertEqual(int(progress["rate"]), 100 * MB)
@@ -0,0 +1,195 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import socket
+import time
+
+from testlib import VdsmTestCase
+
+from storage import devicemapper
+
+PATHS = {"8:16": "active", "8:32": "active"}
+
+
+def uevent(action, devpath, **properties):
+    fields = ["%s@%s" % (action, devpath), "ACTION=" + action,
+              "DEVPATH=" + devpath, "SUBSYSTEM=block"]
+    fields.extend("%s=%s" % item for item in properties.iteritems())
+    return "\0".join(fields) + "\0"
+
+
+def pathFailed(path):
+    return uevent("change", "/devices/virtual/block/dm-0", DEVNAME="dm-0",
+                  DM_ACTION="PATH_FAILED", DM_PATH=path, MAJOR="253",
+                  MINOR="0")
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeScan(object):
+
+    def __init__(self, paths):
+        self.paths = dict(paths)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.paths)
+
+
+class FakeResolve(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, devNum):
+        self.calls += 1
+        return {"8:16": "sdb", "8:32": "sdc", "8:48": "sdd"}[devNum]
+
+
+class ParseUeventTests(VdsmTestCase):
+
+    def test_parse(self):
+        event = devicemapper.parseUevent(pathFailed("8:16"))
+        self.assertEqual(event["ACTION"], "change")
+        self.assertEqual(event["DM_ACTION"], "PATH_FAILED")
+        self.assertEqual(event["DM_PATH"], "8:16")
+        self.assertNotIn("change@/devices/virtual/block/dm-0", event)
+
+
+class PathStatusTrackerTests(VdsmTestCase):
+
+    def setUp(self):
+        self.scan = FakeScan(PATHS)
+        self.resolve = FakeResolve()
+        self.clock = FakeClock()
+        self.tracker = devicemapper.PathStatusTracker(
+            scan=self.scan, resolve=self.resolve, monitor=False,
+            reconcileInterval=60, clock=self.clock)
+        self.tracker.monitoring = True
+
+    def handle(self, data):
+        self.tracker.handleEvent(devicemapper.parseUevent(data))
+
+    def test_cached(self):
+        for i in range(3):
+            status = self.tracker.status()
+        self.assertEqual(status, {"sdb": "active", "sdc": "active"})
+        self.assertEqual(self.scan.calls, 1)
+        self.assertEqual(self.resolve.calls, 2)
+
+    def test_path_events(self):
+        self.tracker.status()
+        self.handle(pathFailed("8:32"))
+        self.assertEqual(self.tracker.status(),
+                         {"sdb": "active", "sdc": "failed"})
+        self.handle(uevent("change", "/devices/virtual/block/dm-0",
+                           DEVNAME="dm-0", DM_ACTION="PATH_REINSTATED",
+                           DM_PATH="8:32"))
+        self.assertEqual(self.tracker.status(),
+                         {"sdb": "active", "sdc": "active"})
+        self.assertEqual(self.scan.calls, 1)
+
+    def test_reconcile(self):
+        self.tracker.status()
+        self.scan.paths["8:16"] = "failed"
+        self.clock.now = 59
+        self.assertEqual(self.tracker.status()["sdb"], "active")
+        self.clock.now = 60
+        self.assertEqual(self.tracker.status()["sdb"], "failed")
+        self.assertEqual(self.scan.calls, 2)
+
+    def test_map_change(self):
+        self.tracker.status()
+        self.scan.paths["8:48"] = "active"
+        self.handle(uevent("change", "/devices/virtual/block/dm-1",
+                           DEVNAME="dm-1", DM_UUID="mpath-3600a0b80"))
+        self.assertEqual(self.tracker.status()["sdd"], "active")
+        self.assertEqual(self.scan.calls, 2)
+
+    def test_lv_change(self):
+        self.tracker.status()
+        self.handle(uevent("change", "/devices/virtual/block/dm-2",
+                           DEVNAME="dm-2", DM_UUID="LVM-xxxxxx"))
+        self.tracker.status()
+        self.assertEqual(self.scan.calls, 1)
+
+    def test_path_removed(self):
+        self.tracker.status()
+        self.handle(uevent("remove", "/devices/.../block/sdc",
+                           DEVNAME="sdc", MAJOR="8", MINOR="32"))
+        self.assertEqual(self.tracker.status(), {"sdb": "active"})
+        self.handle(uevent("add", "/devices/.../block/sdc",
+                           DEVNAME="sdc", MAJOR="8", MINOR="32"))
+        self.handle(uevent("change", "/devices/virtual/block/dm-0",
+                           DEVNAME="dm-0", DM_UUID="mpath-3600a0b80"))
+        self.tracker.status()
+        # Name of the re-added device is resolved again
+        self.assertEqual(self.resolve.calls, 3)
+
+    def test_not_monitoring(self):
+        self.tracker.monitoring = False
+        self.tracker.status()
+        self.tracker.status()
+        self.assertEqual(self.scan.calls, 2)
+        self.assertEqual(self.resolve.calls, 4)
+
+    def test_invalidate(self):
+        self.tracker.status()
+        self.tracker.invalidate()
+        self.tracker.status()
+        self.assertEqual(self.scan.calls, 2)
+
+
+class UeventMonitorTests(VdsmTestCase):
+
+    def test_monitor(self):
+        scan = FakeScan(PATHS)
+        tracker = devicemapper.PathStatusTracker(
+            scan=scan, resolve=FakeResolve(), monitor=False)
+        sock, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            tracker.startMonitoring(sock)
+            self.assertTrue(tracker.monitoring)
+            tracker.status()
+            peer.send(pathFailed("8:16"))
+            self.assertTrue(waitFor(
+                lambda: tracker.status()["sdb"] == "failed"))
+            self.assertEqual(scan.calls, 1)
+        finally:
+            peer.close()
+        # The monitor stops when the socket is closed
+        self.assertTrue(waitFor(lambda: not tracker.monitoring))
+
+
+def waitFor(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
@@ -18,6 +18,7 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import collections
 import fnmatch
 import os
 import time
@@ -52,10 +53,22 @@ class FakeGlob(object):
         return fnmatch.filter(self.files, pattern)
 
 
+FakeStat = collections.namedtuple("FakeStat", "st_size, st_blocks")
+
+
 class FakeOOP(object):
 
-    def __init__(self, glob=None):
+    def __init__(self, glob=None, files=None):
         self.glob = glob
+        self.files = files or {}
+        self.os = self
+
+    def directReadLines(self, path):
+        return self.files[path].splitlines()
+
+    def stat(self, path):
+        size = len(self.files[path])
+        return FakeStat(st_size=size, st_blocks=(size + 511) // 512)
 
 
 class GetAllVolumesTests(TestCaseBase):
@@ -155,3 +168,53 @@ class GetAllVolumesTests(TestCaseBase):
         # This takes 0.065 seconds on my laptop, 1 second should be enough even
         # on overloaded jenkins slave.
         self.assertTrue(elapsed < 1.0, "Elapsed time: %f seconds" % elapsed)
+
+
+class DumpVolumesTests(TestCaseBase):
+
+    MOUNTPOINT = "/rhev/data-center/%s" % uuid.uuid4()
+    SD_UUID = str(uuid.uuid4())
+    IMAGES_DIR = os.path.join(MOUNTPOINT, SD_UUID, sd.DOMAIN_IMAGES)
+
+    def addVolume(self, files, imgUUID, volUUID, meta, data=""):
+        path = os.path.join(self.IMAGES_DIR, imgUUID, volUUID)
+        files[path] = data
+        files[path + ".meta"] = "".join(line + "\n" for line in meta)
+
+    def test_dump(self):
+        files = {}
+        self.addVolume(files, "template-1", "volume-1",
+                       ["FORMAT=RAW", "VOLTYPE=SHARED", "SIZE=8",
+                        "PUUID=" + sd.BLANK_UUID, "LEGALITY=LEGAL", "EOF"],
+                       data="x" * 4096)
+        files[os.path.join(self.IMAGES_DIR, "image-1", "volume-1.meta")] = (
+            files[os.path.join(self.IMAGES_DIR, "template-1",
+                               "volume-1.meta")])
+        self.addVolume(files, "image-1", "volume-2",
+                       ["FORMAT=COW", "VOLTYPE=LEAF", "SIZE=8",
+                        "PUUID=volume-1", "LEGALITY=ILLEGAL", "EOF"])
+        self.addVolume(files, "image-2", "volume-3", ["SIZE=a=b"])
+        oop = FakeOOP(FakeGlob(files.keys()), files)
+        dom = TestingFileStorageDomain(self.SD_UUID, self.MOUNTPOINT, oop)
+
+        res = dom.dumpVolumes()
+
+        self.assertEqual(sorted(res), ["volume-1", "volume-2", "volume-3"])
+
+        # Template volumes are reported once, in the template image
+        info = res["volume-1"]
+        self.assertEqual(info["image"], "template-1")
+        self.assertEqual(info["parent"], sd.BLANK_UUID)
+        self.assertEqual(info["format"], "RAW")
+        self.assertEqual(info["capacity"], str(8 * 512))
+        self.assertEqual(info["apparentsize"], "4096")
+        self.assertEqual(info["status"], "OK")
+
+        info = res["volume-2"]
+        self.assertEqual(info["image"], "image-1")
+        self.assertEqual(info["parent"], "volume-1")
+        self.assertEqual(info["status"], "ILLEGAL")
+
+        info = res["volume-3"]
+        self.assertEqual(info["image"], "image-2")
+        self.assertEqual(info["status"], "INVALID")
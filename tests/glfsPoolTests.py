@@ -0,0 +1,145 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from testlib import VdsmTestCase as TestCaseBase
+from gluster import exception as ge
+from gluster import glfspool
+
+KEY = ('vol1', 'localhost', 24007, 'tcp')
+
+
+class FakeGfapi(object):
+    """
+    Stand in for libgfapi glfs_init and glfs_fini, counting the calls.
+    """
+
+    def __init__(self):
+        self.inits = 0
+        self.finis = 0
+        self.initError = None
+        self.handles = set()
+
+    def init(self, volumeId, host, port, protocol):
+        if self.initError:
+            raise self.initError
+        self.inits += 1
+        fs = (volumeId, self.inits)
+        self.handles.add(fs)
+        return fs
+
+    def fini(self, fs, volumeId):
+        self.finis += 1
+        self.handles.remove(fs)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class GlfsPoolTests(TestCaseBase):
+
+    def setUp(self):
+        self.gfapi = FakeGfapi()
+        self.clock = Clock()
+        self.pool = glfspool.GlfsPool(self.gfapi.init, self.gfapi.fini,
+                                      idleTimeout=60, maxHandles=2,
+                                      clock=self.clock)
+
+    def testReuse(self):
+        for i in range(10):
+            self.assertEqual(self.pool.run(lambda fs: fs, *KEY), ('vol1', 1))
+        self.assertEqual(self.gfapi.inits, 1)
+        self.assertEqual(self.gfapi.finis, 0)
+
+    def testPerVolume(self):
+        self.pool.run(lambda fs: fs, *KEY)
+        self.pool.run(lambda fs: fs, 'vol2', *KEY[1:])
+        self.assertEqual(self.gfapi.inits, 2)
+
+    def testEvictIdle(self):
+        self.pool.run(lambda fs: fs, *KEY)
+        self.clock.now = 30
+        self.pool.evictIdle()
+        self.assertEqual(self.gfapi.finis, 0)
+        self.clock.now = 61
+        self.pool.evictIdle()
+        self.assertEqual(self.gfapi.finis, 1)
+        self.pool.run(lambda fs: fs, *KEY)
+        self.assertEqual(self.gfapi.inits, 2)
+
+    def testMaxHandles(self):
+        for i, volume in enumerate(['vol1', 'vol2', 'vol3']):
+            self.clock.now = i
+            self.pool.run(lambda fs: fs, volume, *KEY[1:])
+        self.pool.evictIdle()
+        # The least recently used handle was finalized
+        self.assertEqual(self.gfapi.handles, set([('vol2', 2), ('vol3', 3)]))
+        self.assertEqual(self.pool.size, 2)
+
+    def testForgetFailedVolumes(self):
+        self.gfapi.initError = ge.GlfsInitException(rc=-1)
+        for volume in ['vol1', 'vol2', 'vol3']:
+            self.assertRaises(ge.GlfsInitException, self.pool.run,
+                              lambda fs: fs, volume, *KEY[1:])
+        self.pool.evictIdle()
+        self.assertEqual(self.pool.size, 0)
+
+    def testReconnect(self):
+        self.pool.run(lambda fs: fs, *KEY)
+        calls = []
+
+        def statvfs(fs):
+            calls.append(fs)
+            if len(calls) == 1:
+                raise ge.GlfsStatvfsException(rc=-1)
+            return fs
+
+        self.assertEqual(self.pool.run(statvfs, *KEY), ('vol1', 2))
+        self.assertEqual(calls, [('vol1', 1), ('vol1', 2)])
+        self.assertEqual(self.gfapi.finis, 1)
+
+    def testNewHandleFailureNotRetried(self):
+        def statvfs(fs):
+            raise ge.GlfsStatvfsException(rc=-1)
+
+        self.assertRaises(ge.GlfsStatvfsException, self.pool.run, statvfs,
+                          *KEY)
+        self.assertEqual(self.gfapi.inits, 1)
+        self.assertEqual(self.gfapi.handles, set())
+
+    def testInitFailure(self):
+        self.gfapi.initError = ge.GlfsInitException(rc=1)
+        self.assertRaises(ge.GlfsInitException, self.pool.run,
+                          lambda fs: fs, *KEY)
+        self.gfapi.initError = None
+        self.pool.run(lambda fs: fs, *KEY)
+        self.assertEqual(self.gfapi.inits, 1)
+
+    def testClose(self):
+        self.pool.run(lambda fs: fs, *KEY)
+        self.pool.run(lambda fs: fs, 'vol2', *KEY[1:])
+        self.pool.close()
+        self.assertEqual(self.gfapi.finis, 2)
+        self.assertEqual(self.gfapi.handles, set())
@@ -18,8 +18,15 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import os
+import shutil
+import tempfile
+import threading
+
 from testlib import VdsmTestCase as TestCaseBase
+from monkeypatch import MonkeyPatchScope
 from gluster import cli as gcli
+from gluster import exception as ge
 import xml.etree.cElementTree as etree
 from nose.plugins.skip import SkipTest
 import glusterTestData
@@ -1226,3 +1233,109 @@ class GlusterCliTests(TestCaseBase):
         status = gcli._parseAllVolumeSnapshotList(tree)
         expected = {}
         self.assertEquals(status, expected)
+
+
+_FAKE_GLUSTER = """#!/bin/sh
+echo "$@" >> "%(log)s"
+sleep 0.2
+cat <<EOF
+<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<cliOutput>
+  <opRet>0</opRet>
+  <opErrno>0</opErrno>
+  <opErrstr/>
+  <volInfo/>
+</cliOutput>
+EOF
+"""
+
+
+class FakeCommandPath(object):
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+
+
+class GlusterQueryCacheTests(TestCaseBase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmpdir, 'log')
+        gluster = os.path.join(self.tmpdir, 'gluster')
+        with open(gluster, 'w') as f:
+            f.write(_FAKE_GLUSTER % {'log': self.log})
+        os.chmod(gluster, 0o755)
+        self.now = 0
+        self.patch = MonkeyPatchScope([
+            (gcli, '_glusterCommandPath', FakeCommandPath(gluster)),
+            (gcli, '_queryCache', gcli._QueryCache(
+                gcli.QUERY_CACHE_TTL, clock=lambda: self.now)),
+        ])
+        self.patch.__enter__()
+
+    def tearDown(self):
+        self.patch.__exit__(None, None, None)
+        shutil.rmtree(self.tmpdir)
+
+    def invocations(self):
+        try:
+            with open(self.log) as f:
+                return f.read().splitlines()
+        except IOError:
+            return []
+
+    def testConcurrentQueriesCoalesced(self):
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(gcli.volumeInfo()))
+            for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [{}] * 5)
+        self.assertEqual(len(self.invocations()), 1)
+
+    def testCachedUntilTtl(self):
+        gcli.volumeInfo()
+        self.now = gcli.QUERY_CACHE_TTL
+        gcli.volumeInfo()
+        self.assertEqual(len(self.invocations()), 1)
+        self.now = gcli.QUERY_CACHE_TTL + 1
+        gcli.volumeInfo()
+        self.assertEqual(len(self.invocations()), 2)
+
+    def testDifferentQueries(self):
+        gcli.volumeInfo()
+        gcli.volumeInfo('vol1')
+        gcli.volumeInfo('vol1')
+        self.assertEqual(len(self.invocations()), 2)
+
+    def testMutationInvalidates(self):
+        gcli.volumeInfo()
+        gcli.volumeStart('vol1')
+        gcli.volumeInfo()
+        self.assertEqual(len(self.invocations()), 3)
+
+    def testFailedCommandNotCached(self):
+        calls = []
+
+        def execCmd(cmd):
+            calls.append(cmd)
+            return 1, [], ['failed']
+
+        with MonkeyPatchScope([(gcli.utils, 'execCmd', execCmd)]):
+            self.assertRaises(ge.GlusterHostUUIDNotFoundException,
+                              gcli.hostUUIDGet)
+            self.assertRaises(ge.GlusterHostUUIDNotFoundException,
+                              gcli.hostUUIDGet)
+        self.assertEqual(len(calls), 2)
+
+    def testFailureNotCached(self):
+        def fail():
+            raise ge.GlusterCmdExecFailedException(1, [], ['failed'])
+
+        self.assertRaises(ge.GlusterCmdExecFailedException,
+                          gcli._queryCache.get, ('key',), fail)
+        self.assertEqual(gcli._queryCache.get(('key',), lambda: 'value'),
+                         'value')
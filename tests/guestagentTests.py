@@ -18,12 +18,19 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
+import errno
 import logging
+import select
+import socket
+import time
+import unicodedata
 from collections import namedtuple
 from virt import guestagent
+from virt import vmchannels
 import json
 
 from testlib import VdsmTestCase as TestCaseBase
+from testValidation import slowtest
 
 _MSG_TYPES = ['heartbeat', 'host-name', 'os-version',
               'network-interfaces', 'applications', 'disks-usage']
@@ -82,6 +89,32 @@ _OUTPUTS = [
             'used': '153149440'}]}]
 
 
+def _referenceFilterXmlChars(u):
+    """
+    Character by character implementation of guestagent._filterXmlChars
+    """
+    return u''.join(
+        guestagent._REPLACEMENT_CHAR
+        if (c > u'\U00010fff' or unicodedata.category(c) == 'Cs' or
+            c in guestagent._RESTRICTED_CHARS) else c
+        for c in u)
+
+
+def _agentPayload(size=64 * 1024):
+    """
+    Return a realistic 'applications' message of about size bytes.
+    """
+    apps = []
+    length = 0
+    i = 0
+    while length < size:
+        app = u'Microsoft Visual C++ 2010 x64 Redistributable - 10.0.%d' % i
+        apps.append(app)
+        length += len(app) + 4
+        i += 1
+    return json.dumps({'__name__': 'applications', 'applications': apps})
+
+
 class TestGuestIF(TestCaseBase):
     def testfilterXmlChars(self):
         ALL_LEGAL = u"Hello World"
@@ -102,6 +135,23 @@ class TestGuestIF(TestCaseBase):
         self.assertEqual(guestagent._REPLACEMENT_CHAR * len(restricted),
                          guestagent._filterXmlChars(restricted))
 
+    def testFilterXmlCharsReference(self):
+        chars = u''.join(unichr(c) for c in range(0x10000))
+        chars += u'\U00010000\U00010fff\U00011000\U0010ffff'
+        self.assertEqual(guestagent._filterXmlChars(chars),
+                         _referenceFilterXmlChars(chars))
+
+    def test_parseLineEscapes(self):
+        fakeGuestAgent = guestagent.GuestAgent(None, None, self.log)
+        for line, expected in (
+                (r'{"__name__": "x", "v": "a\u0000b"}', u'a\ufffdb'),
+                (r'{"__name__": "x", "v": "a\bb\fc"}', u'a\ufffdb\ufffdc'),
+                (r'{"__name__": "x", "v": "C:\\bin"}', u'C:\\bin'),
+                ('{"__name__": "x", "v": "plain"}', u'plain')):
+            name, args = fakeGuestAgent._parseLine(line)
+            self.assertEqual(name, 'x')
+            self.assertEqual(args, {u'v': expected})
+
     def test_filterObject(self):
         ILLEGAL_DATA = {u"foo": u"\x00data\x00test\uffff\ufffe\ud800\udc79"}
         LEGAL_DATA = {u"foo": u"?data?test\U00010000"}
@@ -169,6 +219,19 @@ class TestGuestIFHandleData(TestCaseBase):
         for (k, v) in expected.iteritems():
             self.assertEqual(self.fakeGuestAgent.guestInfo[k], expected[k])
 
+    def testManyMessagesInChunk(self):
+        self.fakeGuestAgent.MAX_MESSAGE_SIZE = 2 ** 20
+        messages = []
+        self.fakeGuestAgent._processMessage = messages.append
+        data = ''.join('{"__name__": "heartbeat", "n": %d}\n' % i
+                       for i in range(1000))
+        self.fakeGuestAgent._handleData(data[:100])
+        self.fakeGuestAgent._handleData(data[100:] + '{"__name__"')
+        self.assertEqual(len(messages), 1000)
+        self.assertEqual(json.loads(messages[999]),
+                         {'__name__': 'heartbeat', 'n': 999})
+        self.assertEqual(self.fakeGuestAgent._buffer, ['{"__name__"'])
+
     def testMixed(self):
         testCase = namedtuple('testCase', 'msgType, message, assertDict')
         for t in zip(_MSG_TYPES, _INPUTS, _OUTPUTS):
@@ -198,6 +261,174 @@ class TestGuestIFHandleData(TestCaseBase):
                     self.assertEqual(self.fakeGuestAgent.guestInfo[k], v)
 
 
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeListener(object):
+
+    def __init__(self):
+        self.throttled = []
+
+    def throttle(self, fileno, seconds):
+        self.throttled.append((fileno, seconds))
+
+
+def _flood(sock, data):
+    """
+    Write data to a non-blocking socket until its buffer is full, returning
+    the number of bytes written.
+    """
+    written = 0
+    try:
+        while True:
+            written += sock.send(data)
+    except socket.error as e:
+        if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+            raise
+    return written
+
+
+class TokenBucketTests(TestCaseBase):
+
+    def testBurst(self):
+        clock = FakeClock()
+        bucket = guestagent._TokenBucket(100, 1000, clock=clock)
+        self.assertTrue(bucket.consume(1000))
+        self.assertFalse(bucket.consume(1))
+
+    def testRefill(self):
+        clock = FakeClock()
+        bucket = guestagent._TokenBucket(100, 1000, clock=clock)
+        self.assertFalse(bucket.consume(1500))
+        # The overdraft must be paid back first
+        clock.now = 4
+        self.assertFalse(bucket.consume(1))
+        clock.now = 7
+        self.assertTrue(bucket.consume(100))
+
+    def testRefillUpToBurst(self):
+        clock = FakeClock()
+        bucket = guestagent._TokenBucket(100, 1000, clock=clock)
+        clock.now = 3600
+        self.assertFalse(bucket.consume(1001))
+
+    def testUnlimited(self):
+        bucket = guestagent._TokenBucket(0, 0, clock=FakeClock())
+        self.assertTrue(bucket.consume(2 ** 30))
+
+
+class GuestAgentChannelTests(TestCaseBase):
+
+    def setUp(self):
+        self.guest, host = socket.socketpair()
+        self.guest.setblocking(0)
+        host.setblocking(0)
+        self.listener = FakeListener()
+        self.agent = guestagent.GuestAgent(None, self.listener, self.log)
+        self.agent._sock.close()
+        self.agent._sock = host
+        self.agent._clearReadBuffer()
+        self.agent._stopped = False
+        self.clock = FakeClock()
+        self.agent._readLimit = guestagent._TokenBucket(
+            1024, 4096, clock=self.clock)
+        self.messages = []
+        self.agent._handleMessage = lambda *args: self.messages.append(args)
+
+    def tearDown(self):
+        self.guest.close()
+        self.agent._sock.close()
+
+    def testFloodIsThrottled(self):
+        message = '{"__name__": "heartbeat", "free-ram": 0}\n'
+        written = _flood(self.guest, message * 100)
+        self.assertTrue(written > 4096 + 2 ** 16)
+
+        self.assertTrue(guestagent.GuestAgent._onChannelRead(self.agent))
+        self.assertEqual(self.listener.throttled,
+                         [(self.agent._sock.fileno(), 10)])
+        self.assertEqual(self.agent.getChannelStats()['throttled'], 1)
+        # Reading stops once the limit is exceeded, leaving the rest of the
+        # flood in the socket buffer
+        read = len(self.messages) * len(message)
+        self.assertTrue(4096 < read < written)
+
+    def testWithinLimit(self):
+        message = '{"__name__": "heartbeat", "free-ram": 0}\n'
+        self.guest.sendall(message * 10)
+        self.assertTrue(guestagent.GuestAgent._onChannelRead(self.agent))
+        self.assertEqual(len(self.messages), 10)
+        self.assertEqual(self.listener.throttled, [])
+
+    def testOversizeMessageDropped(self):
+        self.agent.MAX_MESSAGE_SIZE = 1024
+        self.agent._readLimit = guestagent._TokenBucket(0, 0)
+        self.guest.sendall('{"__name__": "applications", "x": "%s"}\n' %
+                           ('x' * 10000))
+        self.guest.sendall('{"__name__": "heartbeat", "free-ram": 0}\n')
+        self.assertTrue(guestagent.GuestAgent._onChannelRead(self.agent))
+        self.assertEqual(self.messages, [('heartbeat', {'free-ram': 0})])
+        self.assertEqual(self.agent.getChannelStats()['droppedOversize'], 1)
+
+    def testInvalidMessageDropped(self):
+        self.guest.sendall('garbage\n')
+        self.assertTrue(guestagent.GuestAgent._onChannelRead(self.agent))
+        self.assertEqual(self.messages, [])
+        self.assertEqual(self.agent.getChannelStats()['droppedInvalid'], 1)
+
+
+class ListenerThrottleTests(TestCaseBase):
+
+    def setUp(self):
+        self.guest, self.host = socket.socketpair()
+        self.listener = vmchannels.Listener(self.log)
+        self.reads = []
+        self.listener.register(lambda opaque: self.host.fileno(),
+                               lambda opaque: True,
+                               self.reads.append,
+                               lambda opaque: None,
+                               'opaque')
+        self.listener._update_channels()
+        self.listener._handle_unconnected()
+
+    def tearDown(self):
+        self.guest.close()
+        self.host.close()
+
+    def testThrottleAndResume(self):
+        fileno = self.host.fileno()
+        self.guest.sendall('data')
+        self.assertEqual(self.listener._epoll.poll(0),
+                         [(fileno, select.EPOLLIN)])
+
+        self.listener.throttle(fileno, 3600)
+        self.listener._update_channels()
+        self.listener._handle_throttled()
+        self.assertNotIn(fileno, self.listener._channels)
+        self.assertEqual(self.listener._epoll.poll(0), [])
+
+        self.listener._throttled[fileno]['throttle_time'] = 0
+        self.listener._handle_throttled()
+        self.assertIn(fileno, self.listener._channels)
+        self.assertEqual(self.listener._epoll.poll(0),
+                         [(fileno, select.EPOLLIN)])
+
+    def testUnregisterThrottled(self):
+        fileno = self.host.fileno()
+        self.listener.throttle(fileno, 3600)
+        self.listener._update_channels()
+        self.listener.unregister(fileno)
+        self.listener._update_channels()
+        self.assertNotIn(fileno, self.listener._throttled)
+        self.assertNotIn(fileno, self.listener._channels)
+
+
 class DiskMappingTests(TestCaseBase):
 
     def setUp(self):
@@ -211,3 +442,35 @@ class DiskMappingTests(TestCaseBase):
         old_hash = self.agent.diskMappingHash
         self.agent.guestDiskMapping = {'/dev/vda': 'xxx'}
         self.assertNotEqual(self.agent.diskMappingHash, old_hash)
+
+
+class GuestAgentBenchmark(TestCaseBase):
+
+    @slowtest
+    def testParsePayloads(self):
+        fakeGuestAgent = guestagent.GuestAgent(None, None, self.log)
+        fakeGuestAgent._stopped = False
+        fakeGuestAgent._clearReadBuffer()
+        fakeGuestAgent._handleMessage = lambda message, args: None
+        data = (_agentPayload() + '\n') * 16
+        start = time.time()
+        for i in range(0, len(data), 2 ** 16):
+            fakeGuestAgent._handleData(data[i:i + 2 ** 16])
+        elapsed = time.time() - start
+        logging.info("parsed %d bytes of agent messages in %.3f seconds",
+                     len(data), elapsed)
+
+    @slowtest
+    def testFilterXmlChars(self):
+        payload = json.loads(_agentPayload())
+        text = u'\n'.join(payload['applications'])
+        start = time.time()
+        for i in range(10):
+            guestagent._filterXmlChars(text)
+        fast = time.time() - start
+        start = time.time()
+        for i in range(10):
+            _referenceFilterXmlChars(text)
+        reference = time.time() - start
+        logging.info("filtered 64 KiB payload in %.2f ms (per character "
+                     "filter: %.2f ms)", fast * 100, reference * 100)
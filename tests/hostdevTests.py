@@ -18,16 +18,22 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import logging
+import time
+
 import hooks
 import hostdev
 import vmfakelib as fake
 
 from testlib import VdsmTestCase as TestCaseBase
 from testlib import permutations, expandPermutations
-from monkeypatch import MonkeyClass
+from testValidation import slowtest
+from monkeypatch import MonkeyClass, MonkeyPatchScope
 
 from vdsm import libvirtconnection
 
+import libvirt
+
 PCI_DEVICE_XML = [
     """
     <device>
@@ -526,7 +532,7 @@ class HostdevTests(TestCaseBase):
         self.assertEquals(_NET_DEVICE_PARSED, deviceXML)
 
     def testGetDevicesFromLibvirt(self):
-        libvirt_devices = hostdev._get_devices_from_libvirt()
+        libvirt_devices = hostdev._DeviceCache().devices()
 
         self.assertEqual(DEVICES_PARSED, libvirt_devices)
         self.assertEqual(len(libvirt_devices),
@@ -542,3 +548,169 @@ class HostdevTests(TestCaseBase):
         for cap in caps:
             self.assertTrue(set(DEVICES_BY_CAPS[cap].keys()).
                             issubset(devices.keys()))
+
+
+class CountingNodeDevice(fake.VirNodeDeviceStub):
+
+    def __init__(self, xml, calls):
+        fake.VirNodeDeviceStub.__init__(self, xml)
+        # Set after the stub has read the name from the XML
+        self._calls = calls
+
+    def XMLDesc(self, flags=0):
+        if hasattr(self, '_calls'):
+            self._calls.append(self.name())
+        return self.xml
+
+
+class CountingConnection(object):
+    """
+    A connection recording the devices whose XML was requested, and the
+    registered node device event callback.
+    """
+
+    def __init__(self, devices_xml):
+        self.xml_calls = []
+        self.callback = None
+        self.devices = {}
+        for xml in devices_xml:
+            self.add(xml)
+
+    def add(self, xml):
+        device = CountingNodeDevice(xml, self.xml_calls)
+        self.devices[device.name()] = device
+        return device
+
+    def listAllDevices(self, flags=0):
+        return self.devices.values()
+
+    def nodeDeviceLookupByName(self, name):
+        try:
+            return self.devices[name]
+        except KeyError:
+            raise libvirt.libvirtError("Node device not found")
+
+    def nodeDeviceEventRegisterAny(self, dom, event_id, cb, opaque):
+        self.callback = cb
+
+
+_ALL_DEVICES_XML = PCI_DEVICE_XML + USB_DEVICE_XML + SCSI_DEVICE_XML
+
+_LIFECYCLE_EVENT = 0
+_DELETED_EVENT = 0
+_CREATED_EVENT = 1
+
+
+class DeviceCacheTests(TestCaseBase):
+
+    def setUp(self):
+        self.conn = CountingConnection(_ALL_DEVICES_XML)
+        self.cache = hostdev._DeviceCache()
+
+    def patch(self, lifecycle_event):
+        return MonkeyPatchScope([
+            (libvirtconnection, 'get', lambda: self.conn),
+            (hostdev, '_sriov_totalvfs', _fake_totalvfs),
+            (hostdev, '_LIFECYCLE_EVENT', lifecycle_event),
+            (hostdev, '_DELETED_EVENT', _DELETED_EVENT),
+        ])
+
+    def testIndexes(self):
+        with self.patch(None):
+            self.assertEqual(self.cache.devices(), DEVICES_PARSED)
+            for cap in ('pci', 'usb_device'):
+                self.assertEqual(
+                    self.cache.devices([cap]),
+                    dict((name, dev['params']) for name, dev
+                         in DEVICES_BY_CAPS[cap].iteritems()))
+            self.assertEqual(self.cache.get('usb_1_1'),
+                             DEVICES_PARSED['usb_1_1'])
+            self.assertEqual(self.cache.get('no_such_device'), None)
+            self.assertEqual(self.cache.children('usb_1_1'),
+                             set(['usb_1_1_4']))
+
+    def testParseOnce(self):
+        with self.patch(None):
+            self.cache.devices()
+            self.cache.devices(['pci'])
+            self.cache.get('usb_1_1')
+        self.assertEqual(len(self.conn.xml_calls), len(DEVICES_PARSED))
+
+    def testRescanAddsAndRemoves(self):
+        with self.patch(None):
+            self.cache.devices()
+            del self.conn.xml_calls[:]
+            del self.conn.devices['usb_1_1_4']
+            self.conn.add(_SRIOV_VF_XML)
+            devices = self.cache.devices()
+            self.assertEqual(self.cache.children('usb_1_1'), set())
+        self.assertEqual(self.conn.xml_calls, ['pci_0000_05_10_7'])
+        self.assertNotIn('usb_1_1_4', devices)
+        self.assertEqual(devices['pci_0000_05_10_7'], _SRIOV_VF_PARSED)
+
+    def testEvents(self):
+        with self.patch(_LIFECYCLE_EVENT):
+            self.cache.devices()
+            self.assertNotEqual(self.conn.callback, None)
+            del self.conn.xml_calls[:]
+
+            # Without events, the devices are not listed again
+            vf = self.conn.add(_SRIOV_VF_XML)
+            self.assertNotIn('pci_0000_05_10_7', self.cache.devices())
+
+            self.conn.callback(self.conn, vf, _CREATED_EVENT, 0, None)
+            removed = self.conn.devices.pop('usb_1_1_4')
+            self.conn.callback(self.conn, removed, _DELETED_EVENT, 0, None)
+            devices = self.cache.devices()
+
+        self.assertEqual(self.conn.xml_calls, ['pci_0000_05_10_7'])
+        self.assertEqual(devices['pci_0000_05_10_7'], _SRIOV_VF_PARSED)
+        self.assertNotIn('usb_1_1_4', devices)
+
+    def testEventOnRemovedDevice(self):
+        with self.patch(_LIFECYCLE_EVENT):
+            self.cache.devices()
+            removed = self.conn.devices.pop('usb_1_1_4')
+            self.conn.callback(self.conn, removed, _CREATED_EVENT, 0, None)
+            self.assertNotIn('usb_1_1_4', self.cache.devices())
+
+    def testNewConnection(self):
+        with self.patch(None):
+            self.cache.devices()
+            self.conn = CountingConnection(_ALL_DEVICES_XML[:1])
+            self.assertEqual(len(self.cache.devices()), 1)
+
+
+def _vf_xml(index):
+    return _SRIOV_VF_XML.replace(
+        'pci_0000_05_10_7', 'pci_0000_05_%02x_%d' % (index / 8, index % 8))
+
+
+class DeviceCacheBenchmark(TestCaseBase):
+
+    DEVICES = 5000
+
+    @slowtest
+    def testListByCaps(self):
+        conn = CountingConnection(_vf_xml(i) for i in range(self.DEVICES))
+        self.assertEqual(len(conn.devices), self.DEVICES)
+        with MonkeyPatchScope([
+            (libvirtconnection, 'get', lambda: conn),
+            (hostdev, '_sriov_totalvfs', _fake_totalvfs),
+            (hostdev, '_LIFECYCLE_EVENT', None),
+            (hostdev, '_device_cache', hostdev._DeviceCache()),
+            (hooks, 'after_hostdev_list_by_caps', lambda json: json),
+        ]):
+            start = time.time()
+            hostdev.list_by_caps(['pci'])
+            first = time.time() - start
+
+            start = time.time()
+            for i in range(10):
+                devices = hostdev.list_by_caps(['pci'])
+            cached = (time.time() - start) / 10
+
+        self.assertEqual(len(devices), self.DEVICES)
+        self.assertEqual(len(conn.xml_calls), self.DEVICES)
+        logging.info("Listing %d devices: %.3f seconds uncached, %.3f "
+                     "seconds cached", self.DEVICES, first, cached)
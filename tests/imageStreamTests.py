@@ -0,0 +1,255 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import logging
+import os
+import socket
+import threading
+import time
+from StringIO import StringIO
+
+from monkeypatch import MonkeyPatchScope
+from testlib import VdsmTestCase
+from testlib import temporaryPath
+from testValidation import slowtest
+
+from vdsm import constants
+from vdsm import utils
+from storage import imageStream
+from storage import storage_exception as se
+
+MB = constants.MEGAB
+GB = 1024 * MB
+
+
+def writeExtents(path, size, extents):
+    """
+    Create a sparse file of size bytes at path, writing data at the given
+    (offset, data) extents.
+    """
+    with open(path, "wb") as f:
+        f.truncate(size)
+        for offset, data in extents:
+            f.seek(offset)
+            f.write(data)
+
+
+def allocated(path):
+    return os.stat(path).st_blocks * 512
+
+
+class ProgressTests(VdsmTestCase):
+
+    def test_report_interval(self):
+        now = [0]
+        reports = []
+        p = imageStream.Progress(100, lambda *a: reports.append(a),
+                                 interval=1, clock=lambda: now[0])
+        now[0] = 0.5
+        p.update(10)
+        self.assertEqual(reports, [])
+        now[0] = 1
+        p.update(10)
+        self.assertEqual(reports, [(20, 100, 20)])
+
+    def test_report_done(self):
+        reports = []
+        p = imageStream.Progress(100, lambda *a: reports.append(a),
+                                 interval=3600)
+        p.update(100)
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0][:2], (100, 100))
+
+
+class DataExtentsTests(VdsmTestCase):
+
+    def test_sparse(self):
+        with temporaryPath() as path:
+            writeExtents(path, 8 * MB, [(4 * MB, "x" * MB)])
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                extents = list(imageStream.dataExtents(fd, 0, 8 * MB))
+            finally:
+                os.close(fd)
+        # File systems without SEEK_DATA support report everything as data
+        self.assertEqual(sum(length for _, length, _ in extents), 8 * MB)
+        for offset, length, isData in extents:
+            if offset <= 4 * MB < offset + length:
+                self.assertTrue(isData)
+
+    def test_empty(self):
+        with temporaryPath() as path:
+            writeExtents(path, 8 * MB, [])
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                extents = list(imageStream.dataExtents(fd, 0, 8 * MB))
+            finally:
+                os.close(fd)
+        self.assertEqual(sum(length for _, length, _ in extents), 8 * MB)
+
+
+class CopyFromImageTests(VdsmTestCase):
+
+    def test_sparse_to_stream(self):
+        data = [(0, "a" * 4096), (9 * MB + 17, "b" * (3 * MB))]
+        size = 20 * MB
+        with temporaryPath() as path:
+            writeExtents(path, size, data)
+            with open(path, "rb") as f:
+                expected = f.read()
+            out = StringIO()
+            imageStream.copyFromImage(path, out, size)
+        self.assertEqual(out.getvalue(), expected)
+
+    def test_sparse_to_file(self):
+        data = [(MB, "a" * MB), (11 * MB, "b" * 4096)]
+        size = 16 * MB
+        with temporaryPath() as src:
+            writeExtents(src, size, data)
+            with open(src, "rb") as f:
+                expected = f.read()
+            with temporaryPath() as dst:
+                with open(dst, "wb") as out:
+                    imageStream.copyFromImage(src, out, size)
+                with open(dst, "rb") as f:
+                    self.assertEqual(f.read(), expected)
+
+    def test_sparse_to_socket(self):
+        data = [(0, "a" * 4096), (5 * MB, "b" * MB)]
+        size = 8 * MB
+        received = []
+
+        def receive(sock):
+            while True:
+                chunk = sock.recv(MB)
+                if not chunk:
+                    break
+                received.append(chunk)
+
+        def sendfile(*args):
+            raise AssertionError("sendfile used on a socket")
+
+        with temporaryPath() as path:
+            writeExtents(path, size, data)
+            with open(path, "rb") as f:
+                expected = f.read()
+            a, b = socket.socketpair()
+            t = threading.Thread(target=receive, args=(b,))
+            t.daemon = True
+            t.start()
+            try:
+                out = a.makefile("wb")
+                with MonkeyPatchScope([(imageStream, "_sendfile", sendfile)]):
+                    imageStream.copyFromImage(path, out, size)
+                out.close()
+                a.shutdown(socket.SHUT_WR)
+                t.join()
+            finally:
+                a.close()
+                b.close()
+        self.assertEqual("".join(received), expected)
+
+    def test_progress(self):
+        reports = []
+        size = 10 * MB
+        with temporaryPath() as path:
+            writeExtents(path, size, [(MB, "x" * MB)])
+            progress = imageStream.Progress(
+                size, lambda *a: reports.append(a), interval=0)
+            imageStream.copyFromImage(path, StringIO(), size, progress)
+        self.assertEqual(progress.done, size)
+        self.assertEqual(reports[-1][:2], (size, size))
+
+    def test_stop(self):
+        with temporaryPath() as path:
+            writeExtents(path, 10 * MB, [(0, "x" * MB)])
+            self.assertRaises(utils.ActionStopped,
+                              imageStream.copyFromImage, path, StringIO(),
+                              10 * MB, stop=lambda: True)
+
+
+class CopyToImageTests(VdsmTestCase):
+
+    def test_copy(self):
+        data = "".join(("a" * MB, "\0" * 5 * MB, "b" * 100, "\0" * 1000))
+        with temporaryPath(data="old content " * 1000000) as path:
+            imageStream.copyToImage(path, StringIO(data), len(data))
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_skip_zeros(self):
+        size = 64 * MB
+        data = "x" * MB + "\0" * (size - MB)
+        with temporaryPath() as path:
+            imageStream.copyToImage(path, StringIO(data), size)
+            self.assertEqual(os.path.getsize(path), size)
+            self.assertTrue(allocated(path) < 8 * MB)
+
+    def test_keep_preallocated(self):
+        size = 16 * MB
+        data = "\0" * (size - MB) + "x" * MB
+        with temporaryPath(data="y" * size) as path:
+            imageStream.copyToImage(path, StringIO(data), size)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+            self.assertTrue(allocated(path) >= size)
+
+    def test_partial_data(self):
+        with temporaryPath() as path:
+            self.assertRaises(se.MiscFileReadException,
+                              imageStream.copyToImage, path,
+                              StringIO("x" * 100), 200)
+
+
+class SparseImageBenchmark(VdsmTestCase):
+
+    SIZE = 100 * GB
+
+    @slowtest
+    def test_upload_mostly_empty(self):
+        extents = [(i * 10 * GB, "x" * MB) for i in range(10)]
+        with temporaryPath() as path:
+            writeExtents(path, self.SIZE, extents)
+            with open("/dev/null", "wb") as out:
+                start = time.time()
+                imageStream.copyFromImage(path, out, self.SIZE)
+                elapsed = time.time() - start
+        logging.info("uploaded %d bytes sparse image in %.2f seconds "
+                     "(%.2f GiB/s)", self.SIZE, elapsed,
+                     self.SIZE / elapsed / GB)
+
+    @slowtest
+    def test_download_mostly_empty(self):
+        # Reading 100 GiB from the stream is dominated by the stream itself;
+        # measure a 4 GiB download of zeros and check nothing is allocated.
+        size = 4 * GB
+
+        class ZeroStream(object):
+            def read(self, n):
+                return imageStream._ZEROS[:n]
+
+        with temporaryPath() as path:
+            start = time.time()
+            imageStream.copyToImage(path, ZeroStream(), size)
+            elapsed = time.time() - start
+            self.assertEqual(os.path.getsize(path), size)
+            self.assertEqual(allocated(path), 0)
+        logging.info("downloaded %d bytes of zeros in %.2f seconds "
+                     "(%.2f GiB/s)", size, elapsed, size / elapsed / GB)
@@ -18,10 +18,18 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
+from nose.plugins.skip import SkipTest
+
+from monkeypatch import Patch
 from testValidation import ValidateRunningAsRoot
 from vdsm import ipwrapper
 from vdsm.ipwrapper import Route
 from vdsm.ipwrapper import Rule
+from vdsm.netlink import addr as netlink_addr
+from vdsm.netlink import link as netlink_link
+from vdsm.netlink import route as netlink_route
+from vdsm.netlink import rule as netlink_rule
+from vdsm.utils import random_iface_name
 import tcTests
 
 from testlib import VdsmTestCase as TestCaseBase
@@ -141,3 +149,168 @@ class TestDrvinfo(TestCaseBase):
         ipwrapper.getLink(self._bridge.devName).promisc = False
         self.assertFalse(ipwrapper.getLink(self._bridge.devName).promisc,
                          "Could not disable promiscuous mode.")
+
+
+_calls = []
+
+
+def _recorder(name):
+    def record(*args, **kwargs):
+        _calls.append((name, args, kwargs))
+    return record
+
+
+class TestNetlinkArgs(TestCaseBase):
+
+    def setUp(self):
+        del _calls[:]
+        self.patch = Patch([
+            (ipwrapper, '_linkIndex', lambda dev: 7),
+            (ipwrapper, '_execCmd', _recorder('ip')),
+            (netlink_route, 'add_route', _recorder('add_route')),
+            (netlink_route, 'del_route', _recorder('del_route')),
+            (netlink_rule, 'add_rule', _recorder('add_rule')),
+            (netlink_rule, 'del_rule', _recorder('del_rule')),
+            (netlink_addr, 'add_address', _recorder('add_address')),
+            (netlink_addr, 'flush_addresses', _recorder('flush_addresses')),
+            (netlink_link, 'set_link', _recorder('set_link'))])
+        self.patch.apply()
+
+    def tearDown(self):
+        self.patch.revert()
+
+    def testRouteAdd(self):
+        ipwrapper.routeAdd(Route('10.0.0.0/24', via='10.0.1.1', src='10.0.1.2',
+                                 device='eth0', table='100'))
+        self.assertEqual(_calls, [('add_route', (), {
+            'destination': '10.0.0.0/24', 'gateway': '10.0.1.1',
+            'source': '10.0.1.2', 'index': 7, 'table': 100})])
+
+    def testDefaultRoute(self):
+        ipwrapper.routeAdd(['default', 'via', '2001::1'], dev='eth0',
+                           family=6)
+        ipwrapper.routeDel(['default', 'via', '10.0.0.1'])
+        self.assertEqual(_calls, [
+            ('add_route', (), {'destination': '::/0', 'gateway': '2001::1',
+                               'source': None, 'index': 7, 'table': 254}),
+            ('del_route', (), {'destination': '0.0.0.0/0',
+                               'gateway': '10.0.0.1', 'source': None,
+                               'index': 0, 'table': 254})])
+
+    def testRouteFallback(self):
+        ipwrapper.routeAdd(['10.0.0.0/24', 'via', '10.0.1.1', 'table', 'foo'])
+        ipwrapper.routeAdd(['10.0.0.0/24', 'dev', 'eth0', 'metric', '10'])
+        self.assertEqual([name for name, _, _ in _calls], ['ip', 'ip'])
+
+    def testRule(self):
+        ipwrapper.ruleAdd(Rule('100', source='10.0.0.0/24'))
+        ipwrapper.ruleDel(Rule('main', destination='10.0.0.0/24',
+                               srcDevice='eth0'))
+        self.assertEqual(_calls, [
+            ('add_rule', (), {'table': 100, 'source': '10.0.0.0/24',
+                              'destination': None, 'iif': None}),
+            ('del_rule', (), {'table': 254, 'source': None,
+                              'destination': '10.0.0.0/24', 'iif': 'eth0'})])
+
+    def testAddr(self):
+        ipwrapper.addrAdd('eth0', '10.0.0.1', '255.255.255.0')
+        ipwrapper.addrAdd('eth0', '2001::1', '64', family=6)
+        ipwrapper.addrFlush('eth0', 4)
+        ipwrapper.addrFlush('eth0')
+        self.assertEqual(_calls, [
+            ('add_address', (7, '10.0.0.1/24', 2), {}),
+            ('add_address', (7, '2001::1/64', 10), {}),
+            ('flush_addresses', (7, 2), {}),
+            ('flush_addresses', (7, 0), {})])
+
+    def testLinkSet(self):
+        ipwrapper.linkSet('eth0', ['up', 'mtu', '9000'])
+        ipwrapper.linkSet('eth0', ['down', 'master', 'br0'])
+        ipwrapper.linkSet('eth0', ['nomaster'])
+        ipwrapper.linkSet('eth0', ['promisc', 'on'])
+        self.assertEqual(_calls, [
+            ('set_link', ('eth0',), {'up': True, 'mtu': 9000}),
+            ('set_link', ('eth0',), {'up': False, 'master': 'br0'}),
+            ('set_link', ('eth0',), {'master': ''}),
+            ('ip', ([ipwrapper._IP_BINARY.cmd, 'link', 'set', 'dev', 'eth0',
+                     'promisc', 'on'],), {})])
+
+
+class TestNetlinkOperations(TestCaseBase):
+
+    @ValidateRunningAsRoot
+    def setUp(self):
+        self.dummy = random_iface_name('dummy_')
+        try:
+            ipwrapper.linkAdd(self.dummy, linkType='dummy')
+        except ipwrapper.IPRoute2Error as e:
+            raise SkipTest('Failed to create a dummy interface: %s' % e)
+
+    def tearDown(self):
+        ipwrapper.linkDel(self.dummy)
+
+    def _addresses(self):
+        return [(addr['address'], addr['prefixlen'])
+                for addr in netlink_addr.iter_addrs()
+                if addr.get('label') == self.dummy and
+                addr['scope'] == 'global']
+
+    def testLinkSet(self):
+        ipwrapper.linkSet(self.dummy, ['up', 'mtu', '1400'])
+        link = ipwrapper.getLink(self.dummy)
+        self.assertEqual(link.mtu, 1400)
+        self.assertTrue(link.flags & 1)
+        ipwrapper.linkSet(self.dummy, ['down'])
+        self.assertFalse(ipwrapper.getLink(self.dummy).flags & 1)
+
+    def testNetlinkError(self):
+        self.assertRaises(ipwrapper.IPRoute2Error, ipwrapper.linkSet,
+                          random_iface_name(), ['up'])
+
+    def testMaster(self):
+        left = random_iface_name('veth_', 15)
+        right = random_iface_name('veth_', 15)
+        try:
+            ipwrapper.linkAdd(left, linkType='veth',
+                              args=('peer', 'name', right))
+        except ipwrapper.IPRoute2Error as e:
+            raise SkipTest('Failed to create a veth interface: %s' % e)
+        try:
+            ipwrapper.linkSet(left, ['master', self.dummy])
+        except ipwrapper.IPRoute2Error:
+            # dummy devices cannot be masters, the error must be reported
+            pass
+        else:
+            raise AssertionError('Enslaving to a dummy device succeeded')
+        finally:
+            ipwrapper.linkDel(left)
+
+    def testAddrAddFlush(self):
+        with ipwrapper.batch():
+            ipwrapper.addrAdd(self.dummy, '192.0.2.1', '255.255.255.0')
+            ipwrapper.addrAdd(self.dummy, '198.51.100.1', '25')
+        self.assertEqual(sorted(self._addresses()),
+                         [('192.0.2.1', 24), ('198.51.100.1', 25)])
+        ipwrapper.addrFlush(self.dummy)
+        self.assertEqual(self._addresses(), [])
+
+    def testSourceRoute(self):
+        ipwrapper.linkSet(self.dummy, ['up'])
+        ipwrapper.addrAdd(self.dummy, '192.0.2.1', '24')
+        route = Route('0.0.0.0/0', via='192.0.2.254', device=self.dummy,
+                      table='3221225985')
+        rule = Rule('3221225985', source='192.0.2.0/24')
+        with ipwrapper.batch():
+            ipwrapper.routeAdd(route)
+            ipwrapper.ruleAdd(rule)
+        try:
+            self.assertTrue(ipwrapper.routeExists(route))
+            self.assertTrue(ipwrapper.ruleExists(rule))
+            self.assertRaises(ipwrapper.IPRoute2Error, ipwrapper.routeAdd,
+                              route)
+        finally:
+            with ipwrapper.batch():
+                ipwrapper.routeDel(route)
+                ipwrapper.ruleDel(rule)
+        self.assertFalse(ipwrapper.routeExists(route))
+        self.assertFalse(ipwrapper.ruleExists(rule))
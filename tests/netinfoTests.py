@@ -23,6 +23,8 @@ import os
 from datetime import datetime
 from functools import partial
 import io
+import errno
+import logging
 import time
 
 from vdsm import ipwrapper
@@ -36,6 +38,7 @@ from ipwrapperTests import _fakeTypeDetection
 from monkeypatch import MonkeyPatch, MonkeyPatchScope
 from testlib import VdsmTestCase as TestCaseBase, namedTemporaryDir
 from testValidation import ValidateRunningAsRoot, RequireBondingMod
+from testValidation import slowtest
 
 # speeds defined in ethtool
 ETHTOOL_SPEEDS = set([10, 100, 1000, 2500, 10000])
@@ -335,3 +338,143 @@ class TestNetinfo(TestCaseBase):
         self.assertEqual(gateway, '12.34.56.1')
         gateway = netinfo._get_gateway(DUPLICATED_GATEWAY, TEST_IFACE)
         self.assertEqual(gateway, '12.34.56.1')
+
+
+class FakeLink(object):
+    def __init__(self, name, master=None):
+        self.name = name
+        self.master = master
+
+
+class NetInfoModelTests(TestCaseBase):
+
+    def setUp(self):
+        self.links = {'eth0': FakeLink('eth0', master='br0'),
+                      'br0': FakeLink('br0'),
+                      'eth1': FakeLink('eth1')}
+        self.lookups = []
+        self.model = netinfo.NetInfoModel()
+        self.patch = MonkeyPatchScope([
+            (netinfo, 'permAddr', lambda: {}),
+            (netinfo, '_getIpAddrs', lambda: {}),
+            (netinfo, '_get_dhclient_ifaces', lambda: (set(), set())),
+            (netinfo, '_get_routes', lambda: {}),
+            (netinfo, 'networks', lambda: {}),
+            (netinfo, 'getLinks', self.getLinks),
+            (netinfo, 'getLink', self.getLink),
+            (netinfo, '_linkinfo', self.linkinfo),
+        ])
+        self.patch.__enter__()
+
+    def tearDown(self):
+        self.patch.__exit__(None, None, None)
+
+    def getLinks(self):
+        self.lookups.append('all')
+        return self.links.values()
+
+    def getLink(self, name):
+        self.lookups.append(name)
+        try:
+            return self.links[name]
+        except KeyError:
+            raise IOError(errno.ENODEV, 'no such link')
+
+    def linkinfo(self, dev, *args):
+        section = 'bridges' if dev.name.startswith('br') else 'nics'
+        return section, {'master': dev.master}
+
+    def testBuildOnce(self):
+        info = self.model.get()
+        self.assertEqual(sorted(info['nics']), ['eth0', 'eth1'])
+        self.assertEqual(sorted(info['bridges']), ['br0'])
+        self.model.get()
+        self.assertEqual(self.lookups, ['all'])
+
+    def testLinkEvent(self):
+        self.model.get()
+        self.model.handleEvent({'event': 'new_link', 'name': 'eth1',
+                                'master': 'br0'})
+        self.links['eth1'].master = 'br0'
+        info = self.model.get()
+        self.assertEqual(sorted(self.lookups[1:]), ['br0', 'eth1'])
+        self.assertEqual(info['nics']['eth1']['master'], 'br0')
+
+    def testReleasedFromMaster(self):
+        self.model.get()
+        self.model.handleEvent({'event': 'new_link', 'name': 'eth0'})
+        self.model.get()
+        self.assertEqual(sorted(self.lookups[1:]), ['br0', 'eth0'])
+
+    def testAddressAndRouteEvents(self):
+        self.model.get()
+        self.model.handleEvent({'event': 'new_addr', 'label': 'eth1'})
+        self.model.handleEvent({'event': 'new_route', 'oif': 'br0'})
+        self.model.get()
+        self.assertEqual(sorted(self.lookups[1:]), ['br0', 'eth1'])
+
+    def testRemovedLink(self):
+        self.model.get()
+        del self.links['eth1']
+        self.model.handleEvent({'event': 'del_link', 'name': 'eth1'})
+        self.assertNotIn('eth1', self.model.get()['nics'])
+
+    def testUnknownDevice(self):
+        self.model.get()
+        self.model.handleEvent({'event': 'new_route'})
+        self.model.get()
+        self.assertEqual(self.lookups, ['all', 'all'])
+
+    def testInvalidate(self):
+        self.model.get()
+        self.model.invalidate()
+        self.model.get()
+        self.assertEqual(self.lookups, ['all', 'all'])
+
+    def testReturnsCopy(self):
+        self.model.get()['nics']['eth0']['master'] = 'modified'
+        self.assertEqual(self.model.get()['nics']['eth0']['master'], 'br0')
+
+    def testGeneration(self):
+        generation = self.model.generation
+        self.model.get()
+        self.assertEqual(self.model.generation, generation)
+        self.model.handleEvent({'event': 'new_link', 'name': 'eth1'})
+        self.assertTrue(self.model.generation > generation)
+        generation = self.model.generation
+        self.model.invalidate()
+        self.assertTrue(self.model.generation > generation)
+
+
+class NetInfoModelBenchmark(TestCaseBase):
+
+    VLANS = 500
+
+    @slowtest
+    @ValidateRunningAsRoot
+    def testManyVlans(self):
+        nic = dummy.create()
+        try:
+            for tag in range(1, self.VLANS + 1):
+                ipwrapper.linkAdd('%s.%d' % (nic, tag), 'vlan', link=nic,
+                                  args=['id', str(tag)])
+            start = time.time()
+            netinfo._get()
+            uncached = time.time() - start
+
+            model = netinfo.NetInfoModel()
+            model.start()
+            try:
+                model.get()
+                start = time.time()
+                info = model.get()
+                cached = time.time() - start
+            finally:
+                model.stop()
+            self.assertEqual(
+                len([v for v in info['vlans'] if v.startswith(nic)]),
+                self.VLANS)
+        finally:
+            dummy.remove(nic)
+        logging.info("netinfo with %d vlans: %.3f seconds, from the model: "
+                     "%.3f seconds", self.VLANS, uncached, cached)
@@ -19,7 +19,7 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
-import xml.etree.cElementTree as ET
+import os
 
 from testlib import VdsmTestCase as TestCaseBase
 from monkeypatch import MonkeyPatch
@@ -31,31 +31,8 @@ import numaUtils
 import vmfakelib as fake
 
 
-_VM_RUN_FILE_CONTENT = """
-    <domstatus state='running' reason='booted' pid='12262'>
-      <monitor path='/var/lib/libvirt/qemu/testvm.monitor'
-               json='1' type='unix'/>
-        <vcpus>
-          <vcpu pid='12266'/>
-          <vcpu pid='12267'/>
-          <vcpu pid='12268'/>
-          <vcpu pid='12269'/>
-        </vcpus>
-    </domstatus>"""
-
-
 class TestNumaUtils(TestCaseBase):
 
-    @MonkeyPatch(ET, 'parse',
-                 lambda x: ET.fromstring(_VM_RUN_FILE_CONTENT))
-    def testVcpuPid(self):
-        vcpuPids = numaUtils.getVcpuPid('testvm')
-        expectedVcpuPids = {0: '12266',
-                            1: '12267',
-                            2: '12268',
-                            3: '12269'}
-        self.assertEqual(vcpuPids, expectedVcpuPids)
-
     @MonkeyPatch(numaUtils, 'supervdsm', fake.SuperVdsm())
     @MonkeyPatch(caps,
                  'getNumaTopology',
@@ -81,3 +58,66 @@ class TestNumaUtils(TestCaseBase):
                                   lambda vm: sample)]):
                 vm_numa_info = numaUtils.getVmNumaNodeRuntimeInfo(testvm)
                 self.assertEqual(expectedResult, vm_numa_info)
+
+
+_NUMA_TOPOLOGY = {'0': {'cpus': [0, 1, 2, 3], 'totalMemory': '49141'},
+                  '1': {'cpus': [4, 5, 6, 7], 'totalMemory': '49141'}}
+
+_GUEST_NUMA_NODES = {'guestNumaNodes': [{'cpus': '0,1', 'memory': '1024',
+                                         'nodeIndex': 0},
+                                        {'cpus': '2,3', 'memory': '1024',
+                                         'nodeIndex': 1}]}
+
+
+class TestNumaSampler(TestCaseBase):
+
+    def setUp(self):
+        self.vnodeMappings = 0
+        self.orig_get_mapping_vcpu_to_vnode = \
+            numaUtils._get_mapping_vcpu_to_vnode
+
+    def _get_mapping_vcpu_to_vnode(self, vm):
+        self.vnodeMappings += 1
+        return self.orig_get_mapping_vcpu_to_vnode(vm)
+
+    def sample(self, sampler, positioning):
+        with MonkeyPatchScope([
+            (numaUtils, 'supervdsm', fake.SuperVdsm()),
+            (caps, 'getNumaTopology', lambda: _NUMA_TOPOLOGY),
+            (numaUtils, '_get_vcpu_positioning', lambda vm: positioning),
+            (numaUtils, '_get_mapping_vcpu_to_vnode',
+             self._get_mapping_vcpu_to_vnode),
+        ]):
+            return sampler.sample()
+
+    def testCachedVnodeMapping(self):
+        positioning = [(0, 1, 0L, 4), (2, 1, 0L, 0)]
+        with fake.VM(_GUEST_NUMA_NODES) as testvm:
+            sampler = numaUtils.NumaSampler(testvm)
+            for i in range(3):
+                result = self.sample(sampler, positioning)
+        self.assertEqual(result, {'0': [0, 1], '1': [0, 1]})
+        self.assertEqual(self.vnodeMappings, 1)
+
+    def testHotpluggedVcpu(self):
+        positioning = [(0, 1, 0L, 0), (4, 1, 0L, 4)]
+        with fake.VM(_GUEST_NUMA_NODES) as testvm:
+            sampler = numaUtils.NumaSampler(testvm)
+            self.assertEqual(self.sample(sampler, positioning),
+                             {'0': [0, 1]})
+            sampler.invalidate()
+            self.sample(sampler, positioning)
+        self.assertEqual(self.vnodeMappings, 2)
+
+    def testNotRunning(self):
+        with fake.VM(_GUEST_NUMA_NODES) as testvm:
+            sampler = numaUtils.NumaSampler(testvm)
+            self.assertEqual(self.sample(sampler, None), {})
+
+
+class TestMemoryNodes(TestCaseBase):
+
+    def testCurrentProcess(self):
+        nodes = numaUtils.getMemoryNodes(os.getpid())
+        self.assertTrue(len(nodes) > 0)
+        self.assertTrue(all(isinstance(node, int) for node in nodes))
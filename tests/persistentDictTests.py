@@ -17,7 +17,12 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
+import logging
+import time
+import uuid
+
 from testlib import VdsmTestCase as TestCaseBase
+from testValidation import slowtest
 import storage.persistentDict as persistentDict
 
 
@@ -75,3 +80,107 @@ class PersistentDictTests(TestCaseBase):
             return
 
         self.fail("Exception was not thrown")
+
+
+class CountingWriter(DummyWriter):
+    def __init__(self):
+        DummyWriter.__init__(self)
+        self.reads = 0
+
+    def readlines(self):
+        self.reads += 1
+        return DummyWriter.readlines(self)
+
+
+class RefreshTests(TestCaseBase):
+
+    def setUp(self):
+        persistentDict.stats.reset()
+
+    def testRefreshUnchanged(self):
+        pd = persistentDict.PersistentDict(CountingWriter())
+        pd.update({"a": "1", "b": "2"})
+        pd.invalidate()
+        self.assertEqual(pd["a"], "1")
+        self.assertEqual(pd._metaRW.reads, 2)
+        self.assertEqual(persistentDict.stats.hits, 1)
+
+    def testRefreshChanged(self):
+        writer = CountingWriter()
+        pd = persistentDict.PersistentDict(writer)
+        pd.update({"a": "1"})
+        other = persistentDict.PersistentDict(writer)
+        other["a"] = "2"
+        pd.invalidate()
+        self.assertEqual(pd["a"], "2")
+
+    def testRefreshBrokenSeal(self):
+        writer = CountingWriter()
+        pd = persistentDict.PersistentDict(writer)
+        pd.update({"a": "1"})
+        writer.lines[0] = "a=2"
+        pd.invalidate()
+        self.assertRaises(persistentDict.se.MetaDataSealIsBroken,
+                          pd.get, "a")
+
+    def testRefreshAfterModification(self):
+        pd = persistentDict.PersistentDict(CountingWriter())
+        pd.update({"a": "1"})
+        # Modify the dict without flushing, as done in a failed transaction
+        pd._metadata["a"] = "2"
+        pd.invalidate()
+        self.assertEqual(pd["a"], "1")
+
+
+class RefreshBenchmark(TestCaseBase):
+
+    DOMAINS = 50
+    ROUNDS = 100
+
+    def setUp(self):
+        self.domains = []
+        for i in range(self.DOMAINS):
+            pd = persistentDict.PersistentDict(DummyWriter())
+            pd.update({
+                "CLASS": "Data",
+                "DESCRIPTION": "domain-%d" % i,
+                "IOOPTIMEOUTSEC": "10",
+                "LEASERETRIES": "3",
+                "LEASETIMESEC": "60",
+                "LOCKPOLICY": "",
+                "LOCKRENEWALINTERVALSEC": "5",
+                "POOL_UUID": str(uuid.uuid4()),
+                "ROLE": "Regular",
+                "SDUUID": str(uuid.uuid4()),
+                "TYPE": "NFS",
+                "VERSION": "3",
+            })
+            self.domains.append(pd)
+        self.pool = persistentDict.PersistentDict(DummyWriter())
+        self.pool.update({
+            "POOL_DESCRIPTION": "pool",
+            "POOL_DOMAINS": ",".join("%s:Active" % uuid.uuid4()
+                                     for i in range(self.DOMAINS)),
+            "POOL_SPM_ID": "1",
+            "POOL_SPM_LVER": "0",
+        })
+
+    def refreshAll(self, forget):
+        start = time.time()
+        for i in range(self.ROUNDS):
+            for pd in self.domains + [self.pool]:
+                if forget:
+                    pd._lines = None
+                pd.invalidate()
+                pd.get("VERSION")
+        return time.time() - start
+
+    @slowtest
+    def testRefreshPool(self):
+        persistentDict.stats.reset()
+        cached = self.refreshAll(False)
+        self.assertEqual(persistentDict.stats.hitRate, 1.0)
+        uncached = self.refreshAll(True)
+        logging.info("refreshing %d domains %d times: %.3f seconds, "
+                     "without change detection: %.3f seconds",
+                     self.DOMAINS, self.ROUNDS, cached, uncached)
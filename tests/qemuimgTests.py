@@ -18,6 +18,9 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import os
+import subprocess
+
 from monkeypatch import MonkeyPatch, MonkeyPatchScope
 from testlib import VdsmTestCase as TestCaseBase
 from vdsm import qemuimg
@@ -256,6 +259,80 @@ class ConvertTests(CommandTests):
                             backing='bak', backingFormat='qcow2')
 
 
+class ConvertProgressTests(CommandTests):
+
+    def test_progress_flag(self):
+        def convert(cmd, cwd, stop, progress):
+            expected = [QEMU_IMG, 'convert', '-t', 'none', '-p', 'src',
+                        'dst']
+            self.assertEqual(cmd, expected)
+            return 0, '', ''
+
+        with MonkeyPatchScope([(qemuimg, '_watchProgress', convert),
+                               (qemuimg, '_supports_src_cache',
+                                self.supported('convert', False))]):
+            qemuimg.convert('src', 'dst', None,
+                            progress=lambda p, written: None)
+
+    def test_watch_progress(self):
+        reports = []
+        cmd = ['sh', '-c', 'printf "    (0.00/100%%)\\r"; '
+                           'printf "    (50.00/100%%)\\r"; '
+                           'printf "    (100.00/100%%)\\r\\n"']
+        rc, out, err = qemuimg._watchProgress(
+            cmd, None, lambda: False,
+            lambda value, written: reports.append(value))
+        self.assertEqual(rc, 0)
+        self.assertEqual(reports[-1], 100.0)
+
+    def test_watch_progress_stop(self):
+        cmd = ['sh', '-c', 'printf "    (1.00/100%%)\\r"; sleep 10']
+        stopped = []
+
+        def progress(value, written):
+            stopped.append(True)
+
+        self.assertRaises(utils.ActionStopped, qemuimg._watchProgress, cmd,
+                          None, lambda: bool(stopped), progress)
+
+
+    def test_bytes_written(self):
+        before = qemuimg._bytesWritten(os.getpid())
+        with open(os.devnull, "w") as f:
+            os.write(f.fileno(), "x" * 4096)
+        self.assertTrue(qemuimg._bytesWritten(os.getpid()) - before >= 4096)
+
+    def test_bytes_written_no_process(self):
+        proc = subprocess.Popen(["true"])
+        proc.wait()
+        self.assertEqual(qemuimg._bytesWritten(proc.pid), None)
+
+
+class ProgressParserTests(TestCaseBase):
+
+    def test_incremental(self):
+        parser = qemuimg.ProgressParser()
+        self.assertFalse(parser.feed("    (0.00/100%)\r    (12."))
+        self.assertEqual(parser.value, 0.0)
+        self.assertTrue(parser.feed("50/100%)\r"))
+        self.assertEqual(parser.value, 12.5)
+
+    def test_last_value(self):
+        parser = qemuimg.ProgressParser()
+        parser.feed("    (1.00/100%)\r    (2.00/100%)\r    (3.00/100%)\r")
+        self.assertEqual(parser.value, 3.0)
+
+    def test_unchanged(self):
+        parser = qemuimg.ProgressParser()
+        self.assertTrue(parser.feed("    (1.00/100%)\r"))
+        self.assertFalse(parser.feed("    (1.00/100%)\r"))
+
+    def test_garbage(self):
+        parser = qemuimg.ProgressParser()
+        self.assertFalse(parser.feed("garbage\r"))
+        self.assertEqual(parser.value, 0.0)
+
+
 def qcow2_compat_supported(cmd, **kw):
     return 0, 'Supported options:\ncompat ...\n', ''
 
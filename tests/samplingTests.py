@@ -29,6 +29,7 @@ import threading
 from vdsm import ipwrapper
 from vdsm import libvirtconnection
 from vdsm import utils
+from vdsm.netlink import link as netlink_link
 import virt.sampling as sampling
 
 from testValidation import brokentest, ValidateRunningAsRoot
@@ -146,8 +147,8 @@ class InterfaceSampleTests(TestCaseBase):
 
     def testDiff(self):
         lo = ipwrapper.getLink('lo')
-        s0 = sampling.InterfaceSample(lo)
-        s1 = sampling.InterfaceSample(lo)
+        s0 = sampling.InterfaceSample.fromLink(lo)
+        s1 = sampling.InterfaceSample.fromLink(lo)
         s1.operstate = 'x'
         self.assertEquals('operstate:x', s1.connlog_diff(s0))
 
@@ -166,21 +167,113 @@ class InterfaceSampleTests(TestCaseBase):
     @MonkeyPatch(libvirtconnection, '_read_password', read_password)
     @ValidateRunningAsRoot
     def testHostSampleHandlesDisappearingVlanInterfaces(self):
-        original_getLinks = ipwrapper.getLinks
+        original_iter_links_stats = netlink_link.iter_links_stats
 
-        def faultyGetLinks():
-            all_links = list(original_getLinks())
+        def faulty_iter_links_stats():
+            all_links = list(original_iter_links_stats())
             ipwrapper.linkDel(self.NEW_VLAN)
             return iter(all_links)
 
         with MonkeyPatchScope(
-                [(ipwrapper, 'getLinks', faultyGetLinks)]):
+                [(netlink_link, 'iter_links_stats',
+                  faulty_iter_links_stats)]):
             with dummy_if() as dummy_name:
                 with vlan(self.NEW_VLAN, dummy_name, 999):
                     hs = sampling.HostSample(os.getpid())
                     self.assertNotIn(self.NEW_VLAN, hs.interfaces)
 
 
+@expandPermutations
+class LinkInfoCacheTests(TestCaseBase):
+
+    def setUp(self):
+        self.cache = sampling.LinkInfoCache()
+        self.lookups = []
+        self.lo = netlink_link.get_link('lo')
+        original_getDuplex = sampling._getDuplex
+
+        def getDuplex(name):
+            self.lookups.append(name)
+            return original_getDuplex(name)
+
+        self.patch = MonkeyPatchScope([(sampling, '_getDuplex', getDuplex)])
+        self.patch.__enter__()
+
+    def tearDown(self):
+        self.patch.__exit__(None, None, None)
+
+    def testNotMonitoring(self):
+        self.cache.get(self.lo)
+        self.cache.get(self.lo)
+        self.assertEqual(self.lookups, ['lo', 'lo'])
+
+    def testCached(self):
+        self.cache.start()
+        try:
+            first = self.cache.get(self.lo)
+            self.assertEqual(self.cache.get(self.lo), first)
+            self.assertEqual(self.lookups, ['lo'])
+        finally:
+            self.cache.stop()
+
+    def testInvalidate(self):
+        self.cache.start()
+        try:
+            self.cache.get(self.lo)
+            self.cache.invalidate('lo')
+            self.cache.get(self.lo)
+            self.assertEqual(self.lookups, ['lo', 'lo'])
+        finally:
+            self.cache.stop()
+
+    @permutations([['bond'], ['vlan']])
+    def testDerivedNotCached(self, linkType):
+        info = dict(self.lo, name='link0', type=linkType)
+        self.cache.start()
+        try:
+            with MonkeyPatchScope([(sampling, '_getLinkSpeed',
+                                    lambda link: 1000)]):
+                self.cache.get(info)
+                self.cache.get(info)
+            self.assertEqual(self.lookups, ['link0', 'link0'])
+        finally:
+            self.cache.stop()
+
+    def testMissingLink(self):
+        info = dict(self.lo, name='no-such-link')
+        info.pop('type', None)
+        self.assertRaises(IOError, self.cache.get, info)
+
+    def testSampleAllLinks(self):
+        samples = sampling._get_interfaces_and_samples()
+        self.assertIn('lo', samples)
+        self.assertEqual(samples['lo'].operstate, 'up')
+
+    def testSampleAfterDump(self):
+        original_iter_links_stats = netlink_link.iter_links_stats
+        dumping = [False]
+
+        def iter_links_stats():
+            dumping[0] = True
+            for info in original_iter_links_stats():
+                yield info
+            dumping[0] = False
+
+        def getLink(name):
+            raise AssertionError('link %s looked up' % name)
+
+        def get(info):
+            self.assertFalse(dumping[0])
+            return 0, 'unknown'
+
+        with MonkeyPatchScope([
+                (netlink_link, 'iter_links_stats', iter_links_stats),
+                (ipwrapper, 'getLink', getLink),
+                (sampling._linkInfoCache, 'get', get)]):
+            samples = sampling._get_interfaces_and_samples()
+        self.assertIn('lo', samples)
+
+
 @expandPermutations
 class SampleWindowTests(TestCaseBase):
     _VALUES = (19, 42, 23)  # throwaway values, no meaning
@@ -271,6 +364,90 @@ class AdvancedStatsFunctionTests(TestCaseBase):
         self.assertEqual(stat.getLastSample(), values[-1])
 
 
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+class EventDrivenStatsFunctionTests(TestCaseBase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.function = Counter()
+
+    def stat(self, reconcile):
+        return sampling.EventDrivenStatsFunction(
+            self.function, interval=1, window=1, reconcile=reconcile,
+            clock=self.clock)
+
+    def test_no_events(self):
+        stat = self.stat(reconcile=None)
+        for i in range(3):
+            stat()
+        self.assertEqual(self.function.calls, 3)
+        self.assertEqual(stat.getLastSample(), 3)
+
+    def test_reconcile(self):
+        stat = self.stat(reconcile=60)
+        stat()
+        self.clock.now = 59
+        self.assertEqual(stat(), 1)
+        self.assertEqual(self.function.calls, 1)
+        self.clock.now = 60
+        self.assertEqual(stat(), 2)
+        self.assertEqual(self.function.calls, 2)
+
+    def test_update(self):
+        stat = self.stat(reconcile=60)
+        stat()
+        stat.update(42)
+        self.assertEqual(stat.getLastSample(), 42)
+        self.assertEqual(stat(), 42)
+        self.assertEqual(self.function.calls, 1)
+
+    def test_invalidate(self):
+        stat = self.stat(reconcile=60)
+        stat()
+        stat.invalidate()
+        self.assertEqual(stat(), 2)
+        stat()
+        self.assertEqual(self.function.calls, 2)
+
+    def test_event_during_call(self):
+        def function():
+            stat.update(42)
+            return 1
+
+        stat = sampling.EventDrivenStatsFunction(
+            function, interval=1, window=1, reconcile=60, clock=self.clock)
+        stat()
+        self.assertEqual(stat.getLastSample(), 42)
+
+    def test_failed_call(self):
+        def function():
+            raise RuntimeError("libvirt error")
+
+        stat = sampling.EventDrivenStatsFunction(
+            function, interval=1, window=1, reconcile=60, clock=self.clock)
+        self.assertRaises(RuntimeError, stat)
+        # Called again on the next interval
+        self.assertRaises(RuntimeError, stat)
+
+
 class HostStatsThread(TestCaseBase):
     FAILED_SAMPLE = 3  # random 'small' value
     STOP_SAMPLE = 6  # ditto
@@ -41,3 +41,50 @@ class FrozenStatusTests(VdsmTestCase):
     def test_deleting_attribute_raises(self):
         for name in self.status.__slots__:
             self.assertRaises(AssertionError, delattr, self.frozen, name)
+
+
+class FakeDomain(object):
+
+    def __init__(self):
+        self.acquired = []
+
+    def acquireHostId(self, hostId, async=False):
+        self.acquired.append(hostId)
+
+
+class LockspaceAddTimeTests(VdsmTestCase):
+
+    def setUp(self):
+        self.monitor = monitor.MonitorThread(None, "sd", 1, 10)
+        self.monitor.domain = FakeDomain()
+
+    def test_not_acquired(self):
+        self.monitor._checkLockspaceAdded()
+        self.assertIsNone(self.monitor.lockspaceAddTime)
+
+    def test_acquired(self):
+        self.monitor._acquireHostId()
+        self.assertEquals(self.monitor.domain.acquired, [1])
+        self.assertIsNone(self.monitor.lockspaceAddTime)
+        self.monitor._checkLockspaceAdded()
+        self.assertTrue(self.monitor.lockspaceAddTime >= 0)
+
+    def test_measured_from_first_acquire(self):
+        self.monitor._acquireHostId()
+        started = self.monitor.acquireStarted
+        self.monitor._acquireHostId()
+        self.assertEquals(self.monitor.acquireStarted, started)
+
+    def test_measured_once(self):
+        self.monitor._acquireHostId()
+        self.monitor._checkLockspaceAdded()
+        elapsed = self.monitor.lockspaceAddTime
+        self.monitor._checkLockspaceAdded()
+        self.assertEquals(self.monitor.lockspaceAddTime, elapsed)
+
+
+class DomainMonitorLockspaceTests(VdsmTestCase):
+
+    def test_unknown_domain(self):
+        domainMonitor = monitor.DomainMonitor(10)
+        self.assertIsNone(domainMonitor.getLockspaceAddTime("sd"))
@@ -0,0 +1,98 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import threading
+import time
+
+from testlib import VdsmTestCase
+from vdsm.concurrent import BoundedPool
+
+from storage import sp
+from storage import storage_exception as se
+
+
+class ProduceDomainsTests(VdsmTestCase):
+
+    def test_produce_all(self):
+        results = sp.produceDomains(lambda sdUUID: sdUUID.upper(),
+                                    ["a", "b", "c"], timeout=10,
+                                    pool=BoundedPool("test", 2))
+        self.assertEqual(sorted(results), ["a", "b", "c"])
+        for sdUUID, res in results.iteritems():
+            self.assertTrue(res.succeeded)
+            self.assertEqual(res.value, sdUUID.upper())
+            self.assertTrue(res.elapsed >= 0)
+
+    def test_no_domains(self):
+        self.assertEqual(sp.produceDomains(None, [], timeout=10,
+                                           pool=BoundedPool("test", 2)),
+                         {})
+
+    def test_failure_does_not_stop_others(self):
+        def produce(sdUUID):
+            if sdUUID == "bad":
+                raise se.StorageDomainDoesNotExist(sdUUID)
+            return sdUUID
+
+        results = sp.produceDomains(produce, ["good", "bad", "other"],
+                                    timeout=10, pool=BoundedPool("test", 1))
+        self.assertFalse(results["bad"].succeeded)
+        self.assertIsInstance(results["bad"].value,
+                              se.StorageDomainDoesNotExist)
+        self.assertTrue(results["good"].succeeded)
+        self.assertTrue(results["other"].succeeded)
+
+    def test_bounded_concurrency(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def produce(sdUUID):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        results = sp.produceDomains(produce, range(8), timeout=10,
+                                    pool=BoundedPool("test", 3))
+        self.assertEqual(len(results), 8)
+        self.assertTrue(peak[0] <= 3)
+
+    def test_timeout(self):
+        blocked = threading.Event()
+
+        def produce(sdUUID):
+            if sdUUID == "stuck":
+                blocked.wait(5)
+            return sdUUID
+
+        try:
+            start = time.time()
+            results = sp.produceDomains(produce, ["stuck", "a", "b"],
+                                        timeout=0.5,
+                                        pool=BoundedPool("test", 2))
+            self.assertTrue(time.time() - start < 3)
+        finally:
+            blocked.set()
+        self.assertNotIn("stuck", results)
+        self.assertTrue(results["a"].succeeded)
+        self.assertTrue(results["b"].succeeded)
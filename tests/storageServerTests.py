@@ -18,8 +18,13 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import threading
+
 from testlib import VdsmTestCase
+from vdsm.concurrent import BoundedPool
 from storage.storageServer import IscsiConnection
+from storage.storageServer import connectAll
+from storage import storage_exception as se
 
 
 class IscsiConnectionMismatchTests(VdsmTestCase):
@@ -37,3 +42,102 @@ class IscsiConnectionMismatchTests(VdsmTestCase):
                   IscsiConnection.Mismatch("error 2")]
         expected = "%s" % ["error 1", "error 2"]
         self.assertEqual(str(errors), expected)
+
+
+class ConnectAllTests(VdsmTestCase):
+
+    def test_results_order(self):
+        results = connectAll(lambda x: x * 2, [3, 1, 2],
+                             connectionTimeout=5, timeout=10,
+                             pool=BoundedPool("test", 2))
+        self.assertEqual([r.value for r in results], [6, 2, 4])
+        self.assertTrue(all(r.succeeded for r in results))
+
+    def test_failure(self):
+        def connect(x):
+            if x == 1:
+                raise RuntimeError("connection failed")
+            return x
+
+        results = connectAll(connect, [0, 1, 2], connectionTimeout=5,
+                             timeout=10, pool=BoundedPool("test", 3))
+        self.assertEqual([r.succeeded for r in results], [True, False, True])
+        self.assertIsInstance(results[1].value, RuntimeError)
+
+    def test_connection_timeout(self):
+        blocked = threading.Event()
+
+        def connect(x):
+            if x == "dead":
+                blocked.wait(5)
+            return x
+
+        try:
+            results = connectAll(connect, ["dead", "a", "b"],
+                                 connectionTimeout=0.2, timeout=5,
+                                 pool=BoundedPool("test", 2))
+        finally:
+            blocked.set()
+        self.assertFalse(results[0].succeeded)
+        self.assertIsInstance(results[0].value,
+                              se.StorageServerConnectionTimeout)
+        self.assertEqual([r.value for r in results[1:]], ["a", "b"])
+
+    def test_timed_out_connections_use_the_pool(self):
+        blocked = threading.Event()
+        connected = []
+
+        def connect(x):
+            if x == "dead":
+                blocked.wait(5)
+            connected.append(x)
+            return x
+
+        pool = BoundedPool("test", 1)
+        try:
+            connectAll(connect, ["dead"], connectionTimeout=0.1, timeout=5,
+                       pool=pool)
+            # The dead connection still holds the only thread
+            results = connectAll(connect, ["a"], connectionTimeout=5,
+                                 timeout=0.2, pool=pool)
+            self.assertEqual(pool.busy, 1)
+        finally:
+            blocked.set()
+        self.assertFalse(results[0].succeeded)
+        self.assertIsInstance(results[0].value,
+                              se.StorageServerConnectionTimeout)
+        self.assertNotIn("a", connected)
+
+    def test_timeout_reports_item_id(self):
+        blocked = threading.Event()
+
+        def connect(con):
+            blocked.wait(5)
+            return con
+
+        con = {"id": "con-id", "password": "secret"}
+        try:
+            results = connectAll(connect, [con], connectionTimeout=0.2,
+                                 timeout=5, itemId=lambda con: con["id"],
+                                 pool=BoundedPool("test", 1))
+        finally:
+            blocked.set()
+        self.assertFalse(results[0].succeeded)
+        self.assertIn("con-id", str(results[0].value))
+        self.assertNotIn("secret", str(results[0].value))
+
+    def test_overall_timeout(self):
+        blocked = threading.Event()
+
+        def connect(x):
+            blocked.wait(5)
+            return x
+
+        try:
+            results = connectAll(connect, range(4), connectionTimeout=5,
+                                 timeout=0.2, pool=BoundedPool("test", 2))
+        finally:
+            blocked.set()
+        for r in results:
+            self.assertFalse(r.succeeded)
+            self.assertIsInstance(r.value, se.StorageServerConnectionTimeout)
@@ -0,0 +1,254 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+
+from testlib import VdsmTestCase
+from testValidation import slowtest
+
+import supervdsmChannel
+
+CALLS = 10000
+
+
+class Service(object):
+
+    def __init__(self):
+        self.unblock = threading.Event()
+
+    def ping(self, *args, **kwargs):
+        return True
+
+    def echo(self, *args, **kwargs):
+        return args, kwargs
+
+    def fail(self, msg):
+        raise ValueError(msg)
+
+    def block(self):
+        self.unblock.wait()
+        return "unblocked"
+
+    def unpicklable(self):
+        return threading.Lock()
+
+    def _private(self):
+        return "private"
+
+
+@contextmanager
+def channel(service=None):
+    service = service or Service()
+    tmpdir = tempfile.mkdtemp()
+    address = os.path.join(tmpdir, "channel.sock")
+    server = supervdsmChannel.ChannelServer(address, service)
+    server.start()
+    try:
+        client = supervdsmChannel.ChannelClient(address)
+        try:
+            yield client
+        finally:
+            client.close()
+    finally:
+        server.stop()
+        shutil.rmtree(tmpdir)
+
+
+class ChannelTests(VdsmTestCase):
+
+    def test_call(self):
+        with channel() as client:
+            self.assertEqual(client.call("echo", 1, "two", three=3),
+                             ((1, "two"), {"three": 3}))
+
+    def test_error(self):
+        with channel() as client:
+            with self.assertRaises(ValueError) as ctx:
+                client.call("fail", "expected")
+            self.assertEqual(str(ctx.exception), "expected")
+            # The connection is still usable
+            self.assertTrue(client.call("ping"))
+
+    def test_missing_method(self):
+        with channel() as client:
+            self.assertRaises(AttributeError, client.call, "missing")
+
+    def test_private_method(self):
+        with channel() as client:
+            self.assertRaises(AttributeError, client.call, "_private")
+
+    def test_unpicklable_result(self):
+        with channel() as client:
+            self.assertRaises(supervdsmChannel.Error, client.call,
+                              "unpicklable")
+            self.assertTrue(client.call("ping"))
+
+    def test_in_flight(self):
+        service = Service()
+        with channel(service) as client:
+            results = []
+            t = threading.Thread(
+                target=lambda: results.append(client.call("block")))
+            t.start()
+            try:
+                # A blocked call does not delay other calls
+                self.assertTrue(client.call("ping"))
+                self.assertEqual(results, [])
+            finally:
+                service.unblock.set()
+                t.join()
+            self.assertEqual(results, ["unblocked"])
+
+    def test_many_blocked_calls(self):
+        service = Service()
+        with channel(service) as client:
+            results = []
+            threads = [threading.Thread(
+                target=lambda: results.append(client.call("block")))
+                for i in range(20)]
+            for t in threads:
+                t.start()
+            try:
+                # Wait until the calls are pending
+                while len(client._pending) < len(threads):
+                    time.sleep(0.01)
+                # Blocked calls do not starve other calls
+                pinged = threading.Event()
+                t = threading.Thread(
+                    target=lambda: client.call("ping") and pinged.set())
+                t.daemon = True
+                t.start()
+                pinged.wait(2)
+                self.assertTrue(pinged.is_set())
+                self.assertEqual(results, [])
+            finally:
+                service.unblock.set()
+                for t in threads:
+                    t.join()
+            self.assertEqual(results, ["unblocked"] * 20)
+
+    def test_batch(self):
+        with channel() as client:
+            with client.batch() as batch:
+                calls = [batch.echo(i) for i in range(10)]
+                failed = batch.fail("expected")
+            self.assertEqual([c.result() for c in calls],
+                             [((i,), {}) for i in range(10)])
+            self.assertRaises(ValueError, failed.result)
+
+    def test_stats(self):
+        with channel() as client:
+            for i in range(3):
+                client.call("ping")
+            with client.batch() as batch:
+                batch.echo()
+            stats = client.stats.get()
+        self.assertEqual(stats["ping"]["calls"], 3)
+        self.assertEqual(stats["echo"]["calls"], 1)
+        self.assertTrue(stats["ping"]["max"] <= stats["ping"]["total"])
+
+    def test_connection_lost(self):
+        service = Service()
+        with channel(service) as client:
+            results = []
+
+            def call():
+                try:
+                    client.call("block")
+                except supervdsmChannel.Error as e:
+                    results.append(e)
+
+            t = threading.Thread(target=call)
+            t.start()
+            # Wait until the call is pending
+            while not client._pending:
+                time.sleep(0.01)
+            client.close()
+            t.join()
+            service.unblock.set()
+            self.assertEqual(len(results), 1)
+            # The client reconnects on the next call
+            self.assertTrue(client.call("ping"))
+
+
+class _ServerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+@contextmanager
+def manager():
+    # The manager server removes its socket when the process exits
+    address = os.path.join(tempfile.gettempdir(),
+                           "manager-%d.sock" % os.getpid())
+    server = _ServerManager(address=address, authkey="")
+    server.register("instance", callable=Service)
+    t = threading.Thread(target=server.get_server().serve_forever)
+    t.daemon = True
+    t.start()
+    client = _ClientManager(address=address, authkey="")
+    client.register("instance")
+    client.connect()
+    yield client.instance()
+
+
+class ChannelBenchmark(VdsmTestCase):
+
+    @slowtest
+    def test_manager_ping(self):
+        with manager() as instance:
+            start = time.time()
+            for i in xrange(CALLS):
+                instance.ping()
+            elapsed = time.time() - start
+        logging.info("%d manager calls in %.3f seconds (%.1f us per call)",
+                     CALLS, elapsed, elapsed / CALLS * 1000000)
+
+    @slowtest
+    def test_channel_ping(self):
+        with channel() as client:
+            start = time.time()
+            for i in xrange(CALLS):
+                client.call("ping")
+            elapsed = time.time() - start
+        logging.info("%d channel calls in %.3f seconds (%.1f us per call)",
+                     CALLS, elapsed, elapsed / CALLS * 1000000)
+
+    @slowtest
+    def test_channel_batch_ping(self):
+        with channel() as client:
+            start = time.time()
+            with client.batch() as batch:
+                for i in xrange(CALLS):
+                    batch.ping()
+            elapsed = time.time() - start
+        logging.info("%d batched channel calls in %.3f seconds "
+                     "(%.1f us per call)", CALLS, elapsed,
+                     elapsed / CALLS * 1000000)
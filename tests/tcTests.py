@@ -33,12 +33,17 @@ import fcntl
 import struct
 
 from testlib import VdsmTestCase as TestCaseBase
-from testValidation import ValidateRunningAsRoot
+from testValidation import ValidateRunningAsRoot, slowtest
+from monkeypatch import MonkeyPatchScope
 
 from vdsm.constants import EXT_BRCTL, EXT_TC
 from nose.plugins.skip import SkipTest
 
 from network import tc
+from network.tc import _wrapper
+from functional import dummy
+import errno
+import logging
 import platform
 
 EXT_IP = "/sbin/ip"
@@ -198,6 +203,215 @@ class TestQdisc(TestCaseBase):
                           self._bridge.devName + "A", 'ingress')
 
 
+class FakeTc(object):
+    def __init__(self, err='', shows=None):
+        self.calls = []
+        self.err = err
+        self.shows = shows or {}  # command: output
+
+    def __call__(self, command, data=None, raw=False):
+        self.calls.append((command, data))
+        if data is not None:
+            # Only the first batch fails
+            err, self.err = self.err, ''
+            return (1 if err else 0), '', err
+        return 0, self.shows.get(' '.join(command[1:]), ''), ''
+
+    @property
+    def batches(self):
+        return [data for command, data in self.calls if data is not None]
+
+
+class TestBatch(TestCaseBase):
+
+    def _run(self, fake, f):
+        with MonkeyPatchScope([(_wrapper, 'execCmd', fake)]):
+            f()
+
+    def testSingleInvocation(self):
+        fake = FakeTc()
+
+        def configure():
+            with tc.batch():
+                tc.qdisc.add('dev0', 'hfsc', handle='1:')
+                tc.cls.delete('dev0', '1:10')
+                self.assertEqual(fake.calls, [])
+
+        self._run(fake, configure)
+        self.assertEqual(fake.calls[-1], (
+            [EXT_TC, '-force', '-batch', '-'],
+            'qdisc add dev dev0 root handle 1: hfsc\n'
+            'class del dev dev0 classid 1:10\n'))
+        self.assertEqual(len(fake.batches), 1)
+
+    def testShowRunsImmediately(self):
+        fake = FakeTc()
+
+        def configure():
+            with tc.batch():
+                tc.qdisc.show('dev0')
+                self.assertEqual(len(fake.calls), 1)
+
+        self._run(fake, configure)
+
+    def testNested(self):
+        fake = FakeTc()
+
+        def configure():
+            with tc.batch():
+                tc.cls.delete('dev0', '1:10')
+                with tc.batch():
+                    tc.cls.delete('dev0', '1:20')
+                self.assertEqual(fake.calls, [])
+
+        self._run(fake, configure)
+        self.assertEqual(len(fake.batches), 1)
+
+    def testRollback(self):
+        fake = FakeTc(err='RTNETLINK answers: File exists\n'
+                          'We have an error talking to the kernel\n'
+                          'Command failed -:3\n')
+
+        def configure():
+            with tc.batch():
+                tc.qdisc.add('dev0', 'hfsc', handle='1:')
+                tc.qdisc.add('dev0', 'ingress')
+                tc.cls.add('dev0', 'hfsc', '1:', '1:10')
+
+        try:
+            self._run(fake, configure)
+        except tc.TrafficControlException as e:
+            self.assertEqual(e.errCode, errno.EEXIST)
+        else:
+            self.fail('TrafficControlException not raised')
+        self.assertEqual(fake.calls[1][1],
+                         'qdisc del dev dev0 ingress\n'
+                         'qdisc del dev dev0 root\n')
+
+    def testRollbackFailureInMiddle(self):
+        fake = FakeTc(err='RTNETLINK answers: File exists\n'
+                          'We have an error talking to the kernel\n'
+                          'Command failed -:2\n')
+
+        def configure():
+            with tc.batch():
+                tc.qdisc.add('dev0', 'hfsc', handle='1:')
+                tc.qdisc.add('dev0', 'ingress')
+                tc.cls.add('dev0', 'hfsc', '1:', '1:10')
+
+        self.assertRaises(tc.TrafficControlException, self._run, fake,
+                          configure)
+        self.assertEqual(fake.calls[1][1],
+                         'class del dev dev0 classid 1:10\n'
+                         'qdisc del dev dev0 root\n')
+
+    def testTolerated(self):
+        fake = FakeTc(err='RTNETLINK answers: No such file or directory\n'
+                          'Command failed -:1\n')
+
+        def configure():
+            with tc.batch():
+                with tc.tolerate(errno.ENOENT):
+                    tc.qdisc.delete('dev0')
+                tc.qdisc.add('dev0', 'hfsc', handle='1:')
+
+        self._run(fake, configure)
+        self.assertEqual(len(fake.batches), 1)
+
+    def testRestore(self):
+        fake = FakeTc(
+            err='RTNETLINK answers: File exists\n'
+                'We have an error talking to the kernel\n'
+                'Command failed -:4\n',
+            shows={
+                'qdisc show dev dev0':
+                'qdisc prio 8001: root refcnt 2 bands 3 priomap  '
+                '1 2 2 2 1 2 0 0 1 1 1 1 1 1 1 1\n'
+                'qdisc ingress ffff: parent ffff:fff1 ----------------\n',
+                'filter show dev dev0 parent ffff:':
+                'filter parent ffff: protocol ip pref 49152 u32 \n'
+                'filter parent ffff: protocol ip pref 49152 u32 fh 800: ht '
+                'divisor 1 \n'
+                'filter parent ffff: protocol ip pref 49152 u32 fh 800::800 '
+                'order 2048 key ht 800 bkt 0 terminal flowid ??? \n'
+                '  match 00000000/00000000 at 0\n'
+                '\taction order 1: mirred (Egress Mirror to device tap1) '
+                'pipe\n'
+                ' \tindex 18 ref 1 bind 1\n'})
+
+        def configure():
+            with tc.batch():
+                tc.qdisc.delete('dev0')
+                tc.qdisc.delete('dev0', kind='ingress')
+                tc.qdisc.add('dev0', 'hfsc', handle='1:')
+                tc.cls.add('dev0', 'hfsc', '1:', '1:10')
+                tc.cls.add('dev1', 'hfsc', '1:', '1:10')
+
+        self.assertRaises(tc.TrafficControlException, self._run, fake,
+                          configure)
+        self.assertEqual(fake.batches[1:], [
+            'class del dev dev1 classid 1:10\n',
+            'qdisc del dev dev0 root\n'
+            'qdisc del dev dev0 ingress\n',
+            'qdisc add dev dev0 root handle 8001: prio\n'
+            'qdisc add dev dev0 ingress\n'
+            'filter add dev dev0 parent ffff: protocol ip pref 49152 u32 '
+            'match u32 0x00000000 0x00000000 at 0 action mirred egress '
+            'mirror dev tap1\n'])
+
+    def testDiscardedOnError(self):
+        fake = FakeTc()
+
+        def configure():
+            with tc.batch():
+                tc.qdisc.add('dev0', 'hfsc', handle='1:')
+                raise RuntimeError()
+
+        self.assertRaises(RuntimeError, self._run, fake, configure)
+        self.assertEqual(fake.calls, [])
+
+
+class BatchBenchmark(TestCaseBase):
+
+    DEVICES = 4
+    CLASSES = 200
+
+    def _configure(self, devices):
+        per_device = self.CLASSES / len(devices)
+        for dev in devices:
+            tc.qdisc.add(dev, 'hfsc', handle='1:')
+            for i in range(1, per_device + 1):
+                tc.cls.add(dev, 'hfsc', '1:', '1:%x' % i,
+                           ls={'m2': 1000 * i})
+
+    def _clear(self, devices):
+        for dev in devices:
+            tc._qdisc_del(dev)
+
+    @slowtest
+    @ValidateRunningAsRoot
+    def testCreateClasses(self):
+        devices = [dummy.create() for i in range(self.DEVICES)]
+        try:
+            start = time.time()
+            self._configure(devices)
+            serial = time.time() - start
+            self._clear(devices)
+
+            start = time.time()
+            with tc.batch():
+                self._configure(devices)
+            batched = time.time() - start
+            classes = sum(len(list(tc.classes(dev))) for dev in devices)
+            # Each device also has its root class
+            self.assertEqual(classes, self.CLASSES + self.DEVICES)
+        finally:
+            for dev in devices:
+                dummy.remove(dev)
+        logging.info("creating %d classes: %.3f seconds, batched: %.3f "
+                     "seconds", self.CLASSES, serial, batched)
+
+
 class TestFilters(TestCaseBase):
     def test_filter_objs(self):
         dirName = os.path.dirname(os.path.realpath(__file__))
@@ -316,6 +530,38 @@ class TestFilters(TestCaseBase):
                                             qdiscs):
             self.assertEqual(parsed, correct)
 
+    def test_config_commands(self):
+        shows = {
+            'qdisc show dev dev0':
+            'qdisc hfsc 1389: root refcnt 2 default 1388\n'
+            'qdisc fq_codel 1388: parent 1389:1388 limit 10240p flows 1024 '
+            'quantum 1514 target 5.0ms interval 100.0ms ecn\n'
+            'qdisc ingress ffff: parent ffff:fff1 ----------------\n',
+            'class show dev dev0':
+            'class hfsc 1389: root\n'
+            'class hfsc 1389:1388 parent 1389:10 leaf 1388: ls m1 0bit d 0us '
+            'm2 400Kbit\n'
+            'class hfsc 1389:10 parent 1389: sc m1 0bit d 0us m2 800Kbit\n',
+            'filter show dev dev0 parent 1389:':
+            'filter parent 1389: protocol all pref 5000 u32 \n'
+            'filter parent 1389: protocol all pref 5000 u32 fh 800: ht '
+            'divisor 1 \n'
+            'filter parent 1389: protocol all pref 5000 u32 fh 800::800 '
+            'order 2048 key ht 800 bkt 0 flowid 1389:1388 \n'
+            '  match 00000000/00000000 at 0\n'}
+        with MonkeyPatchScope([(_wrapper, 'execCmd', FakeTc(shows=shows))]):
+            commands = tc._config_commands('dev0')
+        self.assertEqual([' '.join(command) for command in commands], [
+            'qdisc add dev dev0 root handle 1389: hfsc default 1388',
+            'qdisc add dev dev0 ingress',
+            'class add dev dev0 parent 1389: classid 1389:10 hfsc sc m1 0bit '
+            'd 0us m2 800Kbit',
+            'class add dev dev0 parent 1389:10 classid 1389:1388 hfsc ls m1 '
+            '0bit d 0us m2 400Kbit',
+            'qdisc add dev dev0 parent 1389:1388 handle 1388: fq_codel',
+            'filter add dev dev0 parent 1389: protocol all pref 5000 u32 '
+            'match u32 0x00000000 0x00000000 at 0 flowid 1389:1388'])
+
     def test_classes(self):
         cmd_line_ls_10 = 3200
         cmd_line_ls_m1_20 = 6400
@@ -19,6 +19,7 @@
 
 from testlib import VdsmTestCase as TestCaseBase
 from vdsm.tool.dump_volume_chains import (_build_volume_chain, _BLANK_UUID,
+                                          _get_volumes_chains,
                                           OrphanVolumes, ChainLoopError,
                                           NoBaseVolume, DuplicateParentError)
 
@@ -54,3 +55,57 @@ class GetVolumeChainTests(TestCaseBase):
         with self.assertRaises(DuplicateParentError):
             _build_volume_chain(
                 [(_BLANK_UUID, 'a'), ('a', 'b'), ('a', 'c')])
+
+
+class FakeServer(object):
+
+    def __init__(self, volumes):
+        self.volumes = volumes
+        self.calls = 0
+
+    def getVolumesInfo(self, sd_uuid):
+        self.calls += 1
+        return {'status': {'code': 0, 'message': 'Done'},
+                'volumes': self.volumes}
+
+
+def _volume(image, parent):
+    return {'image': image, 'parent': parent, 'status': 'OK'}
+
+
+class GetVolumesChainsTests(TestCaseBase):
+
+    def test_single_call(self):
+        server = FakeServer({
+            'a': _volume('img1', _BLANK_UUID),
+            'b': _volume('img1', 'a'),
+            'c': _volume('img1', 'b'),
+            'd': _volume('img2', _BLANK_UUID),
+        })
+        image_chains, volumes_info = _get_volumes_chains(server, 'sd')
+        self.assertEqual(server.calls, 1)
+        self.assertEqual(image_chains, {'img1': ['a', 'b', 'c'],
+                                        'img2': ['d']})
+        self.assertEqual(volumes_info, server.volumes)
+
+    def test_template(self):
+        server = FakeServer({
+            't': _volume('template', _BLANK_UUID),
+            'a': _volume('img1', 't'),
+            'b': _volume('img1', 'a'),
+            'c': _volume('img2', 't'),
+        })
+        image_chains, _ = _get_volumes_chains(server, 'sd')
+        self.assertEqual(image_chains, {'template': ['t'],
+                                        'img1': ['t', 'a', 'b'],
+                                        'img2': ['t', 'c']})
+
+    def test_chain_error(self):
+        server = FakeServer({
+            'a': _volume('img1', _BLANK_UUID),
+            'b': _volume('img1', 'a'),
+            'c': _volume('img1', 'a'),
+        })
+        image_chains, _ = _get_volumes_chains(server, 'sd')
+        self.assertTrue(isinstance(image_chains['img1'],
+                                   DuplicateParentError))
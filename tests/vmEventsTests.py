@@ -0,0 +1,224 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from contextlib import contextmanager
+
+import libvirt
+
+from vdsm import constants
+from vdsm import libvirtconnection
+from virt import vm
+from virt.vmdevices import hwclass
+
+from monkeypatch import MonkeyPatchScope
+from testlib import VdsmTestCase as TestCaseBase
+import vmfakelib as fake
+
+_ALL_EVENTS = (
+    'VIR_DOMAIN_EVENT_ID_LIFECYCLE',
+    'VIR_DOMAIN_EVENT_ID_REBOOT',
+    'VIR_DOMAIN_EVENT_ID_RTC_CHANGE',
+    'VIR_DOMAIN_EVENT_ID_IO_ERROR_REASON',
+    'VIR_DOMAIN_EVENT_ID_GRAPHICS',
+    'VIR_DOMAIN_EVENT_ID_BLOCK_JOB',
+    'VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2',
+    'VIR_DOMAIN_EVENT_ID_WATCHDOG',
+    'VIR_DOMAIN_EVENT_ID_BALLOON_CHANGE',
+    'VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED',
+    'VIR_DOMAIN_EVENT_ID_TUNABLE',
+)
+
+
+# The real get(), fake.VM replaces libvirtconnection.get
+_get = libvirtconnection.get
+
+
+class FakeLibvirt(object):
+    """
+    libvirt bindings defining only the given domain events.
+    """
+    libvirtError = libvirt.libvirtError
+
+    class virConnect:
+        pass
+
+    def __init__(self, events=_ALL_EVENTS):
+        for name in events:
+            setattr(self, name, getattr(libvirt, name))
+
+
+class FakeDrive(object):
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+
+class FakeDevice(object):
+
+    def __init__(self, alias):
+        self.alias = alias
+
+
+@contextmanager
+def eventConnection(cif, bindings=None):
+    """
+    Yield a fake libvirt connection dispatching domain events to cif.
+    """
+    conn = fake.Connection()
+    with MonkeyPatchScope([
+        (libvirtconnection, 'libvirt', bindings or FakeLibvirt()),
+        (libvirtconnection, 'open_connection', lambda *args: conn),
+        (constants, 'P_VDSM_LIBVIRT_PASSWD', '/dev/null'),
+    ]):
+        try:
+            _get(cif)
+            yield conn
+        finally:
+            libvirtconnection._clear()
+
+
+@contextmanager
+def eventVM():
+    with fake.VM() as testvm:
+        testvm._dom = fake.Domain(vmId=testvm.id)
+        with eventConnection(testvm.cif) as conn:
+            yield testvm, conn
+
+
+class RegistrationTests(TestCaseBase):
+
+    def test_register_all(self):
+        cif = fake.ClientIF()
+        with eventConnection(cif) as conn:
+            registered = libvirtconnection.registered_events()
+        self.assertEqual(set(conn.callbacks), registered)
+        self.assertIn(libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2, registered)
+        self.assertNotIn(libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB, registered)
+        self.assertIn(libvirt.VIR_DOMAIN_EVENT_ID_TUNABLE, registered)
+
+    def test_older_bindings(self):
+        bindings = FakeLibvirt([name for name in _ALL_EVENTS
+                                if name not in (
+                                    'VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2',
+                                    'VIR_DOMAIN_EVENT_ID_TUNABLE')])
+        with eventConnection(fake.ClientIF(), bindings):
+            registered = libvirtconnection.registered_events()
+        self.assertIn(libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB, registered)
+        self.assertNotIn(libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2, registered)
+        self.assertNotIn(libvirt.VIR_DOMAIN_EVENT_ID_TUNABLE, registered)
+
+    def test_no_target(self):
+        conn = fake.Connection()
+        with MonkeyPatchScope([
+            (libvirtconnection, 'libvirt', FakeLibvirt()),
+            (libvirtconnection, 'open_connection', lambda *args: conn),
+            (constants, 'P_VDSM_LIBVIRT_PASSWD', '/dev/null'),
+        ]):
+            try:
+                _get()
+                self.assertEqual(libvirtconnection.registered_events(),
+                                 frozenset())
+            finally:
+                libvirtconnection._clear()
+        self.assertEqual(conn.callbacks, {})
+
+
+class DispatchTests(TestCaseBase):
+
+    def test_balloon_change(self):
+        with eventVM() as (testvm, conn):
+            with MonkeyPatchScope([
+                (libvirtconnection, 'registered_events',
+                 lambda: frozenset(conn.callbacks)),
+            ]):
+                testvm._vmStats = vm.VmStatsThread(testvm)
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_BALLOON_CHANGE,
+                               1048576)
+            self.assertEqual(
+                testvm._vmStats.sampleBalloon.getLastSample(), 1048576)
+
+    def test_balloon_change_before_stats(self):
+        with eventVM() as (testvm, conn):
+            # Must not fail before the stats thread was created
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_BALLOON_CHANGE,
+                               1048576)
+
+    def test_block_job_completed(self):
+        with eventVM() as (testvm, conn):
+            job = {'jobID': 'job1', 'disk': {'imageID': 'img1'}}
+            other = {'jobID': 'job2', 'disk': {'imageID': 'img2'}}
+            testvm.conf['_blockJobs'] = {'job1': job, 'job2': other}
+            drives = {'img1': FakeDrive('vda', '/path/vda'),
+                      'img2': FakeDrive('vdb', '/path/vdb')}
+            testvm._findDriveByUUIDs = lambda disk: drives[disk['imageID']]
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2,
+                               'vda', libvirt.VIR_DOMAIN_BLOCK_JOB_TYPE_COMMIT,
+                               libvirt.VIR_DOMAIN_BLOCK_JOB_COMPLETED)
+            self.assertTrue(job.get('gone'))
+            self.assertNotIn('gone', other)
+
+    def test_block_job_ready(self):
+        with eventVM() as (testvm, conn):
+            job = {'jobID': 'job1', 'disk': {'imageID': 'img1'}}
+            testvm.conf['_blockJobs'] = {'job1': job}
+            testvm._findDriveByUUIDs = lambda disk: FakeDrive('vda', '/p')
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2,
+                               'vda',
+                               libvirt.VIR_DOMAIN_BLOCK_JOB_TYPE_ACTIVE_COMMIT,
+                               libvirt.VIR_DOMAIN_BLOCK_JOB_READY)
+            # A ready job must still be queried to pivot
+            self.assertNotIn('gone', job)
+
+    def test_device_removed(self):
+        with eventVM() as (testvm, conn):
+            nic = FakeDevice('net1')
+            testvm._devices[hwclass.NIC] = [FakeDevice('net0'), nic]
+            testvm.conf['devices'] = [
+                {'type': hwclass.NIC, 'alias': 'net0'},
+                {'type': hwclass.NIC, 'alias': 'net1'}]
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED,
+                               'net1')
+            self.assertNotIn(nic, testvm._devices[hwclass.NIC])
+            self.assertEqual(testvm.conf['devices'],
+                             [{'type': hwclass.NIC, 'alias': 'net0'}])
+
+    def test_device_removed_unknown(self):
+        with eventVM() as (testvm, conn):
+            testvm._devices[hwclass.NIC] = [FakeDevice('net0')]
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED,
+                               'net1')
+            self.assertEqual(len(testvm._devices[hwclass.NIC]), 1)
+
+    def test_tunable(self):
+        with eventVM() as (testvm, conn):
+            testvm._vcpuTuneInfo = {'vcpu_period': 100000}
+            conn.dispatchEvent(testvm._dom,
+                               libvirt.VIR_DOMAIN_EVENT_ID_TUNABLE,
+                               {'cputune.vcpu_quota': 50000,
+                                'cputune.shares': 1024})
+            self.assertEqual(testvm._vcpuTuneInfo,
+                             {'vcpu_period': 100000, 'vcpu_quota': 50000})
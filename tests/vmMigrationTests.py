@@ -19,12 +19,18 @@
 #
 
 from itertools import tee, izip, product
+import threading
+import time
+import xmlrpclib
+
+import libvirt
 
 from vdsm.config import config
 from virt import migration
 
 from testlib import VdsmTestCase as TestCaseBase
 from testlib import permutations, expandPermutations
+import vmfakelib as fake
 
 
 # defaults
@@ -117,3 +123,384 @@ def _linear_downtime(downtime, steps):
         # however, it makes no sense to have less than 1 ms
         # we want to avoid anyway downtime = 0
         yield max(1, downtime * (i + 1) / steps)
+
+
+_MiB = 1024 * 1024
+
+_HORIZON = 300
+
+
+def _job_info(elapsed, processed, remaining):
+    """
+    Return a jobInfo tuple of a migration job, elapsed in seconds.
+    """
+    total = processed + remaining
+    return (2, elapsed * 1000, 0, total, processed, remaining,
+            total, processed, remaining, 0, 0, 0)
+
+
+def _workload(remaining, bandwidth, dirty_rate, samples, interval=10):
+    """
+    Generate jobInfo samples of a migration sending bandwidth MiB/s while
+    the guest dirties dirty_rate MiB/s.
+    """
+    processed = 0
+    for i in range(samples):
+        yield _job_info(i * interval, processed * _MiB, remaining * _MiB)
+        processed += bandwidth * interval
+        remaining = max(0, remaining - (bandwidth - dirty_rate) * interval)
+
+
+def _downtimes(policy, samples):
+    downtimes = []
+    for job_info in samples:
+        if policy.done:
+            break
+        downtime = policy.next(job_info)
+        if downtime is not None:
+            downtimes.append(downtime)
+    return downtimes
+
+
+class TestAdaptiveDowntime(TestCaseBase):
+
+    def setUp(self):
+        self.schedule = list(migration.exponential_downtime(_DOWNTIME,
+                                                            _STEPS))
+        self.policy = migration.downtime_policy('adaptive', _DOWNTIME,
+                                                _STEPS, _HORIZON)
+
+    def test_converging(self):
+        samples = _workload(4000, bandwidth=100, dirty_rate=20, samples=5)
+        self.assertEqual(_downtimes(self.policy, samples),
+                         [self.schedule[0]])
+        self.assertFalse(self.policy.done)
+
+    def test_converging_slowly(self):
+        # Would take about 4000 seconds to converge
+        samples = _workload(4000, bandwidth=100, dirty_rate=99, samples=3)
+        downtimes = _downtimes(self.policy, samples)
+        self.assertEqual(downtimes, [self.schedule[0], _DOWNTIME])
+
+    def test_converging_slowly_until_end_of_schedule(self):
+        # Always predicted to converge in 200 seconds, but never does
+        samples = []
+        remaining = 4000.0
+        for i in range(_HORIZON / 10 + 1):
+            samples.append(_job_info(i * 10, i * 1000 * _MiB,
+                                     int(remaining * _MiB)))
+            remaining *= 0.95
+        downtimes = _downtimes(self.policy, samples)
+        self.assertEqual(downtimes, [self.schedule[0], _DOWNTIME])
+        self.assertTrue(self.policy.done)
+
+    def test_stalled(self):
+        # 30 MiB can be sent in 300 milliseconds
+        samples = _workload(30, bandwidth=100, dirty_rate=100, samples=5)
+        downtimes = _downtimes(self.policy, samples)
+        step = min(dt for dt in self.schedule if dt > 300)
+        self.assertEqual(downtimes, [self.schedule[0], step])
+        self.assertFalse(self.policy.done)
+
+    def test_diverging(self):
+        samples = _workload(1000, bandwidth=100, dirty_rate=110, samples=5)
+        self.assertEqual(_downtimes(self.policy, samples),
+                         [self.schedule[0], _DOWNTIME])
+        self.assertTrue(self.policy.done)
+
+    def test_no_progress(self):
+        samples = [_job_info(i * 10, 0, 1000 * _MiB) for i in range(100)]
+        downtimes = _downtimes(self.policy, samples)
+        for a, b in pairwise(downtimes):
+            self.assertTrue(a < b)
+        self.assertEqual(downtimes[-1], _DOWNTIME)
+        self.assertTrue(self.policy.done)
+
+    def test_same_sample(self):
+        sample = _job_info(10, 100 * _MiB, 1000 * _MiB)
+        self.assertEqual(_downtimes(self.policy, [sample] * 3),
+                         [self.schedule[0]])
+
+
+class TestExponentialDowntime(TestCaseBase):
+
+    def test_schedule(self):
+        policy = migration.downtime_policy('exponential', _DOWNTIME,
+                                           _STEPS, _HORIZON)
+        self.assertEqual(_downtimes(policy, [None] * (_STEPS + 1)),
+                         list(migration.exponential_downtime(_DOWNTIME,
+                                                             _STEPS)))
+        self.assertTrue(policy.done)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class BlockingDomain(object):
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.unblock = threading.Event()
+
+    def migrateSetMaxSpeed(self, bandwidth, flags=0):
+        self.entered.set()
+        self.unblock.wait(2)
+
+
+class TestMigrationScheduler(TestCaseBase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def scheduler(self, slots=2, bandwidth=0, maxBandwidth=0):
+        return migration.MigrationScheduler(slots, bandwidth, maxBandwidth,
+                                            clock=self.clock)
+
+    def acquire_async(self, scheduler, name, priority):
+        """
+        Acquire a ticket in another thread, returning an Event set when the
+        migration was admitted and the list receiving the ticket.
+        """
+        admitted = threading.Event()
+        tickets = []
+
+        def acquire():
+            tickets.append(scheduler.acquire(name, fake.Domain(), priority))
+            admitted.set()
+
+        t = threading.Thread(target=acquire)
+        t.daemon = True
+        t.start()
+        return admitted, tickets
+
+    def wait_queued(self, scheduler, count):
+        deadline = time.time() + 2
+        while scheduler.stats()['queued'] != count:
+            self.assertTrue(time.time() < deadline, 'timeout waiting')
+            time.sleep(0.01)
+
+    def test_no_limits(self):
+        scheduler = self.scheduler()
+        dom = fake.Domain()
+        ticket = scheduler.acquire('vm1', dom)
+        self.assertEqual(ticket.bandwidth, 0)
+        scheduler.release(ticket)
+        self.assertNotIn('migrateSetMaxSpeed', dom.calls)
+
+    def test_stats_not_blocked_by_libvirt(self):
+        scheduler = self.scheduler(bandwidth=100)
+        dom = BlockingDomain()
+        scheduler.acquire('vm1', dom)
+        admitted, _ = self.acquire_async(scheduler, 'vm2', 'normal')
+        try:
+            self.assertTrue(dom.entered.wait(2))
+            self.assertEqual(scheduler.stats()['active'], 2)
+        finally:
+            dom.unblock.set()
+        self.assertTrue(admitted.wait(2))
+
+    def test_max_bandwidth(self):
+        scheduler = self.scheduler(bandwidth=0, maxBandwidth=32)
+        ticket = scheduler.acquire('vm1', fake.Domain())
+        self.assertEqual(ticket.bandwidth, 32)
+
+    def test_share_bandwidth(self):
+        scheduler = self.scheduler(slots=4, bandwidth=120, maxBandwidth=100)
+        dom1 = fake.Domain()
+        dom2 = fake.Domain()
+        dom3 = fake.Domain()
+        ticket1 = scheduler.acquire('vm1', dom1)
+        self.assertEqual(ticket1.bandwidth, 100)
+        ticket2 = scheduler.acquire('vm2', dom2)
+        self.assertEqual(ticket2.bandwidth, 60)
+        ticket3 = scheduler.acquire('vm3', dom3)
+        self.assertEqual(ticket3.bandwidth, 40)
+        scheduler.release(ticket1)
+        self.assertEqual(dom1.calls['migrateSetMaxSpeed'], [60, 40])
+        self.assertEqual(dom2.calls['migrateSetMaxSpeed'], [40, 60])
+        self.assertEqual(dom3.calls['migrateSetMaxSpeed'], [60])
+        self.assertEqual(scheduler.stats()['bandwidth'], 60)
+
+    def test_set_speed_failure(self):
+        scheduler = self.scheduler(bandwidth=100)
+        broken = fake.Domain(virtError=libvirt.VIR_ERR_NO_DOMAIN)
+        ticket1 = scheduler.acquire('vm1', broken)
+        ticket2 = scheduler.acquire('vm2', fake.Domain())
+        # The bandwidth of vm1 could not be changed
+        self.assertEqual(ticket1.bandwidth, 100)
+        self.assertEqual(ticket2.bandwidth, 50)
+
+    def test_slots(self):
+        scheduler = self.scheduler(slots=1)
+        ticket = scheduler.acquire('vm1', fake.Domain())
+        admitted, tickets = self.acquire_async(scheduler, 'vm2',
+                                               migration.PRIORITY_NORMAL)
+        self.wait_queued(scheduler, 1)
+        self.assertFalse(admitted.is_set())
+        scheduler.release(ticket)
+        self.assertTrue(admitted.wait(2))
+        self.assertEqual(tickets[0].name, 'vm2')
+
+    def test_priorities(self):
+        scheduler = self.scheduler(slots=1)
+        ticket = scheduler.acquire('vm1', fake.Domain())
+        order = []
+        waiters = []
+        for name, priority in (('balance', migration.PRIORITY_BALANCING),
+                               ('normal', migration.PRIORITY_NORMAL),
+                               ('evacuate', migration.PRIORITY_EVACUATION)):
+            waiters.append(self.acquire_async(scheduler, name, priority))
+            self.wait_queued(scheduler, len(waiters))
+
+        for i in range(len(waiters)):
+            scheduler.release(ticket)
+            deadline = time.time() + 2
+            while True:
+                admitted = [tickets[0] for event, tickets in waiters
+                            if event.is_set() and tickets[0] not in order]
+                if admitted:
+                    break
+                self.assertTrue(time.time() < deadline, 'timeout waiting')
+                time.sleep(0.01)
+            ticket = admitted[0]
+            order.append(ticket)
+        scheduler.release(ticket)
+
+        self.assertEqual([t.name for t in order],
+                         ['evacuate', 'normal', 'balance'])
+
+    def test_stats(self):
+        scheduler = self.scheduler(slots=2, bandwidth=100)
+        ticket1 = scheduler.acquire('vm1', fake.Domain())
+        ticket2 = scheduler.acquire('vm2', fake.Domain())
+        ticket1.progress(0)
+        ticket2.progress(0)
+        self.clock.now = 10
+        ticket1.progress(300 * 1024 * 1024)
+        ticket2.progress(200 * 1024 * 1024)
+        stats = scheduler.stats()
+        self.assertEqual(stats['active'], 2)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['bandwidth'], 50)
+        self.assertEqual(stats['throughput'], 50)
+        self.assertEqual(stats['completed'], 0)
+        scheduler.release(ticket1)
+        scheduler.release(ticket2)
+        stats = scheduler.stats()
+        self.assertEqual(stats['active'], 0)
+        self.assertEqual(stats['completed'], 2)
+        self.assertEqual(stats['averageWait'], 0)
+
+
+def _job_stats(elapsed, processed, remaining, **stats):
+    """
+    Return jobStats of a migration job, elapsed in seconds.
+    """
+    stats.update({'type': libvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+                  'time_elapsed': int(elapsed * 1000),
+                  'data_total': processed + remaining,
+                  'data_processed': processed,
+                  'data_remaining': remaining})
+    return stats
+
+
+_MiB = 1024 * 1024
+
+
+class TestMigrationTelemetry(TestCaseBase):
+
+    def test_samples(self):
+        telemetry = migration.MigrationTelemetry()
+        telemetry.record(_job_stats(10, 1000 * _MiB, 1000 * _MiB,
+                                    memory_iteration=1))
+        telemetry.set_downtime(100)
+        telemetry.record(_job_stats(20, 1500 * _MiB, 600 * _MiB,
+                                    memory_iteration=2,
+                                    memory_dirty_rate=256,
+                                    memory_page_size=4096))
+        samples = telemetry.report()['samples']
+        self.assertEqual(len(samples), 2)
+        self.assertEqual(samples[0]['throughput'], 100)
+        self.assertNotIn('downtime', samples[0])
+        self.assertNotIn('dirtyRate', samples[0])
+        self.assertEqual(samples[1], {
+            'elapsed': 20.0,
+            'dataTotal': 2100,
+            'dataProcessed': 1500,
+            'dataRemaining': 600,
+            'throughput': 50,
+            'iteration': 2,
+            'dirtyRate': 1,
+            'downtime': 100,
+        })
+
+    def test_marshal_large_memory(self):
+        telemetry = migration.MigrationTelemetry()
+        telemetry.record(_job_stats(10, 3000 * _MiB, 5000 * _MiB,
+                                    memory_dirty_rate=1024 * 1024,
+                                    memory_page_size=4096))
+        data = xmlrpclib.dumps((telemetry.report(),), methodresponse=True)
+        (report,), _ = xmlrpclib.loads(data)
+        self.assertEqual(report['samples'][0]['dataTotal'], 8000)
+        self.assertEqual(report['samples'][0]['dirtyRate'], 4096)
+        self.assertEqual(report['summary']['throughputP50'], 300)
+
+    def test_bounded(self):
+        telemetry = migration.MigrationTelemetry(samples=3)
+        for i in range(1, 6):
+            telemetry.record(_job_stats(i, i * _MiB, 0, memory_iteration=i))
+        report = telemetry.report()
+        self.assertEqual([s['iteration'] for s in report['samples']],
+                         [3, 4, 5])
+        self.assertEqual(report['summary']['samples'], 3)
+        self.assertEqual(report['summary']['iterations'], 5)
+
+    def test_percentiles(self):
+        telemetry = migration.MigrationTelemetry()
+        for i in range(1, 21):
+            # Throughput of i MiB/s over one second
+            telemetry.record(_job_stats(i, i * (i + 1) / 2 * _MiB, 0))
+        summary = telemetry.report()['summary']
+        self.assertEqual(summary['throughputP50'], 10)
+        self.assertEqual(summary['throughputP95'], 19)
+        self.assertNotIn('phases', summary)
+
+    def test_empty(self):
+        summary = migration.MigrationTelemetry().report()['summary']
+        self.assertEqual(summary, {'samples': 0, 'iterations': 0,
+                                   'throughputP50': 0, 'throughputP95': 0})
+
+    def test_phases(self):
+        telemetry = migration.MigrationTelemetry()
+        telemetry.record(_job_stats(10, 1000 * _MiB, 100 * _MiB))
+        summary = telemetry.finish({'time_elapsed': 12000,
+                                    'downtime': 500}, 14.0)
+        self.assertEqual(summary['phases'], {'preCopy': 11.5,
+                                             'downtime': 0.5,
+                                             'postCopyWait': 2.0})
+        self.assertEqual(telemetry.report()['summary'], summary)
+
+    def test_phases_failed(self):
+        telemetry = migration.MigrationTelemetry()
+        telemetry.record(_job_stats(10, 1000 * _MiB, 100 * _MiB))
+        summary = telemetry.finish({}, 11.0)
+        self.assertEqual(summary['phases'], {'preCopy': 10.0,
+                                             'downtime': 0.0,
+                                             'postCopyWait': 1.0})
+
+    def test_format(self):
+        telemetry = migration.MigrationTelemetry()
+        telemetry.record(_job_stats(10, 1000 * _MiB, 0, memory_iteration=3))
+        summary = telemetry.finish({'time_elapsed': 10000,
+                                    'downtime': 200}, 10.0)
+        self.assertEqual(
+            migration._format_summary(summary),
+            '1 samples, 3 iterations, throughput p50 100.0 MiB/s '
+            'p95 100.0 MiB/s, pre-copy 9.8 seconds, downtime 200 ms, '
+            'post-copy wait 0.0 seconds')
@@ -39,10 +39,21 @@ from monkeypatch import MonkeyPatchScope
 
 class Connection:
     def __init__(self, *args):
-        pass
+        self.callbacks = {}
 
-    def domainEventRegisterAny(self, *arg):
-        pass
+    def domainEventRegisterAny(self, dom, eventID, cb, opaque):
+        self.callbacks[eventID] = (cb, opaque)
+
+    def getLibVersion(self):
+        return 1002008
+
+    def dispatchEvent(self, dom, eventID, *args):
+        """
+        Call the callback registered for eventID, like the libvirt event
+        loop does when domain dom emits the event.
+        """
+        cb, opaque = self.callbacks[eventID]
+        cb(self, dom, *(args + (opaque,)))
 
     def listAllNetworks(self, *args):
         return []
@@ -132,6 +143,10 @@ class Domain(object):
     def diskErrors(self):
         return self._diskErrors
 
+    def migrateSetMaxSpeed(self, bandwidth, flags):
+        self._failIfRequested()
+        self.calls.setdefault('migrateSetMaxSpeed', []).append(bandwidth)
+
 
 class GuestAgent(object):
     def __init__(self):
@@ -151,6 +166,12 @@ class GuestAgent(object):
             'memoryStats': {},
             'guestCPUCount': -1}
 
+    def getChannelStats(self):
+        return {
+            'droppedOversize': 0,
+            'droppedInvalid': 0,
+            'throttled': 0}
+
 
 class VirNodeDeviceStub(object):
 
@@ -216,8 +237,8 @@ class SuperVdsm(object):
             raise self._exception()
         return self._pid
 
-    def getVcpuNumaMemoryMapping(self, vmName):
-        return {0: [0, 1], 1: [0, 1], 2: [0, 1], 3: [0, 1]}
+    def getVmNumaMemoryNodes(self, vmName):
+        return [0, 1]
 
 
 class AdvancedStatsFunction:
@@ -0,0 +1,173 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+import errno
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from monkeypatch import MonkeyPatch, MonkeyPatchScope
+from testlib import VdsmTestCase
+from testlib import temporaryPath
+from testValidation import ValidateRunningAsRoot
+
+from vdsm import constants
+from vdsm import utils
+from storage import copyJobs
+from storage import wipe
+
+MB = constants.MEGAB
+
+
+@contextmanager
+def loopDevice(path):
+    rc, out, err = utils.execCmd(["losetup", "--find", "--show", path])
+    if rc != 0:
+        raise RuntimeError("losetup failed: %s" % err)
+    device = out[0].strip()
+    try:
+        yield device
+    finally:
+        utils.execCmd(["losetup", "--detach", device])
+
+
+def readAll(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class ZeroDeviceTests(VdsmTestCase):
+
+    def test_write_fallback(self):
+        # Regular files do not support BLKZEROOUT
+        with temporaryPath(data="x" * 3 * MB) as path:
+            size = wipe.zeroDevice(path)
+            self.assertEqual(size, 3 * MB)
+            self.assertEqual(readAll(path), "\0" * 3 * MB)
+
+    @MonkeyPatch(wipe, "CHUNK_SIZE", MB)
+    def test_partial_chunk(self):
+        data = "x" * (2 * MB + 4096)
+        with temporaryPath(data=data) as path:
+            self.assertEqual(wipe.zeroDevice(path), len(data))
+            self.assertEqual(readAll(path), "\0" * len(data))
+
+    def test_empty(self):
+        with temporaryPath() as path:
+            self.assertEqual(wipe.zeroDevice(path), 0)
+
+    @MonkeyPatch(wipe, "CHUNK_SIZE", MB)
+    def test_bandwidth_limit(self):
+        clock = FakeClock()
+        scheduler = copyJobs.BandwidthScheduler(MB, clock=clock)
+        delays = []
+
+        def sleep(seconds):
+            delays.append(seconds)
+            clock.now += seconds
+
+        with MonkeyPatchScope([(wipe.time, "sleep", sleep)]):
+            with temporaryPath(data="x" * 4 * MB) as path:
+                wipe.zeroDevice(path, scheduler=scheduler)
+        # Zeroing is instant, so every chunk must wait a second at 1 MiB/s
+        self.assertEqual(delays, [1.0, 1.0, 1.0, 1.0])
+
+
+class ZeroDevicesTests(VdsmTestCase):
+
+    def test_low_priority(self):
+        priorities = []
+
+        def zeroDevice(path, scheduler=None):
+            priorities.append(os.nice(0))
+            return 0
+
+        before = os.nice(0)
+        with MonkeyPatchScope([(wipe, "zeroDevice", zeroDevice)]):
+            wipe.zeroDevices(["/dev/fake"], workers=1)
+        self.assertEqual(priorities, [utils.NICENESS.HIGH])
+        # The priority of the calling thread is not changed
+        self.assertEqual(os.nice(0), before)
+
+    def test_results(self):
+        with temporaryPath(data="x" * MB) as path:
+            missing = path + ".missing"
+            results = wipe.zeroDevices([path, missing], workers=2)
+            self.assertEqual(readAll(path), "\0" * MB)
+        self.assertTrue(results[path].succeeded)
+        self.assertEqual(results[path].value, MB)
+        self.assertFalse(results[missing].succeeded)
+        self.assertEqual(results[missing].value.errno, errno.ENOENT)
+
+    def test_bounded_workers(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def zeroDevice(path, scheduler=None):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return 0
+
+        paths = ["/dev/fake%d" % i for i in range(10)]
+        with MonkeyPatchScope([(wipe, "zeroDevice", zeroDevice)]):
+            results = wipe.zeroDevices(paths, workers=3)
+        self.assertEqual(sorted(results), sorted(paths))
+        self.assertTrue(all(r.succeeded for r in results.itervalues()))
+        self.assertEqual(peak[0], 3)
+
+    def test_no_devices(self):
+        self.assertEqual(wipe.zeroDevices([], workers=4), {})
+
+
+class LoopDeviceTests(VdsmTestCase):
+
+    @ValidateRunningAsRoot
+    def test_zeroout(self):
+        size = 64 * MB
+        with temporaryPath(data="x" * size) as path:
+            with loopDevice(path) as device:
+                self.assertEqual(wipe.zeroDevice(device), size)
+                self.assertEqual(readAll(device), "\0" * size)
+
+    @ValidateRunningAsRoot
+    def test_parallel(self):
+        size = 16 * MB
+        with temporaryPath(data="x" * size) as first:
+            with temporaryPath(data="y" * size) as second:
+                with loopDevice(first) as dev1, loopDevice(second) as dev2:
+                    results = wipe.zeroDevices([dev1, dev2], workers=2)
+                    for device in (dev1, dev2):
+                        self.assertTrue(results[device].succeeded)
+                        self.assertEqual(readAll(device), "\0" * size)
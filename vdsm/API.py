@@ -42,6 +42,7 @@ import storage.clusterlock
 import storage.volume
 import storage.sd
 import storage.image
+from virt import migration
 from virt import vmstatus
 from virt.vmdevices import graphics
 from virt.vmdevices import hwclass
@@ -354,6 +355,17 @@ class VM(APIBase):
             return errCode['noVM']
         return v.migrateStatus()
 
+    def getMigrationStats(self):
+        """
+        Report the samples and the summary of the current or the last
+        outgoing migration.
+        """
+        try:
+            v = self._cif.vmContainer[self._UUID]
+        except KeyError:
+            return errCode['noVM']
+        return v.migrationStats()
+
     def getStats(self):
         """
         Obtain statistics of the specified VM
@@ -511,6 +523,8 @@ class VM(APIBase):
             *dstqemu* - remote host address dedicated for migration
             *compressed* - compress repeated pages during live migration
             *autoConverge* - force convergence during live migration
+            *priority* - ``evacuation``/``normal``/``balancing``, the order
+            in which waiting outgoing migrations start
         """
         params['vmId'] = self._UUID
         self.log.debug(params)
@@ -1031,6 +1045,9 @@ class StorageDomain(APIBase):
     def getVolumes(self, storagepoolID, imageID=Image.BLANK_UUID):
         return self._irs.getVolumesList(self._UUID, storagepoolID, imageID)
 
+    def getVolumesInfo(self):
+        return self._irs.getVolumesInfo(self._UUID)
+
     def setDescription(self, description):
         return self._irs.setStorageDomainDescription(self._UUID, description)
 
@@ -1100,6 +1117,9 @@ class StoragePool(APIBase):
     def getSpmStatus(self):
         return self._irs.getSpmStatus(self._UUID)
 
+    def getConnectStats(self):
+        return self._irs.getStoragePoolConnectStats(self._UUID)
+
     def getInfo(self):
         return self._irs.getStoragePoolInfo(self._UUID)
 
@@ -1345,6 +1365,8 @@ class Global(APIBase):
         (stats['vmCount'], stats['vmActive'], stats['vmMigrating'],
          stats['incomingVmMigrations'], stats['outgoingVmMigrations']) = \
             self._countVms()
+        stats['outgoingMigrationScheduler'] = \
+            migration.SourceThread.scheduler.stats()
         (tm_year, tm_mon, tm_day, tm_hour, tm_min, tm_sec,
          dummy, dummy, dummy) = time.gmtime(time.time())
         stats['dateTime'] = '%02d-%02d-%02dT%02d:%02d:%02d GMT' % (
@@ -1419,6 +1441,7 @@ class Global(APIBase):
                 supervdsm.getProxy().setupNetworks(networks, bondings, options)
             return rollbackCtx
         finally:
+            netinfo.invalidate()
             self._cif._networkSemaphore.release()
 
     def addNetwork(self, network, vlan=None, bond=None, nics=None,
@@ -1467,6 +1490,7 @@ class Global(APIBase):
                 return {'status': {'code': e.errCode, 'message': e.message}}
             return {'status': doneCode}
         finally:
+            netinfo.invalidate()
             self._cif._networkSemaphore.release()
 
     def delNetwork(self, network, vlan=None, bond=None, nics=None,
@@ -1522,6 +1546,7 @@ class Global(APIBase):
                 return {'status': {'code': e.errCode, 'message': e.message}}
             return {'status': doneCode}
         finally:
+            netinfo.invalidate()
             self._cif._networkSemaphore.release()
 
     def editNetwork(self, oldBridge, newBridge, vlan=None, bond=None,
@@ -1547,6 +1572,7 @@ class Global(APIBase):
                 supervdsm.getProxy().editNetwork(oldBridge, newBridge, options)
             return rollbackCtx
         finally:
+            netinfo.invalidate()
             self._cif._networkSemaphore.release()
 
     @contextmanager
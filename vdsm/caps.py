@@ -20,6 +20,7 @@
 
 """Collect host capabilities"""
 
+from copy import deepcopy
 import itertools
 import os
 import platform
@@ -30,12 +31,14 @@ import time
 import linecache
 import glob
 import re
+import threading
 from distutils.version import LooseVersion
 
 import libvirt
 import rpm
 
 from vdsm.config import config
+from vdsm.constants import P_VDSM_HOOKS
 from vdsm import libvirtconnection
 import dsaversion
 from vdsm import netinfo
@@ -61,6 +64,11 @@ try:
 except ImportError:
     _glusterEnabled = False
 
+RPM_DB_FILES = ('/var/lib/rpm/Packages', '/var/lib/rpm/rpmdb.sqlite',
+                '/var/lib/dpkg/status')
+ISCSI_INITIATOR_NAME = '/etc/iscsi/initiatorname.iscsi'
+CPU_ONLINE = '/sys/devices/system/cpu/online'
+
 
 class OSName:
     UNKNOWN = 'unknown'
@@ -496,7 +504,7 @@ def _parseKeyVal(lines, delim='='):
 
 def _getIscsiIniName():
     try:
-        with open('/etc/iscsi/initiatorname.iscsi') as f:
+        with open(ISCSI_INITIATOR_NAME) as f:
             return _parseKeyVal(f)['InitiatorName']
     except:
         logging.error('reporting empty InitiatorName', exc_info=True)
@@ -599,16 +607,65 @@ def _getHostdevPassthorughSupport():
         return False
 
 
-def get():
-    targetArch = getTargetArch()
+def _once():
+    return True
 
-    caps = {}
 
-    caps['kvmEnabled'] = \
-        str(config.getboolean('vars', 'fake_kvm_support') or
-            os.path.exists('/dev/kvm')).lower()
+def _always():
+    return None
 
-    cpuInfo = CpuInfo()
+
+def _mtimes(paths):
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def _treeMtimes(top):
+    paths = []
+    for root, dirs, files in os.walk(top):
+        paths.append(root)
+        paths.extend(os.path.join(root, name) for name in files)
+    return tuple(zip(paths, _mtimes(paths)))
+
+
+class _CapsSection(object):
+    """
+    A part of the host capabilities, computed again only when the stamp
+    returned by stamp() changes. A section whose stamp() returns None is
+    computed on every call; by default a section is computed once.
+    """
+
+    def __init__(self, name, compute, stamp=_once):
+        self.name = name
+        self._compute = compute
+        self._stamp = stamp
+        self._lock = threading.Lock()
+        self._value = None
+        self._valueStamp = None
+
+    def get(self):
+        with self._lock:
+            stamp = self._stamp()
+            if stamp is None or stamp != self._valueStamp:
+                logging.debug('Computing %s capabilities', self.name)
+                self._valueStamp = None
+                self._value = self._compute()
+                self._valueStamp = stamp
+            # Callers (and after_get_caps hooks) may modify the result
+            return deepcopy(self._value)
+
+    def invalidate(self):
+        with self._lock:
+            self._valueStamp = None
+
+
+def _getCpuTopologyCaps():
+    caps = {}
     cpuTopology = CpuTopology()
     if config.getboolean('vars', 'report_host_threads_as_cores'):
         caps['cpuCores'] = str(cpuTopology.threads())
@@ -618,7 +675,26 @@ def get():
     caps['cpuThreads'] = str(cpuTopology.threads())
     caps['cpuSockets'] = str(cpuTopology.sockets())
     caps['onlineCpus'] = ','.join(cpuTopology.onlineCpus())
-    caps['cpuSpeed'] = cpuInfo.mhz()
+    return caps
+
+
+def _cpuTopologyStamp():
+    # Changes when cpus are hot plugged or set online or offline.
+    try:
+        with open(CPU_ONLINE) as f:
+            return f.read()
+    except IOError:
+        return None
+
+
+def _getCpuSpeedCaps():
+    return {'cpuSpeed': CpuInfo().mhz()}
+
+
+def _getCpuCaps():
+    targetArch = getTargetArch()
+    caps = {}
+    cpuInfo = CpuInfo()
     if config.getboolean('vars', 'fake_kvm_support'):
         if targetArch == Architecture.X86_64:
             caps['cpuModel'] = 'Intel(Fake) CPU'
@@ -643,23 +719,93 @@ def get():
         caps['cpuModel'] = cpuInfo.model()
         caps['cpuFlags'] = ','.join(cpuInfo.flags() +
                                     _getCompatibleCpuModels())
+    return caps
 
-    caps.update(_getVersionInfo())
-    caps.update(netinfo.get())
+
+def _getNumaCaps():
+    return {'numaNodes': getNumaTopology(),
+            'numaNodeDistance': getNumaNodeDistance(),
+            'autoNumaBalancing': getAutoNumaBalancingInfo()}
+
+
+def _getPackagesCaps():
+    return {'packages2': _getKeyPackages(),
+            'operatingSystem': osversion()}
+
+
+def _packagesStamp():
+    return _mtimes(RPM_DB_FILES)
+
+
+def _getNetworkCaps():
+    caps = netinfo.get()
     _report_legacy_bondings(caps)
     _report_network_qos(caps)
+    return caps
+
+
+def _networkStamp():
+    return netinfo.generation()
+
 
+def _getStorageCaps():
+    return {'ISCSIInitiatorName': _getIscsiIniName(),
+            'HBAInventory': storage.hba.HBAInventory()}
+
+
+def _storageStamp():
+    return (_mtimes([ISCSI_INITIATOR_NAME]),
+            tuple(sorted(glob.glob(storage.hba.FC_HOST_MASK))))
+
+
+def _getHooksCaps():
     try:
-        caps['hooks'] = hooks.installed()
+        return {'hooks': hooks.installed()}
     except:
         logging.debug('not reporting hooks', exc_info=True)
+        return {}
+
+
+def _hooksStamp():
+    return _treeMtimes(P_VDSM_HOOKS)
+
+
+_SECTIONS = (
+    _CapsSection('cpu', _getCpuCaps),
+    _CapsSection('cpuTopology', _getCpuTopologyCaps, _cpuTopologyStamp),
+    _CapsSection('cpuSpeed', _getCpuSpeedCaps, _always),
+    _CapsSection('numa', _getNumaCaps),
+    _CapsSection('packages', _getPackagesCaps, _packagesStamp),
+    _CapsSection('network', _getNetworkCaps, _networkStamp),
+    _CapsSection('storage', _getStorageCaps, _storageStamp),
+    _CapsSection('hooks', _getHooksCaps, _hooksStamp),
+)
+
+
+def invalidate():
+    """
+    Compute all the capabilities sections again on the next get().
+    """
+    for section in _SECTIONS:
+        section.invalidate()
+
+
+def get():
+    targetArch = getTargetArch()
+
+    caps = {}
+
+    caps['kvmEnabled'] = \
+        str(config.getboolean('vars', 'fake_kvm_support') or
+            os.path.exists('/dev/kvm')).lower()
+
+    for section in _SECTIONS:
+        caps.update(section.get())
+
+    caps.update(_getVersionInfo())
 
-    caps['operatingSystem'] = osversion()
     caps['uuid'] = utils.getHostUUID()
-    caps['packages2'] = _getKeyPackages()
     caps['emulatedMachines'] = _getEmulatedMachines(targetArch)
-    caps['ISCSIInitiatorName'] = _getIscsiIniName()
-    caps['HBAInventory'] = storage.hba.HBAInventory()
     caps['vmTypes'] = ['kvm']
 
     caps['memSize'] = str(utils.readMemInfo()['MemTotal'] / 1024)
@@ -679,10 +825,6 @@ def get():
         logging.debug('VirtioRNG DISABLED: libvirt version %s required >= %s',
                       libvirtVer, requiredVer)
 
-    caps['numaNodes'] = getNumaTopology()
-    caps['numaNodeDistance'] = getNumaNodeDistance()
-    caps['autoNumaBalancing'] = getAutoNumaBalancingInfo()
-
     caps['selinux'] = _getSELinux()
 
     liveSnapSupported = _getLiveSnapshotSupport(targetArch)
@@ -35,6 +35,7 @@ import libvirt
 from vdsm.sslutils import SSLContext
 from vdsm import libvirtconnection
 from vdsm import constants
+from vdsm import netinfo
 from vdsm import utils
 import caps
 import blkid
@@ -55,6 +56,15 @@ try:
 except ImportError:
     _glusterEnabled = False
 
+# Events missing in older libvirt bindings are never registered
+_EVENT_ID_BLOCK_JOB_2 = getattr(
+    libvirt, 'VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2', None)
+_EVENT_ID_BALLOON_CHANGE = getattr(
+    libvirt, 'VIR_DOMAIN_EVENT_ID_BALLOON_CHANGE', None)
+_EVENT_ID_DEVICE_REMOVED = getattr(
+    libvirt, 'VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED', None)
+_EVENT_ID_TUNABLE = getattr(libvirt, 'VIR_DOMAIN_EVENT_ID_TUNABLE', None)
+
 
 class clientIF(object):
     """
@@ -95,6 +105,7 @@ class clientIF(object):
             self.vmContainer = {}
             self._hostStats = sampling.HostStatsThread(log=log)
             self._hostStats.start()
+            self._startNetInfoMonitoring()
             self.lastRemoteAccess = 0
             self._enabled = True
             self._netConfigDirty = False
@@ -213,6 +224,13 @@ class clientIF(object):
                 stomp_detector = StompDetector(json_binding)
                 self._acceptor.add_detector(stomp_detector)
 
+    def _startNetInfoMonitoring(self):
+        try:
+            netinfo.startMonitoring()
+        except Exception:
+            self.log.exception("Cannot monitor network events, network "
+                               "information will not be cached")
+
     def _prepareMOM(self):
         momconf = config.get("mom", "conf")
 
@@ -239,6 +257,7 @@ class clientIF(object):
             self._enabled = False
             self.channelListener.stop()
             self._hostStats.stop()
+            netinfo.stopMonitoring()
             for vm_obj in self.vmContainer.values():
                 vm_obj.stopVmStats()
             if self.mom:
@@ -555,6 +574,19 @@ class clientIF(object):
             elif eventid == libvirt.VIR_DOMAIN_EVENT_ID_WATCHDOG:
                 action, = args[:-1]
                 v._onWatchdogEvent(action)
+            elif eventid in (libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB,
+                             _EVENT_ID_BLOCK_JOB_2):
+                disk, jobType, status = args[:-1]
+                v._onBlockJobEvent(disk, jobType, status)
+            elif eventid == _EVENT_ID_BALLOON_CHANGE:
+                actual, = args[:-1]
+                v._onBalloonChange(actual)
+            elif eventid == _EVENT_ID_DEVICE_REMOVED:
+                alias, = args[:-1]
+                v._onDeviceRemoved(alias)
+            elif eventid == _EVENT_ID_TUNABLE:
+                params, = args[:-1]
+                v._onTunableEvent(params)
             else:
                 v.log.warning('unknown eventid %s args %s', eventid, args)
         except:
@@ -19,6 +19,7 @@
 #
 
 import xml.etree.cElementTree as etree
+import threading
 import time
 import calendar
 
@@ -33,6 +34,9 @@ _glusterCommandPath = utils.CommandPath("gluster",
                                         )
 _TIME_ZONE = time.tzname[0]
 
+# Seconds a query result is reused by identical queries
+QUERY_CACHE_TTL = 5
+
 
 if hasattr(etree, 'ParseError'):
     _etreeExceptions = (etree.ParseError, AttributeError, ValueError)
@@ -95,12 +99,102 @@ class SnapshotStatus:
     DEACTIVATED = 'DEACTIVATED'
 
 
-def _execGluster(cmd):
-    return utils.execCmd(cmd)
+class _QueryCache(object):
+    """
+    Share the results of identical read-only gluster commands.
+
+    Concurrent identical queries wait for a single execution of the
+    command, and its result is reused for ttl seconds. Failures, and results
+    rejected by the cacheable predicate, are not cached. invalidate() must
+    be called after any command that may change the result of a query.
+
+    The same result object is returned to all the callers sharing it, so
+    callers must not modify it.
+    """
+
+    def __init__(self, ttl, clock=utils.monotonic_time):
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, func, cacheable=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.done.is_set() and \
+                    self._clock() - entry.time > self._ttl:
+                entry = None
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _QueryResult()
+
+        if owner:
+            try:
+                entry.value = func()
+            except Exception as e:
+                entry.error = e
+                self._discard(key, entry)
+                raise
+            else:
+                if cacheable is not None and not cacheable(entry.value):
+                    self._discard(key, entry)
+            finally:
+                entry.time = self._clock()
+                entry.done.set()
+            return entry.value
+
+        entry.done.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
 
+    def _discard(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
 
-def _execGlusterXml(cmd):
+
+class _QueryResult(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.time = None
+        self.value = None
+        self.error = None
+
+
+_queryCache = _QueryCache(QUERY_CACHE_TTL)
+
+
+def _execGluster(cmd, query=False):
+    """
+    Run a gluster command. Results of queries are shared through the query
+    cache; any other command invalidates it.
+    """
+    if query:
+        return _queryCache.get(tuple(cmd), lambda: utils.execCmd(cmd),
+                               cacheable=lambda res: res[0] == 0)
+    try:
+        return utils.execCmd(cmd)
+    finally:
+        _queryCache.invalidate()
+
+
+def _execGlusterXml(cmd, query=False):
     cmd.append('--xml')
+    if query:
+        return _queryCache.get(tuple(cmd), lambda: _runGlusterXml(cmd))
+    try:
+        return _runGlusterXml(cmd)
+    finally:
+        _queryCache.invalidate()
+
+
+def _runGlusterXml(cmd):
     rc, out, err = utils.execCmd(cmd)
     if rc != 0:
         raise ge.GlusterCmdExecFailedException(rc, out, err)
@@ -136,7 +230,7 @@ def _getGlusterHostName():
 @makePublic
 def hostUUIDGet():
     command = _getGlusterSystemCmd() + ["uuid", "get"]
-    rc, out, err = _execGluster(command)
+    rc, out, err = _execGluster(command, query=True)
     if rc == 0:
         for line in out:
             if line.startswith('UUID: '):
@@ -341,7 +435,7 @@ def volumeStatus(volumeName, brick=None, option=None):
     if option:
         command.append(option)
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeStatusFailedException(rc=e.rc, err=e.err)
     try:
@@ -489,7 +583,7 @@ def volumeInfo(volumeName=None, remoteServer=None):
     if volumeName:
         command.append(volumeName)
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumesListFailedException(rc=e.rc, err=e.err)
     try:
@@ -580,7 +674,8 @@ def _parseVolumeSetHelpXml(out):
 
 @makePublic
 def volumeSetHelpXml():
-    rc, out, err = _execGluster(_getGlusterVolCmd() + ["set", 'help-xml'])
+    rc, out, err = _execGluster(_getGlusterVolCmd() + ["set", 'help-xml'],
+                                query=True)
     if rc:
         raise ge.GlusterVolumeSetHelpXmlFailedException(rc, out, err)
     else:
@@ -715,7 +810,7 @@ def _parseVolumeRebalanceRemoveBrickStatus(xmltree, mode):
 def volumeRebalanceStatus(volumeName):
     command = _getGlusterVolCmd() + ["rebalance", volumeName, "status"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException, e:
         raise ge.GlusterVolumeRebalanceStatusFailedException(rc=e.rc,
                                                              err=e.err)
@@ -769,7 +864,8 @@ def volumeReplaceBrickStatus(volumeName, existingBrick, newBrick):
     rc, out, err = _execGluster(_getGlusterVolCmd() + ["replace-brick",
                                                        volumeName,
                                                        existingBrick, newBrick,
-                                                       "status"])
+                                                       "status"],
+                                query=True)
     if rc:
         raise ge.GlusterVolumeReplaceBrickStatusFailedException(rc, out,
                                                                 err)
@@ -844,7 +940,7 @@ def volumeRemoveBrickStatus(volumeName, brickList, replicaCount=0):
         command += ["replica", "%s" % replicaCount]
     command += brickList + ["status"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException, e:
         raise ge.GlusterVolumeRemoveBrickStatusFailedException(rc=e.rc,
                                                                err=e.err)
@@ -934,7 +1030,7 @@ def peerStatus():
     """
     command = _getGlusterPeerCmd() + ["status"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterHostsListFailedException(rc=e.rc, err=e.err)
     try:
@@ -1027,7 +1123,7 @@ def volumeProfileInfo(volumeName, nfs=False):
     if nfs:
         command += ["nfs"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterVolumeProfileInfoFailedException(rc=e.rc, err=e.err)
     try:
@@ -1075,7 +1171,7 @@ def _parseVolumeTasks(tree):
 def volumeTasks(volumeName="all"):
     command = _getGlusterVolCmd() + ["status", volumeName, "tasks"]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException, e:
         raise ge.GlusterVolumeTasksFailedException(rc=e.rc, err=e.err)
     try:
@@ -1202,7 +1298,7 @@ def volumeGeoRepStatus(volumeName=None, remoteHost=None,
         command.append("detail")
 
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterGeoRepStatusFailedException(rc=e.rc, err=e.err)
     try:
@@ -1540,7 +1636,7 @@ def snapshotInfo(volumeName=None):
     if volumeName:
         command += ["volume", volumeName]
     try:
-        xmltree = _execGlusterXml(command)
+        xmltree = _execGlusterXml(command, query=True)
     except ge.GlusterCmdFailedException as e:
         raise ge.GlusterSnapshotInfoFailedException(rc=e.rc, err=e.err)
     try:
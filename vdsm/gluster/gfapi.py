@@ -22,6 +22,7 @@ from ctypes.util import find_library
 import os
 
 import exception as ge
+from . import glfspool
 from . import makePublic
 
 
@@ -95,20 +96,13 @@ def glfsFini(fs, volumeId):
         raise ge.GlfsFiniException(rc=rc)
 
 
-@makePublic
-def volumeStatvfsGet(volumeId, host=GLUSTER_VOL_HOST,
-                     port=GLUSTER_VOL_PORT,
-                     protocol=GLUSTER_VOL_PROTOCOL):
+def glfsStatvfs(fs):
     statvfsdata = StatVfsStruct()
 
-    fs = glfsInit(volumeId, host, port, protocol)
-
     rc = _glfs_statvfs(fs, GLUSTER_VOL_PATH, ctypes.byref(statvfsdata))
     if rc != 0:
         raise ge.GlfsStatvfsException(rc=rc)
 
-    glfsFini(fs, volumeId)
-
     # To convert to os.statvfs_result we need to pass tuple/list in
     # following order: bsize, frsize, blocks, bfree, bavail, files,
     #                  ffree, favail, flag, namemax
@@ -124,6 +118,17 @@ def volumeStatvfsGet(volumeId, host=GLUSTER_VOL_HOST,
                               statvfsdata.f_namemax))
 
 
+@makePublic
+def volumeStatvfsGet(volumeId, host=GLUSTER_VOL_HOST,
+                     port=GLUSTER_VOL_PORT,
+                     protocol=GLUSTER_VOL_PROTOCOL):
+    fs = glfsInit(volumeId, host, port, protocol)
+    try:
+        return glfsStatvfs(fs)
+    finally:
+        glfsFini(fs, volumeId)
+
+
 def checkVolumeEmpty(volumeId, host=GLUSTER_VOL_HOST,
                      port=GLUSTER_VOL_PORT,
                      protocol=GLUSTER_VOL_PROTOCOL):
@@ -196,12 +201,13 @@ _glfs_readdir = ctypes.CFUNCTYPE(ctypes.POINTER(DirentStruct),
                                  ctypes.c_void_p)(('glfs_readdir', _lib))
 
 
-# This is a workaround for memory leak caused by the
-# libgfapi(BZ:1093594) used to get volume statistics.
-# Memory accumulates every time the api is invoked to
-# avoid that, this file is executed as script.This is
-# a temporary fix for BZ:1142647. This can be reverted
-# back once the memory leak issue is fixed in libgfapi.
+# libgfapi leaks memory on every glfs_init (BZ:1093594), and a hung or
+# crashing libgfapi call must not hang or crash supervdsm. Requests are
+# therefore executed by running this file as a script (BZ:1142647). Volume
+# statistics are requested periodically for every volume, so they are
+# served by a long-lived helper process per volume, keeping its handle
+# initialized. A helper that fails or does not reply in time is killed and
+# replaced.
 
 import sys
 import json
@@ -210,26 +216,34 @@ import argparse
 from vdsm import constants
 from vdsm import utils
 
+# Seconds to wait for a reply from a helper process
+HELPER_TIMEOUT = 30
 
-@makePublic
-def volumeStatvfs(volumeName, host=GLUSTER_VOL_HOST,
-                  port=GLUSTER_VOL_PORT,
-                  protocol=GLUSTER_VOL_PROTOCOL):
-    module = "gluster.gfapi"
-    command = [constants.EXT_PYTHON, '-m', module, '-v', volumeName,
-               '-p', str(port), '-H', host, '-t', protocol, '-c', 'statvfs']
 
+def _scriptCommand(volumeName, host, port, protocol, command):
+    return [constants.EXT_PYTHON, '-m', "gluster.gfapi", '-v', volumeName,
+            '-p', str(port), '-H', host, '-t', protocol, '-c', command]
+
+
+def _scriptEnv():
     # to include /usr/share/vdsm in python path
     env = os.environ.copy()
     env['PYTHONPATH'] = "%s:%s" % (
         env.get("PYTHONPATH", ""), constants.P_VDSM)
     env['PYTHONPATH'] = ":".join(map(os.path.abspath,
                                      env['PYTHONPATH'].split(":")))
+    return env
 
-    rc, out, err = utils.execCmd(command, raw=True, env=env)
-    if rc != 0:
-        raise ge.GlfsStatvfsException(rc, [out], [err])
-    res = json.loads(out)
+
+def _statvfsDict(res):
+    return {'f_blocks': res.f_blocks, 'f_bfree': res.f_bfree,
+            'f_bsize': res.f_bsize, 'f_frsize': res.f_frsize,
+            'f_bavail': res.f_bavail, 'f_files': res.f_files,
+            'f_ffree': res.f_ffree, 'f_favail': res.f_favail,
+            'f_flag': res.f_flag, 'f_namemax': res.f_namemax}
+
+
+def _statvfsResult(res):
     return os.statvfs_result((res['f_bsize'],
                               res['f_frsize'],
                               res['f_blocks'],
@@ -242,27 +256,132 @@ def volumeStatvfs(volumeName, host=GLUSTER_VOL_HOST,
                               res['f_namemax']))
 
 
+class _Helper(object):
+    """
+    A child process keeping an initialized handle of a volume, serving
+    requests written as lines to its stdin, see serve().
+    """
+
+    def __init__(self, volumeName, host, port, protocol,
+                 timeout=HELPER_TIMEOUT):
+        self._volumeName = volumeName
+        self._timeout = timeout
+        self._buf = ""
+        self._proc = utils.execCmd(
+            _scriptCommand(volumeName, host, port, protocol, 'serve'),
+            sync=False, env=_scriptEnv())
+        try:
+            self._reply(ge.GlfsInitException)
+        except:
+            self.close()
+            raise
+
+    def statvfs(self):
+        self._request("statvfs")
+        return _statvfsResult(self._reply(ge.GlfsStatvfsException))
+
+    def close(self):
+        """
+        Kill the process, releasing its handle.
+        """
+        if self._proc.returncode is None:
+            self._proc.kill()
+        self._proc.wait()
+
+    def _request(self, command):
+        if self._proc.returncode is not None:
+            raise ge.GlusterLibgfapiException(
+                rc=self._proc.returncode,
+                err=["Helper of volume %s exited" % self._volumeName])
+        self._proc.stdin.write(command + "\n")
+        self._proc.stdin.flush()
+
+    def _reply(self, error):
+        def received():
+            data = self._proc.stdout.read1(4096)
+            if data:
+                self._buf += data
+            return "\n" in self._buf
+
+        if self._proc.wait(self._timeout, cond=received):
+            # Exited, read the reply it may have written
+            received()
+        line, sep, self._buf = self._buf.partition("\n")
+        if not sep:
+            if self._proc.returncode is None:
+                raise error(err=["No reply from helper of volume %s in %d "
+                                 "seconds" % (self._volumeName,
+                                              self._timeout)])
+            raise error(rc=self._proc.returncode,
+                        err=utils.stripNewLines(self._proc.stderr))
+        reply = json.loads(line)
+        if "error" in reply:
+            raise error(rc=reply["error"]["rc"], err=reply["error"]["err"])
+        return reply["result"]
+
+
+def _closeHelper(helper, volumeName):
+    helper.close()
+
+
+_pool = glfspool.GlfsPool(_Helper, _closeHelper)
+
+
+@makePublic
+def volumeStatvfs(volumeName, host=GLUSTER_VOL_HOST,
+                  port=GLUSTER_VOL_PORT,
+                  protocol=GLUSTER_VOL_PROTOCOL):
+    return _pool.run(lambda helper: helper.statvfs(), volumeName, host, port,
+                     protocol)
+
+
 @makePublic
 def volumeEmptyCheck(volumeName, host=GLUSTER_VOL_HOST,
                      port=GLUSTER_VOL_PORT,
                      protocol=GLUSTER_VOL_PROTOCOL):
-    module = "gluster.gfapi"
-    command = [constants.EXT_PYTHON, '-m', module, '-v', volumeName,
-               '-p', str(port), '-H', host, '-t', protocol, '-c', 'readdir']
-
-    # to include /usr/share/vdsm in python path
-    env = os.environ.copy()
-    env['PYTHONPATH'] = "%s:%s" % (
-        env.get("PYTHONPATH", ""), constants.P_VDSM)
-    env['PYTHONPATH'] = ":".join(map(os.path.abspath,
-                                     env['PYTHONPATH'].split(":")))
-
-    rc, out, err = utils.execCmd(command, raw=True, env=env)
+    command = _scriptCommand(volumeName, host, port, protocol, 'readdir')
+    rc, out, err = utils.execCmd(command, raw=True, env=_scriptEnv())
     if rc != 0:
         raise ge.GlusterVolumeEmptyCheckFailedException(rc, [out], [err])
     return out.upper() == "TRUE"
 
 
+def _writeReply(reply):
+    sys.stdout.write(json.dumps(reply) + "\n")
+    sys.stdout.flush()
+
+
+def _errorReply(e):
+    return {"error": {"rc": e.rc, "err": list(e.err)}}
+
+
+def serve(volumeId, host, port, protocol):
+    """
+    Keep a handle of the volume, replying to the requests read from stdin
+    until stdin is closed. Every reply is a line of json, either
+    {"result": value} or {"error": {"rc": rc, "err": [lines]}}. The first
+    reply reports the initialization of the handle.
+    """
+    try:
+        fs = glfsInit(volumeId, host, port, protocol)
+    except ge.GlusterException as e:
+        _writeReply(_errorReply(e))
+        return
+    try:
+        _writeReply({"result": True})
+        for line in iter(sys.stdin.readline, ""):
+            request = line.strip()
+            try:
+                if request != "statvfs":
+                    raise ge.GlusterLibgfapiException(
+                        err=["Unknown request %r" % request])
+                _writeReply({"result": _statvfsDict(glfsStatvfs(fs))})
+            except ge.GlusterException as e:
+                _writeReply(_errorReply(e))
+    finally:
+        glfsFini(fs, volumeId)
+
+
 # This file is modified to act as a script which can retrive
 # volume statistics using libgfapi. This can be reverted
 # after the memory leak issue is resolved in libgfapi.
@@ -287,12 +406,9 @@ if __name__ == '__main__':
     if args.command.upper() == 'STATVFS':
         res = volumeStatvfsGet(args.volume, args.host,
                                int(args.port), args.protocol)
-        json.dump({'f_blocks': res.f_blocks, 'f_bfree': res.f_bfree,
-                   'f_bsize': res.f_bsize, 'f_frsize': res.f_frsize,
-                   'f_bavail': res.f_bavail, 'f_files': res.f_files,
-                   'f_ffree': res.f_ffree, 'f_favail': res.f_favail,
-                   'f_flag': res.f_flag, 'f_namemax': res.f_namemax},
-                  sys.stdout)
+        json.dump(_statvfsDict(res), sys.stdout)
+    elif args.command.upper() == 'SERVE':
+        serve(args.volume, args.host, int(args.port), args.protocol)
     elif args.command.upper() == 'READDIR':
         try:
             result = checkVolumeEmpty(args.volume,
@@ -0,0 +1,186 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+"""
+A pool of long lived libgfapi handles.
+
+Initializing a gfapi client fetches the volume file and connects to all the
+bricks of the volume, which takes much longer than the request made with it.
+The pool keeps one initialized handle per volume, reusing it for every
+request. Handles unused for idleTimeout seconds are finalized, and a handle
+that failed a request is finalized and replaced by a new one. At most
+maxHandles handles are kept; the least recently used handles are finalized
+first.
+"""
+
+import logging
+import threading
+
+from vdsm import utils
+
+import exception as ge
+
+IDLE_TIMEOUT = 600
+
+MAX_HANDLES = 32
+
+
+class _Entry(object):
+
+    def __init__(self, key):
+        self.key = key
+        self.lock = threading.Lock()
+        self.fs = None
+        self.lastUsed = None
+        self.removed = False
+
+
+class GlfsPool(object):
+    """
+    Keep an initialized handle per (volumeId, host, port, protocol).
+
+    connect(volumeId, host, port, protocol) returns a new handle, and
+    disconnect(fs, volumeId) finalizes it. Requests on the same volume are
+    serialized.
+    """
+    log = logging.getLogger("Gluster.GlfsPool")
+
+    def __init__(self, connect, disconnect, idleTimeout=IDLE_TIMEOUT,
+                 maxHandles=MAX_HANDLES, clock=utils.monotonic_time):
+        self._connect = connect
+        self._disconnect = disconnect
+        self._idleTimeout = idleTimeout
+        self._maxHandles = maxHandles
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def run(self, func, volumeId, host, port, protocol):
+        """
+        Return func(fs) using the pooled handle of the volume.
+
+        If func fails with a gfapi error on a reused handle, the handle may
+        have lost its connection; it is replaced and func is retried once.
+        """
+        self.evictIdle()
+        key = (volumeId, host, port, protocol)
+        while True:
+            entry = self._entry(key)
+            entry.lock.acquire()
+            if not entry.removed:
+                break
+            # Evicted while we were waiting, use a new entry
+            entry.lock.release()
+        try:
+            reused = entry.fs is not None
+            try:
+                return self._call(entry, func)
+            except ge.GlusterLibgfapiException:
+                if not reused:
+                    raise
+                self.log.warning("Request on volume %s failed, reconnecting",
+                                 volumeId, exc_info=True)
+            return self._call(entry, func)
+        finally:
+            entry.lock.release()
+
+    def evictIdle(self):
+        """
+        Finalize the handles unused for idleTimeout seconds and the least
+        recently used handles beyond maxHandles, and forget the volumes
+        without a handle.
+        """
+        deadline = self._clock() - self._idleTimeout
+        with self._lock:
+            # Most recently used first
+            entries = sorted(self._entries.itervalues(),
+                             key=lambda entry: entry.lastUsed, reverse=True)
+        for i, entry in enumerate(entries):
+            # Skip handles in use, they are not idle
+            if not entry.lock.acquire(False):
+                continue
+            try:
+                if entry.lastUsed is not None and entry.lastUsed < deadline:
+                    self.log.debug("Closing idle handle of volume %s",
+                                   entry.key[0])
+                    self._close(entry)
+                elif entry.fs is not None and i >= self._maxHandles:
+                    self.log.debug("Closing least recently used handle of "
+                                   "volume %s", entry.key[0])
+                    self._close(entry)
+                if entry.fs is None:
+                    self._remove(entry)
+            finally:
+                entry.lock.release()
+
+    @property
+    def size(self):
+        """
+        The number of volumes in the pool.
+        """
+        with self._lock:
+            return len(self._entries)
+
+    def close(self):
+        """
+        Finalize all the handles.
+        """
+        with self._lock:
+            entries = self._entries.values()
+            self._entries.clear()
+        for entry in entries:
+            with entry.lock:
+                entry.removed = True
+                self._close(entry)
+
+    def _entry(self, key):
+        with self._lock:
+            try:
+                return self._entries[key]
+            except KeyError:
+                entry = self._entries[key] = _Entry(key)
+                return entry
+
+    def _remove(self, entry):
+        with self._lock:
+            entry.removed = True
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+
+    def _call(self, entry, func):
+        if entry.fs is None:
+            entry.fs = self._connect(*entry.key)
+        try:
+            result = func(entry.fs)
+        except:
+            self._close(entry)
+            raise
+        entry.lastUsed = self._clock()
+        return result
+
+    def _close(self, entry):
+        fs, entry.fs = entry.fs, None
+        entry.lastUsed = None
+        if fs is None:
+            return
+        try:
+            self._disconnect(fs, entry.key[0])
+        except Exception:
+            self.log.warning("Failed to finalize handle of volume %s",
+                             entry.key[0], exc_info=True)
@@ -18,8 +18,13 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import collections
+import logging
+import threading
 import xml.etree.ElementTree as etree
 
+import libvirt
+
 import hooks
 from vdsm import libvirtconnection
 import supervdsm
@@ -28,6 +33,11 @@ CAPABILITY_TO_XML_ATTR = {'pci': 'pci',
                           'scsi': 'scsi',
                           'usb_device': 'usb'}
 
+# Node device events are not available in older libvirt versions
+_LIFECYCLE_EVENT = getattr(libvirt, 'VIR_NODE_DEVICE_EVENT_ID_LIFECYCLE',
+                           None)
+_DELETED_EVENT = getattr(libvirt, 'VIR_NODE_DEVICE_EVENT_DELETED', None)
+
 
 def _name_to_pci_path(device_name):
     return device_name[4:].replace('_', '.').replace('.', ':', 2)
@@ -130,12 +140,133 @@ def _get_device_ref_and_params(device_name):
     return libvirt_device, _parse_device_params(libvirt_device.XMLDesc(0))
 
 
-def _get_devices_from_libvirt():
+class _DeviceCache(object):
     """
-    Returns all available host devices from libvirt parsed to dict
+    The parsed params of the host devices, indexed by name, capability and
+    parent.
+
+    Parsing a device takes a libvirt call and a sysfs lookup, so devices
+    are parsed once. If libvirt reports node device lifecycle events, the
+    cache is updated from the events. Otherwise the device names are listed
+    on every refresh, and only the devices added since are parsed.
     """
-    return dict((device.name(), _parse_device_params(device.XMLDesc(0)))
-                for device in libvirtconnection.get().listAllDevices(0))
+    log = logging.getLogger('hostdev.DeviceCache')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events_lock = threading.Lock()
+        self._conn = None
+        self._use_events = False
+        self._events = {}  # {device_name: event}, from the event loop
+        self._devices = {}
+        self._by_caps = collections.defaultdict(set)
+        self._by_parent = collections.defaultdict(set)
+
+    def devices(self, caps=None):
+        """
+        Return {device_name: params} of the devices having one of the
+        given capabilities, or of all devices if caps is empty.
+        """
+        with self._lock:
+            self._refresh()
+            if not caps:
+                names = self._devices.keys()
+            else:
+                names = set()
+                for cap in caps:
+                    names.update(self._by_caps.get(cap, ()))
+            return dict((name, self._devices[name]) for name in names)
+
+    def get(self, device_name):
+        """
+        Return the params of device_name, or None if it is not known.
+        """
+        with self._lock:
+            self._refresh()
+            return self._devices.get(device_name)
+
+    def children(self, device_name):
+        """
+        Return the names of the devices whose parent is device_name.
+        """
+        with self._lock:
+            self._refresh()
+            return set(self._by_parent.get(device_name, ()))
+
+    def _refresh(self):
+        conn = libvirtconnection.get()
+        if conn is not self._conn:
+            self._reset(conn)
+        elif self._use_events:
+            self._apply_events(conn)
+        else:
+            self._rescan(conn)
+
+    def _reset(self, conn):
+        self._conn = conn
+        self._devices.clear()
+        self._by_caps.clear()
+        self._by_parent.clear()
+        with self._events_lock:
+            self._events.clear()
+        # Register before listing the devices so no change is missed
+        self._use_events = self._register_events(conn)
+        self._rescan(conn)
+
+    def _register_events(self, conn):
+        if _LIFECYCLE_EVENT is None:
+            return False
+        try:
+            conn.nodeDeviceEventRegisterAny(None, _LIFECYCLE_EVENT,
+                                            self._on_lifecycle_event, None)
+        except (AttributeError, libvirt.libvirtError):
+            self.log.debug("Node device events not supported, listing "
+                           "devices on every refresh", exc_info=True)
+            return False
+        return True
+
+    def _on_lifecycle_event(self, conn, dev, event, detail, opaque):
+        with self._events_lock:
+            self._events[dev.name()] = event
+
+    def _apply_events(self, conn):
+        with self._events_lock:
+            events, self._events = self._events, {}
+        for name, event in events.iteritems():
+            self._remove(name)
+            if event == _DELETED_EVENT:
+                continue
+            try:
+                device = conn.nodeDeviceLookupByName(name)
+                self._add(name, _parse_device_params(device.XMLDesc(0)))
+            except libvirt.libvirtError:
+                self.log.debug("Device %s is gone", name, exc_info=True)
+
+    def _rescan(self, conn):
+        devices = dict((device.name(), device)
+                       for device in conn.listAllDevices(0))
+        for name in set(self._devices).difference(devices):
+            self._remove(name)
+        for name, device in devices.iteritems():
+            if name not in self._devices:
+                self._add(name, _parse_device_params(device.XMLDesc(0)))
+
+    def _add(self, name, params):
+        self._devices[name] = params
+        self._by_caps[params['capability']].add(name)
+        if 'parent' in params:
+            self._by_parent[params['parent']].add(name)
+
+    def _remove(self, name):
+        params = self._devices.pop(name, None)
+        if params is None:
+            return
+        self._by_caps[params['capability']].discard(name)
+        if 'parent' in params:
+            self._by_parent[params['parent']].discard(name)
+
+
+_device_cache = _DeviceCache()
 
 
 def list_by_caps(caps=None):
@@ -150,21 +281,21 @@ def list_by_caps(caps=None):
             will be returned (e.g. ['pci', 'usb'] -> pci and usb devices)
     """
     devices = {}
-    libvirt_devices = _get_devices_from_libvirt()
+    libvirt_devices = _device_cache.devices(caps)
 
-    for devName, params in libvirt_devices.items():
-        if caps and params['capability'] not in caps:
-            continue
-
-        devices[devName] = {'params': params}
+    for devName, params in libvirt_devices.iteritems():
+        # Copied since hooks may modify the devices
+        devices[devName] = {'params': dict(params)}
 
     devices = hooks.after_hostdev_list_by_caps(devices)
     return devices
 
 
 def get_device_params(device_name):
-    _, device_params = _get_device_ref_and_params(device_name)
-    return device_params
+    device_params = _device_cache.get(device_name)
+    if device_params is None:
+        _, device_params = _get_device_ref_and_params(device_name)
+    return dict(device_params)
 
 
 def detach_detachable(device_name):
@@ -204,19 +204,21 @@ class Iproute2(Configurator):
 
     @staticmethod
     def configureSourceRoute(routes, rules, device):
-        for route in routes:
-            routeAdd(route)
+        with ipwrapper.batch():
+            for route in routes:
+                routeAdd(route)
 
-        for rule in rules:
-            ruleAdd(rule)
+            for rule in rules:
+                ruleAdd(rule)
 
     @staticmethod
     def removeSourceRoute(routes, rules, device):
-        for route in routes:
-            routeDel(route)
+        with ipwrapper.batch():
+            for route in routes:
+                routeDel(route)
 
-        for rule in rules:
-            ruleDel(rule)
+            for rule in rules:
+                ruleDel(rule)
 
 
 class ConfigApplier(object):
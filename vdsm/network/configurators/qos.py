@@ -39,11 +39,12 @@ def configure_outbound(qosOutbound, top_device):
     device = models.hierarchy_backing_device(top_device).name
     root_qdisc = _root_qdisc(tc._qdiscs(device))
     class_id = '%x' % (_NON_VLANNED_ID if vlan_tag is None else vlan_tag)
-    if not root_qdisc or root_qdisc['kind'] != _SHAPING_QDISC_KIND:
-        _fresh_qdisc_conf_out(device, vlan_tag, class_id, qosOutbound)
-    else:
-        _qdisc_conf_out(device, root_qdisc['handle'], vlan_tag, class_id,
-                        qosOutbound)
+    with tc.batch():
+        if not root_qdisc or root_qdisc['kind'] != _SHAPING_QDISC_KIND:
+            _fresh_qdisc_conf_out(device, vlan_tag, class_id, qosOutbound)
+        else:
+            _qdisc_conf_out(device, root_qdisc['handle'], vlan_tag, class_id,
+                            qosOutbound)
 
 
 def remove_outbound(top_device):
@@ -54,39 +55,38 @@ def remove_outbound(top_device):
     class_id = '%x' % (_NON_VLANNED_ID if vlan_tag is None else vlan_tag)
     MISSING_OBJ_ERR_CODES = (errno.EINVAL, errno.ENOENT, errno.EOPNOTSUPP)
 
-    try:
-        tc.filter.delete(
-            device, pref=_NON_VLANNED_ID if vlan_tag is None else vlan_tag)
-    except tc.TrafficControlException as tce:
-        if tce.errCode not in MISSING_OBJ_ERR_CODES:  # No filter exists
-            raise
-
+    # Read the configuration before queueing the changes in the batch
     device_qdiscs = list(tc._qdiscs(device))
-    if not device_qdiscs:
-        return
-    root_qdisc_handle = _root_qdisc(device_qdiscs)['handle']
-    try:
-        tc.cls.delete(device, classid=root_qdisc_handle + class_id)
-    except tc.TrafficControlException as tce:
-        if tce.errCode not in MISSING_OBJ_ERR_CODES:  # No class exists
-            raise
-
-    if not _uses_classes(device, root_qdisc_handle=root_qdisc_handle):
-        try:
-            tc._qdisc_del(device)
-            tc._qdisc_del(device, kind='ingress')
-        except tc.TrafficControlException as tce:
-            if tce.errCode not in MISSING_OBJ_ERR_CODES:  # No qdisc
-                raise
-
-
-def _uses_classes(device, root_qdisc_handle=None):
+    if device_qdiscs:
+        root_qdisc_handle = _root_qdisc(device_qdiscs)['handle']
+        classid = root_qdisc_handle + class_id
+        uses_classes = _uses_classes(
+            device, root_qdisc_handle=root_qdisc_handle, exclude=classid)
+
+    with tc.batch():
+        with tc.tolerate(*MISSING_OBJ_ERR_CODES):  # No filter exists
+            tc.filter.delete(
+                device, pref=_NON_VLANNED_ID if vlan_tag is None else vlan_tag)
+
+        if not device_qdiscs:
+            return
+        with tc.tolerate(*MISSING_OBJ_ERR_CODES):  # No class exists
+            tc.cls.delete(device, classid=classid)
+
+        if not uses_classes:
+            with tc.tolerate(*MISSING_OBJ_ERR_CODES):  # No qdisc
+                tc._qdisc_del(device)
+                tc._qdisc_del(device, kind='ingress')
+
+
+def _uses_classes(device, root_qdisc_handle=None, exclude=None):
     """Returns true iff there's traffic classes in the device, ignoring the
-    root class and a default unused class"""
+    root class, a default unused class and the exclude class (about to be
+    removed)"""
     if root_qdisc_handle is None:
         root_qdisc_handle = _root_qdisc(tc._qdiscs(device))['handle']
     classes = [cls for cls in tc.classes(device, parent=root_qdisc_handle) if
-               not cls.get('root')]
+               not cls.get('root') and cls['handle'] != exclude]
     return (classes and
             not(len(classes) == 1 and not netinfo.ifaceUsed(device) and
                 classes[0]['handle'] == root_qdisc_handle + _DEFAULT_CLASSID))
@@ -95,17 +95,10 @@ def _uses_classes(device, root_qdisc_handle=None):
 def _fresh_qdisc_conf_out(dev, vlan_tag, class_id, qos):
     """Replaces the dev qdisc with hfsc and sets up the shaping"""
     # Use deletion + addition to flush children classes and filters
-    try:
+    with tc.tolerate(errno.ENOENT):
         tc.qdisc.delete(dev)  # Deletes the root qdisc by default
-    except tc.TrafficControlException as tce:
-        if tce.errCode != errno.ENOENT:
-            raise
-    try:
+    with tc.tolerate(errno.EINVAL, errno.ENOENT):  # No ingress exists
         tc.qdisc.delete(dev, kind='ingress')  # Deletes the ingress qdisc
-    except tc.TrafficControlException as tce:
-        if tce.errCode not in (errno.EINVAL,
-                               errno.ENOENT):  # No ingress exists
-            raise
 
     tc.qdisc.add(dev, _SHAPING_QDISC_KIND, handle='0x' + _ROOT_QDISC_HANDLE,
                  default='%#x' % _NON_VLANNED_ID)
@@ -135,18 +128,12 @@ def _qdisc_conf_out(dev, root_qdisc_handle, vlan_tag, class_id, qos):
 
     # Clear up any previous filters to the class
     for filt in filters:
-        try:
+        with tc.tolerate(errno.EINVAL):  # no filters exist -> EINVAL
             tc.filter.delete(dev, filt['pref'], parent=root_qdisc_handle)
-        except tc.TrafficControlException as tce:
-            if tce.errCode != errno.EINVAL:  # no filters exist -> EINVAL
-                raise
 
     # Clear the class in case it exists
-    try:
+    with tc.tolerate(errno.ENOENT):
         tc.cls.delete(dev, classid=root_qdisc_handle + class_id)
-    except tc.TrafficControlException as tce:
-        if tce.errCode != errno.ENOENT:
-            raise
 
     _add_hfsc_cls(dev, root_qdisc_handle, class_id, **qos)
     if class_id == _DEFAULT_CLASSID:
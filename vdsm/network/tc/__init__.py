@@ -28,10 +28,13 @@ from . import filter as tc_filter
 from . import _parser
 from . import cls
 from . import qdisc
-from ._wrapper import TrafficControlException
+from . import _wrapper
+from ._wrapper import TrafficControlException, tolerate
 
 QDISC_INGRESS = 'ffff:'
 
+tolerate  # Appease flake8 since it should be exported from here
+
 
 def _addTarget(network, parent, target):
     fs = list(filters(network, parent))
@@ -158,6 +161,83 @@ def _iterate(module, dev, out=None, **kwargs):
         yield module.parse(tokens)
 
 
+def _config_commands(dev):
+    """Returns the tc commands re-creating the qdiscs, classes and u32
+    filters of dev. Only the options vdsm sets are kept: the default class of
+    hfsc qdiscs, the class curves and the raw matches, flow ids and mirred
+    actions of the filters."""
+    qdiscs = []
+    leaves = []
+    filter_parents = []
+    created = set()
+    for qdisc_data in _qdiscs(dev):
+        handle = qdisc_data['handle']
+        if handle == '0:':
+            continue  # A kernel default, back once its parent is removed
+        command = ['qdisc', 'add', 'dev', dev]
+        if qdisc_data['kind'] == 'ingress':
+            qdiscs.append(command + ['ingress'])
+            filter_parents.append(handle)
+            continue
+        if qdisc_data.get('root'):
+            command.append('root')
+        else:
+            command += ['parent', qdisc_data['parent']]
+        command += ['handle', handle, qdisc_data['kind']]
+        if 'default' in qdisc_data.get('hfsc', {}):
+            command += ['default', '%x' % qdisc_data['hfsc']['default']]
+        if qdisc_data.get('root'):
+            qdiscs.append(command)
+            filter_parents.append(handle)
+            created.add(handle)
+        else:
+            leaves.append(command)
+
+    # The shown class curves use the tc syntax. Classes are added after their
+    # parent class.
+    pending = []
+    for line in _parser.linearize(cls.show(dev).splitlines()):
+        line = [token for token in line if token != _parser.LINE_DELIMITER]
+        kind, classid, attrs = line[1], line[2], line[3:]
+        if attrs[:1] == ['root']:
+            continue  # Added with its qdisc
+        opts = attrs[4:] if attrs[2:3] == ['leaf'] else attrs[2:]
+        pending.append(['class', 'add', 'dev', dev, 'parent', attrs[1],
+                        'classid', classid, kind] + opts)
+    classes = []
+    while pending:
+        ready = [added for added in pending if added[5] in created]
+        if not ready:
+            break  # Orphans, tc would not add them
+        for added in ready:
+            classes.append(added)
+            created.add(added[7])
+            pending.remove(added)
+
+    filters = []
+    for parent in filter_parents:
+        for filt in _filters(dev, parent=parent):
+            data = filt.get('u32', {})
+            if not isinstance(data.get('match'), dict):
+                continue  # A hash table or a match we do not parse
+            match = data['match']
+            command = ['filter', 'add', 'dev', dev, 'parent', parent,
+                       'protocol', filt['protocol'], 'pref', str(filt['pref']),
+                       'u32', 'match', 'u32', '%#010x' % match['value'],
+                       '%#010x' % match['mask'], 'at', str(match['offset'])]
+            if 'flowid' in data:
+                command += ['flowid', data['flowid']]
+            for action in data.get('actions', ()):
+                if action['kind'] == 'mirred':
+                    command += ['action', 'mirred']
+                    command += action['action'].split('_')
+                    command += ['dev', action['target']]
+            filters.append(command)
+
+    return qdiscs + classes + leaves + filters
+
+
 _filters = partial(_iterate, tc_filter)  # kwargs: parent and pref
 _qdiscs = partial(_iterate, qdisc)  # kwargs: dev
 classes = partial(_iterate, cls)  # kwargs: parent and classid
+batch = partial(_wrapper.batch, snapshot=_config_commands)
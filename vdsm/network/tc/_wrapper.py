@@ -16,28 +16,187 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
+from contextlib import contextmanager
 import errno
+import logging
 import os
+import re
+import threading
 
 from vdsm.constants import EXT_TC
 from vdsm.utils import execCmd
 
 _TC_ERR_PREFIX = 'RTNETLINK answers: '
 _errno_trans = dict(((os.strerror(code), code) for code in errno.errorcode))
+_BATCH_FAILED = re.compile(r'^Command failed -:(\d+)$')
+_MUTATIONS = frozenset(('add', 'change', 'del', 'delete', 'replace'))
 
+_local = threading.local()
 
-def process_request(command):
+
+def process_request(command, undo=None):
+    """Runs a tc command. Inside a batch, commands that change the traffic
+    control configuration are queued instead, and undo, the command
+    reverting this one, is kept for rolling back the batch."""
+    current = getattr(_local, 'batch', None)
+    if current is not None and command[1] in _MUTATIONS:
+        current.append(command, undo, _tolerated())
+        return ''
+    try:
+        return _run(command)
+    except TrafficControlException as tce:
+        if tce.errCode in _tolerated():
+            return ''
+        raise
+
+
+def _run(command):
     command.insert(0, EXT_TC)
     retcode, out, err = execCmd(command, raw=True)
     if retcode != 0:
         if retcode == 2:
             if err:
                 err = err.splitlines()[0]  # There may be extra lines
-                retcode = _errno_trans.get(err[len(_TC_ERR_PREFIX):].strip())
+                retcode = _err_to_errno(err)
         raise TrafficControlException(retcode, err, command)
     return out
 
 
+def _err_to_errno(err):
+    return _errno_trans.get(err[len(_TC_ERR_PREFIX):].strip())
+
+
+def _tolerated():
+    return getattr(_local, 'tolerated', frozenset())
+
+
+@contextmanager
+def tolerate(*errCodes):
+    """Ignores failures of tc commands with errCodes, also when the commands
+    are run as part of a batch."""
+    previous = _tolerated()
+    _local.tolerated = previous.union(errCodes)
+    try:
+        yield
+    finally:
+        _local.tolerated = previous
+
+
+@contextmanager
+def batch(snapshot=None):
+    """Queues the changing tc commands issued in the block and applies them
+    with a single tc -batch invocation when the block ends. Commands that
+    read the configuration are still run immediately, and do not see the
+    queued changes.
+
+    If a command fails, all the commands of the batch that were applied are
+    reverted in reverse order and TrafficControlException is raised. The
+    devices changed by commands that cannot be reverted, such as deletions,
+    are restored instead: snapshot(dev) returns the commands re-creating the
+    configuration of dev, and is called before the batch is applied. Nested
+    batches join the outer batch."""
+    if getattr(_local, 'batch', None) is not None:
+        yield
+        return
+    _local.batch = current = _Batch(snapshot)
+    try:
+        yield
+    finally:
+        _local.batch = None
+    current.commit()
+
+
+class _Batch(object):
+    _log = logging.getLogger('TrafficControl.Batch')
+
+    def __init__(self, snapshot):
+        self._commands = []  # (command, undo, tolerated errCodes)
+        self._snapshot = snapshot
+        self._snapshots = {}  # device: commands re-creating its config
+
+    def append(self, command, undo, tolerated):
+        self._commands.append((command, undo, tolerated))
+
+    def commit(self):
+        if not self._commands:
+            return
+        if self._snapshot is not None:
+            for command, undo, _ in self._commands:
+                dev = _device(command)
+                if undo is None and dev not in self._snapshots:
+                    self._snapshots[dev] = self._snapshot(dev)
+        failures = _run_batch([command for command, _, _ in self._commands])
+        for index, (command, _, tolerated) in enumerate(self._commands):
+            if index in failures and failures[index][0] not in tolerated:
+                errCode, message = failures[index]
+                self._rollback(failures)
+                raise TrafficControlException(errCode, message, command)
+
+    def _rollback(self, failures):
+        # tc -force keeps running the commands after a failing one, so every
+        # command that did not fail was applied.
+        applied = [(command, undo) for index, (command, undo, _) in
+                   enumerate(self._commands) if index not in failures]
+        restored = set(_device(command) for command, undo in applied
+                       if undo is None and _device(command) in self._snapshots)
+        undos = []
+        for command, undo in reversed(applied):
+            if _device(command) in restored:
+                continue
+            if undo is None:
+                self._log.warning('Cannot revert tc command %s', command)
+                continue
+            undos.append(undo)
+        if undos:
+            self._log.info('Reverting %d tc commands', len(undos))
+            self._revert(undos)
+        for dev in restored:
+            self._log.info('Restoring the traffic control configuration of %s',
+                           dev)
+            # Flush the device; it may be left with no root or ingress qdisc
+            _run_batch([['qdisc', 'del', 'dev', dev, 'root'],
+                        ['qdisc', 'del', 'dev', dev, 'ingress']])
+            if self._snapshots[dev]:
+                self._revert(self._snapshots[dev])
+
+    def _revert(self, commands):
+        for index, (errCode, message) in _run_batch(commands).iteritems():
+            self._log.error('Failed to revert tc command %s: %s',
+                            commands[index], message)
+
+
+def _device(command):
+    """Returns the device of a qdisc, class or filter changing command"""
+    return command[command.index('dev') + 1]
+
+
+def _run_batch(commands):
+    """Runs commands with tc -batch, continuing after failures. Returns a
+    dict of the failed commands indices to their (errCode, message)."""
+    data = ''.join(' '.join(command) + '\n' for command in commands)
+    retcode, out, err = execCmd([EXT_TC, '-force', '-batch', '-'],
+                                data=data, raw=True)
+    failures = {}
+    message = None
+    for line in err.splitlines():
+        match = _BATCH_FAILED.match(line)
+        if match is None:
+            # The first line reported for a failing command explains it
+            if message is None:
+                message = line
+            continue
+        index = int(match.group(1)) - 1
+        if message is not None and message.startswith(_TC_ERR_PREFIX):
+            errCode = _err_to_errno(message)
+        else:
+            errCode = retcode
+        failures[index] = (errCode, message)
+        message = None
+    if retcode != 0 and not failures:
+        raise TrafficControlException(retcode, err, commands)
+    return failures
+
+
 class TrafficControlException(Exception):
     def __init__(self, errCode, message, command):
         self.errCode = errCode
@@ -36,7 +36,8 @@ def add(dev, kind, parent, classid, **opts):
         else:
             command.append(key)
             command += value
-    _wrapper.process_request(command)
+    _wrapper.process_request(
+        command, undo=['class', 'del', 'dev', dev, 'classid', classid])
 
 
 def delete(dev, classid, parent=None):
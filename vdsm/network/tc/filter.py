@@ -54,7 +54,15 @@ def replace(dev, root=False, parent=None, handle=None, pref=None,
             command += value
     for action in actions:
         command += action
-    _wrapper.process_request(command)
+    undo = None
+    if pref is not None:
+        # A filter that was replaced is deleted on rollback, not restored
+        undo = ['filter', 'del', 'dev', dev, 'pref', str(pref)]
+        if root:
+            undo.append('root')
+        elif parent is not None:
+            undo += ['parent', parent]
+    _wrapper.process_request(command, undo=undo)
 
 
 def show(dev, parent=None, pref=None):
@@ -26,17 +26,22 @@ _TC_PRIO_MAX = 15
 
 def add(dev, kind, parent=None, handle=None, **opts):
     command = ['qdisc', 'add', 'dev', dev]
+    undo = ['qdisc', 'del', 'dev', dev]
     if kind != 'ingress':
         if parent is None:
             command.append('root')
+            undo.append('root')
         else:
             command += ['parent', parent]
+            undo += ['parent', parent]
+    else:
+        undo.append('ingress')
     if handle is not None:
         command += ['handle', handle]
     command.append(kind)
     for key, value in opts.items():
         command += [key, value]
-    _wrapper.process_request(command)
+    _wrapper.process_request(command, undo=undo)
 
 
 def delete(dev, kind=None, parent=None, handle=None, **opts):
@@ -19,21 +19,13 @@
 #
 
 from collections import defaultdict
-
-import xml.etree.cElementTree as ET
+import os
+import re
 
 import caps
 import supervdsm
 
 
-def getVcpuPid(vmName):
-    runInfo = ET.parse("/var/run/libvirt/qemu/%s.xml" % vmName)
-    vCpuPids = {}
-    for vCpuIndex, vCpu in enumerate(runInfo.findall('./vcpus/vcpu')):
-        vCpuPids[vCpuIndex] = vCpu.get('pid')
-    return vCpuPids
-
-
 def getVmNumaNodeRuntimeInfo(vm):
     """
     Collect vm numa nodes runtime pinning to which host numa nodes
@@ -53,40 +45,91 @@ def getVmNumaNodeRuntimeInfo(vm):
     The first list element of the above tuple describe each vcpu(list[0])
     runtime pinning to which physical cpu core(list[3]).
 
-    Get the mapping info between vcpu and pid from
-    /var/run/libvirt/qemu/<vmName>.xml
-
-    Get each vcpu(pid) backed memory mapping to which host numa nodes info
-    from /proc/<vm_pid>/<vcpu_pid>/numa_maps
+    Get the host numa nodes backing the vm memory from the memory.numa_stat
+    of the vm cgroup, or from /proc/<vm_pid>/numa_maps. All the vcpu
+    threads share the memory of the vm process.
 
     From all the above information, we can calculate each vm numa node
     runtime pinning to which host numa node.
     The output is a map like:
     '<vm numa node index>': [<host numa node index>, ...]
     """
+    return NumaSampler(vm).sample()
 
-    vmNumaNodeRuntimeMap = {}
 
-    vcpu_to_pcpu = _get_mapping_vcpu_to_pcpu(
-        _get_vcpu_positioning(vm))
-    if vcpu_to_pcpu:
-        vm_numa_placement = defaultdict(set)
+class NumaSampler(object):
+    """
+    Sample the runtime numa placement of a vm, keeping the mapping of vcpus
+    to vm numa nodes until invalidate() is called after vcpus were
+    hotplugged.
+    """
+
+    def __init__(self, vm):
+        self._vm = vm
+        self._vcpu_to_vnode = None
 
-        vcpu_to_pnode = supervdsm.getProxy().getVcpuNumaMemoryMapping(
-            vm.conf['vmName'].encode('utf-8'))
+    def invalidate(self):
+        self._vcpu_to_vnode = None
+
+    def sample(self):
+        vcpu_to_pcpu = _get_mapping_vcpu_to_pcpu(
+            _get_vcpu_positioning(self._vm))
+        if not vcpu_to_pcpu:
+            return {}
+
+        if self._vcpu_to_vnode is None:
+            self._vcpu_to_vnode = _get_mapping_vcpu_to_vnode(self._vm)
+
+        vm_numa_placement = defaultdict(set)
+        memory_pnodes = supervdsm.getProxy().getVmNumaMemoryNodes(
+            self._vm.conf['vmName'].encode('utf-8'))
         pcpu_to_pnode = _get_mapping_pcpu_to_pnode()
-        vcpu_to_vnode = _get_mapping_vcpu_to_vnode(vm)
 
         for vcpu_id, pcpu_id in vcpu_to_pcpu.iteritems():
-            vnode_index = str(vcpu_to_vnode[vcpu_id])
+            try:
+                vnode_index = str(self._vcpu_to_vnode[vcpu_id])
+            except KeyError:
+                # Hotplugged vcpu not in any vm numa node
+                continue
             vm_numa_placement[vnode_index].add(pcpu_to_pnode[pcpu_id])
-            vm_numa_placement[vnode_index].update(
-                vcpu_to_pnode.get(vcpu_id, ()))
+            vm_numa_placement[vnode_index].update(memory_pnodes)
 
-        vmNumaNodeRuntimeMap = dict((k, list(v)) for k, v in
-                                    vm_numa_placement.iteritems())
+        return dict((k, list(v)) for k, v in vm_numa_placement.iteritems())
 
-    return vmNumaNodeRuntimeMap
+
+def getMemoryNodes(pid):
+    """
+    Return the host numa nodes backing the memory of process pid, using the
+    memory cgroup statistics if available, since reading numa_maps walks
+    the page tables of the process.
+    """
+    try:
+        return _getCgroupMemoryNodes(pid)
+    except (IOError, LookupError):
+        pass
+
+    with open("/proc/%s/numa_maps" % pid) as f:
+        return sorted(set(int(node) for node in
+                          re.findall(r'N(\d+)=\d+', f.read())))
+
+
+def _getCgroupMemoryNodes(pid):
+    with open("/proc/%s/cgroup" % pid) as f:
+        for line in f:
+            _, controllers, path = line.rstrip("\n").split(":", 2)
+            if "memory" in controllers.split(","):
+                break
+        else:
+            raise LookupError("No memory cgroup for process %s" % pid)
+
+    numaStat = os.path.join("/sys/fs/cgroup/memory", path.lstrip("/"),
+                            "memory.numa_stat")
+    with open(numaStat) as f:
+        # total=<pages> N0=<pages> N1=<pages> ...
+        fields = f.readline().split()
+    return sorted(int(name[1:]) for name, _, pages in
+                  (field.partition("=") for field in fields)
+                  if name.startswith("N") and int(pages) > 0)
 
 
 def _get_vcpu_positioning(vm):
@@ -406,6 +406,10 @@ class BindingXMLRPC(object):
         vm = API.VM(vmId)
         return vm.getMigrationStatus()
 
+    def vmGetMigrationStats(self, vmId):
+        vm = API.VM(vmId)
+        return vm.getMigrationStats()
+
     def vmMigrationCancel(self, vmId):
         vm = API.VM(vmId)
         return vm.migrateCancel()
@@ -659,6 +663,10 @@ class BindingXMLRPC(object):
         domain = API.StorageDomain(sdUUID)
         return domain.getVolumes(spUUID, imgUUID)
 
+    def domainGetVolumesInfo(self, sdUUID, options=None):
+        domain = API.StorageDomain(sdUUID)
+        return domain.getVolumesInfo()
+
     def domainSetDescription(self, sdUUID, description, options=None):
         domain = API.StorageDomain(sdUUID)
         return domain.setDescription(description)
@@ -786,6 +794,10 @@ class BindingXMLRPC(object):
         pool = API.StoragePool(spUUID)
         return pool.getInfo()
 
+    def poolGetConnectStats(self, spUUID, options=None):
+        pool = API.StoragePool(spUUID)
+        return pool.getConnectStats()
+
     def poolMoveMultipleImages(self, spUUID, srcDomUUID, dstDomUUID, imgDict,
                                vmUUID, force=False):
         pool = API.StoragePool(spUUID)
@@ -995,6 +1007,7 @@ class BindingXMLRPC(object):
                 (self.vmMigrate, 'migrate'),
                 (self.vmGetMigrationStatus, 'migrateStatus'),
                 (self.vmMigrationCancel, 'migrateCancel'),
+                (self.vmGetMigrationStats, 'migrateStats'),
                 (self.getRoute, 'getRoute'),
                 (self.getCapabilities, 'getVdsCapabilities'),
                 (self.getHardwareInfo, 'getVdsHardwareInfo'),
@@ -1052,6 +1065,7 @@ class BindingXMLRPC(object):
                 (self.domainGetInfo, 'getStorageDomainInfo'),
                 (self.domainGetStats, 'getStorageDomainStats'),
                 (self.domainGetVolumes, 'getVolumesList'),
+                (self.domainGetVolumesInfo, 'getVolumesInfo'),
                 (self.domainSetDescription, 'setStorageDomainDescription'),
                 (self.domainValidate, 'validateStorageDomain'),
                 (self.imageDelete, 'deleteImage'),
@@ -1080,6 +1094,7 @@ class BindingXMLRPC(object):
                 (self.poolGetIsoList, 'getIsoList'),
                 (self.poolGetSpmStatus, 'getSpmStatus'),
                 (self.poolGetInfo, 'getStoragePoolInfo'),
+                (self.poolGetConnectStats, 'getStoragePoolConnectStats'),
                 (self.poolMoveMultipleImages, 'moveMultipleImages'),
                 (self.poolReconstructMaster, 'reconstructMaster'),
                 (self.poolRefresh, 'refreshStoragePool'),
@@ -442,11 +442,13 @@ command_info = {
     'StorageDomain_getInfo': {'ret': 'info'},
     'StorageDomain_getStats': {'ret': 'stats'},
     'StorageDomain_getVolumes': {'ret': 'uuidlist'},
+    'StorageDomain_getVolumesInfo': {'ret': 'volumes'},
     'StoragePool_connectStorageServer': {'ret': 'statuslist'},
     'StoragePool_disconnectStorageServer': {'ret': 'statuslist'},
     'StoragePool_fence': {'ret': 'spm_st'},
     'StoragePool_getBackedUpVmsInfo': {'ret': 'vmlist'},
     'StoragePool_getBackedUpVmsList': {'ret': 'vmlist'},
+    'StoragePool_getConnectStats': {'ret': 'stats'},
     'StoragePool_getDomainsContainingImage': {'ret': 'domainslist'},
     'StoragePool_getFloppyList': {'ret': 'isolist'},
     'StoragePool_getInfo': {'ret': StoragePool_getInfo_Ret},
@@ -464,6 +466,7 @@ command_info = {
     'VM_diskSizeExtend': {'ret': 'size'},
     'VM_getInfo': {'call': VM_getInfo_Call, 'ret': VM_getInfo_Ret},
     'VM_getIoTunePolicy': {'ret': 'ioTunePolicyList'},
+    'VM_getMigrationStats': {'ret': 'migrationStats'},
     'VM_getStats': {'ret': 'statsList'},
     'VM_hotplugDisk': {'ret': 'vmList'},
     'VM_hotplugNic': {'ret': 'vmList'},
@@ -22,7 +22,6 @@ import os
 import threading
 import logging
 import signal
-import select
 import errno
 import re
 from StringIO import StringIO
@@ -51,6 +50,7 @@ import resourceManager as rm
 import mount
 import supervdsm as svdsm
 import volume
+import wipe
 
 STORAGE_DOMAIN_TAG = "RHAT_storage_domain"
 STORAGE_UNREADY_DOMAIN_TAG = STORAGE_DOMAIN_TAG + "_UNREADY"
@@ -200,30 +200,7 @@ def deleteVolumes(sdUUID, vols):
     lvm.removeLVs(sdUUID, vols)
 
 
-def _zeroVolume(sdUUID, volUUID):
-    """Fill a block volume.
-
-    This function requires an active LV.
-    """
-    dm = lvm.lvDmDev(sdUUID, volUUID)
-    size = multipath.getDeviceSize(dm)  # Bytes
-    # TODO: Change for zero 128 M chuncks and log.
-    # 128 M is the vdsm extent size default
-    BS = constants.MEGAB  # 1024 ** 2 = 1 MiB
-    count = size / BS
-    cmd = [constants.EXT_DD, "oflag=%s" % misc.DIRECTFLAG, "if=/dev/zero",
-           "of=%s" % lvm.lvPath(sdUUID, volUUID), "bs=%s" % BS,
-           "count=%s" % count]
-    p = misc.execCmd(cmd, sync=False, nice=utils.NICENESS.HIGH,
-                     ioclass=utils.IOCLASS.IDLE, deathSignal=signal.SIGKILL)
-    return p
-
-
 def zeroImgVolumes(sdUUID, imgUUID, volUUIDs):
-    ProcVol = namedtuple("ProcVol", "proc, vol")
-    # Put a sensible value for dd zeroing a 128 M or 1 G chunk and lvremove
-    # spent time.
-    ZEROING_TIMEOUT = 60000  # [miliseconds]
     log.debug("sd: %s, LVs: %s, img: %s", sdUUID, volUUIDs, imgUUID)
     # Following call to changelv is separate since setting rw permission on an
     # LV fails if the LV is already set to the same value, hence we would not
@@ -234,46 +211,33 @@ def zeroImgVolumes(sdUUID, imgUUID, volUUIDs):
     except se.StorageException as e:
         # Hope this only means that some volumes were already writable.
         log.debug("Ignoring failed permission change: %s", e)
-    # blank the volumes.
-    zerofds = {}
-    poller = select.poll()
-    for volUUID in volUUIDs:
-        proc = _zeroVolume(sdUUID, volUUID)
-        fd = proc.stdout.fileno()
-        zerofds[fd] = ProcVol(proc, volUUID)
-        poller.register(fd, select.EPOLLHUP)
-
-    # Wait until all the asyncs procs return
-    # Yes, this is a potentially infinite loop. Kill the vdsm task.
-    while zerofds:
-        fdevents = poller.poll(ZEROING_TIMEOUT)  # [(fd, event)]
-        toDelete = []
-        for fd, event in fdevents:
-            proc, vol = zerofds[fd]
-            if not proc.wait(0):
-                continue
-            else:
-                poller.unregister(fd)
-                zerofds.pop(fd)
-                if proc.returncode != 0:
-                    log.error("zeroing %s/%s failed. Zero and remove this "
-                              "volume manually. rc=%s %s", sdUUID, vol,
-                              proc.returncode, proc.stderr.read(1000))
-                else:
-                    log.debug("%s/%s was zeroed and will be deleted",
-                              sdUUID, volUUID)
-                    toDelete.append(vol)
-        if toDelete:
-            try:
-                deleteVolumes(sdUUID, toDelete)
-            except se.CannotRemoveLogicalVolume:
-                # TODO: Add the list of removed fail volumes to the exception.
-                log.error("Remove failed for some of VG: %s zeroed volumes: "
-                          "%s", sdUUID, toDelete, exc_info=True)
+
+    # blank the volumes, this requires active LVs.
+    paths = dict((lvm.lvPath(sdUUID, volUUID), volUUID)
+                 for volUUID in volUUIDs)
+    results = wipe.zeroDevices(paths)
+
+    toDelete = []
+    for path, volUUID in paths.iteritems():
+        result = results[path]
+        if not result.succeeded:
+            log.error("zeroing %s/%s failed. Zero and remove this volume "
+                      "manually: %s", sdUUID, volUUID, result.value)
+        else:
+            log.debug("%s/%s was zeroed and will be deleted", sdUUID,
+                      volUUID)
+            toDelete.append(volUUID)
+
+    if toDelete:
+        try:
+            deleteVolumes(sdUUID, toDelete)
+        except se.CannotRemoveLogicalVolume:
+            # TODO: Add the list of removed fail volumes to the exception.
+            log.error("Remove failed for some of VG: %s zeroed volumes: "
+                      "%s", sdUUID, toDelete, exc_info=True)
 
     log.debug("finished with VG:%s LVs: %s, img: %s", sdUUID, volUUIDs,
               imgUUID)
-    return
 
 
 class VGTagMetadataRW(object):
@@ -1026,6 +990,66 @@ class BlockStorageDomain(sd.StorageDomain):
         vols, rems = self.getAllVolumesImages()
         return vols
 
+    def dumpVolumes(self):
+        """
+        Return dict {volUUID: info} of the volumes of the domain, where info
+        is the volume info reported by getVolumeInfo.
+
+        The info is built from a single scan of the domain LVs and a single
+        read of the metadata volume, instead of reading the tags and the
+        metadata of every volume.
+        """
+        volumes = {}  # {volUUID: (imgUUID, parentUUID, slot, size)}
+        for lv in lvm.getLV(self.sdUUID):
+            if lv.name in SPECIAL_LVS:
+                continue
+            tags = {}
+            for tag in lv.tags:
+                for prefix in (blockVolume.TAG_PREFIX_IMAGE,
+                               blockVolume.TAG_PREFIX_PARENT,
+                               blockVolume.TAG_PREFIX_MD):
+                    if tag.startswith(prefix):
+                        tags[prefix] = tag[len(prefix):]
+            try:
+                imgUUID = tags[blockVolume.TAG_PREFIX_IMAGE]
+                parent = tags[blockVolume.TAG_PREFIX_PARENT]
+            except KeyError:
+                self.log.warning("Ignoring volume %s that lacks minimal tag "
+                                 "set tags %s", lv.name, lv.tags)
+                continue
+            if imgUUID.startswith(sd.REMOVED_IMAGE_PREFIX):
+                continue
+            try:
+                slot = int(tags[blockVolume.TAG_PREFIX_MD])
+            except (KeyError, ValueError):
+                self.log.warning("Volume %s has no valid metadata slot, tags "
+                                 "%s", lv.name, lv.tags)
+                slot = None
+            volumes[lv.name] = (imgUUID, parent, slot, int(lv.size))
+
+        slots = [v[2] for v in volumes.itervalues() if v[2] is not None]
+        if slots:
+            metaSize = (max(slots) + 1) * blockVolume.VOLUME_METASIZE
+            metadata = misc.readblockRaw(
+                lvm.lvPath(self.sdUUID, sd.METADATA), 0, metaSize)
+        else:
+            metadata = ""
+
+        res = {}
+        for volUUID, (imgUUID, parent, slot, size) in volumes.iteritems():
+            meta = None
+            if slot is not None:
+                offset = slot * blockVolume.VOLUME_METASIZE
+                block = metadata[offset:offset + blockVolume.VOLUME_METASIZE]
+                try:
+                    meta = volume.parseMetadata(block.splitlines())
+                except ValueError:
+                    self.log.warning("Invalid metadata for volume %s: %r",
+                                     volUUID, block)
+            res[volUUID] = volume.dumpInfo(volUUID, imgUUID, parent, meta,
+                                           size, size)
+        return res
+
     def getAllRemnants(self):
         vols, rems = self.getAllVolumesImages()
         return rems
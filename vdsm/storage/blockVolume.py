@@ -592,21 +592,11 @@ class BlockVolume(volume.Volume):
         try:
             meta = misc.readblock(lvm.lvPath(vgname, sd.METADATA),
                                   offs * VOLUME_METASIZE, VOLUME_METASIZE)
-            out = {}
-            for l in meta:
-                if l.startswith("EOF"):
-                    return out
-                if l.find("=") < 0:
-                    continue
-                key, value = l.split("=")
-                out[key.strip()] = value.strip()
-
+            return volume.parseMetadata(meta)
         except Exception as e:
             self.log.error(e, exc_info=True)
             raise se.VolumeMetadataReadError("%s: %s" % (metaId, e))
 
-        return out
-
     def setMetadata(self, meta, metaId=None):
         """
         Set the meta data hash as the new meta data of the Volume
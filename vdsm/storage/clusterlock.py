@@ -182,6 +182,95 @@ def initSANLock(sdUUID, idsPath, leasesPath):
         raise se.ClusterLockInitError()
 
 
+class SANLockStatus(object):
+    """
+    The status of all sanlock lockspaces and their hosts, shared by the
+    domain monitors.
+
+    The lockspaces are read from sanlock with a single get_lockspaces call,
+    at most once per interval seconds. The hosts of a lockspace are read
+    with get_hosts only when they are asked for, and are kept until the
+    next refresh. If sanlock does not support get_lockspaces or does not
+    report the lockspace flags, or interval is 0, nothing is cached and
+    every query calls sanlock.
+    """
+    log = logging.getLogger("Storage.SANLockStatus")
+
+    def __init__(self, interval, clock=utils.monotonic_time):
+        self._interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._lockspaces = {}
+        self._hosts = {}
+        self._error = None
+        self._lastRefresh = None
+
+    @property
+    def enabled(self):
+        return (self._interval > 0 and
+                hasattr(sanlock, 'get_lockspaces') and
+                hasattr(sanlock, 'LSFLAG_ADD') and
+                hasattr(sanlock, 'LSFLAG_REM'))
+
+    def lockspace(self, sdUUID):
+        """
+        Return the lockspace of domain sdUUID as reported by get_lockspaces,
+        or None if this host did not join the lockspace.
+        """
+        with self._lock:
+            self._refreshIfNeeded()
+            return self._lockspaces.get(sdUUID)
+
+    def hosts(self, sdUUID):
+        """
+        Return the hosts of lockspace sdUUID as reported by get_hosts.
+        """
+        with self._lock:
+            self._refreshIfNeeded()
+            if sdUUID not in self._lockspaces:
+                raise sanlock.SanlockException(
+                    os.errno.ENOENT, "Lockspace not found", sdUUID)
+            hosts = self._hosts.get(sdUUID)
+            if hosts is None:
+                try:
+                    hosts = sanlock.get_hosts(sdUUID)
+                except sanlock.SanlockException as e:
+                    hosts = e
+                self._hosts[sdUUID] = hosts
+        if isinstance(hosts, Exception):
+            raise hosts
+        return hosts
+
+    def invalidate(self):
+        """
+        Read the status again on the next query, after a lockspace was
+        added or removed.
+        """
+        with self._lock:
+            self._lastRefresh = None
+
+    def _refreshIfNeeded(self):
+        now = self._clock()
+        if (self._lastRefresh is not None and
+                now - self._lastRefresh < self._interval):
+            if self._error is not None:
+                raise self._error
+            return
+        self._lastRefresh = now
+        try:
+            lockspaces = sanlock.get_lockspaces()
+        except sanlock.SanlockException as e:
+            self._lockspaces = {}
+            self._hosts = {}
+            self._error = e
+            raise
+        self._error = None
+        self._lockspaces = dict((ls['lockspace'], ls) for ls in lockspaces)
+        self._hosts = {}
+        self.log.debug("Refreshed status of %d lockspaces in %.3f seconds",
+                       len(self._lockspaces), self._clock() - now)
+
+
 class SANLock(object):
 
     STATUS_NAME = {
@@ -197,6 +286,8 @@ class SANLock(object):
     _sanlock_fd = None
     _sanlock_lock = threading.Lock()
 
+    _status = SANLockStatus(config.getint('irs', 'sanlock_status_interval'))
+
     def __init__(self, sdUUID, idsPath, leasesPath, *args):
         self._lock = threading.Lock()
         self._sdUUID = sdUUID
@@ -235,6 +326,8 @@ class SANLock(object):
                     # or it's in the process of being acquired (async)
                 elif e.errno != os.errno.EEXIST:
                     raise se.AcquireHostIdFailure(self._sdUUID, e)
+            finally:
+                self._status.invalidate()
 
             self.log.debug("Host id for domain %s successfully acquired "
                            "(id: %s)", self._sdUUID, hostId)
@@ -250,11 +343,15 @@ class SANLock(object):
             except sanlock.SanlockException as e:
                 if e.errno != os.errno.ENOENT:
                     raise se.ReleaseHostIdFailure(self._sdUUID, e)
+            finally:
+                self._status.invalidate()
 
             self.log.debug("Host id for domain %s released successfully "
                            "(id: %s)", self._sdUUID, hostId)
 
     def hasHostId(self, hostId):
+        if self._status.enabled:
+            return self._cachedHasHostId(hostId)
         with self._lock:
             try:
                 return sanlock.inq_lockspace(self._sdUUID,
@@ -264,12 +361,31 @@ class SANLock(object):
                                "status, returning False", exc_info=True)
                 return False
 
+    def _cachedHasHostId(self, hostId):
+        # Return the same values as inq_lockspace: None while the lockspace
+        # is being added or removed.
+        try:
+            lockspace = self._status.lockspace(self._sdUUID)
+        except sanlock.SanlockException:
+            self.log.debug("Unable to get sanlock lockspaces status, "
+                           "returning False", exc_info=True)
+            return False
+        if (lockspace is None or lockspace['host_id'] != hostId or
+                lockspace['path'] != self._idsPath):
+            return False
+        if lockspace['flags'] & (sanlock.LSFLAG_ADD | sanlock.LSFLAG_REM):
+            return None
+        return True
+
     def getHostStatus(self, hostId):
         # Note: get_hosts has off-by-one bug when asking for particular host
         # id, so get all hosts info and filter.
         # See https://bugzilla.redhat.com/1111210
         try:
-            hosts = sanlock.get_hosts(self._sdUUID)
+            if self._status.enabled:
+                hosts = self._status.hosts(self._sdUUID)
+            else:
+                hosts = sanlock.get_hosts(self._sdUUID)
         except sanlock.SanlockException as e:
             self.log.debug("Unable to get host %d status in lockspace %s: %s",
                            hostId, self._sdUUID, e)
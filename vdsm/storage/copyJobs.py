@@ -0,0 +1,170 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+"""
+Progress reporting and bandwidth sharing for copy, move and merge jobs.
+
+Every qemu-img conversion runs as a CopyJob registered with the host
+BandwidthScheduler. When copy_bandwidth_limit is set, the limit is divided
+equally between the running jobs; a job writing faster than its share is
+paused until it is back within its share. Jobs are throttled on the bytes
+qemu-img actually wrote, so holes in sparse images, which qemu-img skips,
+do not count against the share.
+"""
+
+import logging
+import threading
+
+from vdsm import constants
+from vdsm import utils
+from vdsm.config import config
+
+log = logging.getLogger("Storage.CopyJobs")
+
+# Maximum amount of unused bandwidth a job can accumulate, in seconds of
+# its share. Allows short bursts after a job was idle.
+BURST_SECONDS = 1.0
+
+
+class BandwidthScheduler(object):
+    """
+    Divide a bandwidth limit in bytes per second equally between the
+    registered jobs. A limit of 0 disables throttling.
+    """
+
+    def __init__(self, limit, clock=utils.monotonic_time):
+        self.limit = limit
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._jobs = set()
+
+    def register(self, job):
+        with self._lock:
+            self._jobs.add(job)
+            log.debug("Registered %s, %d active jobs", job, len(self._jobs))
+
+    def unregister(self, job):
+        with self._lock:
+            self._jobs.discard(job)
+            log.debug("Unregistered %s, %d active jobs", job,
+                      len(self._jobs))
+
+    def share(self):
+        """
+        Return the bandwidth allowed for each job, or 0 if unlimited.
+        """
+        with self._lock:
+            if not self.limit or not self._jobs:
+                return self.limit
+            return self.limit / len(self._jobs)
+
+
+class CopyJob(object):
+    """
+    Track the progress of a copy of size bytes, reporting it to task, and
+    compute the delay needed to keep it within its share of the scheduler
+    bandwidth.
+
+    Use as a context manager, passing the progress method to
+    qemuimg.convert.
+    """
+
+    def __init__(self, scheduler, size, task=None, name="copy"):
+        self._scheduler = scheduler
+        self._clock = scheduler.clock
+        self._size = size
+        self._task = task
+        self._name = name
+        self._done = 0
+        self._written = 0
+        self._start = None
+        self._last = None
+        self._allowance = 0
+
+    def __enter__(self):
+        self._start = self._last = self._clock()
+        self._scheduler.register(self)
+        return self
+
+    def __exit__(self, t, v, tb):
+        self._scheduler.unregister(self)
+        log.info("%s copied %d bytes in %.2f seconds (%d bytes/s)", self,
+                 self._done, self._clock() - self._start, self.rate)
+
+    @property
+    def rate(self):
+        elapsed = self._clock() - self._start
+        if elapsed <= 0:
+            return 0
+        return int(self._done / elapsed)
+
+    def progress(self, percent, written=None):
+        """
+        Update the job with qemu-img progress percent and the number of bytes
+        written so far, returning the number of seconds the copy should be
+        paused.
+
+        If written is None, the bytes written are estimated from percent.
+        """
+        done = int(self._size * percent / 100)
+        if written is None:
+            copied = max(0, done - self._done)
+        else:
+            copied = max(0, written - self._written)
+            self._written = written
+        self._done = done
+        if self._task is not None:
+            self._task.setProgress(done, self._size, self.rate)
+        return self._throttle(copied)
+
+    def _throttle(self, copied):
+        share = self._scheduler.share()
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        if not share:
+            self._allowance = 0
+            return 0
+
+        # Token bucket refilled at the current share
+        self._allowance = min(self._allowance + share * elapsed,
+                              share * BURST_SECONDS)
+        self._allowance -= copied
+        if self._allowance >= 0:
+            return 0
+
+        delay = -self._allowance / float(share)
+        # The allowance is refilled during the pause
+        self._allowance = 0
+        self._last = now + delay
+        return delay
+
+    def __str__(self):
+        return "<CopyJob %s size=%d>" % (self._name, self._size)
+
+
+_scheduler = BandwidthScheduler(
+    config.getint('irs', 'copy_bandwidth_limit') * constants.MEGAB)
+
+
+def copyJob(size, task=None, name="copy"):
+    """
+    Return a CopyJob registered with the host scheduler.
+    """
+    return CopyJob(_scheduler, size, task=task, name=name)
@@ -22,13 +22,32 @@ import os
 import misc
 from glob import glob
 import errno
+import logging
 import re
+import socket
+import threading
 
 from supervdsm import getProxy
+from vdsm import utils
 from vdsm.constants import EXT_DMSETUP
 
 DMPATH_PREFIX = "/dev/mapper/"
 
+# Seconds between full scans of the paths status, correcting the status
+# tracked from uevents if an event was missed.
+RECONCILE_INTERVAL = 60
+
+# From <linux/netlink.h>
+NETLINK_KOBJECT_UEVENT = 15
+
+# Multicast group of the uevents sent by the kernel
+UEVENT_KERNEL_GROUP = 1
+
+UEVENT_BUFSIZE = 64 * 1024
+
+# Uevents sent by dm-multipath when multipathd fails or reinstates a path
+PATH_EVENTS = {"PATH_FAILED": "failed", "PATH_REINSTATED": "active"}
+
 
 def getDmId(deviceMultipathName):
     devlinkPath = os.path.join(DMPATH_PREFIX, deviceMultipathName)
@@ -148,7 +167,10 @@ def removeMappingsHoldingDevice(slaveName):
 PATH_STATUS_RE = re.compile(r"(?P<devnum>\d+:\d+)\s+(?P<status>[AF])")
 
 
-def _getPathsStatus():
+def _dmsetupPathsStatus():
+    """
+    Return the status of all multipath paths, keyed by "major:minor".
+    """
     cmd = [EXT_DMSETUP, "status"]
     rc, out, err = misc.execCmd(cmd)
     if rc != 0:
@@ -167,11 +189,185 @@ def _getPathsStatus():
 
         for m in PATH_STATUS_RE.finditer(statusLine):
             devNum, status = m.groups()
-            physdevName = findDev(*[int(i) for i in devNum.split(":")])
-            res[physdevName] = {"A": "active", "F": "failed"}[status]
+            res[devNum] = {"A": "active", "F": "failed"}[status]
 
     return res
 
 
+def parseUevent(data):
+    """
+    Return the properties of a kernel uevent message
+    "action@devpath\\0KEY=value\\0...".
+    """
+    event = {}
+    for field in data.split("\0")[1:]:
+        key, sep, value = field.partition("=")
+        if sep:
+            event[key] = value
+    return event
+
+
+def _findDevByNum(devNum):
+    major, minor = devNum.split(":")
+    return findDev(int(major), int(minor))
+
+
+class PathStatusTracker(object):
+    """
+    Track the status of multipath paths in memory.
+
+    A full scan runs dmsetup status; between scans the status is updated
+    from the path events sent by dm-multipath. Path device names are cached
+    until the device is added or removed. Changes in the multipath maps
+    trigger a new scan, and a scan runs every reconcileInterval seconds to
+    correct missed events. When uevents cannot be monitored, every request
+    scans the paths.
+    """
+    log = logging.getLogger("Storage.PathStatusTracker")
+
+    def __init__(self, scan=_dmsetupPathsStatus, resolve=_findDevByNum,
+                 monitor=True, reconcileInterval=RECONCILE_INTERVAL,
+                 clock=utils.monotonic_time):
+        self._scan = scan
+        self._resolve = resolve
+        self._monitor = monitor
+        self._reconcileInterval = reconcileInterval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._status = {}
+        self._devNames = {}
+        self._lastScan = None
+        self.monitoring = False
+
+    def status(self):
+        """
+        Return the status of all multipath paths, keyed by device name.
+        """
+        with self._lock:
+            if self._monitor:
+                self._monitor = False
+                self._startMonitoring()
+            if self._stale():
+                self._reconcile()
+            return dict((self._devName(devNum), status)
+                        for devNum, status in self._status.iteritems())
+
+    def invalidate(self):
+        """
+        Scan the paths status on the next request.
+        """
+        with self._lock:
+            self._lastScan = None
+
+    def handleEvent(self, event):
+        if event.get("SUBSYSTEM") != "block":
+            return
+        action = event.get("ACTION")
+        with self._lock:
+            if action in ("add", "remove"):
+                devNum = "%s:%s" % (event.get("MAJOR"), event.get("MINOR"))
+                self._devNames.pop(devNum, None)
+                if action == "remove":
+                    self._status.pop(devNum, None)
+                if event.get("DEVNAME", "").startswith("dm-"):
+                    self._lastScan = None
+            elif action == "change":
+                status = PATH_EVENTS.get(event.get("DM_ACTION"))
+                if status is not None and "DM_PATH" in event:
+                    self._status[event["DM_PATH"]] = status
+                elif self._isMultipathMap(event):
+                    self._lastScan = None
+
+    def startMonitoring(self, sock=None):
+        """
+        Start a thread updating the tracker from the uevents received on
+        sock, by default a kernel uevent netlink socket.
+        """
+        with self._lock:
+            self._monitor = False
+            self._startMonitoring(sock)
+
+    def _startMonitoring(self, sock=None):
+        if sock is None:
+            try:
+                sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                     NETLINK_KOBJECT_UEVENT)
+                sock.bind((0, UEVENT_KERNEL_GROUP))
+            except socket.error as e:
+                self.log.warning("Cannot monitor uevents, paths will be "
+                                 "scanned on every request: %s", e)
+                return
+        t = threading.Thread(target=self._monitorEvents, args=(sock,),
+                             name="uevents")
+        t.daemon = True
+        # Events received before the monitor started are unknown
+        self._lastScan = None
+        self.monitoring = True
+        t.start()
+
+    def _monitorEvents(self, sock):
+        try:
+            while True:
+                try:
+                    data = sock.recv(UEVENT_BUFSIZE)
+                except socket.error as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    if e.errno != errno.ENOBUFS:
+                        raise
+                    self.log.warning("Uevents were lost, rescanning paths")
+                    self.invalidate()
+                    continue
+                if not data:
+                    break
+                self.handleEvent(parseUevent(data))
+        except Exception:
+            self.log.exception("Uevent monitor failed")
+        finally:
+            sock.close()
+            with self._lock:
+                self.monitoring = False
+                self._devNames.clear()
+            self.log.warning("Stopped monitoring uevents, paths will be "
+                             "scanned on every request")
+
+    def _isMultipathMap(self, event):
+        uuid = event.get("DM_UUID")
+        if uuid is None:
+            return event.get("DEVNAME", "").startswith("dm-")
+        return uuid.startswith("mpath-")
+
+    def _stale(self):
+        if not self.monitoring or self._lastScan is None:
+            return True
+        return self._clock() - self._lastScan >= self._reconcileInterval
+
+    def _reconcile(self):
+        status = self._scan()
+        if not self.monitoring:
+            # Without events, cached names may be stale
+            self._devNames.clear()
+        elif self._lastScan is not None:
+            drift = set(status.iteritems()) ^ set(self._status.iteritems())
+            if drift:
+                self.log.debug("Corrected paths status drift: %s", drift)
+        self._status = status
+        self._lastScan = self._clock()
+
+    def _devName(self, devNum):
+        try:
+            return self._devNames[devNum]
+        except KeyError:
+            name = self._devNames[devNum] = self._resolve(devNum)
+            return name
+
+
+_pathStatusTracker = PathStatusTracker()
+
+
+def _getPathsStatus():
+    return _pathStatusTracker.status()
+
+
 def getPathsStatus():
     return getProxy().getPathsStatus()
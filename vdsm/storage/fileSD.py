@@ -31,6 +31,7 @@ import storage_exception as se
 import fileUtils
 import fileVolume
 import misc
+import volume
 import outOfProcess as oop
 from remoteFileHandler import Timeout
 from persistentDict import PersistentDict, DictValidator
@@ -468,6 +469,38 @@ class FileStorageDomain(sd.StorageDomain):
         return dict((k, sd.ImgsPar(tuple(v['imgs']), v['parent']))
                     for k, v in volumes.iteritems())
 
+    def dumpVolumes(self):
+        """
+        Return dict {volUUID: info} of the volumes of the domain, where info
+        is the volume info reported by getVolumeInfo.
+
+        The volumes are found with a single glob, and the info is built
+        from the metadata file and a stat of every volume, without
+        producing volume objects.
+        """
+        res = {}
+        for volUUID, (imgs, parent) in self.getAllVolumes().iteritems():
+            # The first image of a template volume is the template image
+            imgUUID = imgs[0]
+            if imgUUID.startswith(sd.REMOVED_IMAGE_PREFIX):
+                continue
+            volPath = os.path.join(self.mountpoint, self.sdUUID,
+                                   sd.DOMAIN_IMAGES, imgUUID, volUUID)
+            try:
+                meta = volume.parseMetadata(self.oop.directReadLines(
+                    volPath + fileVolume.META_FILEEXT))
+                st = self.oop.os.stat(volPath)
+            except Exception:
+                self.log.warning("Cannot read volume %s", volPath,
+                                 exc_info=True)
+                res[volUUID] = volume.dumpInfo(
+                    volUUID, imgUUID, parent or sd.BLANK_UUID, None, 0, 0)
+                continue
+            res[volUUID] = volume.dumpInfo(
+                volUUID, imgUUID, meta.get(volume.PUUID, sd.BLANK_UUID), meta,
+                st.st_size, st.st_blocks * ST_BYTES_PER_BLOCK)
+        return res
+
     def linkBCImage(self, imgPath, imgUUID):
         # Nothing to do here other than returning the path
         return self.getLinkBCImagePath(imgUUID)
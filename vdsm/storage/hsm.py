@@ -2427,6 +2427,25 @@ class HSM(object):
         findMethod = self.__getSDTypeFindMethod(domType)
         return dict.fromkeys(uuids, findMethod)
 
+    def __prefetchAllDomains(self, domType, conObjs):
+        """
+        Prefetch the domains visible through all connected conObjs.
+
+        Block and gluster domains are found by scanning the whole host, so
+        they are scanned once no matter how many connections were made.
+        """
+        if domType in (sd.FCP_DOMAIN, sd.ISCSI_DOMAIN, sd.GLUSTERFS_DOMAIN):
+            conObjs = conObjs[:1]
+
+        doms = {}
+        for conObj in conObjs:
+            try:
+                doms.update(self.__prefetchDomains(domType, conObj))
+            except:
+                self.log.debug("prefetch failed: %s",
+                               sdCache.knownSDs, exc_info=True)
+        return doms
+
     @deprecated
     @public(logger=logged(printers={'conList': connectionListPrinter}))
     def connectStorageServer(self, domType, spUUID, conList, options=None):
@@ -2451,38 +2470,54 @@ class HSM(object):
                 "domType=%s, spUUID=%s, conList=%s" %
                 (domType, spUUID, cons)))
 
-        res = []
+        conObjs = []
         for conDef in conList:
             conInfo = _connectionDict2ConnectionInfo(domType, conDef)
-            conObj = storageServer.ConnectionFactory.createConnection(conInfo)
+            conObjs.append(
+                storageServer.ConnectionFactory.createConnection(conInfo))
+
+        def connect(args):
+            conDef, conObj = args
             try:
                 self._connectStorageOverIser(conDef, conObj, domType)
                 conObj.connect()
-            except Exception as err:
+            except Exception:
                 self.log.error(
                     "Could not connect to storageServer", exc_info=True)
-                status, _ = self._translateConnectionError(err)
-            else:
-                status = 0
-                try:
-                    doms = self.__prefetchDomains(domType, conObj)
-                except:
-                    self.log.debug("prefetch failed: %s",
-                                   sdCache.knownSDs, exc_info=True)
-                else:
-                    # Any pre-existing domains in sdCache stand the chance of
-                    # being invalid, since there is no way to know what happens
-                    # to them while the storage is disconnected.
-                    for sdUUID in doms.iterkeys():
-                        sdCache.manuallyRemoveDomain(sdUUID)
-                    sdCache.knownSDs.update(doms)
+                raise
+            return conObj
 
-            self.log.debug("knownSDs: {%s}", ", ".join("%s: %s.%s" %
-                           (k, v.__module__, v.__name__)
-                           for k, v in sdCache.knownSDs.iteritems()))
+        results = storageServer.connectAll(
+            connect, zip(conList, conObjs),
+            connectionTimeout=config.getint(
+                'irs', 'storage_server_connection_timeout'),
+            timeout=config.getint('irs', 'connect_storage_server_timeout'),
+            itemId=lambda args: args[0]["id"])
 
+        res = []
+        connected = []
+        for conDef, result in zip(conList, results):
+            if result.succeeded:
+                status = 0
+                connected.append(result.value)
+            else:
+                status, _ = self._translateConnectionError(result.value)
+            self.log.debug("Connection %s status %s (%.2f seconds)",
+                           conDef["id"], status, result.elapsed)
             res.append({'id': conDef["id"], 'status': status})
 
+        doms = self.__prefetchAllDomains(domType, connected)
+        # Any pre-existing domains in sdCache stand the chance of being
+        # invalid, since there is no way to know what happens to them while
+        # the storage is disconnected.
+        for sdUUID in doms.iterkeys():
+            sdCache.manuallyRemoveDomain(sdUUID)
+        sdCache.knownSDs.update(doms)
+
+        self.log.debug("knownSDs: {%s}", ", ".join("%s: %s.%s" %
+                       (k, v.__module__, v.__name__)
+                       for k, v in sdCache.knownSDs.iteritems()))
+
         # Connecting new device may change the visible storage domain list
         # so invalidate caches
         sdCache.invalidateStorage()
@@ -2630,6 +2665,24 @@ class HSM(object):
 
         return dict(connectionslist=res)
 
+    @public
+    def getStoragePoolConnectStats(self, spUUID, options=None):
+        """
+        Gets the timing breakdown of the last connect or refresh of a storage
+        pool.
+
+        :param spUUID: The UUID of the storage pool.
+        :type spUUID: UUID
+
+        :returns: a dict with the seconds spent producing the master domain,
+                  reading the pool metadata, producing the other domains and
+                  linking them, and the produce and lockspace add time of
+                  every domain.
+        :rtype: dict
+        """
+        pool = self.getPool(spUUID)
+        return dict(stats=pool.getConnectStats())
+
     @public
     def getStoragePoolInfo(self, spUUID, options=None):
         """
@@ -3295,6 +3348,23 @@ class HSM(object):
             volUUIDs = [k for k, v in vols.iteritems() if imgUUID in v.imgs]
         return dict(uuidlist=volUUIDs)
 
+    @public
+    def getVolumesInfo(self, sdUUID, options=None):
+        """
+        Gets the info of all the volumes of a storage domain.
+
+        :param sdUUID: The UUID of the storage domain you want to query.
+        :type sdUUID: UUID
+
+        :returns: a dict with the info of every volume of the domain, keyed
+                  by volume UUID. The info is the same as returned by
+                  :meth:`getVolumeInfo`.
+        :rtype: dict
+        """
+        vars.task.getSharedLock(STORAGE, sdUUID)
+        dom = sdCache.produce(sdUUID=sdUUID)
+        return dict(volumes=dom.dumpVolumes())
+
     @public
     def getImagesList(self, sdUUID, options=None):
         """
@@ -32,6 +32,7 @@ import sd
 import misc
 import fileUtils
 import imageSharing
+import copyJobs
 from vdsm.utils import ActionStopped
 import storage_exception as se
 import task
@@ -444,13 +445,18 @@ class Image:
                         backingFormat = None
 
                     self.log.debug("start qemu convert")
-                    qemuimg.convert(srcVol.getVolumePath(),
-                                    dstVol.getVolumePath(),
-                                    vars.task.aborting,
-                                    srcFormat=srcFormat,
-                                    dstFormat=dstFormat,
-                                    backing=backing,
-                                    backingFormat=backingFormat)
+                    job = copyJobs.copyJob(
+                        srcVol.getSize() * volume.BLOCK_SIZE, vars.task,
+                        "copy volume %s" % srcVol.volUUID)
+                    with job:
+                        qemuimg.convert(srcVol.getVolumePath(),
+                                        dstVol.getVolumePath(),
+                                        vars.task.aborting,
+                                        srcFormat=srcFormat,
+                                        dstFormat=dstFormat,
+                                        backing=backing,
+                                        backingFormat=backingFormat,
+                                        progress=job.progress)
                 except ActionStopped:
                     raise
                 except se.StorageException:
@@ -829,11 +835,17 @@ class Image:
                 srcVol.prepare(rw=False)
                 dstVol.prepare(rw=True, setrw=True)
 
+                job = copyJobs.copyJob(
+                    volParams['size'] * volume.BLOCK_SIZE, vars.task,
+                    "copy collapsed %s" % srcVol.volUUID)
                 try:
-                    qemuimg.convert(volParams['path'], dstPath,
-                                    vars.task.aborting,
-                                    volume.fmt2str(volParams['volFormat']),
-                                    volume.fmt2str(dstVolFormat))
+                    with job:
+                        qemuimg.convert(
+                            volParams['path'], dstPath,
+                            vars.task.aborting,
+                            volume.fmt2str(volParams['volFormat']),
+                            volume.fmt2str(dstVolFormat),
+                            progress=job.progress)
                 except ActionStopped:
                     raise
                 except qemuimg.QImgError as e:
@@ -1070,12 +1082,18 @@ class Image:
             with newVol.scopedPrepare(rw=True, justme=True, setrw=True):
                 # Step 2: Convert successor to new volume
                 #   qemu-img convert -f qcow2 successor -O raw newUUID
+                job = copyJobs.copyJob(
+                    srcVolParams['size'] * volume.BLOCK_SIZE, vars.task,
+                    "merge %s" % srcVol.volUUID)
                 try:
-                    qemuimg.convert(srcVolParams['path'],
-                                    newVol.getVolumePath(),
-                                    vars.task.aborting,
-                                    volume.fmt2str(srcVolParams['volFormat']),
-                                    volume.fmt2str(volParams['volFormat']))
+                    with job:
+                        qemuimg.convert(
+                            srcVolParams['path'],
+                            newVol.getVolumePath(),
+                            vars.task.aborting,
+                            volume.fmt2str(srcVolParams['volFormat']),
+                            volume.fmt2str(volParams['volFormat']),
+                            progress=job.progress)
                 except qemuimg.QImgError:
                     self.log.exception('conversion failure for volume %s',
                                        srcVol.volUUID)
@@ -18,25 +18,13 @@
 #
 
 import logging
-import signal
 
 import curlImgWrap
-from vdsm import constants
-from vdsm import utils
-import storage_exception as se
+import imageStream
+from threadLocal import vars
 
 
 log = logging.getLogger("Storage.ImageSharing")
-# Time to wait from finishing writing data to dd, until dd exists,
-# Ensure that we don't keep the task active forever if dd cannot
-# access the storage.
-WAIT_TIMEOUT = 30
-# Number of bytes to read from the socket and write
-# to dd stdin trough the pipe. Based on default socket buffer
-# size(~80KB) and default pipe buffer size (64K), this should
-# minimize system call overhead without consuming too much
-# memory.
-BUFFER_SIZE = 65536
 
 
 def httpGetSize(methodArgs):
@@ -74,71 +62,34 @@ def httpUploadImage(srcImgPath, methodArgs):
                        methodArgs.get("headers", {}))
 
 
+def _taskProgress(totalSize):
+    """
+    Return a Progress reporting to the current task, if any.
+    """
+    task = vars.task
+    callback = task.setProgress if task is not None else None
+    return imageStream.Progress(totalSize, callback)
+
+
+def _taskAborting():
+    task = vars.task
+    return task.aborting if task is not None else None
+
+
 def copyToImage(dstImgPath, methodArgs):
     totalSize = getLengthFromArgs(methodArgs)
     fileObj = methodArgs['fileObj']
-    cmd = [constants.EXT_DD, "of=%s" % dstImgPath, "bs=%s" % constants.MEGAB]
-    p = utils.execCmd(cmd, sudo=False, sync=False,
-                      deathSignal=signal.SIGKILL)
-    try:
-        _copyData(fileObj, p.stdin, totalSize)
-        p.stdin.close()
-        if not p.wait(WAIT_TIMEOUT):
-            log.error("timeout waiting for dd process")
-            raise se.StorageException()
-
-        if p.returncode != 0:
-            log.error("dd error - code %s, stderr %s",
-                      p.returncode, p.stderr.read(1000))
-            raise se.MiscFileWriteException()
-
-    except Exception:
-        if p.returncode is None:
-            p.kill()
-        raise
+    imageStream.copyToImage(dstImgPath, fileObj, totalSize,
+                            progress=_taskProgress(totalSize),
+                            stop=_taskAborting())
 
 
 def copyFromImage(dstImgPath, methodArgs):
     fileObj = methodArgs['fileObj']
-    bytes_left = total_size = methodArgs['length']
-    cmd = [constants.EXT_DD, "if=%s" % dstImgPath, "bs=%s" % constants.MEGAB,
-           "count=%s" % (total_size / constants.MEGAB + 1)]
-
-    p = utils.execCmd(cmd, sync=False,
-                      deathSignal=signal.SIGKILL)
-    p.blocking = True
-    try:
-        _copyData(p.stdout, fileObj, bytes_left)
-    finally:
-        if p.returncode is None:
-            p.kill()
-
-
-def _copyData(inFile, outFile, totalSize):
-    bytesToRead = totalSize
-    while totalSize > 0:
-        toRead = min(BUFFER_SIZE, totalSize)
-
-        try:
-            data = inFile.read(toRead)
-        except IOError as e:
-            error = "error reading file: %s" % e
-            log.error(error)
-            raise se.MiscFileReadException(error)
-
-        if not data:
-            error = "partial data %s from %s" % \
-                    (bytesToRead - totalSize, bytesToRead)
-            log.error(error)
-            raise se.MiscFileReadException(error)
-
-        outFile.write(data)
-        # outFile may not be a real file object but a wrapper.
-        # To ensure that we don't use more memory as the input buffer size
-        # we flush on every write.
-        outFile.flush()
-
-        totalSize = totalSize - len(data)
+    totalSize = methodArgs['length']
+    imageStream.copyFromImage(dstImgPath, fileObj, totalSize,
+                              progress=_taskProgress(totalSize),
+                              stop=_taskAborting())
 
 
 _METHOD_IMPLEMENTATIONS = {
@@ -0,0 +1,443 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+"""
+In process streaming of image data between a volume and a stream.
+
+Zero extents are detected so they are not read from the volume when
+streaming out of a file volume (using SEEK_DATA/SEEK_HOLE), and are not
+written to the volume when streaming into it (holes are left in sparse file
+volumes, and other volumes are zeroed using fallocate or BLKZEROOUT).
+
+Data extents of file volumes are sent to the stream using sendfile(2) when
+the stream is backed by a regular file or a pipe. Sockets are always written
+through the stream object, since they may be wrapped by SSL.
+"""
+
+import ctypes
+import errno
+import fcntl
+import io
+import logging
+import mmap
+import os
+import select
+import stat
+import struct
+
+from vdsm import constants
+from vdsm import utils
+import storage_exception as se
+
+log = logging.getLogger("Storage.ImageStream")
+
+libc = ctypes.CDLL("libc.so.6", use_errno=True)
+
+# Size of the buffer used to copy data. Allocated with mmap, so it is page
+# aligned.
+BUFFER_SIZE = 8 * constants.MEGAB
+
+# Granularity of zero detection when writing to a volume.
+ZERO_BLOCK_SIZE = constants.MEGAB
+
+# Maximum number of bytes sent in one sendfile call.
+SENDFILE_SIZE = 64 * constants.MEGAB
+
+# Seconds to wait for a non blocking stream to become writable.
+WAIT_TIMEOUT = 60
+
+# Minimal interval between progress reports in seconds.
+PROGRESS_INTERVAL = 1.0
+
+# From <unistd.h>
+SEEK_DATA = 3
+SEEK_HOLE = 4
+
+# From <linux/fs.h>
+BLKZEROOUT = 0x127f
+
+# From <linux/falloc.h>
+FALLOC_FL_ZERO_RANGE = 0x10
+
+_ZEROS = "\0" * BUFFER_SIZE
+_ZERO_BLOCK = _ZEROS[:ZERO_BLOCK_SIZE]
+
+libc.sendfile.argtypes = [ctypes.c_int, ctypes.c_int,
+                          ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t]
+libc.sendfile.restype = ctypes.c_ssize_t
+
+libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64,
+                           ctypes.c_int64]
+libc.fallocate.restype = ctypes.c_int
+
+
+class Progress(object):
+    """
+    Track the number of bytes transferred, reporting the progress and the
+    average throughput to callback at most once per interval seconds.
+
+    callback is called as callback(done, total, rate), rate in bytes per
+    second.
+    """
+
+    def __init__(self, total, callback=None, interval=PROGRESS_INTERVAL,
+                 clock=utils.monotonic_time):
+        self.total = total
+        self.done = 0
+        self._callback = callback
+        self._interval = interval
+        self._clock = clock
+        self._start = clock()
+        self._lastReport = self._start
+
+    @property
+    def elapsed(self):
+        return self._clock() - self._start
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0
+        return int(self.done / elapsed)
+
+    def update(self, count):
+        self.done += count
+        if self._callback is None:
+            return
+        now = self._clock()
+        if now - self._lastReport >= self._interval or \
+                self.done >= self.total:
+            self._lastReport = now
+            self._callback(self.done, self.total, self.rate)
+
+
+def dataExtents(fd, start, end):
+    """
+    Iterate over the extents of the file fd between start and end, yielding
+    (offset, length, isData) tuples.
+
+    If the file system does not support SEEK_DATA/SEEK_HOLE the whole range
+    is reported as data.
+    """
+    offset = start
+    while offset < end:
+        try:
+            dataStart = os.lseek(fd, offset, SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # No more data after offset
+                yield offset, end - offset, False
+                return
+            if e.errno == errno.EINVAL:
+                yield offset, end - offset, True
+                return
+            raise
+
+        dataStart = min(dataStart, end)
+        if dataStart > offset:
+            yield offset, dataStart - offset, False
+            offset = dataStart
+            if offset == end:
+                return
+
+        dataEnd = min(os.lseek(fd, offset, SEEK_HOLE), end)
+        yield offset, dataEnd - offset, True
+        offset = dataEnd
+
+
+def _streamFileno(fileObj):
+    """
+    Return the file descriptor of fileObj if it can be used for sendfile, or
+    None.
+
+    Only regular files and pipes are written directly. The descriptor of a
+    socket file object may be the raw socket under an SSL connection, and
+    writing to it would bypass the encryption.
+    """
+    try:
+        fd = fileObj.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+    mode = os.fstat(fd).st_mode
+    if not (stat.S_ISREG(mode) or stat.S_ISFIFO(mode)):
+        return None
+    # Writing directly to the descriptor bypasses the file object buffer.
+    fileObj.flush()
+    return fd
+
+
+def _waitWritable(fd):
+    _, writable, _ = select.select([], [fd], [], WAIT_TIMEOUT)
+    if not writable:
+        raise se.MiscFileWriteException("timeout writing to stream")
+
+
+def _sendfile(outFd, inFd, offset, count):
+    """
+    Send count bytes at offset from inFd to outFd, handling non blocking
+    output descriptors.
+    """
+    off = ctypes.c_int64(offset)
+    while count > 0:
+        n = libc.sendfile(outFd, inFd, ctypes.byref(off),
+                          min(count, SENDFILE_SIZE))
+        if n < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                continue
+            if err == errno.EAGAIN:
+                _waitWritable(outFd)
+                continue
+            raise OSError(err, os.strerror(err))
+        if n == 0:
+            raise se.MiscFileReadException(
+                "unexpected end of file at offset %d" % off.value)
+        count -= n
+        yield n
+
+
+def _checkStop(stop):
+    if stop is not None and stop():
+        raise utils.ActionStopped()
+
+
+def copyFromImage(srcPath, outFile, size, progress=None, stop=None):
+    """
+    Write size bytes from the volume at srcPath to outFile.
+
+    Holes in file volumes are not read from storage; zeros are written to
+    outFile instead. Data extents are sent using sendfile when outFile is
+    backed by a regular file or a pipe.
+    """
+    if progress is None:
+        progress = Progress(size)
+
+    fd = os.open(srcPath, os.O_RDONLY)
+    try:
+        if stat.S_ISBLK(os.fstat(fd).st_mode):
+            extents = [(0, size, True)]
+        else:
+            extents = dataExtents(fd, 0, size)
+
+        outFd = _streamFileno(outFile)
+        src = io.FileIO(fd, "r", closefd=False)
+        buf = mmap.mmap(-1, BUFFER_SIZE)
+        try:
+            for offset, length, isData in extents:
+                _checkStop(stop)
+                if not isData:
+                    _writeZeros(outFile, length, progress, stop)
+                elif outFd is not None:
+                    for n in _sendfile(outFd, fd, offset, length):
+                        progress.update(n)
+                        _checkStop(stop)
+                else:
+                    _copyExtent(src, offset, length, buf, outFile,
+                                progress, stop)
+        finally:
+            buf.close()
+    finally:
+        os.close(fd)
+
+
+def _writeZeros(outFile, length, progress, stop):
+    while length > 0:
+        n = min(length, BUFFER_SIZE)
+        outFile.write(_ZEROS if n == BUFFER_SIZE else _ZEROS[:n])
+        length -= n
+        progress.update(n)
+        _checkStop(stop)
+
+
+def _copyExtent(src, offset, length, buf, outFile, progress, stop):
+    src.seek(offset)
+    while length > 0:
+        if length < BUFFER_SIZE:
+            # readinto fills the whole buffer, so read the tail of the
+            # extent without it to avoid reading past the extent.
+            data = src.read(length)
+            n = len(data)
+            if n:
+                outFile.write(data)
+        else:
+            n = src.readinto(buf)
+            if n:
+                outFile.write(buffer(buf, 0, n))
+        if not n:
+            raise se.MiscFileReadException(
+                "unexpected end of file at offset %d" % src.tell())
+        length -= n
+        progress.update(n)
+        _checkStop(stop)
+
+
+# Ways to handle zero blocks when writing to a volume
+ZERO_SKIP = "skip"              # Leave a hole in a sparse file
+ZERO_RANGE = "zero-range"       # fallocate(FALLOC_FL_ZERO_RANGE)
+ZERO_BLKZEROOUT = "blkzeroout"  # ioctl(BLKZEROOUT) on block devices
+
+
+class _ZeroWriter(object):
+    """
+    Write data to fd, detecting zero blocks and handling them according to
+    zeroMode without writing the zeros, falling back to writing zeros if
+    the kernel does not support the operation.
+
+    Consecutive zero blocks are merged to one operation.
+    """
+
+    def __init__(self, fd, zeroMode):
+        self._fd = fd
+        self._zeroMode = zeroMode
+        self._zeroStart = None
+        self._zeroLength = 0
+        self.offset = 0
+        self.zeroed = 0
+
+    def write(self, data):
+        pos = 0
+        size = len(data)
+        while pos < size:
+            n = min(ZERO_BLOCK_SIZE, size - pos)
+            block = data[pos:pos + n]
+            if block == _ZERO_BLOCK[:n]:
+                self._addZeros(n)
+            else:
+                self._flushZeros()
+                self._write(block)
+            pos += n
+
+    def close(self):
+        self._flushZeros()
+
+    def _addZeros(self, n):
+        if self._zeroStart is None:
+            self._zeroStart = self.offset
+        self._zeroLength += n
+        self.offset += n
+        self.zeroed += n
+
+    def _flushZeros(self):
+        if self._zeroStart is None:
+            return
+        start, length = self._zeroStart, self._zeroLength
+        self._zeroStart = None
+        self._zeroLength = 0
+
+        if self._zeroMode != ZERO_SKIP:
+            try:
+                self._zeroRange(start, length)
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.ENOTTY, errno.EOPNOTSUPP,
+                                   errno.EINVAL):
+                    raise
+                log.debug("Cannot zero using %s (%s), writing zeros",
+                          self._zeroMode, e)
+                self._zeroMode = None
+                os.lseek(self._fd, start, os.SEEK_SET)
+                while length > 0:
+                    n = min(length, BUFFER_SIZE)
+                    self._writeAll(buffer(_ZEROS, 0, n))
+                    length -= n
+        os.lseek(self._fd, self.offset, os.SEEK_SET)
+
+    def _zeroRange(self, start, length):
+        if self._zeroMode == ZERO_BLKZEROOUT:
+            fcntl.ioctl(self._fd, BLKZEROOUT,
+                        struct.pack("QQ", start, length))
+        elif self._zeroMode == ZERO_RANGE:
+            fallocate(self._fd, FALLOC_FL_ZERO_RANGE, start, length)
+        else:
+            raise IOError(errno.EOPNOTSUPP, "zeroing not supported")
+
+    def _write(self, data):
+        self._writeAll(data)
+        self.offset += len(data)
+
+    def _writeAll(self, data):
+        pos = 0
+        while pos < len(data):
+            pos += os.write(self._fd, buffer(data, pos))
+
+
+def fallocate(fd, mode, offset, length):
+    if libc.fallocate(fd, mode, ctypes.c_int64(offset),
+                      ctypes.c_int64(length)) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+def copyToImage(dstPath, inFile, size, progress=None, stop=None):
+    """
+    Read size bytes from inFile and write them to the volume at dstPath.
+
+    Zero blocks are not written to the volume; they are left as holes in
+    sparse file volumes, zeroed using fallocate in preallocated file
+    volumes, and zeroed by the storage on block volumes.
+    """
+    if progress is None:
+        progress = Progress(size)
+
+    fd = os.open(dstPath, os.O_WRONLY)
+    try:
+        st = os.fstat(fd)
+        isBlock = stat.S_ISBLK(st.st_mode)
+        if isBlock:
+            zeroMode = ZERO_BLKZEROOUT
+        elif st.st_size > 0 and st.st_blocks * 512 >= st.st_size:
+            # Keep preallocated volumes allocated, zeroing the range
+            # without writing the zeros.
+            zeroMode = ZERO_RANGE
+        else:
+            # Like dd, replace the previous content of the file. The file
+            # is extended back to size at the end, leaving holes where zero
+            # blocks were skipped.
+            zeroMode = ZERO_SKIP
+            os.ftruncate(fd, 0)
+
+        writer = _ZeroWriter(fd, zeroMode)
+        remaining = size
+        while remaining > 0:
+            _checkStop(stop)
+            toRead = min(BUFFER_SIZE, remaining)
+            try:
+                data = inFile.read(toRead)
+            except IOError as e:
+                error = "error reading file: %s" % e
+                log.error(error)
+                raise se.MiscFileReadException(error)
+
+            if not data:
+                error = "partial data %s from %s" % (size - remaining, size)
+                log.error(error)
+                raise se.MiscFileReadException(error)
+
+            writer.write(data)
+            remaining -= len(data)
+            progress.update(len(data))
+
+        writer.close()
+        if not isBlock:
+            os.ftruncate(fd, size)
+        os.fsync(fd)
+        log.debug("Copied %d bytes to %s, skipped %d zero bytes in %.2f "
+                  "seconds", size, dstPath, writer.zeroed, progress.elapsed)
+    finally:
+        os.close(fd)
@@ -229,6 +229,14 @@ def readblock(name, offset, size):
     '''
     Read (direct IO) the content of device 'name' at offset, size bytes
     '''
+    return readblockRaw(name, offset, size).splitlines()
+
+
+def readblockRaw(name, offset, size):
+    '''
+    Read (direct IO) the content of device 'name' at offset, size bytes,
+    returning the data as a string
+    '''
 
     # direct io must be aligned on block size boundaries
     if (size % 512) or (offset % 512):
@@ -253,7 +261,7 @@ def readblock(name, offset, size):
         ret += out
         left = left % iounit
         offset = baseoffset + size - left
-    return ret.splitlines()
+    return ret
 
 
 def validateDDBytes(ddstderr, size):
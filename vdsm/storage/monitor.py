@@ -119,6 +119,17 @@ class DomainMonitor(object):
         for sdUUID, monitor in self._monitors.items():
             yield sdUUID, monitor.getStatus()
 
+    def getLockspaceAddTime(self, sdUUID):
+        """
+        Return the number of seconds the monitor of sdUUID waited for its
+        host id since it started to acquire it, or None if the monitor did
+        not acquire the host id (yet).
+        """
+        monitor = self._monitors.get(sdUUID)
+        if monitor is None:
+            return None
+        return monitor.lockspaceAddTime
+
     def getHostStatus(self, domains):
         status = {}
         for sdUUID, hostId in domains.iteritems():
@@ -178,6 +189,8 @@ class MonitorThread(object):
         self.lastRefresh = time.time()
         self.refreshTime = \
             config.getint("irs", "repo_stats_cache_refresh_timeout")
+        self.acquireStarted = None
+        self.lockspaceAddTime = None
 
     def start(self):
         self.thread.start()
@@ -334,6 +347,8 @@ class MonitorThread(object):
         self.nextStatus.masterMounted = masterStats['mount']
 
         self.nextStatus.hasHostId = self.domain.hasHostId(self.hostId)
+        if self.nextStatus.hasHostId:
+            self._checkLockspaceAdded()
         self.nextStatus.isoPrefix = self.isoPrefix
         self.nextStatus.version = self.domain.getVersion()
 
@@ -350,8 +365,17 @@ class MonitorThread(object):
         # it is superfluous.
         return self.domain and not self.isIsoDomain
 
+    def _checkLockspaceAdded(self):
+        if self.acquireStarted is None or self.lockspaceAddTime is not None:
+            return
+        self.lockspaceAddTime = utils.monotonic_time() - self.acquireStarted
+        self.log.info("Host id %s for domain %s acquired in %.2f seconds",
+                      self.hostId, self.sdUUID, self.lockspaceAddTime)
+
     @utils.cancelpoint
     def _acquireHostId(self):
+        if self.acquireStarted is None:
+            self.acquireStarted = utils.monotonic_time()
         try:
             self.domain.acquireHostId(self.hostId, async=True)
         except:
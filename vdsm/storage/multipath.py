@@ -143,27 +143,31 @@ def getHBTL(physdev):
 def pathListIter(filterGuids=None):
     filteringOn = filterGuids is not None
     filterLen = len(filterGuids) if filteringOn else -1
-    devsFound = 0
-
-    knownSessions = {}
-
-    svdsm = supervdsm.getProxy()
-    pathStatuses = devicemapper.getPathsStatus()
+    devices = []
 
     for dmId, guid in getMPDevsIter():
-        if devsFound == filterLen:
+        if len(devices) == filterLen:
             break
 
         if filteringOn and guid not in filterGuids:
             continue
 
-        devsFound += 1
+        devices.append((dmId, guid))
+
+    knownSessions = {}
+
+    # Get the paths status and the serials of all devices in one request
+    with supervdsm.getProxy().batch() as batch:
+        pathStatuses = batch.getPathsStatus()
+        serials = [batch.getScsiSerial(dmId) for dmId, _ in devices]
+    pathStatuses = pathStatuses.result()
 
+    for (dmId, guid), serial in zip(devices, serials):
         devInfo = {
             "guid": guid,
             "dm": dmId,
             "capacity": str(getDeviceSize(dmId)),
-            "serial": svdsm.getScsiSerial(dmId),
+            "serial": serial.result(),
             "paths": [],
             "connections": [],
             "devtypes": [],
@@ -42,6 +42,45 @@ def _preprocessLine(line):
     return unicode.encode(line, 'ascii', 'xmlcharrefreplace')
 
 
+class RefreshStats(object):
+    """
+    Count metadata refreshes that could reuse the previously parsed
+    metadata (hits) and the ones that had to parse and verify it (misses).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    @property
+    def hitRate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return float(self.hits) / total
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def __repr__(self):
+        return "<RefreshStats hits=%d misses=%d hitRate=%.2f>" % (
+            self.hits, self.misses, self.hitRate)
+
+
+stats = RefreshStats()
+
+
 def unicodeEncoder(s):
     return s
 
@@ -185,6 +224,10 @@ class PersistentDict(object):
     def __init__(self, metaReaderWriter):
         self._syncRoot = threading.RLock()
         self._metadata = {}
+        # Raw lines and parsed metadata of the last metadata read or
+        # written, used to skip parsing when the metadata did not change.
+        self._lines = None
+        self._parsed = None
         self._metaRW = metaReaderWriter
         self._isValid = False
         self._inTransaction = False
@@ -229,6 +272,17 @@ class PersistentDict(object):
         with self._syncRoot:
             lines = self._metaRW.readlines()
 
+            # The lines include the checksum, so if they did not change the
+            # metadata was already parsed and verified.
+            if lines == self._lines:
+                stats.hit()
+                self.log.debug("metadata unchanged (%s), %s",
+                               self._metaRW.__class__.__name__, stats)
+                self._isValid = True
+                self._metadata = self._parsed.copy()
+                return
+
+            stats.miss()
             self.log.debug("read lines (%s)=%s",
                            self._metaRW.__class__.__name__,
                            lines)
@@ -252,6 +306,7 @@ class PersistentDict(object):
                 self.log.debug("Empty metadata")
                 self._isValid = True
                 self._metadata = newMD
+                self._remember(lines, newMD)
                 return
 
             if declaredChecksum is None:
@@ -263,6 +318,7 @@ class PersistentDict(object):
                               "trust it as it is")
                 self._isValid = True
                 self._metadata = newMD
+                self._remember(lines, newMD)
                 return
 
             checksumCalculator = hashlib.sha1()
@@ -283,6 +339,7 @@ class PersistentDict(object):
 
             self._isValid = True
             self._metadata = newMD
+            self._remember(lines, newMD)
 
     def flush(self, overrideMD):
         with self._syncRoot:
@@ -303,11 +360,19 @@ class PersistentDict(object):
 
             self.log.debug("about to write lines (%s)=%s",
                            self._metaRW.__class__.__name__, lines)
+            # writelines may modify the lines
+            written = lines[:]
             self._metaRW.writelines(lines)
 
             self._metadata = md
+            self._remember(written, md)
             self._isValid = True
 
+    def _remember(self, lines, md):
+        # Keep a private copy, self._metadata is modified in transactions
+        self._lines = lines
+        self._parsed = md.copy()
+
     def invalidate(self):
         with self._syncRoot:
             self._isValid = False
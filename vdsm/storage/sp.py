@@ -31,6 +31,7 @@ from weakref import proxy
 
 from imageRepository.formatConverter import DefaultFormatConverter
 
+from vdsm import concurrent
 from vdsm import constants, utils
 import storage_mailbox
 import blockSD
@@ -76,6 +77,26 @@ def domainListDecoder(s):
     return domList
 
 
+_producePool = concurrent.BoundedPool(
+    "produce", config.getint('irs', 'connect_storage_pool_workers'))
+
+
+def produceDomains(produce, sdUUIDs, timeout, pool=_producePool):
+    """
+    Call produce(sdUUID) for every sdUUID concurrently, using the threads of
+    pool.
+
+    Returns {sdUUID: concurrent.Status}. value is the produced domain on
+    success, or the exception raised otherwise. Domains that were not
+    produced within timeout seconds are missing from the result; calls still
+    running are abandoned and their results are ignored.
+    """
+    sdUUIDs = list(sdUUIDs)
+    statuses = pool.map(produce, sdUUIDs, timeout)
+    return dict((sdUUID, status) for sdUUID, status in zip(sdUUIDs, statuses)
+                if status is not None)
+
+
 @secured
 class StoragePool(object):
     '''
@@ -105,6 +126,7 @@ class StoragePool(object):
         self._upgradeCallback = partial(StoragePool._upgradePoolDomain,
                                         proxy(self))
         self._backend = None
+        self._connectStats = {}
 
     def __is_secure__(self):
         return self.isSecure()
@@ -1159,8 +1181,15 @@ class StoragePool(object):
         """
         Rebuild storage pool.
         """
+        start = utils.monotonic_time()
+
         # master domain must be refreshed first
-        self.setMasterDomain(msdUUID, masterVersion)
+        self._setMasterDomain(msdUUID, masterVersion)
+        masterDone = utils.monotonic_time()
+
+        # Adding the master lockspace may take some time, let the master
+        # monitor start it while the other domains are produced.
+        self.domainMonitor.startMonitoring(msdUUID, self.id)
 
         fileUtils.createdir(self.poolPath)
 
@@ -1171,6 +1200,7 @@ class StoragePool(object):
         # We should not rebuild non-active domains, because
         # they are probably disconnected from the host
         domUUIDs = self.getDomains(activeOnly=True).keys()
+        metadataDone = utils.monotonic_time()
 
         # msdUUID should be present and active in getDomains result.
         try:
@@ -1180,6 +1210,14 @@ class StoragePool(object):
                            'domains or not active', msdUUID)
             raise se.StoragePoolWrongMaster(self.spUUID, msdUUID)
 
+        # Produce the domains before starting their monitors, so they do not
+        # all race to produce them at the same time. This runs under the
+        # pool lock, so the wait is short; unreachable domains are left to
+        # their monitors.
+        produced = self._produceDomains(domUUIDs)
+        self.updateMonitoringThreads()
+        produceDone = utils.monotonic_time()
+
         # TODO: Consider to remove this whole block. UGLY!
         # We want to avoid looking up (vgs) of unknown block domains.
         # domUUIDs includes all the domains, file or block.
@@ -1228,6 +1266,68 @@ class StoragePool(object):
                     self.log.warn("Could not clean all trash from the pool dom"
                                   " `%s` (%s)", oldie, e)
 
+        end = utils.monotonic_time()
+        domains = {msdUUID: {'produced': True,
+                             'produce': masterDone - start}}
+        for sdUUID in domUUIDs:
+            res = produced.get(sdUUID)
+            if res is None:
+                domains[sdUUID] = {'produced': False}
+            else:
+                domains[sdUUID] = {'produced': res.succeeded,
+                                   'produce': res.elapsed}
+        self._connectStats = {
+            'elapsed': end - start,
+            'master': masterDone - start,
+            'metadata': metadataDone - masterDone,
+            'produce': produceDone - metadataDone,
+            'links': end - produceDone,
+            'domains': domains,
+        }
+        self.log.info("Rebuilt pool %s with %d domains in %.2f seconds "
+                      "(master %.2f, metadata %.2f, produce %.2f, "
+                      "links %.2f)", self.spUUID, len(domains), end - start,
+                      masterDone - start, metadataDone - masterDone,
+                      produceDone - metadataDone, end - produceDone)
+
+    @unsecured
+    def _produceDomains(self, sdUUIDs):
+        results = produceDomains(
+            sdCache.produce, sdUUIDs,
+            timeout=config.getint('irs', 'connect_storage_pool_timeout'))
+
+        for sdUUID in sdUUIDs:
+            res = results.get(sdUUID)
+            if res is None:
+                self.log.warning("Timeout producing domain %s, leaving it to "
+                                 "the domain monitor", sdUUID)
+            elif res.succeeded:
+                self.log.debug("Produced domain %s in %.2f seconds", sdUUID,
+                               res.elapsed)
+            else:
+                self.log.warning("Error producing domain %s after %.2f "
+                                 "seconds: %s", sdUUID, res.elapsed,
+                                 res.value)
+        return results
+
+    @unsecured
+    def getConnectStats(self):
+        """
+        Return the timing breakdown of the last pool connect or refresh, and
+        the time it took to add the lockspace of every domain, if it was
+        added by its domain monitor.
+        """
+        stats = dict(self._connectStats)
+        domains = {}
+        for sdUUID, info in stats.get('domains', {}).iteritems():
+            info = dict(info)
+            lockspace = self.domainMonitor.getLockspaceAddTime(sdUUID)
+            if lockspace is not None:
+                info['lockspace'] = lockspace
+            domains[sdUUID] = info
+        stats['domains'] = domains
+        return stats
+
     @unsecured
     def refresh(self, msdUUID, masterVersion):
         """
@@ -1367,6 +1467,11 @@ class StoragePool(object):
         'msdUUID' - expected master domain UUID.
         'masterVersion' - expected pool msd version.
         """
+        self._setMasterDomain(msdUUID, masterVersion)
+        self.updateMonitoringThreads()
+
+    @unsecured
+    def _setMasterDomain(self, msdUUID, masterVersion):
         try:
             domain = sdCache.produce(msdUUID)
         except se.StorageDomainDoesNotExist:
@@ -1389,7 +1494,6 @@ class StoragePool(object):
                        masterVersion)
 
         self.masterDomain = domain
-        self.updateMonitoringThreads()
 
     @unsecured
     @misc.samplingmethod
@@ -31,6 +31,8 @@ import sys
 
 from vdsm.compat import pickle
 from vdsm.config import config
+from vdsm import concurrent
+from vdsm import utils
 
 import mount
 import fileUtils
@@ -646,6 +648,51 @@ class ConnectionFactory(object):
         return ctor(**params)
 
 
+_connectPool = concurrent.BoundedPool(
+    "connect", config.getint('irs', 'connect_storage_server_workers'))
+
+
+def connectAll(connect, items, connectionTimeout, timeout, itemId=str,
+               pool=_connectPool):
+    """
+    Call connect(item) for every item concurrently, using the threads of
+    pool.
+
+    Returns a list of concurrent.Status in the same order as items. value is
+    the result of connect on success, or the exception raised otherwise.
+
+    A connection that did not finish connectionTimeout seconds after it was
+    started, or before the overall timeout expired, is reported as failed
+    with se.StorageServerConnectionTimeout. Connections that were not
+    started before the overall timeout expired fail the same way. The thread
+    of a timed out connection keeps counting against the pool size until
+    the connection returns, so connecting again to a dead server cannot
+    pile up threads.
+
+    Timed out items are logged and reported using itemId(item), so items
+    holding credentials are never logged.
+    """
+    log = logging.getLogger("Storage.ConnectAll")
+    items = list(items)
+    start = utils.monotonic_time()
+    statuses = pool.map(connect, items, timeout,
+                        item_timeout=connectionTimeout)
+    end = utils.monotonic_time()
+
+    results = []
+    for item, status in zip(items, statuses):
+        if status is None:
+            name = itemId(item)
+            log.error("Timeout connecting to %s", name)
+            status = concurrent.Status(
+                False, se.StorageServerConnectionTimeout(name), end - start)
+        results.append(status)
+
+    log.debug("Connected %d connections in %.2f seconds",
+              len(items), end - start)
+    return results
+
+
 class ConnectionMonitor(object):
     _log = logging.getLogger("Storage.ConnectionMonitor")
 
@@ -1196,6 +1196,11 @@ class StorageServerConnectionRefIdDoesNotExist(StorageException):
     message = "Connection Reference ID was not registered"
 
 
+class StorageServerConnectionTimeout(StorageException):
+    code = 480
+    message = "Timeout connecting to storage server"
+
+
 #################################################
 #  LVM related Exceptions
 #################################################
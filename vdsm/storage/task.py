@@ -495,6 +495,7 @@ class Task:
         self.jobs = []
         self.nrecoveries = 0    # just utility count - used by save/load
         self.njobs = 0          # just utility count - used by save/load
+        self.progress = None    # not persisted, see setProgress
 
         self.log = SimpleLogAdapter(self.log, {"Task": self.id})
 
@@ -1266,8 +1267,24 @@ class Task:
     def getState(self):
         return str(self.state)
 
+    def setProgress(self, done, total, rate):
+        """
+        Report the progress of a long running operation.
+
+        done and total are in bytes, rate is the current throughput in bytes
+        per second. The progress is reported by getInfo. Byte counts are
+        reported as strings, since they may exceed XML-RPC int limits.
+        """
+        percent = 100 * done / total if total else 100
+        self.progress = {"done": str(done), "total": str(total),
+                         "percent": percent, "rate": str(rate)}
+
     def getInfo(self):
-        return dict(id=self.id, verb=self.name)
+        info = dict(id=self.id, verb=self.name)
+        progress = self.progress
+        if progress is not None:
+            info["progress"] = progress
+        return info
 
     def deprecated_getStatus(self):
         oReturn = {}
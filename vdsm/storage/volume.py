@@ -117,6 +117,68 @@ def name2type(name):
     return None
 
 
+def parseMetadata(lines):
+    """
+    Return a dict of the key=value lines of volume metadata, up to the EOF
+    line. Raises ValueError if a line cannot be parsed.
+    """
+    out = {}
+    for l in lines:
+        if l.startswith("EOF"):
+            break
+        if l.find("=") < 0:
+            continue
+        key, value = l.split("=")
+        out[key.strip()] = value.strip()
+    return out
+
+
+def _metadataInfo(volUUID, imgUUID, parent, meta):
+    return {
+        "uuid": volUUID,
+        "type": meta.get(TYPE, ""),
+        "format": meta.get(FORMAT, ""),
+        "disktype": meta.get(DISKTYPE, ""),
+        "voltype": meta.get(VOLTYPE, ""),
+        "size": int(meta.get(SIZE, "0")),
+        "parent": parent,
+        "description": meta.get(DESCRIPTION, ""),
+        "pool": meta.get(sd.DMDK_POOLS, ""),
+        "domain": meta.get(DOMAIN, ""),
+        "image": imgUUID,
+        "ctime": meta.get(CTIME, ""),
+        "mtime": "0",
+        "legality": meta.get(LEGALITY, ""),
+    }
+
+
+def dumpInfo(volUUID, imgUUID, parent, meta, apparentsize, truesize):
+    """
+    Return the volume info reported by Volume.getInfo, from the volume
+    metadata dict and sizes in bytes. If meta is None the metadata could
+    not be read, and the volume is reported as invalid.
+    """
+    if meta is None:
+        return {
+            "uuid": volUUID,
+            "image": imgUUID,
+            "parent": parent,
+            "apparentsize": "0",
+            "truesize": "0",
+            "status": "INVALID",
+            "children": [],
+        }
+    info = _metadataInfo(volUUID, imgUUID, parent, meta)
+    info["capacity"] = str(info.pop("size") * BLOCK_SIZE)
+    info["apparentsize"] = str(apparentsize)
+    info["truesize"] = str(truesize)
+    info["status"] = "OK"
+    info["children"] = []
+    if info["legality"] == ILLEGAL_VOL:
+        info["status"] = ILLEGAL_VOL
+    return info
+
+
 def getBackingVolumePath(imgUUID, volUUID):
     return os.path.join('..', imgUUID, volUUID)
 
@@ -800,22 +862,8 @@ class Volume(object):
         pass
 
     def metadata2info(self, meta):
-        return {
-            "uuid": self.volUUID,
-            "type": meta.get(TYPE, ""),
-            "format": meta.get(FORMAT, ""),
-            "disktype": meta.get(DISKTYPE, ""),
-            "voltype": meta.get(VOLTYPE, ""),
-            "size": int(meta.get(SIZE, "0")),
-            "parent": self.getParent(),
-            "description": meta.get(DESCRIPTION, ""),
-            "pool": meta.get(sd.DMDK_POOLS, ""),
-            "domain": meta.get(DOMAIN, ""),
-            "image": self.getImage(),
-            "ctime": meta.get(CTIME, ""),
-            "mtime": "0",
-            "legality": meta.get(LEGALITY, ""),
-        }
+        return _metadataInfo(self.volUUID, self.getImage(), self.getParent(),
+                             meta)
 
     @classmethod
     def newMetadata(cls, metaId, sdUUID, imgUUID, puuid, size, format, type,
@@ -0,0 +1,215 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+"""
+Zeroing of block volumes before they are removed.
+
+Volumes are zeroed in large chunks by the kernel using the BLKZEROOUT
+ioctl, which the kernel may offload (e.g. using WRITE SAME or discard) when
+it knows the storage reads the range back as zeros. BLKDISCARD is never
+used directly, since the discard_zeroes_data flag of devices is not
+reliable. If the kernel does not support the ioctl, zeros are written.
+
+Volumes are zeroed by a bounded number of workers, sharing the host wide
+zero_bandwidth_limit like copy jobs share copy_bandwidth_limit. The workers
+run with the lowest cpu priority and the idle io class, like the dd
+processes previously used for zeroing.
+"""
+
+import ctypes
+import errno
+import fcntl
+import logging
+import os
+import platform
+import struct
+import time
+import Queue
+
+from vdsm import concurrent
+from vdsm import constants
+from vdsm import utils
+from vdsm.config import config
+
+import copyJobs
+import imageStream
+
+log = logging.getLogger("Storage.Wipe")
+
+# Size of a single zero request. 128 MiB is the vdsm extent size.
+CHUNK_SIZE = 128 * constants.MEGAB
+
+# Size of the writes when zeros must be written.
+WRITE_SIZE = constants.MEGAB
+
+# Minimal interval between progress reports in seconds.
+PROGRESS_INTERVAL = 10.0
+
+# From <linux/fs.h>
+BLKZEROOUT = 0x127f
+
+# From <sys/resource.h>
+PRIO_PROCESS = 0
+
+# From <linux/ioprio.h>
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+
+# ioprio_set has no libc wrapper.
+_SYS_IOPRIO_SET = {
+    "x86_64": 251,
+    "ppc64": 273,
+    "ppc64le": 273,
+}
+
+_ZEROS = "\0" * WRITE_SIZE
+
+libc = ctypes.CDLL("libc.so.6", use_errno=True)
+
+_scheduler = copyJobs.BandwidthScheduler(
+    config.getint('irs', 'zero_bandwidth_limit') * constants.MEGAB)
+
+
+def lowerThreadPriority():
+    """
+    Run the calling thread with the lowest cpu priority and the idle io
+    class, as execCmd does with nice=NICENESS.HIGH and ioclass=IOCLASS.IDLE.
+    On Linux both are per thread attributes.
+    """
+    if libc.setpriority(PRIO_PROCESS, 0, utils.NICENESS.HIGH) != 0:
+        log.warning("Cannot set thread cpu priority: %s",
+                    os.strerror(ctypes.get_errno()))
+
+    nr = _SYS_IOPRIO_SET.get(platform.machine())
+    if nr is None:
+        log.debug("Cannot set thread io priority on %s", platform.machine())
+        return
+    ioprio = utils.IOCLASS.IDLE << IOPRIO_CLASS_SHIFT
+    if libc.syscall(nr, IOPRIO_WHO_PROCESS, 0, ioprio) != 0:
+        log.warning("Cannot set thread io priority: %s",
+                    os.strerror(ctypes.get_errno()))
+
+
+def zeroDevice(path, scheduler=None):
+    """
+    Zero the device at path, returning the number of bytes zeroed.
+
+    The device bandwidth is limited to its share of the scheduler bandwidth.
+    """
+    if scheduler is None:
+        scheduler = _scheduler
+
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        size = os.lseek(fd, 0, os.SEEK_END)
+        zeroer = _Zeroer(fd)
+        progress = imageStream.Progress(
+            size, lambda done, total, rate: log.info(
+                "Zeroing %s: %d%% (%d/%d bytes, %d bytes/s)", path,
+                100 * done / total, done, total, rate),
+            interval=PROGRESS_INTERVAL)
+
+        with copyJobs.CopyJob(scheduler, size, name="zero " + path) as job:
+            offset = 0
+            while offset < size:
+                length = min(CHUNK_SIZE, size - offset)
+                zeroer.zero(offset, length)
+                offset += length
+                progress.update(length)
+                delay = job.progress(100.0 * offset / size)
+                if delay:
+                    time.sleep(delay)
+
+        if zeroer.wrote:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    log.debug("Zeroed %s (%d bytes) using %s", path, size, zeroer.method)
+    return size
+
+
+class _Zeroer(object):
+    """
+    Zero ranges of a block device using BLKZEROOUT, falling back to writing
+    zeros if the device does not support it.
+    """
+
+    def __init__(self, fd):
+        self._fd = fd
+        self._ioctl = True
+        self.wrote = False
+
+    @property
+    def method(self):
+        return "BLKZEROOUT" if self._ioctl else "write"
+
+    def zero(self, offset, length):
+        if self._ioctl:
+            try:
+                fcntl.ioctl(self._fd, BLKZEROOUT,
+                            struct.pack("QQ", offset, length))
+                return
+            except IOError as e:
+                if e.errno not in (errno.ENOTTY, errno.EOPNOTSUPP,
+                                   errno.EINVAL):
+                    raise
+                log.debug("Cannot zero using %s (%s), writing zeros",
+                          self.method, e)
+                self._ioctl = False
+        self._write(offset, length)
+
+    def _write(self, offset, length):
+        self.wrote = True
+        os.lseek(self._fd, offset, os.SEEK_SET)
+        while length > 0:
+            n = os.write(self._fd, buffer(_ZEROS, 0, min(length, WRITE_SIZE)))
+            length -= n
+
+
+def zeroDevices(paths, workers=None, scheduler=None):
+    """
+    Zero the devices at paths using at most workers threads, returning
+    {path: concurrent.Result}. A failure to zero one device does not stop
+    zeroing the others. The workers run with low cpu and io priority.
+    """
+    if workers is None:
+        workers = config.getint('irs', 'zero_volume_workers')
+
+    queue = Queue.Queue()
+    for path in paths:
+        queue.put(path)
+    results = {}
+
+    def worker(_):
+        lowerThreadPriority()
+        while True:
+            try:
+                path = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[path] = concurrent.Result(
+                    True, zeroDevice(path, scheduler=scheduler))
+            except Exception as e:
+                log.exception("Zeroing %s failed", path)
+                results[path] = concurrent.Result(False, e)
+
+    concurrent.tmap(worker, range(max(1, min(workers, len(paths)))))
+    return results
@@ -24,12 +24,15 @@ from multiprocessing.managers import BaseManager, RemoteError
 import logging
 import threading
 from vdsm import constants, utils
+from vdsm.config import config
+import supervdsmChannel
 
 _g_singletonSupervdsmInstance = None
 _g_singletonSupervdsmInstance_lock = threading.Lock()
 
 
 ADDRESS = os.path.join(constants.P_VDSM_RUN, "svdsm.sock")
+CHANNEL_ADDRESS = os.path.join(constants.P_VDSM_RUN, "svdsm-channel.sock")
 
 
 class _SuperVdsmManager(BaseManager):
@@ -43,6 +46,10 @@ class ProxyCaller(object):
         self._supervdsmProxy = supervdsmProxy
 
     def __call__(self, *args, **kwargs):
+        channel = self._supervdsmProxy._channel
+        if channel is not None:
+            return channel.call(self._funcName, *args, **kwargs)
+
         callMethod = lambda: \
             getattr(self._supervdsmProxy._svdsm, self._funcName)(*args,
                                                                  **kwargs)
@@ -64,11 +71,33 @@ class SuperVdsmProxy(object):
     def __init__(self):
         self._manager = None
         self._svdsm = None
+        self._channel = None
         self._connect()
 
     def open(self, *args, **kwargs):
         return self._manager.open(*args, **kwargs)
 
+    def batch(self):
+        """
+        Return a context collecting calls, sent to supervdsm in one request
+        when the context exits:
+
+            with proxy.batch() as batch:
+                calls = [batch.getScsiSerial(dev) for dev in devices]
+            serials = [call.result() for call in calls]
+        """
+        if self._channel is not None:
+            return self._channel.batch()
+        return _SequentialBatch(self)
+
+    def stats(self):
+        """
+        Return the number of calls and their latency per method.
+        """
+        if self._channel is not None:
+            return self._channel.stats.get()
+        return {}
+
     def _connect(self):
         self._manager = _SuperVdsmManager(address=ADDRESS, authkey='')
         self._manager.register('instance')
@@ -82,10 +111,49 @@ class SuperVdsmProxy(object):
 
         self._svdsm = self._manager.instance()
 
+        if config.getboolean('vars', 'supervdsm_channel'):
+            channel = supervdsmChannel.ChannelClient(CHANNEL_ADDRESS)
+            try:
+                channel.connect()
+            except Exception as e:
+                self._log.warning("Cannot connect to supervdsm channel, "
+                                  "using manager connection: %s", e)
+            else:
+                self._channel = channel
+
     def __getattr__(self, name):
         return ProxyCaller(self, name)
 
 
+class _SequentialBatch(object):
+    """
+    Batch interface for the manager connection, making the calls one by one.
+    """
+
+    def __init__(self, proxy):
+        self._proxy = proxy
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            result = supervdsmChannel.Call(name)
+            try:
+                result.complete(True, getattr(self._proxy, name)(*args,
+                                                                 **kwargs))
+            except Exception as e:
+                result.complete(False, e)
+            return result
+        return call
+
+
 def getProxy():
     global _g_singletonSupervdsmInstance
     if _g_singletonSupervdsmInstance is None:
@@ -0,0 +1,368 @@
+#
+# Copyright 2015 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+"""
+A multiplexed channel for calling supervdsm.
+
+The multiprocessing manager needs a connection per calling thread, each
+allowing one call at a time. The channel carries any number of in-flight
+calls over a single unix socket. Every frame is a length prefixed pickle of
+a list of calls [(callId, method, args, kwargs)], answered by a frame of
+results [(callId, succeeded, value)]. Calls in the same frame (a batch) run
+in order; every frame runs in its own server thread, so a slow call never
+delays other frames.
+"""
+
+import cPickle as pickle
+import errno
+import functools
+import itertools
+import logging
+import socket
+import struct
+import threading
+
+from vdsm import utils
+
+_HEADER = struct.Struct("!I")
+
+
+class Error(RuntimeError):
+    pass
+
+
+class _Connection(object):
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._sendLock = threading.Lock()
+
+    def send(self, obj):
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        with self._sendLock:
+            self._sock.sendall(_HEADER.pack(len(data)) + data)
+
+    def receive(self):
+        """
+        Return the next frame, or None if the peer closed the connection.
+        """
+        header = self._recvall(_HEADER.size)
+        if header is None:
+            return None
+        data = self._recvall(_HEADER.unpack(header)[0])
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass  # Closed by the peer or by another thread
+        self._sock.close()
+
+    def _recvall(self, size):
+        chunks = []
+        while size:
+            try:
+                chunk = self._sock.recv(size)
+            except socket.error as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return "".join(chunks)
+
+
+class ChannelServer(object):
+    """
+    Serve the public methods of instance on a unix socket at address.
+    """
+    log = logging.getLogger("SuperVdsm.ChannelServer")
+
+    def __init__(self, address, instance):
+        self._address = address
+        self._instance = instance
+        self._sock = None
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self._address)
+        self._sock.listen(5)
+        self._startThread(self._accept, "svdsm-accept")
+
+    def stop(self):
+        # Wakes up the accept thread
+        _Connection(self._sock).close()
+
+    def _startThread(self, target, name, args=()):
+        t = threading.Thread(target=target, name=name, args=args)
+        t.daemon = True
+        t.start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except socket.error as e:
+                if e.errno == errno.EINTR:
+                    continue
+                self.log.debug("Stopped accepting connections: %s", e)
+                return
+            self._startThread(self._serve, "svdsm-conn",
+                              args=(_Connection(sock),))
+
+    def _serve(self, conn):
+        try:
+            while True:
+                frame = conn.receive()
+                if frame is None:
+                    break
+                self._startThread(self._run, "svdsm-call",
+                                  args=(conn, frame))
+        except Exception:
+            self.log.exception("Error reading from connection")
+        finally:
+            conn.close()
+
+    def _run(self, conn, frame):
+        results = [self._invoke(*call) for call in frame]
+        try:
+            self._reply(conn, results)
+        except Exception:
+            self.log.exception("Error replying to connection")
+
+    def _invoke(self, callId, name, args, kwargs):
+        try:
+            if name.startswith("_"):
+                raise AttributeError("Private method %r" % name)
+            return callId, True, getattr(self._instance, name)(*args,
+                                                               **kwargs)
+        except Exception as e:
+            return callId, False, e
+
+    def _reply(self, conn, results):
+        try:
+            conn.send(results)
+        except (pickle.PicklingError, TypeError):
+            # Send what can be pickled, failing the other calls
+            conn.send([self._picklable(result) for result in results])
+
+    def _picklable(self, result):
+        callId, succeeded, value = result
+        try:
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            return callId, False, Error("Cannot pickle result: %s" % e)
+        return result
+
+
+class Call(object):
+    """
+    The result of a call sent on the channel.
+    """
+
+    def __init__(self, name, stats=None):
+        self.name = name
+        self._stats = stats
+        self._start = utils.monotonic_time()
+        self._done = threading.Event()
+        self._succeeded = None
+        self._value = None
+
+    def complete(self, succeeded, value):
+        if self._stats is not None:
+            self._stats.record(self.name, utils.monotonic_time() - self._start)
+        self._succeeded = succeeded
+        self._value = value
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+
+    def result(self):
+        """
+        Wait for the call and return its value, or raise its error.
+        """
+        self._done.wait()
+        if not self._succeeded:
+            raise self._value
+        return self._value
+
+
+class CallStats(object):
+    """
+    Count calls and their latency per method.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, latency):
+        with self._lock:
+            try:
+                stats = self._stats[name]
+            except KeyError:
+                stats = self._stats[name] = {"calls": 0, "total": 0.0,
+                                             "max": 0.0}
+            stats["calls"] += 1
+            stats["total"] += latency
+            stats["max"] = max(stats["max"], latency)
+
+    def get(self):
+        """
+        Return {method: {"calls": n, "total": seconds, "max": seconds}}.
+        """
+        with self._lock:
+            return dict((name, dict(stats))
+                        for name, stats in self._stats.iteritems())
+
+
+class ChannelClient(object):
+    """
+    Call methods on a ChannelServer, sharing one connection between all
+    threads. The connection is opened on the first call and reopened after
+    it was lost.
+    """
+    log = logging.getLogger("SuperVdsm.ChannelClient")
+
+    def __init__(self, address):
+        self._address = address
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self.stats = CallStats()
+
+    def connect(self):
+        with self._lock:
+            self._connect()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+
+    def call(self, name, *args, **kwargs):
+        call = Call(name, self.stats)
+        self._send([call], [(name, args, kwargs)])
+        return call.result()
+
+    def batch(self):
+        """
+        Return a context collecting calls made on it, sending them in one
+        frame when the context exits. Calls return a Call, completed once
+        the context has exited.
+        """
+        return Batch(self)
+
+    def _send(self, calls, requests):
+        with self._lock:
+            conn = self._connect()
+            frame = []
+            for call, (name, args, kwargs) in zip(calls, requests):
+                callId = next(self._ids)
+                self._pending[callId] = call
+                frame.append((callId, name, args, kwargs))
+            try:
+                conn.send(frame)
+            except Exception as e:
+                for callId, _, _, _ in frame:
+                    self._pending.pop(callId, None)
+                if isinstance(e, socket.error):
+                    raise Error("Broken communication with supervdsm. "
+                                "Failed call to %s: %s" %
+                                (", ".join(c.name for c in calls), e))
+                raise
+
+    def _connect(self):
+        if self._conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self._address)
+            except:
+                sock.close()
+                raise
+            self._conn = _Connection(sock)
+            t = threading.Thread(target=self._read, args=(self._conn,),
+                                 name="svdsm-reader")
+            t.daemon = True
+            t.start()
+        return self._conn
+
+    def _read(self, conn):
+        try:
+            while True:
+                frame = conn.receive()
+                if frame is None:
+                    break
+                with self._lock:
+                    calls = [(self._pending.pop(callId, None), succeeded,
+                              value)
+                             for callId, succeeded, value in frame]
+                for call, succeeded, value in calls:
+                    if call is not None:
+                        call.complete(succeeded, value)
+        except Exception:
+            self.log.exception("Error reading from supervdsm")
+        finally:
+            with self._lock:
+                if self._conn is conn:
+                    self._conn = None
+                pending = self._pending.values()
+                self._pending.clear()
+            conn.close()
+            for call in pending:
+                call.complete(False, Error(
+                    "Broken communication with supervdsm. Failed call to "
+                    "%s" % call.name))
+
+
+class Batch(object):
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+        self._requests = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        if t is not None or not self._calls:
+            return
+        self._client._send(self._calls, self._requests)
+        for call in self._calls:
+            call.wait()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return functools.partial(self._add, name)
+
+    def _add(self, name, *args, **kwargs):
+        call = Call(name, self._client.stats)
+        self._calls.append(call)
+        self._requests.append((name, args, kwargs))
+        return call
@@ -18,13 +18,16 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
-import array
 import logging
 import time
 import socket
 import errno
 import json
-import unicodedata
+import re
+import sys
+
+from vdsm import utils
+from vdsm.config import config
 
 # TODO: in future import from ..
 import supervdsm
@@ -47,6 +50,22 @@ _RESTRICTED_CHARS = frozenset(unichr(c) for c in
                               [0xFFFE, 0xFFFF])
 
 
+def _charRanges():
+    yield 0xD800, 0xDFFF  # surrogates
+    if sys.maxunicode > 0xFFFF:
+        yield 0x11000, sys.maxunicode
+    for c in sorted(_RESTRICTED_CHARS):
+        yield ord(c), ord(c)
+
+
+_ILLEGAL_XML_CHARS = re.compile(u'[%s]' % u''.join(
+    u'%s-%s' % (unichr(first), unichr(last))
+    for first, last in _charRanges()))
+
+# JSON escapes that may decode to characters illegal in XML
+_UNSAFE_JSON_ESCAPES = re.compile(r'\\[bfu]')
+
+
 def _filterXmlChars(u):
     """
     The set of characters allowed in XML documents is described in
@@ -68,12 +87,7 @@ def _filterXmlChars(u):
     if not isinstance(u, unicode):
         raise TypeError
 
-    chars = array.array('u', u)
-    for i, c in enumerate(chars):
-        if (c > u'\U00010fff' or unicodedata.category(c) == 'Cs'
-                or c in _RESTRICTED_CHARS):
-            chars[i] = _REPLACEMENT_CHAR
-    return chars.tounicode()
+    return _ILLEGAL_XML_CHARS.sub(_REPLACEMENT_CHAR, u)
 
 
 def _filterObject(obj):
@@ -82,7 +96,7 @@ def _filterObject(obj):
     """
     def filt(o):
         if isinstance(o, dict):
-            return dict(map(filt, o.iteritems()))
+            return dict((filt(k), filt(v)) for k, v in o.iteritems())
         elif isinstance(o, list):
             return map(filt, o)
         elif isinstance(o, tuple):
@@ -98,6 +112,34 @@ class MessageState:
     TOO_BIG = 'too-big'
 
 
+class _TokenBucket(object):
+    """
+    Allow consuming rate units per second on average, and up to burst units
+    at once after being idle. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate, burst, clock=utils.monotonic_time):
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._last = clock()
+
+    def consume(self, n):
+        """
+        Consume n units, returning False if the bucket is overdrawn. The
+        overdraft is paid back before more units are available.
+        """
+        if not self._rate:
+            return True
+        now = self._clock()
+        self._tokens = min(self._tokens + (now - self._last) * self._rate,
+                           self._burst)
+        self._last = now
+        self._tokens -= n
+        return self._tokens >= 0
+
+
 class GuestAgentUnsupportedMessage(Exception):
     def __init__(self, cmd, requiredVersion, currentVersion):
         message = "Guest Agent command '%s' requires version '%d'. Current " \
@@ -131,6 +173,13 @@ class GuestAgent(object):
         self._agentTimestamp = 0
         self._channelListener = channelListener
         self._messageState = MessageState.NORMAL
+        self._readLimit = _TokenBucket(
+            config.getint('vars', 'guest_agent_rate_limit'),
+            config.getint('vars', 'guest_agent_rate_burst'))
+        self._channelStats = {
+            'droppedOversize': 0,
+            'droppedInvalid': 0,
+            'throttled': 0}
 
     @property
     def guestDiskMapping(self):
@@ -352,6 +401,13 @@ class GuestAgent(object):
                 'guestIPs': self.guestInfo['guestIPs'],
                 'guestFQDN': self.guestInfo['guestFQDN']}
 
+    def getChannelStats(self):
+        """
+        Return the number of messages dropped because they were too big or
+        invalid, and the number of times the channel was throttled.
+        """
+        return dict(self._channelStats)
+
     def onReboot(self):
         self.guestStatus = vmstatus.REBOOT_IN_PROGRESS
         self.guestInfo['lastUser'] = '' + self.guestInfo['username']
@@ -421,17 +477,32 @@ class GuestAgent(object):
             self._agentTimestamp = time.time()
             self._handleMessage(message, args)
         except ValueError as err:
+            self._channelStats['droppedInvalid'] += 1
             self.log.error("%s: %s" % (err, repr(line)))
 
     def _handleData(self, data):
-        while (not self._stopped) and '\n' in data:
-            line, data = data.split('\n', 1)
-            line = ''.join(self._buffer) + line
-            self._clearReadBuffer()
+        # Splitting once keeps framing linear in the size of data, even
+        # when it holds many messages
+        lines = data.split('\n')
+        data = lines.pop()
+        for i, line in enumerate(lines):
+            if self._stopped:
+                data = '\n'.join(lines[i:] + [data])
+                break
+            if self._buffer:
+                self._buffer.append(line)
+                line = ''.join(self._buffer)
+                self._clearReadBuffer()
             if self._messageState is MessageState.TOO_BIG:
                 self._messageState = MessageState.NORMAL
+                self._channelStats['droppedOversize'] += 1
                 self.log.warning("Not processing current message because it "
                                  "was too big")
+            elif len(line) > self.MAX_MESSAGE_SIZE:
+                self._channelStats['droppedOversize'] += 1
+                self.log.warning("Discarding message with size: %d because "
+                                 "it exceeds the maximum size of %d bytes",
+                                 len(line), self.MAX_MESSAGE_SIZE)
             else:
                 self._processMessage(line)
 
@@ -459,12 +530,23 @@ class GuestAgent(object):
                     result = False
                 else:
                     self._handleData(data)
+                    if not self._readLimit.consume(len(data)):
+                        self._throttle()
+                        break
         except socket.error as err:
             if err.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
                 raise
 
         return result
 
+    def _throttle(self):
+        cooldown = config.getint('vars', 'guest_agent_throttle_cooldown')
+        self.log.warning("Guest agent channel %s exceeded the rate limit, "
+                         "not reading it for %d seconds", self._socketName,
+                         cooldown)
+        self._channelStats['throttled'] += 1
+        self._channelListener.throttle(self._sock.fileno(), cooldown)
+
     def _parseLine(self, line):
         # Deal with any bad UTF8 encoding from the (untrusted) guest,
         # by replacing them with the Unicode replacement character
@@ -473,8 +555,11 @@ class GuestAgent(object):
         # Filter out any characters in the untrusted guest response
         # that aren't permitted in XML.  This must be done _after_ the
         # JSON decoding, since otherwise JSON's \u escape decoding
-        # could be used to generate the bad characters
-        args = _filterObject(args)
+        # could be used to generate the bad characters. Lines with no such
+        # characters or escapes cannot decode to them, and are not filtered.
+        if (_ILLEGAL_XML_CHARS.search(uniline) or
+                _UNSAFE_JSON_ESCAPES.search(uniline)):
+            args = _filterObject(args)
         name = args['__name__']
         del args['__name__']
         return (name, args)
@@ -18,6 +18,12 @@
 # Refer to the README and COPYING files for full details of the license
 #
 
+import collections
+import heapq
+import itertools
+import logging
+import math
+import mmap
 import threading
 import time
 
@@ -41,24 +47,326 @@ MODE_FILE = 'file'
 
 METHOD_ONLINE = 'online'
 
+PRIORITY_EVACUATION = 'evacuation'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_BALANCING = 'balancing'
+
+_PRIORITIES = {
+    PRIORITY_EVACUATION: 0,
+    PRIORITY_NORMAL: 1,
+    PRIORITY_BALANCING: 2,
+}
+
+
+class MigrationTicket(object):
+    """
+    An outgoing migration admitted by the MigrationScheduler.
+    """
+
+    def __init__(self, name, dom, priority, clock):
+        self.name = name
+        self.priority = priority
+        self.bandwidth = None
+        self.throughput = 0
+        self._dom = dom
+        self._clock = clock
+        self._queued = clock()
+        self._admitted = None
+        self._lastSample = None
+
+    @property
+    def waited(self):
+        return self._admitted - self._queued
+
+    def admit(self):
+        self._admitted = self._clock()
+
+    def set_bandwidth(self, bandwidth, log):
+        if bandwidth == self.bandwidth:
+            return
+        # A new migration starts with its bandwidth
+        if self.bandwidth is not None and bandwidth:
+            log.debug('setting migration bandwidth of %s to %d MiB/s',
+                      self.name, bandwidth)
+            try:
+                self._dom.migrateSetMaxSpeed(bandwidth, 0)
+            except libvirt.libvirtError:
+                log.warning('cannot set migration bandwidth of %s',
+                            self.name, exc_info=True)
+                return
+        self.bandwidth = bandwidth
+
+    def progress(self, dataProcessed):
+        """
+        Update the throughput of the migration with dataProcessed bytes
+        reported by jobInfo.
+        """
+        now = self._clock()
+        if self._lastSample is not None:
+            last, processed = self._lastSample
+            if now > last:
+                self.throughput = max(
+                    0, (dataProcessed - processed) / (now - last))
+        self._lastSample = (now, dataProcessed)
+
+
+class MigrationScheduler(object):
+    """
+    Admit at most slots outgoing migrations at the same time, by priority
+    and then in arrival order, and divide the host migration bandwidth
+    between the admitted migrations.
+
+    bandwidth is the host budget in MiB/s, and maxBandwidth the limit of a
+    single migration in MiB/s; 0 means no limit. The bandwidth of the
+    running migrations is updated whenever a migration is admitted or
+    released.
+    """
+    log = logging.getLogger('virt.migration.scheduler')
+
+    def __init__(self, slots, bandwidth, maxBandwidth,
+                 clock=utils.monotonic_time):
+        self._slots = slots
+        self._bandwidth = bandwidth
+        self._maxBandwidth = maxBandwidth
+        self._clock = clock
+        self._cond = threading.Condition(threading.Lock())
+        # Serializes updating the bandwidth of the migrations, which is done
+        # without holding _cond since libvirt may block.
+        self._rebalanceLock = threading.Lock()
+        self._waiting = []
+        self._active = set()
+        self._seq = itertools.count()
+        self._completed = 0
+        self._totalWait = 0.0
+
+    def acquire(self, name, dom, priority=PRIORITY_NORMAL):
+        """
+        Wait until the migration of domain dom can start, and return its
+        ticket. The ticket must be released when the migration ends.
+        """
+        ticket = MigrationTicket(name, dom, priority, self._clock)
+        with self._cond:
+            heapq.heappush(self._waiting,
+                           (_PRIORITIES[priority], next(self._seq), ticket))
+            while (len(self._active) >= self._slots or
+                   self._waiting[0][2] is not ticket):
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            ticket.admit()
+            self._totalWait += ticket.waited
+            self._active.add(ticket)
+            # The next waiting migration may fit in another free slot
+            self._cond.notify_all()
+        self._rebalance()
+        return ticket
+
+    def release(self, ticket):
+        with self._cond:
+            self._active.discard(ticket)
+            self._completed += 1
+            self._cond.notify_all()
+        self._rebalance()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'slots': self._slots,
+                'active': len(self._active),
+                'queued': len(self._waiting),
+                'bandwidth': self._share(),
+                'throughput': sum(t.throughput for t in self._active) /
+                Mbytes,
+                'completed': self._completed,
+                'averageWait': (self._totalWait / self._completed
+                                if self._completed else 0.0),
+            }
+
+    def _share(self):
+        share = self._maxBandwidth
+        if self._bandwidth and self._active:
+            budget = max(1, self._bandwidth / len(self._active))
+            share = min(share, budget) if share else budget
+        return share
+
+    def _rebalance(self):
+        # The share is computed while holding _rebalanceLock, so the last
+        # update always uses the current set of active migrations.
+        with self._rebalanceLock:
+            with self._cond:
+                share = self._share()
+                active = list(self._active)
+            for ticket in active:
+                ticket.set_bandwidth(share, self.log)
+
+
+def _scheduler(slots):
+    return MigrationScheduler(
+        slots,
+        config.getint('vars', 'migration_host_bandwidth'),
+        config.getint('vars', 'migration_max_bandwidth'))
+
+
+class MigrationTelemetry(object):
+    """
+    Samples of an outgoing migration, for debugging migrations which do
+    not converge.
+
+    Data amounts and rates are reported in MiB and MiB per second, since
+    byte counts exceed the XML-RPC int limit.
+
+    The MonitorThread records a sample of the migration job stats on every
+    monitoring interval, keeping the last SAMPLES samples. When the
+    migration ends, the time spent in each phase is computed from the stats
+    of the completed job: pre-copy until the guest was stopped, the
+    downtime, and the post-copy wait until the destination resumed the
+    guest.
+    """
+    SAMPLES = 100
+
+    def __init__(self, samples=SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = collections.deque(maxlen=samples)
+        self._last = None
+        self._downtime = None
+        self._phases = None
+
+    def set_downtime(self, downtime):
+        """
+        Record downtime, the maximum downtime in milliseconds set for the
+        migration.
+        """
+        with self._lock:
+            self._downtime = downtime
+
+    def record(self, job_stats):
+        """
+        Record a sample of job_stats, the stats of the migration job
+        reported by libvirt jobStats().
+        """
+        # time_elapsed is in milliseconds
+        elapsed = job_stats.get('time_elapsed', 0) / 1000.0
+        processed = job_stats.get('data_processed', 0)
+        sample = {
+            'elapsed': elapsed,
+            'dataTotal': _mib(job_stats.get('data_total', 0)),
+            'dataProcessed': _mib(processed),
+            'dataRemaining': _mib(job_stats.get('data_remaining', 0)),
+        }
+        if 'memory_iteration' in job_stats:
+            sample['iteration'] = job_stats['memory_iteration']
+        if 'memory_dirty_rate' in job_stats:
+            # Reported in pages per second
+            sample['dirtyRate'] = _mib(
+                job_stats['memory_dirty_rate'] *
+                job_stats.get('memory_page_size', mmap.PAGESIZE))
+
+        with self._lock:
+            if self._last is not None and elapsed > self._last[0]:
+                throughput = ((processed - self._last[1]) /
+                              (elapsed - self._last[0]))
+            elif elapsed > 0:
+                throughput = processed / elapsed
+            else:
+                throughput = 0
+            self._last = (elapsed, processed)
+            sample['throughput'] = _mib(max(0, throughput))
+            if self._downtime is not None:
+                sample['downtime'] = self._downtime
+            self._samples.append(sample)
+
+    def finish(self, job_stats, duration):
+        """
+        Compute the time spent in each phase of the migration from
+        job_stats, the stats of the completed job, or an empty dict if the
+        migration failed, and duration, the seconds the migration took.
+        Return the summary of the migration.
+        """
+        with self._lock:
+            if 'time_elapsed' in job_stats:
+                elapsed = job_stats['time_elapsed'] / 1000.0
+            elif self._last is not None:
+                elapsed = self._last[0]
+            else:
+                elapsed = duration
+            downtime = job_stats.get('downtime', 0) / 1000.0
+            self._phases = {
+                'preCopy': max(0.0, elapsed - downtime),
+                'downtime': downtime,
+                'postCopyWait': max(0.0, duration - elapsed),
+            }
+            return self._summary()
+
+    def report(self):
+        """
+        Return the recorded samples, oldest first, and the summary of the
+        migration. The time spent in each phase is reported only when the
+        migration has ended.
+        """
+        with self._lock:
+            return {'samples': [dict(s) for s in self._samples],
+                    'summary': self._summary()}
+
+    def _summary(self):
+        throughputs = sorted(s['throughput'] for s in self._samples)
+        iterations = [s['iteration'] for s in self._samples
+                      if 'iteration' in s]
+        summary = {
+            'samples': len(self._samples),
+            'iterations': iterations[-1] if iterations else 0,
+            'throughputP50': _percentile(throughputs, 50),
+            'throughputP95': _percentile(throughputs, 95),
+        }
+        if self._phases is not None:
+            summary['phases'] = dict(self._phases)
+        return summary
+
+
+def _mib(n):
+    return n / float(Mbytes)
+
+
+def _format_summary(summary):
+    phases = summary.get('phases', {})
+    return ('%d samples, %d iterations, throughput p50 %.1f MiB/s '
+            'p95 %.1f MiB/s, pre-copy %.1f seconds, downtime %d ms, '
+            'post-copy wait %.1f seconds' % (
+                summary['samples'], summary['iterations'],
+                summary['throughputP50'],
+                summary['throughputP95'],
+                phases.get('preCopy', 0),
+                phases.get('downtime', 0) * 1000,
+                phases.get('postCopyWait', 0)))
+
+
+def _percentile(values, percent):
+    """
+    Return the nearest rank percentile of sorted values, or 0 if there are
+    no values.
+    """
+    if not values:
+        return 0
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(0, rank - 1)]
+
 
 class SourceThread(threading.Thread):
     """
     A thread that takes care of migration on the source vdsm.
     """
-    _ongoingMigrations = threading.BoundedSemaphore(1)
+    scheduler = _scheduler(1)
 
     @classmethod
     def setMaxOutgoingMigrations(cls, n):
-        """Set the initial value of the _ongoingMigrations semaphore.
+        """Set the number of concurrent outgoing migrations.
 
         must not be called after any vm has been run."""
-        cls._ongoingMigrations = threading.BoundedSemaphore(n)
+        cls.scheduler = _scheduler(n)
 
     def __init__(self, vm, dst='', dstparams='',
                  mode=MODE_REMOTE, method=METHOD_ONLINE,
                  tunneled=False, dstqemu='', abortOnError=False,
-                 compressed=False, autoConverge=False, **kwargs):
+                 compressed=False, autoConverge=False,
+                 priority=PRIORITY_NORMAL, **kwargs):
         self.log = vm.log
         self._vm = vm
         self._dst = dst
@@ -76,6 +384,13 @@ class SourceThread(threading.Thread):
             config.get('vars', 'migration_downtime')
         self._autoConverge = autoConverge
         self._compressed = compressed
+        if priority not in _PRIORITIES:
+            self.log.warning('unknown migration priority %r, using %r',
+                             priority, PRIORITY_NORMAL)
+            priority = PRIORITY_NORMAL
+        self._priority = priority
+        self._ticket = None
+        self.telemetry = MigrationTelemetry()
         self.status = {
             'status': {
                 'code': 0,
@@ -252,11 +567,12 @@ class SourceThread(threading.Thread):
             self._setupVdsConnection()
             self._setupRemoteMachineParams()
             self._prepareGuest()
-            SourceThread._ongoingMigrations.acquire()
+            self._ticket = SourceThread.scheduler.acquire(
+                self._vm.id, self._vm._dom, self._priority)
             try:
                 if self._migrationCanceledEvt:
                     self._raiseAbortError()
-                self.log.debug("migration semaphore acquired after %d seconds",
+                self.log.debug("migration admitted after %d seconds",
                                time.time() - startTime)
                 self._vm.conf['_migrationParams'] = {
                     'dst': self._dst,
@@ -276,7 +592,7 @@ class SourceThread(threading.Thread):
             finally:
                 if '_migrationParams' in self._vm.conf:
                     del self._vm.conf['_migrationParams']
-                SourceThread._ongoingMigrations.release()
+                SourceThread.scheduler.release(self._ticket)
         except Exception as e:
             self._recover(str(e))
             self.log.exception("Failed to migrate")
@@ -329,12 +645,22 @@ class SourceThread(threading.Thread):
             self._vm.log.info('starting migration to %s '
                               'with miguri %s', duri, muri)
 
-            downtimeThread = DowntimeThread(self._vm, int(self._downtime))
-            self._monitorThread = MonitorThread(self._vm, startTime)
-            with utils.running(downtimeThread):
-                with utils.running(self._monitorThread):
-                    # we need to support python 2.6, so two nested with-s.
-                    self._perform_migration(duri, muri)
+            downtimeThread = DowntimeThread(self._vm, int(self._downtime),
+                                            self.telemetry)
+            self._monitorThread = MonitorThread(self._vm, startTime,
+                                                self._ticket, self.telemetry)
+            migrationStartTime = utils.monotonic_time()
+            completed = False
+            try:
+                with utils.running(downtimeThread):
+                    with utils.running(self._monitorThread):
+                        # we need to support python 2.6, so two nested
+                        # with-s.
+                        self._perform_migration(duri, muri)
+                completed = True
+            finally:
+                self._finish_telemetry(
+                    utils.monotonic_time() - migrationStartTime, completed)
 
             self.log.info("migration took %d seconds to complete",
                           (time.time() - startTime) + destCreationTime)
@@ -344,7 +670,7 @@ class SourceThread(threading.Thread):
             SPICE_MIGRATION_HANDOVER_TIME = 120
             self._vm._reviveTicket(SPICE_MIGRATION_HANDOVER_TIME)
 
-        maxBandwidth = config.getint('vars', 'migration_max_bandwidth')
+        maxBandwidth = self._ticket.bandwidth
         # FIXME: there still a race here with libvirt,
         # if we call stop() and libvirt migrateToURI2 didn't start
         # we may return migration stop but it will start at libvirt
@@ -367,6 +693,18 @@ class SourceThread(threading.Thread):
         else:
             self._raiseAbortError()
 
+    def _finish_telemetry(self, duration, completed):
+        stats = {}
+        if completed:
+            try:
+                stats = self._vm._dom.jobStats(
+                    libvirt.VIR_DOMAIN_JOB_STATS_COMPLETED)
+            except libvirt.libvirtError:
+                self.log.debug('cannot get completed migration job stats',
+                               exc_info=True)
+        summary = self.telemetry.finish(stats, duration)
+        self.log.info('migration telemetry: %s', _format_summary(summary))
+
     def stop(self):
         # if its locks we are before the migrateToURI2()
         # call so no need to abortJob()
@@ -386,34 +724,152 @@ def exponential_downtime(downtime, steps):
         yield int(offset + base ** i)
 
 
+class ExponentialDowntime(object):
+    """
+    Raise the downtime on the fixed exponential_downtime schedule.
+    """
+    uses_job_info = False
+
+    def __init__(self, downtime, steps, horizon):
+        self._schedule = exponential_downtime(downtime, steps)
+        self.done = False
+
+    def next(self, job_info):
+        try:
+            return next(self._schedule)
+        except StopIteration:
+            self.done = True
+            return None
+
+
+class AdaptiveDowntime(object):
+    """
+    Raise the downtime only when the migration is not converging.
+
+    The bandwidth and the dirty page rate are estimated from successive
+    jobInfo samples. While the remaining data is predicted to fit in the
+    current downtime before horizon seconds have passed since the first
+    sample, the downtime is kept. Otherwise it is raised to the smallest
+    step of the exponential schedule allowing to send the remaining data
+    during the downtime.
+    """
+    uses_job_info = True
+
+    def __init__(self, downtime, steps, horizon):
+        self._schedule = list(exponential_downtime(downtime, steps))
+        self._max = downtime
+        self._horizon = horizon
+        self._start = None
+        self._current = None
+        self._last = None
+        self.done = False
+
+    def next(self, job_info):
+        # timeElapsed is in milliseconds
+        sample = (job_info[1] / 1000.0, job_info[4], job_info[5])
+        last, self._last = self._last, sample
+
+        if self._current is None:
+            self._start = sample[0]
+            return self._set(self._schedule[0])
+
+        elapsed, processed, remaining = sample
+        if last is None or elapsed <= last[0]:
+            return None
+        interval = elapsed - last[0]
+
+        bandwidth = (processed - last[1]) / interval
+        if bandwidth <= 0:
+            # No data sent, nothing to predict from
+            return self._set(self._next_step(self._current))
+
+        needed = remaining / bandwidth * 1000
+        if needed <= self._current:
+            # The remaining data can be sent during the downtime
+            return None
+
+        # Data sent minus data dirtied since the last sample
+        convergence = (last[2] - remaining) / interval
+        # Time left in the schedule
+        left = self._horizon - (elapsed - self._start)
+        if convergence > 0 and left > 0:
+            target = self._current / 1000.0 * bandwidth
+            if (remaining - target) / convergence <= left:
+                return None
+
+        return self._set(self._next_step(needed))
+
+    def _next_step(self, downtime):
+        for step in self._schedule:
+            if step > downtime and step > self._current:
+                return step
+        return self._max
+
+    def _set(self, downtime):
+        self._current = min(int(downtime), self._max)
+        if self._current >= self._max:
+            self.done = True
+        return self._current
+
+
+_DOWNTIME_POLICIES = {
+    'exponential': ExponentialDowntime,
+    'adaptive': AdaptiveDowntime,
+}
+
+
+def downtime_policy(name, downtime, steps, horizon):
+    return _DOWNTIME_POLICIES[name](downtime, steps, horizon)
+
+
 class DowntimeThread(threading.Thread):
     DOWNTIME_STEPS = config.getint('vars', 'migration_downtime_steps')
 
-    def __init__(self, vm, downtime):
+    def __init__(self, vm, downtime, telemetry=None):
         super(DowntimeThread, self).__init__()
 
         self._vm = vm
         self._downtime = downtime
+        self._telemetry = telemetry
         self._stop = threading.Event()
 
         delay_per_gib = config.getint('vars', 'migration_downtime_delay')
         memSize = int(vm.conf['memSize'])
         self._wait = (delay_per_gib * max(memSize, 2048) + 1023) / 1024
+        # The adaptive policy keeps the downtime if the migration would
+        # converge before the exponential schedule reaches its end.
+        self._policy = downtime_policy(
+            config.get('vars', 'migration_downtime_policy'),
+            self._downtime, self.DOWNTIME_STEPS, self._wait)
 
         self.daemon = True
 
     def run(self):
         self._vm.log.debug('migration downtime thread started')
 
-        for downtime in exponential_downtime(self._downtime,
-                                             self.DOWNTIME_STEPS):
+        while not self._policy.done:
             self._stop.wait(self._wait / self.DOWNTIME_STEPS)
 
             if self._stop.isSet():
                 break
 
+            job_info = None
+            if self._policy.uses_job_info:
+                try:
+                    job_info = self._vm._dom.jobInfo()
+                except libvirt.libvirtError:
+                    self._vm.log.debug('cannot get migration job info',
+                                       exc_info=True)
+                    break
+
+            downtime = self._policy.next(job_info)
+            if downtime is None:
+                continue
+
             self._vm.log.debug('setting migration downtime to %d', downtime)
             self._vm._dom.migrateSetMaxDowntime(downtime, 0)
+            if self._telemetry is not None:
+                self._telemetry.set_downtime(downtime)
 
         self._vm.log.debug('migration downtime thread exiting')
 
@@ -426,11 +882,13 @@ class MonitorThread(threading.Thread):
     _MIGRATION_MONITOR_INTERVAL = config.getint(
         'vars', 'migration_monitor_interval')  # seconds
 
-    def __init__(self, vm, startTime):
+    def __init__(self, vm, startTime, ticket=None, telemetry=None):
         super(MonitorThread, self).__init__()
         self._stop = threading.Event()
         self._vm = vm
         self._startTime = startTime
+        self._ticket = ticket
+        self._telemetry = telemetry
         self.daemon = True
         self.progress = 0
 
@@ -464,12 +922,19 @@ class MonitorThread(threading.Thread):
 
         while not self._stop.isSet():
             self._stop.wait(self._MIGRATION_MONITOR_INTERVAL)
-            (jobType, timeElapsed, _,
-             dataTotal, dataProcessed, dataRemaining,
-             memTotal, memProcessed, memRemaining,
-             fileTotal, fileProcessed, _) = self._vm._dom.jobInfo()
+            jobStats = self._vm._dom.jobStats()
+            jobType = jobStats.get('type', libvirt.VIR_DOMAIN_JOB_NONE)
+            timeElapsed = jobStats.get('time_elapsed', 0)
             # from libvirt sources: data* = file* + mem*.
             # docs can be misleading due to misaligned lines.
+            dataTotal = jobStats.get('data_total', 0)
+            dataProcessed = jobStats.get('data_processed', 0)
+            dataRemaining = jobStats.get('data_remaining', 0)
+            if self._ticket is not None:
+                self._ticket.progress(dataProcessed)
+            if (self._telemetry is not None and
+                    jobType != libvirt.VIR_DOMAIN_JOB_NONE):
+                self._telemetry.record(jobStats)
             abort = False
             now = time.time()
             if 0 < migrationMaxTime < now - self._startTime:
@@ -35,6 +35,8 @@ from vdsm import ipwrapper
 from vdsm import netinfo
 from vdsm import utils
 from vdsm.config import config
+from vdsm.netlink import link as nl_link
+from vdsm.netlink import monitor as nl_monitor
 
 import caps
 
@@ -49,7 +51,11 @@ class InterfaceSample(object):
 
     The sample is set at the time of initialization and can't be updated.
     """
-    def readIfaceStat(self, ifid, stat):
+    _STATS = ('rx_bytes', 'tx_bytes', 'rx_dropped', 'tx_dropped',
+              'rx_errors', 'tx_errors')
+
+    @staticmethod
+    def readIfaceStat(ifid, stat):
         """
         Get and interface's stat.
 
@@ -85,17 +91,33 @@ class InterfaceSample(object):
                 if not tries:
                     raise
 
-    def __init__(self, link):
+    def __init__(self, operUp, stats, speed, duplex):
+        """
+        :param operUp: Whether the link is operationally up.
+        :param stats: A dict of link counters named as in
+                      /sys/class/net/<link>/statistics/.
+        :param speed: The link speed in Mbps.
+        :param duplex: The link duplex state.
+        """
+        self.rx = stats['rx_bytes']
+        self.tx = stats['tx_bytes']
+        self.rxDropped = stats['rx_dropped']
+        self.txDropped = stats['tx_dropped']
+        self.rxErrors = stats['rx_errors']
+        self.txErrors = stats['tx_errors']
+        self.operstate = 'up' if operUp else 'down'
+        self.speed = speed
+        self.duplex = duplex
+
+    @classmethod
+    def fromLink(cls, link):
+        """
+        Sample an ipwrapper.Link, reading its counters from /sys.
+        """
         ifid = link.name
-        self.rx = self.readIfaceStat(ifid, 'rx_bytes')
-        self.tx = self.readIfaceStat(ifid, 'tx_bytes')
-        self.rxDropped = self.readIfaceStat(ifid, 'rx_dropped')
-        self.txDropped = self.readIfaceStat(ifid, 'tx_dropped')
-        self.rxErrors = self.readIfaceStat(ifid, 'rx_errors')
-        self.txErrors = self.readIfaceStat(ifid, 'tx_errors')
-        self.operstate = 'up' if link.oper_up else 'down'
-        self.speed = _getLinkSpeed(link)
-        self.duplex = _getDuplex(ifid)
+        stats = dict((stat, cls.readIfaceStat(ifid, stat))
+                     for stat in cls._STATS)
+        return cls(link.oper_up, stats, _getLinkSpeed(link), _getDuplex(ifid))
 
     _LOGGED_ATTRS = ('operstate', 'speed', 'duplex')
 
@@ -216,17 +238,112 @@ def getBootTime():
     raise ValueError('Boot time not present')
 
 
+class LinkInfoCache(object):
+    """
+    Cache the speed and duplex of links, which are expensive to get and
+    rarely change.
+
+    The cache is used only while it is monitoring netlink link events;
+    any event for a link drops its cached information. Bonds and vlans are
+    not cached, since their information derives from their slaves or
+    underlying device, whose events do not name them.
+    """
+    _log = logging.getLogger('virt.sampling.LinkInfoCache')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._info = {}
+        self._generation = 0
+        self._monitor = None
+
+    def start(self):
+        monitor = nl_monitor.Monitor(groups=('link',))
+        monitor.start()
+        with self._lock:
+            self._monitor = monitor
+        t = threading.Thread(target=self._run, args=(monitor,),
+                             name='link-info-cache')
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        with self._lock:
+            monitor = self._monitor
+            self._monitor = None
+            self._info.clear()
+        if monitor is not None:
+            monitor.stop()
+
+    def _run(self, monitor):
+        try:
+            for event in monitor:
+                self.invalidate(event.get('name'))
+        except Exception:
+            self._log.exception("Error monitoring link events")
+        finally:
+            with self._lock:
+                if self._monitor is monitor:
+                    self._monitor = None
+                self._info.clear()
+
+    def invalidate(self, name=None):
+        """
+        Drop the cached information for link name, or for all links.
+        """
+        with self._lock:
+            self._generation += 1
+            if name is None:
+                self._info.clear()
+            else:
+                self._info.pop(name, None)
+
+    def get(self, linkInfo):
+        """
+        Return the (speed, duplex) of the link described by linkInfo, an
+        information dictionary from netlink.link.
+
+        Raises IOError(ENODEV) if the link does not exist.
+        """
+        name = linkInfo['name']
+        with self._lock:
+            if self._monitor is not None and name in self._info:
+                return self._info[name]
+            generation = self._generation
+
+        link = ipwrapper.Link.fromDict(dict(linkInfo))
+        info = _getLinkSpeed(link), _getDuplex(name)
+        if link.isBOND() or link.isVLAN():
+            return info
+
+        with self._lock:
+            # Do not cache information that an event may have outdated
+            if (self._monitor is not None and
+                    generation == self._generation):
+                self._info[name] = info
+        return info
+
+
+_linkInfoCache = LinkInfoCache()
+
+
 def _get_interfaces_and_samples():
     links_and_samples = {}
-    for link in ipwrapper.getLinks():
+    # The counters of all links are fetched with a single netlink dump. The
+    # dump is completed before looking up the links, to release its netlink
+    # socket as soon as possible.
+    for info in list(nl_link.iter_links_stats()):
+        name = info['name']
         try:
-            links_and_samples[link.name] = InterfaceSample(link)
+            speed, duplex = _linkInfoCache.get(info)
         except IOError as e:
             # this handles a race condition where the device is now no
             # longer exists and netlink fails to fetch it
             if e.errno == errno.ENODEV:
                 continue
             raise
+        operUp = bool(info['flags'] & ipwrapper.Link.IFF_RUNNING)
+        links_and_samples[name] = InterfaceSample(
+            operUp, info['stats'], speed, duplex)
     return links_and_samples
 
 
@@ -401,6 +518,70 @@ class AdvancedStatsFunction(object):
         return self._samples.last()
 
 
+class EventDrivenStatsFunction(AdvancedStatsFunction):
+    """
+    An AdvancedStatsFunction whose samples are reported by libvirt events.
+
+    Samples are recorded with update() when an event arrives. The function
+    is executed only after invalidate() was called, and every 'reconcile'
+    seconds in case an event was missed. If 'reconcile' is None, events are
+    not available and the function is executed on every interval.
+    """
+    def __init__(self, function, interval=1, window=_MINIMUM_SAMPLES,
+                 reconcile=None, timefn=time.time,
+                 clock=utils.monotonic_time):
+        super(EventDrivenStatsFunction, self).__init__(
+            function, interval, window, timefn)
+        self._reconcile = reconcile
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._lastCall = None
+        self._stale = True
+        self._generation = 0
+
+    def __repr__(self):
+        return "<EventDrivenStatsFunction %s at 0x%x>" % (
+            self._function.__name__, id(self._function.__name__))
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            if not self._needsCall():
+                return self._samples.last()
+            self._stale = False
+            generation = self._generation
+
+        value = self._function(*args, **kwargs)
+
+        with self._lock:
+            self._lastCall = self._clock()
+            # An event that arrived while the function was running is
+            # newer than its value.
+            if generation == self._generation:
+                self._samples.append(value)
+        return value
+
+    def update(self, value):
+        """
+        Record a sample reported by an event.
+        """
+        with self._lock:
+            self._generation += 1
+            self._samples.append(value)
+
+    def invalidate(self):
+        """
+        Execute the function on the next interval.
+        """
+        with self._lock:
+            self._generation += 1
+            self._stale = True
+
+    def _needsCall(self):
+        return (self._reconcile is None or self._stale or
+                self._lastCall is None or
+                self._clock() - self._lastCall >= self._reconcile)
+
+
 class StatsCache(object):
     """
     Cache for bulk stats samples.
@@ -589,6 +770,7 @@ class HostStatsThread(threading.Thread):
 
     def stop(self):
         self._stopEvent.set()
+        _linkInfoCache.stop()
 
     def sample(self):
         hs = HostSample(self._pid)
@@ -596,6 +778,11 @@ class HostStatsThread(threading.Thread):
 
     def run(self):
         import vm
+        try:
+            _linkInfoCache.start()
+        except Exception:
+            self._log.exception("Cannot monitor link events, link speed "
+                                "and duplex will not be cached")
         try:
             # wait a bit before starting to sample
             time.sleep(self._sampleInterval)
@@ -70,6 +70,7 @@ from .vmtune import io_tune_values_to_dom, io_tune_dom_to_values
 from . import vmxml
 
 from .sampling import AdvancedStatsFunction, AdvancedStatsThread
+from .sampling import EventDrivenStatsFunction
 from .utils import isVdsmImage
 from vmpowerdown import VmShutdown, VmReboot
 
@@ -183,6 +184,19 @@ VolumeSize = namedtuple("VolumeSize",
 
 _MBPS_TO_BPS = 10 ** 6 / 8
 
+_EVENT_ID_BALLOON_CHANGE = getattr(
+    libvirt, 'VIR_DOMAIN_EVENT_ID_BALLOON_CHANGE', None)
+
+
+def _eventReconcileInterval(eventid):
+    """
+    Return the interval for sampling state reported by eventid, or None if
+    the event is not registered and the state must be polled.
+    """
+    if eventid not in libvirtconnection.registered_events():
+        return None
+    return config.getint('vars', 'vm_event_reconcile_interval')
+
 
 class VmStatsThread(AdvancedStatsThread):
 
@@ -210,10 +224,14 @@ class VmStatsThread(AdvancedStatsThread):
                 self._sampleNet,
                 config.getint('vars', 'vm_sample_net_interval'),
                 config.getint('vars', 'vm_sample_net_window')))
+        # The balloon size is reported by events when libvirt supports
+        # them, so it is sampled only to reconcile missed events.
         self.sampleBalloon = (
-            AdvancedStatsFunction(
+            EventDrivenStatsFunction(
                 self._sampleBalloon,
-                config.getint('vars', 'vm_sample_balloon_interval'), 1))
+                config.getint('vars', 'vm_sample_balloon_interval'), 1,
+                reconcile=_eventReconcileInterval(
+                    _EVENT_ID_BALLOON_CHANGE)))
         self.sampleVmJobs = (
             AdvancedStatsFunction(
                 self._sampleVmJobs,
@@ -771,6 +789,7 @@ class Vm(object):
         self._vcpuLimit = None
         self._vcpuTuneInfo = {}
         self._numaInfo = {}
+        self._numaSampler = numaUtils.NumaSampler(self)
 
     def _get_lastStatus(self):
         # note that we don't use _statusLock here. One of the reasons is the
@@ -1836,6 +1855,7 @@ class Vm(object):
         else:
             memUsage = 0
         stats['memUsage'] = utils.convertToStr(int(memUsage))
+        stats['guestAgentChannelStats'] = self.guestAgent.getChannelStats()
         return stats
 
     def isMigrating(self):
@@ -1870,6 +1890,11 @@ class Vm(object):
     def migrateStatus(self):
         return self._migrationSourceThread.getStat()
 
+    def migrationStats(self):
+        return {'status': doneCode,
+                'migrationStats':
+                    self._migrationSourceThread.telemetry.report()}
+
     def migrateCancel(self):
         self._acquireCpuLockWithTimeout()
         try:
@@ -2580,6 +2605,7 @@ class Vm(object):
             return response.error('setNumberOfCpusErr', e.message)
 
         self.conf['smp'] = str(numberOfCpus)
+        self._numaSampler.invalidate()
         self.saveState()
         hooks.after_set_num_of_cpus()
         return {'status': doneCode, 'vmList': self.status()}
@@ -3685,6 +3711,72 @@ class Vm(object):
                       "Action: %s", self.name,
                       actionToString(action))
 
+    def _onBalloonChange(self, actual):
+        self.log.debug('balloon size changed to %d KiB', actual)
+        vmStats = self._vmStats
+        if vmStats is not None:
+            vmStats.sampleBalloon.update(actual)
+
+    def _onBlockJobEvent(self, disk, jobType, status):
+        """
+        Mark the tracked block job of disk as gone when libvirt reports its
+        end, so the next sample starts its cleanup without querying libvirt.
+        disk is the drive name, or its path for the older BLOCK_JOB event.
+        """
+        self.log.debug('block job event disk %s type %s status %s',
+                       disk, jobType, status)
+        if status not in (libvirt.VIR_DOMAIN_BLOCK_JOB_COMPLETED,
+                          libvirt.VIR_DOMAIN_BLOCK_JOB_FAILED,
+                          libvirt.VIR_DOMAIN_BLOCK_JOB_CANCELED):
+            return
+        with self._jobsLock:
+            for storedJob in self.conf['_blockJobs'].values():
+                try:
+                    drive = self._findDriveByUUIDs(storedJob['disk'])
+                except LookupError:
+                    continue
+                if disk in (drive.name, drive.path):
+                    self.log.info('block job %s ended', storedJob['jobID'])
+                    storedJob['gone'] = True
+
+    def _onDeviceRemoved(self, alias):
+        """
+        Stop tracking a device removed from the domain without a hotunplug
+        request, for example when the guest ejected it.
+        """
+        self.log.debug('device %s removed', alias)
+        for devType, devices in self._devices.items():
+            for dev in devices[:]:
+                if getattr(dev, 'alias', None) != alias:
+                    continue
+                self.log.info('device %s was removed from the domain', alias)
+                devices.remove(dev)
+                with self._confLock:
+                    for devConf in self.conf['devices'][:]:
+                        if devConf.get('alias') == alias:
+                            self.conf['devices'].remove(devConf)
+                self.saveState()
+                if devType == hwclass.DISK:
+                    # Teardown accesses storage and must not block the
+                    # libvirt event loop.
+                    t = threading.Thread(target=self._cleanupDrives,
+                                         args=(dev,),
+                                         name='vm-cleanup-%s' % alias)
+                    t.daemon = True
+                    t.start()
+                return
+
+    def _onTunableEvent(self, params):
+        self.log.debug('tunable parameters changed: %s', params)
+        vcpuTune = dict((key[len('cputune.'):], value)
+                        for key, value in params.iteritems()
+                        if key in ('cputune.vcpu_quota',
+                                   'cputune.vcpu_period'))
+        if vcpuTune:
+            vcpuTuneInfo = dict(self._vcpuTuneInfo)
+            vcpuTuneInfo.update(vcpuTune)
+            self._vcpuTuneInfo = vcpuTuneInfo
+
     def changeCD(self, drivespec):
         if self.arch in caps.Architecture.POWER:
             blockdev = 'sda'
@@ -5015,7 +5107,7 @@ class Vm(object):
             stats['monitorResponse'] = '-1'
 
     def updateNumaInfo(self):
-        self._numaInfo = numaUtils.getVmNumaNodeRuntimeInfo(self)
+        self._numaInfo = self._numaSampler.sample()
 
     @property
     def hasGuestNumaNode(self):
@@ -45,6 +45,8 @@ class Listener(threading.Thread):
         self._update_lock = threading.Lock()
         self._add_channels = {}
         self._del_channels = []
+        self._throttle_channels = {}
+        self._throttled = {}
         self._timeout = None
 
     def _handle_event(self, fileno, event):
@@ -118,14 +120,42 @@ class Listener(threading.Thread):
             self._add_channels.pop(fileno, None)
             self._unconnected.pop(fileno, None)
             self._channels.pop(fileno, None)
+            self._throttle_channels.pop(fileno, None)
+            self._throttled.pop(fileno, None)
             self.log.debug("fileno %d was removed from listener.", fileno)
         self._del_channels = []
 
+    def _do_throttle_channels(self):
+        """ Stop polling the channels requested to be throttled. """
+        now = time.time()
+        for (fileno, seconds) in self._throttle_channels.items():
+            obj = self._channels.pop(fileno, None)
+            if obj is None:
+                continue
+            self._epoll.unregister(fileno)
+            obj['throttle_time'] = now + seconds
+            self._throttled[fileno] = obj
+            self.log.debug("fileno %d was throttled for %d seconds.",
+                           fileno, seconds)
+        self._throttle_channels.clear()
+
     def _update_channels(self):
         """ Update channels list. """
         with self._update_lock:
             self._do_add_channels()
             self._do_del_channels()
+            self._do_throttle_channels()
+
+    def _handle_throttled(self):
+        """ Resume polling the channels whose cooldown has ended. """
+        now = time.time()
+        for (fileno, obj) in self._throttled.items():
+            if now >= obj['throttle_time']:
+                self.log.debug("Resuming throttled fileno %d.", fileno)
+                del self._throttled[fileno]
+                self._channels[fileno] = obj
+                obj['read_time'] = now
+                self._epoll.register(fileno, select.EPOLLIN)
 
     def _handle_unconnected(self):
         """
@@ -169,6 +199,7 @@ class Listener(threading.Thread):
             self._handle_event(fileno, event)
         else:
             self._update_channels()
+            self._handle_throttled()
             if (self._timeout is not None) and (self._timeout > 0):
                 self._handle_timeouts()
             self._handle_unconnected()
@@ -214,3 +245,11 @@ class Listener(threading.Thread):
         self.log.debug("Delete fileno %d from listener.", fileno)
         with self._update_lock:
             self._del_channels.append(fileno)
+
+    def throttle(self, fileno, seconds):
+        """
+        Stop reading a connected file descriptor for the given number of
+        seconds, leaving the data sent on it in the socket buffer.
+        """
+        with self._update_lock:
+            self._throttle_channels[fileno] = seconds